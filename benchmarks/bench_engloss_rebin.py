@@ -0,0 +1,51 @@
+""" Benchmark of :meth:`.EnglossRebinData.rebin` against the original implementation, which is kept as a reference in ``tests/test_spectools.py``.
+
+Run from the repository root with ``python benchmarks/bench_engloss_rebin.py``.
+
+"""
+
+import sys
+import os
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from darkhistory.spec.spectools import EnglossRebinData
+from tests.test_spectools import engloss_rebin_ref
+
+def main(n_eleceng=500, n_photeng=500, number=20):
+
+    # Same abscissae as the default binning.
+    eleceng = 10**np.linspace(np.log10(1e-3), np.log10(5e12), n_eleceng)
+    photeng = 10**np.linspace(np.log10(1e-4), np.log10(5e12), n_photeng)
+
+    rng = np.random.default_rng(0)
+    grid_vals = rng.random((n_eleceng, n_photeng))
+
+    setup_time = timeit.timeit(
+        lambda: EnglossRebinData(eleceng, photeng, eleceng), number=1
+    )
+    rebin_data = EnglossRebinData(eleceng, photeng, eleceng)
+
+    new = rebin_data.rebin(grid_vals)
+    old = engloss_rebin_ref(rebin_data, grid_vals)
+    print('Maximum difference relative to total: ', np.max(
+        np.abs(new - old)
+    )/np.max(np.abs(old)))
+
+    t_old = timeit.timeit(
+        lambda: engloss_rebin_ref(rebin_data, grid_vals), number=number
+    )/number
+    t_new = timeit.timeit(
+        lambda: rebin_data.rebin(grid_vals), number=number
+    )/number
+
+    print('Construction:              {:.2f} ms'.format(setup_time*1e3))
+    print('rebin, aggregate:          {:.2f} ms'.format(t_old*1e3))
+    print('rebin, sparse matrix:      {:.2f} ms'.format(t_new*1e3))
+    print('Speedup:                   {:.1f}x'.format(t_old/t_new))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+""" Benchmark of :class:`.ICSSpecTable` against :func:`.ics_spec` and :func:`.engloss_spec`.
+
+Run from the repository root with ``python benchmarks/bench_ics_spec_table.py``. The ICS transfer functions must be in the data directory set in ``config.py``.
+
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from config import load_data
+from darkhistory.electrons.ics.ics_cooling import ICSSpecTable
+
+def main(rs_min=100., rs_max=200., n_test=20, dlnrs_list=(0.1, 0.03, 0.01)):
+
+    # Same abscissae as the default binning.
+    eleceng = 10**np.linspace(np.log10(1e-3), np.log10(5e12), 500)
+    photeng = 10**np.linspace(np.log10(1e-4), np.log10(5e12), 500)
+
+    ics_tf = load_data('ics_tf')
+    raw_tfs = (ics_tf['thomson'], ics_tf['rel'], ics_tf['engloss'])
+
+    # Redshifts between the nodes of the tables.
+    rng = np.random.default_rng(0)
+    rs_test = np.exp(rng.uniform(np.log(rs_min), np.log(rs_max), n_test))
+
+    # Direct computation.
+    table = ICSSpecTable(
+        eleceng, photeng, np.array([rs_min, rs_max]), *raw_tfs
+    )
+    start = time.perf_counter()
+    direct = [table._direct(eleceng, photeng, rs) for rs in rs_test]
+    t_direct = (time.perf_counter() - start)/n_test
+
+    print('Direct computation:              {:.2f} ms'.format(t_direct*1e3))
+
+    for dlnrs in dlnrs_list:
+
+        n_rs = int(np.ceil(np.log(rs_max/rs_min)/dlnrs)) + 1
+        rs_arr = np.exp(np.linspace(np.log(rs_min), np.log(rs_max), n_rs))
+
+        start = time.perf_counter()
+        table = ICSSpecTable(eleceng, photeng, rs_arr, *raw_tfs)
+        t_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        interp = [table.interp(rs) for rs in rs_test]
+        t_interp = (time.perf_counter() - start)/n_test
+
+        # Maximum difference relative to the peak of each row, over all
+        # electrons and over electrons above 3 keV, which are the ones
+        # that cool through ICS in get_elec_cooling_tf. For the lowest
+        # electron energies, the spectra lie almost entirely below
+        # photeng[0], so that only their exponential tails are on the
+        # grid. 
+        high = eleceng > 3000
+        err = np.array([
+            [
+                np.max(
+                    np.abs(new.grid_vals - old.grid_vals)
+                    /np.max(old.grid_vals, axis=1, keepdims=True),
+                    axis=1
+                ) for new, old in zip(new_tfs, old_tfs)
+            ] for new_tfs, old_tfs in zip(interp, direct)
+        ])
+        err_all  = np.max(err, axis=(0, 2))
+        err_high = np.max(err[:, :, high], axis=(0, 2))
+
+        print('dlnrs = {:g}, {:d} redshifts:'.format(dlnrs, n_rs))
+        print('    Maximum difference relative to row peak:')
+        print('        ICS, all electrons:          {:.1e}'.format(err_all[0]))
+        print('        ICS, above 3 keV:            {:.1e}'.format(err_high[0]))
+        print('        energy loss, all electrons:  {:.1e}'.format(err_all[1]))
+        print('        energy loss, above 3 keV:    {:.1e}'.format(err_high[1]))
+        print('    Table size:                      {:.0f} MB'.format(
+            (table.ics_grid.nbytes + table.engloss_grid.nbytes)/2**20
+        ))
+        print('    Construction:                    {:.2f} s'.format(t_build))
+        print('    Interpolation:                   {:.2f} ms'.format(t_interp*1e3))
+        print('    Speedup:                         {:.1f}x'.format(t_direct/t_interp))
+
+if __name__ == '__main__':
+    main()
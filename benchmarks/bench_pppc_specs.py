@@ -0,0 +1,53 @@
+""" Benchmark of :func:`.get_pppc_specs` against a loop over :func:`.get_pppc_spec`.
+
+Run from the repository root with ``python benchmarks/bench_pppc_specs.py``. The PPPC4DMID tables must be in the data directory set in ``config.py``.
+
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from darkhistory.spec import pppc
+
+def main(n_mass=200, pri='b', sec='elec'):
+
+    # Same abscissa as the default binning.
+    eng = 10**np.linspace(np.log10(1e-4), np.log10(5e12), 500)
+
+    # Masses from 10 GeV to 1 TeV.
+    mDM = np.logspace(10, 12, n_mass)
+
+    # Do not reuse cached spectra in the loop.
+    pppc.spec_cache_size = 0
+
+    # Build the interpolator before timing.
+    pppc.get_pppc_spec(mDM[0], eng, pri, sec)
+
+    for method in ['rebin', 'integrate']:
+
+        start = time.perf_counter()
+        old = np.array([
+            pppc.get_pppc_spec(m, eng, pri, sec, method=method).dNdE
+            for m in mDM
+        ])
+        t_old = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = pppc.get_pppc_specs(mDM, eng, pri, sec, method=method)
+        t_new = time.perf_counter() - start
+
+        print("method = '"+method+"', ", n_mass, ' masses:')
+        print('    Maximum difference relative to peak: ', np.max(
+            np.abs(new.grid_vals - old)/np.max(old, axis=1, keepdims=True)
+        ))
+        print('    get_pppc_spec, one at a time: {:.2f} s'.format(t_old))
+        print('    get_pppc_specs:               {:.2f} s'.format(t_new))
+        print('    Speedup:                      {:.1f}x'.format(t_old/t_new))
+
+if __name__ == '__main__':
+    main()
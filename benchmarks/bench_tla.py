@@ -0,0 +1,78 @@
+""" Benchmark of :class:`.TLAEquations` against the original right-hand side of :func:`.get_history`.
+
+Run from the repository root with ``python benchmarks/bench_tla.py``.
+
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import darkhistory.physics as phys
+from darkhistory.history import tla
+
+def main(n_hist=32, n_rs=400):
+
+    rs_start = 1500.
+    rs_vec   = np.exp(np.linspace(np.log(rs_start), np.log(4.), n_rs))
+
+    init_cond = [
+        phys.TCMB(rs_start), phys.xe_Saha(rs_start, 'HI'), 1e-6*phys.chi, 0.
+    ]
+
+    # Roughly the injection rate of 100 MeV DM decaying with a lifetime
+    # of 1e25 s.
+    def injection_rate(rs):
+        return phys.rho_DM * rs**3 / 1e25
+
+    kwargs = {
+        'init_cond': init_cond, 'f_H_ion': 0.3, 'f_H_exc': 0.1,
+        'f_heating': 0.2, 'injection_rate': injection_rate,
+        'reion_switch': True, 'helium_TLA': True
+    }
+
+    # Single history.
+    start = time.perf_counter()
+    old = tla.get_history(rs_vec, vectorized=False, **kwargs)
+    t_old = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = tla.get_history(rs_vec, **kwargs)
+    t_new = time.perf_counter() - start
+
+    print('Single history:')
+    print('    Maximum relative difference: ', np.max(np.abs(new - old)/old))
+    print('    Original right-hand side: ', t_old, ' s')
+    print('    TLAEquations: ', t_new, ' s')
+
+    # Several histories, with different heating fractions.
+    f_heating = np.linspace(0., 0.5, n_hist)
+
+    start = time.perf_counter()
+    old = np.array([
+        tla.get_history(
+            rs_vec, vectorized=False, **dict(kwargs, f_heating=f)
+        ) for f in f_heating
+    ])
+    t_old = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = tla.get_history_batch(
+        rs_vec, np.tile(init_cond, (n_hist, 1)), f_H_ion=0.3, f_H_exc=0.1,
+        f_heating=f_heating, injection_rate=injection_rate,
+        reion_switch=True, helium_TLA=True
+    )
+    t_new = time.perf_counter() - start
+
+    print(n_hist, ' histories:')
+    print('    Maximum relative difference: ', np.max(np.abs(new - old)/old))
+    print('    Original right-hand side, one at a time: ', t_old, ' s')
+    print('    TLAEquations, all together: ', t_new, ' s')
+
+if __name__ == '__main__':
+
+    main()
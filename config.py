@@ -4,6 +4,7 @@
 
 import os
 import sys
+from collections.abc import Sequence
 
 import numpy as np
 import json
@@ -13,6 +14,8 @@ from scipy.interpolate import PchipInterpolator
 from scipy.interpolate import pchip_interpolate
 from scipy.interpolate import RegularGridInterpolator
 
+import darkhistory.utilities as utils
+
 
 # Location of all data files. CHANGE THIS FOR DARKHISTORY TO ALWAYS
 # LOOK FOR THESE DATA FILES HERE. 
@@ -28,16 +31,53 @@ glob_hist_data    = None
 glob_pppc_data    = None
 glob_f_data       = None
 
+# File names (without extension) of the transfer functions in data_path.
+dep_tf_file_names = {
+    'highengphot' : 'highengphot_tf_interp',
+    'lowengphot'  : 'lowengphot_tf_interp',
+    'lowengelec'  : 'lowengelec_tf_interp',
+    'highengdep'  : 'highengdep_interp',
+    'CMB_engloss' : 'CMB_engloss_interp'
+}
+ics_tf_file_names = {
+    'thomson' : 'ics_thomson_ref_tf',
+    'rel'     : 'ics_rel_ref_tf',
+    'engloss' : 'engloss_ref_tf'
+}
+
+# File name (without extension) of the binary PPPC4DMID tables in data_path.
+pppc_file_name = 'dlNdlxIEW_tables'
+
+# Channels in the raw PPPC4DMID tables, in the order of axis 1 of the data.
+pppc_table_chans = [
+    'e_L', 'e_R', 'mu_L', 'mu_R', 'tau_L', 'tau_R',
+    'q', 'c', 'b', 't',
+    'W_L', 'W_T', 'Z_L', 'Z_T', 
+    'g', 'gamma', 'h',
+    'nu_e', 'nu_mu', 'nu_tau',
+    'VV_to_4e', 'VV_to_4mu', 'VV_to_4tau'
+]
+
+# Primary channels with a PchipInterpolator2D.
+pppc_chan_list = [
+    'e_L','e_R', 'e', 'mu_L', 'mu_R', 'mu', 
+    'tau_L', 'tau_R', 'tau',
+    'q',  'c',  'b', 't',
+    'W_L', 'W_T', 'W', 'Z_L', 'Z_T', 'Z', 'g',  'gamma', 'h',
+    'nu_e', 'nu_mu', 'nu_tau',
+    'VV_to_4e', 'VV_to_4mu', 'VV_to_4tau'
+]
+
 class PchipInterpolator2D: 
 
     """ 2D interpolation over PPPC4DMID raw data, using the PCHIP method.
 
     Parameters
     -----------
-    coords_data : ndarray, size (M,N)
-
-        
-    values_data : ndarray
+    coords_data : ndarray or mapping
+        Coordinates of the PPPC4DMID tables, of size (2, 23, 2), as read from ``dlNdlxIEW_coords_table.txt``. If *values_data* is None, this is instead the mapping of arrays saved by :func:`convert_pppc_to_binary`, and only the arrays of channels needed for *pri* are read. 
+    values_data : ndarray or None
+        Values of the PPPC4DMID tables, of size (2, 23), as read from ``dlNdlxIEW_values_table.txt``. 
     pri : string
         Specifies primary annihilation channel. See :func:`.get_pppc_spec` for the full list.
     sec : {'elec', 'phot'}
@@ -92,47 +132,48 @@ class PchipInterpolator2D:
             pri_2 = pri
             self._weight = [0.5, 0.5]
 
-        idx_list_data = {
-            'e_L': 0, 'e_R': 1, 'mu_L': 2, 'mu_R': 3, 'tau_L': 4, 'tau_R': 5,
-            'q': 6, 'c': 7, 'b': 8, 't': 9,
-            'W_L': 10, 'W_T': 11, 'Z_L': 12, 'Z_T': 13, 
-            'g': 14, 'gamma': 15, 'h': 16,
-            'nu_e': 17, 'nu_mu': 18, 'nu_tau': 19,
-            'VV_to_4e': 20, 'VV_to_4mu': 21, 'VV_to_4tau': 22
-        } 
-        
-        # Compile the raw data.
-        mDM_in_GeV_arr_1 = np.array(
-            coords_data[i, idx_list_data[pri_1], 0]
-        )
-        log10x_arr_1     = np.array(
-            coords_data[i, idx_list_data[pri_1], 1]
-        )
-        values_arr_1     = np.array(values_data[i, idx_list_data[pri_1]])
+        def raw_data(chan):
+            if values_data is None:
+                # Binary tables from convert_pppc_to_binary. Arrays are
+                # only read from disk when accessed.
+                key = sec+'_'+chan
+                return (
+                    coords_data[key+'_mDM'], coords_data[key+'_log10x'],
+                    coords_data[key+'_values']
+                )
+            j = pppc_table_chans.index(chan)
+            return (
+                np.array(coords_data[i, j, 0]), 
+                np.array(coords_data[i, j, 1]), 
+                np.array(values_data[i, j])
+            )
 
-        mDM_in_GeV_arr_2 = np.array(
-            coords_data[i, idx_list_data[pri_2], 0]
-        )
-        log10x_arr_2     = np.array(
-            coords_data[i, idx_list_data[pri_2], 1]
-        )
-        values_arr_2     = np.array(values_data[i, idx_list_data[pri_2]])
+        # Compile the raw data.
+        mDM_in_GeV_arr_1, log10x_arr_1, values_arr_1 = raw_data(pri_1)
+        if pri_2 == pri_1:
+            mDM_in_GeV_arr_2, log10x_arr_2, values_arr_2 = (
+                mDM_in_GeV_arr_1, log10x_arr_1, values_arr_1
+            )
+        else:
+            mDM_in_GeV_arr_2, log10x_arr_2, values_arr_2 = raw_data(pri_2)
 
         self._mDM_in_GeV_arrs = [mDM_in_GeV_arr_1, mDM_in_GeV_arr_2] 
         self._log10x_arrs     = [log10x_arr_1,     log10x_arr_2]
 
         # Save the 1D PCHIP interpolator over mDM_in_GeV. Multiply the 
         # electron spectrum by 2 by adding np.log10(2).  
-        self._interpolators = [
-            PchipInterpolator(
-                mDM_in_GeV_arr_1, values_arr_1 + np.log10(fac), 
-                extrapolate=False
-            ),
-            PchipInterpolator(
+        interp_1 = PchipInterpolator(
+            mDM_in_GeV_arr_1, values_arr_1 + np.log10(fac), 
+            extrapolate=False
+        )
+        if pri_2 == pri_1:
+            interp_2 = interp_1
+        else:
+            interp_2 = PchipInterpolator(
                 mDM_in_GeV_arr_2, values_arr_2 + np.log10(fac),
                 extrapolate=False
             )
-        ]
+        self._interpolators = [interp_1, interp_2]
     
     def get_val(self, mDM_in_GeV, log10x):
         
@@ -165,6 +206,154 @@ class PchipInterpolator2D:
             self._weight[0]*10**result1 + self._weight[1]*10**result2
         )
 
+    def get_vals(self, mDM_in_GeV, log10x):
+        """ Returns the interpolation values for many masses at once.
+
+        Parameters
+        ----------
+        mDM_in_GeV : ndarray
+            The dark matter masses (in GeV), with shape (n_mass,).
+        log10x : ndarray
+            The values of log10(K/mDM) for each mass, with shape (n_mass, n_x).
+
+        Returns
+        -------
+        ndarray
+            log10 of dN/dlog10x, with shape (n_mass, n_x).
+
+        Notes
+        -----
+        The PCHIP interpolator over mDM_in_GeV is evaluated once for all masses, and the PCHIP interpolation over log10x is then carried out for all masses together. The result is the same as calling :meth:`get_val` for each mass.
+
+        """
+
+        mDM_in_GeV = np.asarray(mDM_in_GeV, dtype=float)
+        log10x     = np.asarray(log10x, dtype=float)
+
+        if (
+            np.any(mDM_in_GeV < self._mDM_in_GeV_arrs[0][0])
+            or np.any(mDM_in_GeV < self._mDM_in_GeV_arrs[1][0])
+            or np.any(mDM_in_GeV > self._mDM_in_GeV_arrs[0][-1])
+            or np.any(mDM_in_GeV > self._mDM_in_GeV_arrs[1][-1])
+        ):
+            raise TypeError('mDM lies outside of the interpolation range.')
+
+        rows = np.arange(mDM_in_GeV.size)[:, np.newaxis]
+
+        def interp_half(k):
+
+            log10x_arr = self._log10x_arrs[k]
+
+            # PCHIP coefficients in log10x for all masses, with shape
+            # (n_mass, log10x_arr.size-1, 4).
+            coeffs = np.ascontiguousarray(PchipInterpolator(
+                log10x_arr, self._interpolators[k](mDM_in_GeV), axis=1
+            ).c.T)
+
+            # Index of the interval containing each point, extrapolating
+            # with the first and last intervals, as PchipInterpolator does.
+            ind = np.clip(
+                np.searchsorted(log10x_arr, log10x, side='right') - 1,
+                0, log10x_arr.size - 2
+            )
+            s = log10x - log10x_arr[ind]
+            c = coeffs[rows, ind]
+
+            # Same order of operations as PchipInterpolator.
+            result = c[..., 3].copy()
+            z = s
+            result += c[..., 2]*z
+            z = z*s
+            result += c[..., 1]*z
+            z *= s
+            result += c[..., 0]*z
+
+            # Set all values outside of the log10x interpolation range to
+            # (effectively) zero.
+            result[log10x >= log10x_arr[-1]] = -100.
+            result[log10x <= log10x_arr[0]]  = -100.
+
+            return result
+
+        result1 = interp_half(0)
+        if self._interpolators[1] is self._interpolators[0]:
+            result2 = result1
+        else:
+            result2 = interp_half(1)
+
+        # Combine the two spectra.
+        return np.log10(
+            self._weight[0]*10**result1 + self._weight[1]*10**result2
+        )
+
+class PPPCInterpDict(dict):
+
+    """ Dictionary of :class:`PchipInterpolator2D` objects, keyed by primary channel, that are built on first access.
+
+    Parameters
+    ----------
+    coords_data : ndarray or mapping
+        See :class:`PchipInterpolator2D`.
+    values_data : ndarray or None
+        See :class:`PchipInterpolator2D`.
+    sec : {'elec', 'phot'}
+        Specifies which secondary spectrum to obtain (electrons/positrons or photons).
+
+    Notes
+    -----
+    Building an interpolator only reads and processes the tables of the requested channel, so that the cost of loading the PPPC4DMID data is proportional to the number of channels actually used. 
+
+    """
+
+    def __init__(self, coords_data, values_data, sec):
+
+        super().__init__()
+        self.sec = sec
+        self._coords_data = coords_data
+        self._values_data = values_data
+
+    def __missing__(self, pri):
+
+        if pri not in pppc_chan_list:
+            raise KeyError(pri)
+
+        interp = PchipInterpolator2D(
+            self._coords_data, self._values_data, pri, self.sec
+        )
+        self[pri] = interp
+
+        return interp
+
+class ExpGridList(Sequence):
+
+    """ List of grids in real space, computed on access from the log of the grids.
+
+    Parameters
+    ----------
+    log_grids : list of ndarray
+        The log of the grid values.
+
+    Notes
+    -----
+    Used as *grid_vals* of transfer functions loaded by :func:`load_binary_tf` with *log_interp* True, so that only the memory-mapped log grids are kept. Each access returns a new array. 
+
+    """
+
+    def __init__(self, log_grids):
+
+        self._log_grids = log_grids
+
+    def __getitem__(self, key):
+
+        if isinstance(key, slice):
+            return [np.exp(grid) for grid in self._log_grids[key]]
+
+        return np.exp(self._log_grids[key])
+
+    def __len__(self):
+
+        return len(self._log_grids)
+
 def load_data(data_type):
     """ Loads data from downloaded files. 
 
@@ -185,7 +374,7 @@ def load_data(data_type):
 
         - *'f'* -- :math:`f_c(z)` fractions without backreaction; and
 
-        - *'pppc'* -- Data from PPPC4DMID for annihilation spectra. Specify the primary channel in *primary*.
+        - *'pppc'* -- Data from PPPC4DMID for annihilation spectra. Specify the primary channel in *primary*. The interpolator of each channel is only built when first accessed, from the binary file written by :func:`convert_pppc_to_binary` if it exists. 
 
 
     Returns
@@ -223,6 +412,13 @@ def load_data(data_type):
 
     elif data_type == 'dep_tf':
 
+        if glob_dep_tf_data is None and binary_tf_exists('dep_tf'):
+
+            glob_dep_tf_data = {
+                key: load_binary_tf(file_name) 
+                for key,file_name in dep_tf_file_names.items()
+            }
+
         if glob_dep_tf_data is None:
 
             print('****** Loading transfer functions... ******')
@@ -271,6 +467,13 @@ def load_data(data_type):
 
     elif data_type == 'ics_tf':
 
+        if glob_ics_tf_data is None and binary_tf_exists('ics_tf'):
+
+            glob_ics_tf_data = {
+                key: load_binary_tf(file_name) 
+                for key,file_name in ics_tf_file_names.items()
+            }
+
         if glob_ics_tf_data is None:
 
             print('****** Loading transfer functions... ******')
@@ -378,52 +581,22 @@ def load_data(data_type):
 
         if glob_pppc_data is None:
 
-            coords_file_name = (
-                data_path+'/dlNdlxIEW_coords_table.txt'
-            )
-            values_file_name = (
-                data_path+'/dlNdlxIEW_values_table.txt'
-            )
+            if pppc_binary_exists():
 
-            with open(coords_file_name) as data_file:    
-                coords_data = np.array(json.load(data_file))
-            with open(values_file_name) as data_file:
-                values_data = np.array(json.load(data_file))
-
-            # coords_data is a (2, 23, 2) array. 
-            # axis 0: stable SM secondaries, {'elec', 'phot'}
-            # axis 1: annihilation primary channel.
-            # axis 2: {mDM in GeV, np.log10(K/mDM)}, K is the energy of 
-            # the secondary. 
-            # Each element is a 1D array.
-
-            # values_data is a (2, 23) array, d log_10 N / d log_10 (K/mDM). 
-            # axis 0: stable SM secondaries, {'elec', 'phot'}
-            # axis 1: annihilation primary channel.
-            # Each element is a 2D array indexed by {mDM in GeV, np.log10(K/mDM)}
-            # as saved in coords_data. 
-
-            # Compile a dictionary of all of the interpolators.
-            dlNdlxIEW_interp = {'elec':{}, 'phot':{}}
-
-            chan_list = [
-                'e_L','e_R', 'e', 'mu_L', 'mu_R', 'mu', 
-                'tau_L', 'tau_R', 'tau',
-                'q',  'c',  'b', 't',
-                'W_L', 'W_T', 'W', 'Z_L', 'Z_T', 'Z', 'g',  'gamma', 'h',
-                'nu_e', 'nu_mu', 'nu_tau',
-                'VV_to_4e', 'VV_to_4mu', 'VV_to_4tau'
-            ]
-
-            for pri in chan_list:
-                dlNdlxIEW_interp['elec'][pri] = PchipInterpolator2D(
-                    coords_data, values_data, pri, 'elec'
-                )
-                dlNdlxIEW_interp['phot'][pri] = PchipInterpolator2D(
-                    coords_data, values_data, pri, 'phot'
-                )
+                # Arrays in the .npz file are only read when accessed.
+                coords_data = np.load(data_path+'/'+pppc_file_name+'.npz')
+                values_data = None
+
+            else:
 
-            glob_pppc_data = dlNdlxIEW_interp
+                coords_data, values_data = _load_pppc_json()
+
+            # Compile a dictionary of all of the interpolators, which are 
+            # built when first accessed.
+            glob_pppc_data = {
+                sec: PPPCInterpDict(coords_data, values_data, sec)
+                for sec in ['elec', 'phot']
+            }
 
         return glob_pppc_data
 
@@ -431,4 +604,319 @@ def load_data(data_type):
 
         raise ValueError('invalid data_type.')
 
+def _load_pppc_json():
+    """ Reads the PPPC4DMID tables from the original JSON files.
+
+    Returns
+    -------
+    tuple of ndarray
+        The coordinates and values of the tables. 
+
+    """
+
+    coords_file_name = (
+        data_path+'/dlNdlxIEW_coords_table.txt'
+    )
+    values_file_name = (
+        data_path+'/dlNdlxIEW_values_table.txt'
+    )
+
+    with open(coords_file_name) as data_file:    
+        coords_data = np.array(json.load(data_file))
+    with open(values_file_name) as data_file:
+        values_data = np.array(json.load(data_file))
+
+    # coords_data is a (2, 23, 2) array. 
+    # axis 0: stable SM secondaries, {'elec', 'phot'}
+    # axis 1: annihilation primary channel, see pppc_table_chans.
+    # axis 2: {mDM in GeV, np.log10(K/mDM)}, K is the energy of 
+    # the secondary. 
+    # Each element is a 1D array.
+
+    # values_data is a (2, 23) array, d log_10 N / d log_10 (K/mDM). 
+    # axis 0: stable SM secondaries, {'elec', 'phot'}
+    # axis 1: annihilation primary channel.
+    # Each element is a 2D array indexed by {mDM in GeV, np.log10(K/mDM)}
+    # as saved in coords_data. 
+
+    return coords_data, values_data
+
+def convert_pppc_to_binary():
+    """ Converts the PPPC4DMID JSON tables into a binary file.
+
+    This only needs to be run once. Afterwards, :func:`load_data` reads the binary file in *data_path* instead of parsing the JSON files. 
+
+    Returns
+    -------
+    None
+
+    Notes
+    -----
+    The tables are saved as a single uncompressed ``.npz`` file, with the arrays ``<sec>_<chan>_mDM``, ``<sec>_<chan>_log10x`` and ``<sec>_<chan>_values`` for each secondary *sec* and channel *chan* in the raw tables. Each array is only read when the corresponding channel is first used. 
+
+    """
+
+    coords_data, values_data = _load_pppc_json()
+
+    tables = {}
+    for i,sec in enumerate(['elec', 'phot']):
+        for j,chan in enumerate(pppc_table_chans):
+            key = sec+'_'+chan
+            tables[key+'_mDM']    = np.array(coords_data[i, j, 0], dtype=float)
+            tables[key+'_log10x'] = np.array(coords_data[i, j, 1], dtype=float)
+            tables[key+'_values'] = np.array(values_data[i, j], dtype=float)
+
+    # An interrupted conversion never leaves a partial file behind. 
+    utils.atomic_savez(data_path+'/'+pppc_file_name+'.npz', **tables)
+
+def pppc_binary_exists():
+    """ Checks if the binary file from :func:`convert_pppc_to_binary` exists.
+
+    Returns
+    -------
+    bool
+        True if the PPPC4DMID tables have been converted. 
+    """
+
+    return os.path.isfile(data_path+'/'+pppc_file_name+'.npz')
+
+def convert_tf_to_binary(data_type):
+    """ Converts pickled transfer functions into memory-mappable binary files.
+
+    This only needs to be run once. Afterwards, :func:`load_data` loads the binary files in *data_path* instead of the pickled ``.raw`` files. 
+
+    Parameters
+    ----------
+    data_type : {'dep_tf', 'ics_tf'}
+        Type of data to convert. See :func:`load_data`. 
+
+    Returns
+    -------
+    None
+
+    Notes
+    -----
+    Each transfer function is saved as a ``.npz`` file containing the abscissae, redshift and ionization nodes, together with one ``.npy`` file per redshift regime containing the grid values. For :class:`.TransferFuncInterp` and :class:`.IonRSInterp`, the grid values are saved after taking the log if *log_interp* is True, so that no copy of the grid is needed when loading. 
+
+    """
+
+    if data_type == 'dep_tf':
+        file_names = dep_tf_file_names
+    elif data_type == 'ics_tf':
+        file_names = ics_tf_file_names
+    else:
+        raise ValueError('invalid data_type.')
+
+    for file_name in file_names.values():
+
+        print('Converting '+file_name+'.raw... ', end=' ')
+
+        tf_obj = pickle.load(open(data_path+'/'+file_name+'.raw', 'rb'))
+
+        if type(tf_obj).__name__ in ['TransferFuncInterp', 'IonRSInterp']:
+
+            func = tf_obj._interp_space()
+
+            meta = {
+                'obj_type'   : type(tf_obj).__name__,
+                'n_regimes'  : len(tf_obj.grid_vals),
+                'log_interp' : tf_obj._log_interp,
+                'rs_nodes'   : (
+                    tf_obj.rs_nodes if tf_obj.rs_nodes is not None 
+                    else np.array([])
+                )
+            }
+            if meta['obj_type'] == 'TransferFuncInterp':
+                meta['in_eng']    = tf_obj.in_eng
+                meta['eng']       = tf_obj.eng
+                meta['dlnz']      = tf_obj.dlnz
+                meta['spec_type'] = tf_obj.spec_type
+            else:
+                # IonRSInterp stores abscissae per regime, possibly None.
+                for i,(in_eng,eng) in enumerate(
+                    zip(tf_obj.in_eng, tf_obj.eng)
+                ):
+                    if in_eng is not None:
+                        meta['in_eng_'+str(i)] = in_eng
+                    if eng is not None:
+                        meta['eng_'+str(i)] = eng
+
+            for i,(x_vals,z,grid) in enumerate(
+                zip(tf_obj.x, tf_obj.rs, tf_obj.grid_vals)
+            ):
+                meta['rs_'+str(i)] = z
+                if x_vals is not None:
+                    meta['x_'+str(i)] = x_vals
+                np.save(
+                    data_path+'/'+file_name+'_grid_'+str(i)+'.npy', 
+                    func(grid)
+                )
+
+        elif type(tf_obj).__name__ == 'TransFuncAtRedshift':
+
+            meta = {
+                'obj_type'  : 'TransFuncAtRedshift',
+                'n_regimes' : 1,
+                'in_eng'    : tf_obj.in_eng,
+                'eng'       : tf_obj.eng,
+                'rs'        : tf_obj.rs,
+                'dlnz'      : tf_obj.dlnz,
+                'spec_type' : tf_obj.spec_type,
+                'with_interp_func' : hasattr(tf_obj, 'interp_func')
+            }
+
+            np.save(
+                data_path+'/'+file_name+'_grid_0.npy', tf_obj.grid_vals
+            )
+
+        else:
+
+            raise TypeError('cannot convert '+type(tf_obj).__name__+'.')
+
+        # Save the metadata last and atomically, since its presence 
+        # signals a complete conversion. 
+        utils.atomic_savez(data_path+'/'+file_name+'.npz', **meta)
+
+        print('Done!')
+
+def binary_tf_exists(data_type):
+    """ Checks if binary files from :func:`convert_tf_to_binary` exist.
+
+    Parameters
+    ----------
+    data_type : {'dep_tf', 'ics_tf'}
+        Type of data to check. 
+
+    Returns
+    -------
+    bool
+        True if all of the transfer functions have been converted. 
+    """
+
+    if data_type == 'dep_tf':
+        file_names = dep_tf_file_names
+    elif data_type == 'ics_tf':
+        file_names = ics_tf_file_names
+    else:
+        raise ValueError('invalid data_type.')
+
+    return all(
+        os.path.isfile(data_path+'/'+file_name+'.npz') 
+        for file_name in file_names.values()
+    )
+
+def load_binary_tf(file_name, mmap_mode='r'):
+    """ Loads a transfer function saved by :func:`convert_tf_to_binary`.
+
+    Parameters
+    ----------
+    file_name : str
+        File name in *data_path*, without the extension. 
+    mmap_mode : {None, 'r', 'r+', 'c'}, optional
+        Memory-map mode for the grid values. See *numpy.load* for more information. Default is 'r'. 
+
+    Returns
+    -------
+    TransferFuncInterp, IonRSInterp or TransFuncAtRedshift
+        The transfer function. 
+
+    Notes
+    -----
+    Grid values are memory-mapped, so that loading is fast and processes using the same files share the data through the page cache. For :class:`.TransferFuncInterp` and :class:`.IonRSInterp`, only the grid in the space used for interpolation, i.e. the log of the grid if *log_interp* is True, is memory-mapped. The attribute *grid_vals* contains the grid values as usual, computed from the log of the grid on access if *log_interp* is True, see :class:`ExpGridList`. Grids of :class:`.TransFuncAtRedshift` objects are loaded copy-on-write, since they may be modified after loading. 
+
+    """
+
+    from darkhistory.spec.transferfunclist import TransferFuncInterp
+    from darkhistory.spec.transferfunction import TransFuncAtRedshift
+    from darkhistory.history.histools import IonRSInterp
+
+    with np.load(data_path+'/'+file_name+'.npz') as npz_file:
+        meta = {key: npz_file[key] for key in npz_file.files}
+
+    obj_type = str(meta['obj_type'])
+
+    def grid_file(i):
+        return data_path+'/'+file_name+'_grid_'+str(i)+'.npy'
+
+    if obj_type == 'TransFuncAtRedshift':
+
+        if mmap_mode == 'r':
+            mmap_mode = 'c'
+
+        return TransFuncAtRedshift(
+            np.load(grid_file(0), mmap_mode=mmap_mode), 
+            eng=meta['eng'], in_eng=meta['in_eng'], rs=meta['rs'],
+            dlnz=float(meta['dlnz']), spec_type=str(meta['spec_type']), 
+            with_interp_func=bool(meta['with_interp_func'])
+        )
+
+    n_regimes = int(meta['n_regimes'])
+
+    if obj_type == 'TransferFuncInterp':
+        tf_obj = TransferFuncInterp.__new__(TransferFuncInterp)
+        tf_obj.in_eng    = meta['in_eng']
+        tf_obj.eng       = meta['eng']
+        tf_obj.dlnz      = [float(dlnz) for dlnz in meta['dlnz']]
+        tf_obj.spec_type = str(meta['spec_type'])
+    elif obj_type == 'IonRSInterp':
+        tf_obj = IonRSInterp.__new__(IonRSInterp)
+        tf_obj.in_eng = [
+            meta.get('in_eng_'+str(i)) for i in np.arange(n_regimes)
+        ]
+        tf_obj.eng    = [
+            meta.get('eng_'+str(i)) for i in np.arange(n_regimes)
+        ]
+    else:
+        raise TypeError('invalid obj_type '+obj_type+'.')
+
+    tf_obj.rs_nodes    = meta['rs_nodes'] if meta['rs_nodes'].size > 0 else None
+    tf_obj._log_interp = bool(meta['log_interp'])
+    tf_obj.rs          = [meta['rs_'+str(i)] for i in np.arange(n_regimes)]
+    tf_obj.x           = [
+        meta['x_'+str(i)] if 'x_'+str(i) in meta else None
+        for i in np.arange(n_regimes)
+    ]
+    # Grid values in the space used for interpolation.
+    tf_obj._interp_grid_vals = [
+        np.load(grid_file(i), mmap_mode=mmap_mode) 
+        for i in np.arange(n_regimes)
+    ]
+    if tf_obj._log_interp:
+        tf_obj.grid_vals = ExpGridList(tf_obj._interp_grid_vals)
+    else:
+        tf_obj.grid_vals = tf_obj._interp_grid_vals
+
+    func = tf_obj._interp_space()
+
+    # RegularGridInterpolator uses the memory-mapped grid without copying.
+    tf_obj.interp_func = []
+    for x_vals,z,grid in zip(tf_obj.x, tf_obj.rs, tf_obj._interp_grid_vals):
+        if x_vals is None:
+            # No xe dependence. 
+            interp_func = RegularGridInterpolator(
+                (func(z),), np.squeeze(grid)
+            )
+            tf_obj.interp_func.append(
+                lambda log_rs, interp_func=interp_func: (
+                    interp_func([log_rs])
+                )
+            )
+        elif x_vals.ndim == 1:
+            # xH dependence.
+            tf_obj.interp_func.append(
+                RegularGridInterpolator((func(x_vals), func(z)), grid)
+            )
+        elif x_vals.ndim == 3:
+            # xH, xHe dependence.
+            tf_obj.interp_func.append(
+                RegularGridInterpolator(
+                    (func(x_vals[:,0,0]), func(x_vals[0,:,1]), func(z)), 
+                    grid
+                )
+            )
+        else:
+            raise TypeError('grid has anomalous dimensions.')
+
+    tf_obj._setup_interp()
 
+    return tf_obj
@@ -2,6 +2,7 @@
 """
 
 import numpy as np
+import warnings
 
 import darkhistory.physics as phys
 import darkhistory.utilities as utils
@@ -22,7 +23,7 @@ def get_elec_cooling_tf(
     eleceng, photeng, rs, xHII, xHeII=0, 
     raw_thomson_tf=None, raw_rel_tf=None, raw_engloss_tf=None,
     coll_ion_sec_elec_specs=None, coll_exc_sec_elec_specs=None,
-    ics_engloss_data=None, 
+    ics_engloss_data=None, ics_spec_table=None,
     check_conservation_eng = False, verbose=False
 ):
 
@@ -53,6 +54,8 @@ def get_elec_cooling_tf(
         Normalized collisional excitation secondary electron spectra, order HI, HeI, HeII, indexed by injected electron energy by outgoing electron energy. If None, the function calculates this. Default is None.
     ics_engloss_data : EnglossRebinData
         An `EnglossRebinData` object which stores rebinning information (based on ``eleceng`` and ``photeng``) for speed. Default is None.
+    ics_spec_table : ICSSpecTable, optional
+        Table of ICS and energy loss spectra to interpolate instead of calling :func:`.ics_spec` and :func:`.engloss_spec`. Default is None.
     check_conservation_eng : bool
         If True, lower=True, checks for energy conservation. Default is False.
     verbose : bool
@@ -166,23 +169,35 @@ def get_elec_cooling_tf(
 
     T = phys.TCMB(rs)
 
-    # Photon transfer function for single primary electron single scattering.
-    # This is dN/(dE dt), dt = 1 s.
-    phot_ICS_tf = ics_spec(
-        eleceng, photeng, T, thomson_tf = raw_thomson_tf, rel_tf = raw_rel_tf
-    )
+    if ics_spec_table is None:
 
-    # Downcasting speeds up np.dot
-    phot_ICS_tf._grid_vals = phot_ICS_tf.grid_vals.astype('float64')
+        # Photon transfer function for single primary electron single 
+        # scattering. This is dN/(dE dt), dt = 1 s.
+        phot_ICS_tf = ics_spec(
+            eleceng, photeng, T, 
+            thomson_tf = raw_thomson_tf, rel_tf = raw_rel_tf
+        )
 
-    # Energy loss transfer function for single primary electron
-    # single scattering. This is dN/(dE dt), dt = 1 s.
-    engloss_ICS_tf = engloss_spec(
-        eleceng, photeng, T, thomson_tf = raw_engloss_tf, rel_tf = raw_rel_tf
-    )
+        # Energy loss transfer function for single primary electron
+        # single scattering. This is dN/(dE dt), dt = 1 s.
+        engloss_ICS_tf = engloss_spec(
+            eleceng, photeng, T, 
+            thomson_tf = raw_engloss_tf, rel_tf = raw_rel_tf
+        )
+
+    else:
+
+        phot_ICS_tf, engloss_ICS_tf = ics_spec_table.get_tf(
+            eleceng, photeng, rs
+        )
 
     # Downcasting speeds up np.dot
-    engloss_ICS_tf._grid_vals = engloss_ICS_tf.grid_vals.astype('float64')
+    phot_ICS_tf._grid_vals = phot_ICS_tf.grid_vals.astype(
+        'float64', copy=False
+    )
+    engloss_ICS_tf._grid_vals = engloss_ICS_tf.grid_vals.astype(
+        'float64', copy=False
+    )
 
     # Switch the spectra type here to type 'N'.
     if phot_ICS_tf.spec_type == 'dNdE':
@@ -466,38 +481,43 @@ def get_elec_cooling_tf(
     )
     
     # T = E.T + Prompt
-    deposited_ICS_vec  = solve_triangular(
-        np.identity(eleceng.size) - sec_elec_spec_N_arr,
-        deposited_ICS_eng_arr, lower=True, check_finite=False
-    )
-    deposited_exc_vec  = solve_triangular(
-        np.identity(eleceng.size) - sec_elec_spec_N_arr, 
-        deposited_exc_eng_arr, lower=True, check_finite=False
-    )
-    deposited_ion_vec  = solve_triangular(
-        np.identity(eleceng.size) - sec_elec_spec_N_arr, 
-        deposited_ion_eng_arr, lower=True, check_finite=False
-    )
-    deposited_heat_vec = solve_triangular(
-        np.identity(eleceng.size) - sec_elec_spec_N_arr, 
-        deposited_heat_eng_arr, lower=True, check_finite=False
-    )
-    
-    cont_loss_ICS_vec = solve_triangular(
-        np.identity(eleceng.size) - sec_elec_spec_N_arr, 
-        continuum_engloss_arr, lower=True, check_finite=False
-    )
-    
-    sec_phot_specs = solve_triangular(
-        np.identity(eleceng.size) - sec_elec_spec_N_arr, 
-        sec_phot_spec_N_arr, lower=True, check_finite=False
-    )
+    # All deposition vectors and the photon spectra are solved against 
+    # the same lower triangular matrix, so solve them together. 
+
+    # Buffer for the identity minus the secondary spectrum matrix, 
+    # reused for both triangular systems below. 
+    lhs_mat = np.negative(sec_elec_spec_N_arr)
+    lhs_mat.flat[::N_eleceng+1] += 1.
+
+    rhs_mat = np.empty(
+        (N_eleceng, 5 + sec_phot_spec_N_arr.shape[1]), order='F'
+    )
+    rhs_mat[:,0] = deposited_ICS_eng_arr
+    rhs_mat[:,1] = deposited_exc_eng_arr
+    rhs_mat[:,2] = deposited_ion_eng_arr
+    rhs_mat[:,3] = deposited_heat_eng_arr
+    rhs_mat[:,4] = continuum_engloss_arr
+    rhs_mat[:,5:] = sec_phot_spec_N_arr
+
+    sol_mat = solve_triangular(
+        lhs_mat, rhs_mat, lower=True, check_finite=False, overwrite_b=True
+    )
+
+    deposited_ICS_vec  = sol_mat[:,0]
+    deposited_exc_vec  = sol_mat[:,1]
+    deposited_ion_vec  = sol_mat[:,2]
+    deposited_heat_vec = sol_mat[:,3]
+    cont_loss_ICS_vec  = sol_mat[:,4]
+    sec_phot_specs     = sol_mat[:,5:]
     
     # Prompt: low energy e produced in secondary spectrum upon scattering (sec_lowengelec_N_arr).
     # T : high energy e produced (sec_highengelec_N_arr). 
+    np.negative(sec_highengelec_N_arr, out=lhs_mat)
+    lhs_mat.flat[::N_eleceng+1] += 1.
+
     sec_lowengelec_specs = solve_triangular(
-        np.identity(eleceng.size) - sec_highengelec_N_arr,
-        sec_lowengelec_N_arr, lower=True, check_finite=False
+        lhs_mat, sec_lowengelec_N_arr, lower=True, check_finite=False, 
+        overwrite_b=True
     )
 
     # Subtract continuum from sec_phot_specs. After this point, 
@@ -603,3 +623,266 @@ def get_elec_cooling_tf(
 
 
     
+
+# Keys of the outputs of get_elec_cooling_tf, in order, as stored in tables
+# made by make_elec_cooling_table.
+elec_cooling_table_keys = [
+    'phot', 'lowengelec', 'ion', 'exc', 'heat', 'cont', 'ICS'
+]
+
+def make_elec_cooling_table(
+    file_name, eleceng, photeng, rs_arr, xHII_arr, xHeII_arr, 
+    **elec_cooling_kwargs
+):
+    """Tabulates the electron cooling transfer functions for :class:`ElecCoolingTable`.
+
+    Parameters
+    ----------
+    file_name : str
+        Path of the table, without the extension. 
+    eleceng : ndarray
+        The electron kinetic energy abscissa.
+    photeng : ndarray
+        The photon energy abscissa.
+    rs_arr : ndarray
+        Increasing redshifts (1+z) of the table.
+    xHII_arr : ndarray
+        Increasing values of nHII/nH of the table. Must be positive. 
+    xHeII_arr : ndarray
+        Increasing values of nHeII/nH of the table. Must be positive.
+    **elec_cooling_kwargs
+        Keyword arguments passed to :func:`get_elec_cooling_tf`, e.g. the output of :func:`main.get_elec_cooling_data`. 
+
+    Returns
+    -------
+    None
+
+    Notes
+    -----
+    Each output of :func:`get_elec_cooling_tf` is written to its own ``.npy`` file, indexed by (rs, xHII, xHeII, ...), as it is computed, so that the table does not need to fit in memory. The abscissae are stored in a ``.npz`` file, written last so that it only exists once the table is complete. 
+
+    """
+
+    for arr in [rs_arr, xHII_arr, xHeII_arr]:
+        if np.any(arr <= 0) or np.any(np.diff(arr) <= 0):
+            raise ValueError('table abscissae must be positive and increasing.')
+
+    node_shape = (rs_arr.size, xHII_arr.size, xHeII_arr.size)
+    out_shapes = [
+        (eleceng.size, photeng.size), (eleceng.size, eleceng.size)
+    ] + [(eleceng.size,) for key in elec_cooling_table_keys[2:]]
+
+    grids = [
+        np.lib.format.open_memmap(
+            file_name+'_'+key+'.npy', mode='w+', shape=node_shape+shape
+        ) for key, shape in zip(elec_cooling_table_keys, out_shapes)
+    ]
+
+    for i, rs in enumerate(rs_arr):
+        for j, xHII in enumerate(xHII_arr):
+            for k, xHeII in enumerate(xHeII_arr):
+                out = get_elec_cooling_tf(
+                    eleceng, photeng, rs, xHII, xHeII=xHeII,
+                    **elec_cooling_kwargs
+                )
+                grids[0][i,j,k] = out[0].grid_vals
+                grids[1][i,j,k] = out[1].grid_vals
+                for grid, vec in zip(grids[2:], out[2:]):
+                    grid[i,j,k] = vec
+
+    for grid in grids:
+        grid.flush()
+
+    # Save the abscissae last and atomically, since ElecCoolingTable reads 
+    # them first. 
+    utils.atomic_savez(
+        file_name+'.npz', eleceng=eleceng, photeng=photeng, 
+        rs=rs_arr, xHII=xHII_arr, xHeII=xHeII_arr
+    )
+
+class ElecCoolingTable:
+    """Interpolation over a table of electron cooling transfer functions.
+
+    Parameters
+    ----------
+    file_name : str
+        Path of a table made by :func:`make_elec_cooling_table`, without the extension.
+    rtol : float, optional
+        Tolerance for the comparison with :func:`get_elec_cooling_tf`. Default is 0.01. 
+    check_interval : int, optional
+        Number of calls to :meth:`get_tf` between comparisons with :func:`get_elec_cooling_tf`. Default is 100. 
+    mmap_mode : {None, 'r', 'r+', 'c'}, optional
+        Memory-map mode for the table. Default is 'r'.
+
+    Attributes
+    ----------
+    eleceng : ndarray
+        The electron kinetic energy abscissa.
+    photeng : ndarray
+        The photon energy abscissa.
+    rs : ndarray
+        Redshifts (1+z) of the table.
+    xHII : ndarray
+        Values of nHII/nH of the table.
+    xHeII : ndarray
+        Values of nHeII/nH of the table.
+    use_table : bool
+        False once a comparison has failed, after which :func:`get_elec_cooling_tf` is always used. 
+
+    """
+
+    def __init__(
+        self, file_name, rtol=1e-2, check_interval=100, mmap_mode='r'
+    ):
+
+        with np.load(file_name+'.npz') as abscissae:
+            self.eleceng = abscissae['eleceng']
+            self.photeng = abscissae['photeng']
+            self.rs      = abscissae['rs']
+            self.xHII    = abscissae['xHII']
+            self.xHeII   = abscissae['xHeII']
+
+        self.grids = [
+            np.load(file_name+'_'+key+'.npy', mmap_mode=mmap_mode)
+            for key in elec_cooling_table_keys
+        ]
+
+        self.rtol           = rtol
+        self.check_interval = check_interval
+        self.use_table      = True
+
+        self._nodes = (np.log(self.rs), np.log(self.xHII), np.log(self.xHeII))
+        self._n_calls = 0
+
+    def interp(self, rs, xHII, xHeII):
+        """Interpolates the table.
+
+        Parameters
+        ----------
+        rs : float
+            The redshift (1+z). Must lie within the table.
+        xHII : float
+            Ionized hydrogen fraction, nHII/nH. Must lie within the table.
+        xHeII : float
+            Singly-ionized helium fraction, nHe+/nH. Must lie within the table.
+
+        Returns
+        -------
+        tuple
+            Same as :func:`get_elec_cooling_tf`.
+
+        """
+
+        if not self.in_table(rs, xHII, xHeII):
+            raise ValueError('(rs, xHII, xHeII) lies outside of the table.')
+
+        corners = utils.multilinear_weights(
+            self._nodes, [np.log(rs), np.log(xHII), np.log(xHeII)]
+        )
+
+        out = [utils.multilinear_sum(grid, corners) for grid in self.grids]
+
+        sec_phot_tf = tf.TransFuncAtRedshift(
+            out[0], in_eng = self.eleceng, 
+            rs = rs*np.ones_like(self.eleceng), eng = self.photeng,
+            dlnz = -1, spec_type = 'N'
+        )
+        sec_lowengelec_tf = tf.TransFuncAtRedshift(
+            out[1], in_eng = self.eleceng,
+            rs = rs*np.ones_like(self.eleceng), eng = self.eleceng,
+            dlnz = -1, spec_type = 'N'
+        )
+
+        return (sec_phot_tf, sec_lowengelec_tf) + tuple(out[2:])
+
+    def in_table(self, rs, xHII, xHeII):
+        """Checks if a point lies within the table.
+
+        Parameters
+        ----------
+        rs : float
+            The redshift (1+z). 
+        xHII : float
+            Ionized hydrogen fraction, nHII/nH.
+        xHeII : float
+            Singly-ionized helium fraction, nHe+/nH.
+
+        Returns
+        -------
+        bool
+
+        """
+
+        return (
+            self.rs[0] <= rs <= self.rs[-1]
+            and self.xHII[0] <= xHII <= self.xHII[-1]
+            and self.xHeII[0] <= xHeII <= self.xHeII[-1]
+        )
+
+    def get_tf(self, eleceng, photeng, rs, xHII, xHeII, direct_func):
+        """Returns the electron cooling transfer functions.
+
+        Parameters
+        ----------
+        eleceng : ndarray
+            The electron *kinetic* energy abscissa used by *direct_func*.
+        photeng : ndarray
+            The photon energy abscissa used by *direct_func*.
+        rs : float
+            The redshift (1+z). 
+        xHII : float
+            Ionized hydrogen fraction, nHII/nH.
+        xHeII : float
+            Singly-ionized helium fraction, nHe+/nH.
+        direct_func : function
+            Function with no arguments that returns the output of :func:`get_elec_cooling_tf` at (rs, xHII, xHeII).
+
+        Returns
+        -------
+        tuple
+            Same as :func:`get_elec_cooling_tf`.
+
+        Notes
+        -----
+        *direct_func* is used instead of the table if the abscissae differ from those of the table, if (rs, xHII, xHeII) lies outside of the table or if *use_table* is False. Every *check_interval* calls, both are evaluated and compared: if any output differs from *direct_func* by more than *rtol* relative to its largest absolute value, a warning is issued and *use_table* is set to False. 
+
+        """
+
+        if (
+            not self.use_table or not self.in_table(rs, xHII, xHeII)
+            or not np.array_equal(eleceng, self.eleceng)
+            or not np.array_equal(photeng, self.photeng)
+        ):
+            return direct_func()
+
+        check = self._n_calls % self.check_interval == 0
+        self._n_calls += 1
+
+        out = self.interp(rs, xHII, xHeII)
+
+        if check:
+
+            direct_out = direct_func()
+
+            for key, table_val, direct_val in zip(
+                elec_cooling_table_keys, out, direct_out
+            ):
+                if isinstance(direct_val, tf.TransFuncAtRedshift):
+                    table_val  = table_val.grid_vals
+                    direct_val = direct_val.grid_vals
+                scale = np.max(np.abs(direct_val))
+                if (
+                    scale > 0 
+                    and np.max(np.abs(table_val - direct_val)) > self.rtol*scale
+                ):
+                    warnings.warn(
+                        'electron cooling table differs from direct '
+                        +'computation in '+key+' at rs = '+str(rs)
+                        +', using direct computation from now on.'
+                    )
+                    self.use_table = False
+                    break
+
+            return direct_out
+
+        return out
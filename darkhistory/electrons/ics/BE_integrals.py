@@ -13,7 +13,366 @@ from darkhistory.utilities import hyp2f1_func_real
 
 from scipy.integrate import quad
 
-def F2(a,b,tol=1e-10):
+# Method used by F2, F1, F0, F_inv, F_inv_n, F_inv_3, F_inv_5, F_log and 
+# F_x_log if no method is specified: 'series' for the series expansions, 
+# or 'table' for BEIntegralTable. 
+default_method = 'series'
+
+# If True, integrals obtained with method='table' are also computed with 
+# the series expansions, and a RuntimeError is raised if the relative 
+# difference is larger than check_rtol.
+check_table = False
+check_rtol  = 1e-8
+
+# Tables that have been built, keyed by (p, q).
+_tables = {}
+
+def _exp_expn(n, z):
+    """ Returns :math:`e^z E_n(z)` for z > 0 in float64.
+
+    Parameters
+    ----------
+    n : int
+        The order of the exponential integral.
+    z : ndarray
+        The argument of the function.
+
+    Returns
+    -------
+    ndarray
+        The value of :math:`e^z E_n(z)`.
+
+    Notes
+    -----
+    Above z = 700, where ``np.exp`` overflows, the asymptotic series is used.
+
+    """
+
+    z = np.asarray(z, dtype='float64')
+    expr = np.zeros_like(z)
+
+    low = z < 700
+    expr[low] = np.exp(z[low])*sp.expn(n, z[low])
+
+    high = ~low
+    term = 1/z[high]
+    for m in np.arange(10):
+        expr[high] += term
+        term = -term*(n+m)/z[high]
+
+    return expr
+
+class BEIntegralTable:
+    """ Tabulated definite integrals of :math:`x^p (\\log x)^q/(e^x - 1)`.
+
+    Parameters
+    ----------
+    p : int
+        Power of x. 
+    q : {0, 1}
+        Power of log(x). Only p = 0 and p = 1 are supported for q = 1.
+    h : float, optional
+        Spacing of the table in log(x). Default is 1e-3.
+
+    Attributes
+    ----------
+    p : int
+        Power of x. 
+    q : int
+        Power of log(x).
+    bound : float
+        The table is used above bound, and the series expansion below it.
+    x_max : float
+        The integral from x_max to infinity is taken to be zero.
+    rel_err : float
+        Largest relative error of the interpolated table, estimated at the midpoints between nodes.
+
+    Notes
+    -----
+    Definite integrals are obtained as differences of indefinite integrals, so that all evaluations are vectorized and in float64. Below *bound* = 2, the indefinite integral is the series in Bernoulli numbers used by :func:`F2` and the other functions, with enough terms for machine precision. Above *bound*, the integral :math:`G(x)` from x to infinity is tabulated on a grid in log(x) from *bound* to *x_max* = 800. The table stores :math:`J = e^x x^{-p} G(x)`, which varies slowly, together with its derivative, and is interpolated by cubic Hermite interpolation. 
+
+    Integrals over intervals that are short compared to min(a, 1) would suffer from cancellation between the indefinite integrals, and are instead computed directly by Gauss-Legendre quadrature. 
+
+    Tables should be obtained with :meth:`get`, which builds each table only once.
+
+    """
+
+    bound = 2.
+    x_max = 800.
+
+    # Number of terms of the series below bound, enough for machine 
+    # precision since the series converges like (x/(2 pi))**k. 
+    _n_low  = 40
+    # Number of terms in the sum over exp(-k x) used to build the table.
+    _n_high = 30
+    # Intervals shorter than _narrow*min(a, 1) are integrated by 
+    # quadrature with _n_quad points.
+    _narrow = 0.1
+    _n_quad = 8
+
+    def __init__(self, p, q=0, h=1e-3):
+
+        if q not in [0, 1] or (q == 1 and p not in [0, 1]):
+            raise ValueError('unsupported integrand.')
+
+        self.p = p
+        self.q = q
+
+        # Coefficients of x/(e^x - 1) = sum_k c_k x^k.
+        k = np.arange(self._n_low)
+        c = sp.bernoulli(self._n_low - 1)/sp.factorial(k)
+
+        # Integrate x^(k+p-1) (log x)^q term by term. The term with 
+        # k + p = 0 integrates to a power of log(x). 
+        self._log_coeff = c[-p]/(q+1) if 0 <= -p < self._n_low else 0.
+        kp = (k + p).astype(float)
+        c_reg = np.where(kp != 0, c, 0.)
+        kp[kp == 0] = 1.
+        self._poly_coeffs     = c_reg/kp
+        self._poly_log_coeffs = -c_reg/kp**2
+
+        # Table of J and dJ/du on a uniform grid in u = log(x). 
+        self._u0 = np.log(self.bound)
+        self._h  = h
+        n_nodes  = int(np.ceil((np.log(self.x_max) - self._u0)/h)) + 1
+        u = self._u0 + h*np.arange(n_nodes)
+        self._J = self._exact_J(np.exp(u))
+        self._dJ_du = self._dJ_du_from_J(np.exp(u), self._J)
+
+        # Estimate the interpolation error between nodes.
+        x_mid = np.exp(u[:-1] + h/2)
+        J_mid = self._exact_J(x_mid)
+        self.rel_err = np.max(np.abs(self._interp_J(x_mid)/J_mid - 1))
+
+        # Indefinite integrals at bound, from below and from above. 
+        self._L_bound = self._low_indef(np.array([self.bound]))[0]
+        self._G_bound = self._tail(np.array([self.bound]))[0]
+
+    @classmethod
+    def get(cls, p, q=0):
+        """ Returns the table for an integrand, building it if necessary.
+
+        Parameters
+        ----------
+        p : int
+            Power of x. 
+        q : {0, 1}
+            Power of log(x).
+
+        Returns
+        -------
+        BEIntegralTable
+        """
+
+        if (p, q) not in _tables:
+            _tables[(p, q)] = cls(p, q)
+
+        return _tables[(p, q)]
+
+    def integrand(self, x):
+        """ The integrand :math:`x^p (\\log x)^q/(e^x - 1)`.
+
+        Parameters
+        ----------
+        x : ndarray
+            Abscissa.
+
+        Returns
+        -------
+        ndarray
+        """
+
+        return x**self.p * np.log(x)**self.q / np.expm1(x)
+
+    def _exact_J(self, x):
+        # J = e^x x^(-p) G(x), summing the integral from x to infinity of
+        # x^p (log x)^q exp(-k x) over k. The terms decrease like 
+        # exp(-(k-1) x), and x >= bound.
+        p = self.p
+        J = np.zeros_like(x)
+        for k in np.arange(1, self._n_high + 1):
+            w = np.exp(-(k-1)*x)
+            kx = k*x
+            if self.q == 0 and p >= 0:
+                term = sp.factorial(p)/k**(p+1) * x**(-p) * np.sum(
+                    [kx**j/sp.factorial(j) for j in np.arange(p+1)], axis=0
+                )
+            elif self.q == 0:
+                term = x*_exp_expn(-p, kx)
+            elif p == 0:
+                term = (np.log(x) + _exp_expn(1, kx))/k
+            else:
+                term = (
+                    (1 + kx)*(np.log(x) + _exp_expn(1, kx)) 
+                    + _exp_expn(2, kx)
+                )/(k**2 * x)
+            J += w*term
+
+        return J
+
+    def _dJ_du_from_J(self, x, J):
+        # From dG/dx = -x^p (log x)^q/(e^x - 1).
+        return (x - self.p)*J - x*np.log(x)**self.q/(-np.expm1(-x))
+
+    def _interp_J(self, x):
+        # Cubic Hermite interpolation in u = log(x).
+        s = (np.log(x) - self._u0)/self._h
+        ind = np.clip(np.floor(s).astype(int), 0, self._J.size - 2)
+        t = s - ind
+
+        return (
+            (1 + 2*t)*(1 - t)**2 * self._J[ind]
+            + t*(1 - t)**2 * self._h*self._dJ_du[ind]
+            + t**2*(3 - 2*t) * self._J[ind+1]
+            + t**2*(t - 1) * self._h*self._dJ_du[ind+1]
+        )
+
+    def _low_indef(self, x):
+        # Indefinite integral below bound, from the series.
+        poly = np.polynomial.polynomial.polyval(x, self._poly_coeffs)
+        if self.q == 0:
+            return x**self.p*poly + self._log_coeff*np.log(x)
+        else:
+            log_x = np.log(x)
+            poly_log = np.polynomial.polynomial.polyval(
+                x, self._poly_log_coeffs
+            )
+            return (
+                x**self.p*(log_x*poly + poly_log) 
+                + self._log_coeff*log_x**2
+            )
+
+    def _tail(self, x):
+        # Integral from x to infinity, for x >= bound.
+        G = np.zeros_like(x)
+        tab = x <= self.x_max
+        G[tab] = (
+            np.exp(-x[tab]) * x[tab]**self.p * self._interp_J(x[tab])
+        )
+        return G
+
+    def _quad(self, a, b):
+        # Gauss-Legendre quadrature over [a, b].
+        nodes, weights = np.polynomial.legendre.leggauss(self._n_quad)
+        half_width = (b - a)/2
+        x = ((a + b)/2)[..., np.newaxis] + half_width[..., np.newaxis]*nodes
+        return half_width*np.dot(self.integrand(x), weights)
+
+    def integral(self, a, b):
+        """ Definite integral from a to b.
+
+        Parameters
+        ----------
+        a : ndarray
+            Lower limit of integration. 
+        b : ndarray
+            Upper limit of integration, which can be infinite. Must broadcast with *a*.
+
+        Returns
+        -------
+        ndarray
+            The resulting integral, in float64. 
+        """
+
+        a, b = np.broadcast_arrays(
+            np.asarray(a, dtype='float64'), np.asarray(b, dtype='float64')
+        )
+
+        integral = np.zeros(a.shape)
+
+        narrow = np.abs(b - a) < self._narrow*np.minimum(
+            np.minimum(a, b), 1.
+        )
+        wide = ~narrow
+
+        if np.any(narrow):
+            integral[narrow] = self._quad(a[narrow], b[narrow])
+
+        if np.any(wide):
+
+            # Split the integral at bound. The parts below and above bound
+            # are exactly zero if both limits lie above or below bound.
+            def low_part(x):
+                expr = np.full_like(x, self._L_bound)
+                low = x < self.bound
+                expr[low] = self._low_indef(x[low])
+                return expr
+
+            def high_part(x):
+                expr = np.full_like(x, self._G_bound)
+                high = x > self.bound
+                expr[high] = self._tail(x[high])
+                return expr
+
+            a_wide = a[wide]
+            b_wide = b[wide]
+            integral[wide] = (
+                (low_part(b_wide) - low_part(a_wide))
+                + (high_part(a_wide) - high_part(b_wide))
+            )
+
+        return integral
+
+def _table_integral(p, q, a, b, series):
+    """ Definite integral from :class:`BEIntegralTable`.
+
+    Parameters
+    ----------
+    p : int
+        Power of x in the integrand. 
+    q : {0, 1}
+        Power of log(x) in the integrand.
+    a : ndarray
+        Lower limit of integration. 
+    b : ndarray
+        Upper limit of integration. 
+    series : function
+        Returns the integral from the series expansion, given *a* and *b*.
+
+    Returns
+    -------
+    ndarray
+        The resulting integral.
+
+    Notes
+    -----
+    Values that are not finite in float64 are computed with *series* instead, and the result is then in float128. If *check_table* is True, all values are compared with *series*. 
+
+    """
+
+    if a.ndim == 1 and b.ndim == 2:
+        if b.shape[1] != a.size:
+            raise TypeError('The second dimension of b must have the same length as a.')
+    elif a.ndim == 2 and b.ndim == 1:
+        if a.shape[1] != b.size:
+            raise TypeError('The second dimension of a must have the same length as b.')
+
+    a, b = np.broadcast_arrays(a, b)
+
+    integral = BEIntegralTable.get(p, q).integral(a, b)
+
+    # Overflow in float64, e.g. for very small limits when p < 0.
+    bad = ~np.isfinite(integral) & np.isfinite(a)
+    if np.any(bad):
+        integral = np.array(integral, dtype='float128')
+        integral[bad] = series(a[bad], b[bad])
+
+    if check_table:
+        series_integral = series(a, b)
+        normal = np.abs(series_integral) > np.finfo('float64').tiny
+        rel_diff = np.abs(
+            integral[normal]/series_integral[normal] - 1
+        )
+        if rel_diff.size > 0 and np.max(rel_diff) > check_rtol:
+            raise RuntimeError(
+                'Tabulated integral differs from the series: relative '
+                + 'difference is ' + str(np.max(rel_diff)) 
+                + ', allowed is ' + str(check_rtol) + '.'
+            )
+
+    return integral
+
+def F2(a,b,tol=1e-10,method=None):
     """Definite integral of x^2/[(exp(x) - 1)]
 
     Parameters
@@ -24,6 +383,8 @@ def F2(a,b,tol=1e-10):
         Upper limit of integration. Can be either 1D or 2D.
     tol : float
         The relative tolerance to be reached. Default is 1e-10. 
+    method : {'table', 'series', None}
+        If 'table', the integral is obtained from :class:`BEIntegralTable`; if 'series', from the series expansion. If None, ``default_method`` is used. Default is None.
 
     Returns
     -------
@@ -32,6 +393,19 @@ def F2(a,b,tol=1e-10):
 
     """
 
+    if method is None:
+        method = default_method
+
+    if method == 'table':
+        integral = _table_integral(
+            2, 0, a, b, lambda a, b: F2(a, b, tol=tol, method='series')[0]
+        )
+        return integral, np.full(
+            integral.shape, BEIntegralTable.get(2, 0).rel_err
+        )
+    elif method != 'series':
+        raise ValueError('invalid method.')
+
     # bound is fixed. If changed to another number, the exact integral from bound to infinity later in the code needs to be changed to the appropriate value. 
     bound = 2. 
 
@@ -216,7 +590,7 @@ def F2(a,b,tol=1e-10):
 
 
 
-def F1(a,b,epsrel=0):
+def F1(a,b,epsrel=0,method=None):
     """Definite integral of x/[(exp(x) - 1)]. 
 
     This is computed from the indefinite integral
@@ -238,6 +612,8 @@ def F1(a,b,epsrel=0):
         Upper limit of integration. Can be either 1D or 2D.
     epsrel : float
         Target relative error associated with series expansion. If zero, then the error is not computed. Default is 0. If the error is larger than ``epsrel``, then the Taylor expansions used here are insufficient. Higher order terms can be added very easily, however.
+    method : {'table', 'series', None}
+        If 'table', the integral is obtained from :class:`BEIntegralTable`; if 'series', from the series expansion. If None, ``default_method`` is used. Default is None.
 
     Returns
     -------
@@ -253,6 +629,16 @@ def F1(a,b,epsrel=0):
     :func:`.log_1_plus_x`, :func:`.spence_series_diff`
     
     """
+
+    if method is None:
+        method = default_method
+
+    if method == 'table':
+        return _table_integral(
+            1, 0, a, b, lambda a, b: F1(a, b, epsrel=epsrel, method='series')
+        )
+    elif method != 'series':
+        raise ValueError('invalid method.')
     lowlim = 0.1
     upplim = 3
 
@@ -373,7 +759,7 @@ def F1(a,b,epsrel=0):
 
     return integral
 
-def F0(a,b,epsrel=0):
+def F0(a,b,epsrel=0,method=None):
     """Definite integral of 1/[(exp(x) - 1)]. 
 
     Parameters
@@ -384,6 +770,8 @@ def F0(a,b,epsrel=0):
         Upper limit of integration. Can be either 1D or 2D.
     err : float
         Error associated with series expansion. If zero, then the error is not computed.
+    method : {'table', 'series', None}
+        If 'table', the integral is obtained from :class:`BEIntegralTable`; if 'series', from the series expansion. If None, ``default_method`` is used. Default is None.
 
     Returns
     -------
@@ -391,6 +779,16 @@ def F0(a,b,epsrel=0):
         The resulting integral.   
 
     """
+
+    if method is None:
+        method = default_method
+
+    if method == 'table':
+        return _table_integral(
+            0, 0, a, b, lambda a, b: F0(a, b, epsrel=epsrel, method='series')
+        )
+    elif method != 'series':
+        raise ValueError('invalid method.')
     lowlim = 0.1
     upplim = 3
 
@@ -467,7 +865,7 @@ def F0(a,b,epsrel=0):
 
     return integral
 
-def F_inv(a,b,tol=1e-10):
+def F_inv(a,b,tol=1e-10,method=None):
     """Definite integral of (1/x)/(exp(x) - 1). 
 
     Parameters
@@ -478,6 +876,8 @@ def F_inv(a,b,tol=1e-10):
         Upper limit of integration.
     tol : float
         The relative tolerance to be reached.
+    method : {'table', 'series', None}
+        If 'table', the integral is obtained from :class:`BEIntegralTable`; if 'series', from the series expansion. If None, ``default_method`` is used. Default is None.
 
     Returns
     -------
@@ -486,6 +886,19 @@ def F_inv(a,b,tol=1e-10):
 
     """
 
+    if method is None:
+        method = default_method
+
+    if method == 'table':
+        integral = _table_integral(
+            -1, 0, a, b, lambda a, b: F_inv(a, b, tol=tol, method='series')[0]
+        )
+        return integral, np.full(
+            integral.shape, BEIntegralTable.get(-1, 0).rel_err
+        )
+    elif method != 'series':
+        raise ValueError('invalid method.')
+
     # bound is fixed. If changed to another number, the exact integral from bound to infinity later in the code needs to be changed to the appropriate value.
     bound = 2.
 
@@ -803,7 +1216,7 @@ def F_inv_a(lowlim, a, tol=1e-10):
 
     return integral, err
 
-def F_inv_n(a,b,n,tol=1e-10):
+def F_inv_n(a,b,n,tol=1e-10,method=None):
     """Definite integral of (1/x**n)/(exp(x) - 1)
 
     Parameters
@@ -814,6 +1227,8 @@ def F_inv_n(a,b,n,tol=1e-10):
         Upper limit of integration. 
     tol : float
         The relative tolerance to be reached. 
+    method : {'table', 'series', None}
+        If 'table', the integral is obtained from :class:`BEIntegralTable`; if 'series', from the series expansion. If None, ``default_method`` is used. Default is None.
 
     Returns
     -------
@@ -821,6 +1236,19 @@ def F_inv_n(a,b,n,tol=1e-10):
         The resulting integral. 
     """
 
+    if method is None:
+        method = default_method
+
+    if method == 'table':
+        integral = _table_integral(
+            -n, 0, a, b, lambda a, b: F_inv_n(a, b, n, tol=tol, method='series')[0]
+        )
+        return integral, np.full(
+            integral.shape, BEIntegralTable.get(-n, 0).rel_err
+        )
+    elif method != 'series':
+        raise ValueError('invalid method.')
+
     bound = np.float128(2.) 
 
     # Two different series to approximate this: below and above bound.
@@ -1002,7 +1430,7 @@ def F_inv_n(a,b,n,tol=1e-10):
 
     return integral, err
 
-def F_inv_3(a,b,tol=1e-10):
+def F_inv_3(a,b,tol=1e-10,method=None):
     """Definite integral of (1/x**3)/(exp(x) - 1). 
 
     Parameters
@@ -1013,6 +1441,8 @@ def F_inv_3(a,b,tol=1e-10):
         Upper limit of integration. 
     tol : float
         The relative tolerance to be reached. 
+    method : {'table', 'series', None}
+        If 'table', the integral is obtained from :class:`BEIntegralTable`; if 'series', from the series expansion. If None, ``default_method`` is used. Default is None.
 
     Returns
     -------
@@ -1020,6 +1450,19 @@ def F_inv_3(a,b,tol=1e-10):
         The resulting integral. 
     """
 
+    if method is None:
+        method = default_method
+
+    if method == 'table':
+        integral = _table_integral(
+            -3, 0, a, b, lambda a, b: F_inv_3(a, b, tol=tol, method='series')[0]
+        )
+        return integral, np.full(
+            integral.shape, BEIntegralTable.get(-3, 0).rel_err
+        )
+    elif method != 'series':
+        raise ValueError('invalid method.')
+
     # bound is fixed. If changed to another number, the exact integral from bound to infinity later in the code needs to be changed to the appropriate value.
     bound = 2.
 
@@ -1189,7 +1632,7 @@ def F_inv_3(a,b,tol=1e-10):
 
     return integral, err
 
-def F_inv_5(a,b,tol=1e-10):
+def F_inv_5(a,b,tol=1e-10,method=None):
     """Definite integral of (1/x**5)/(exp(x) - 1). 
 
     Parameters
@@ -1200,6 +1643,8 @@ def F_inv_5(a,b,tol=1e-10):
         Upper limit of integration. 
     tol : float
         The relative tolerance to be reached. 
+    method : {'table', 'series', None}
+        If 'table', the integral is obtained from :class:`BEIntegralTable`; if 'series', from the series expansion. If None, ``default_method`` is used. Default is None.
 
     Returns
     -------
@@ -1207,6 +1652,19 @@ def F_inv_5(a,b,tol=1e-10):
         The resulting integral. 
     """
 
+    if method is None:
+        method = default_method
+
+    if method == 'table':
+        integral = _table_integral(
+            -5, 0, a, b, lambda a, b: F_inv_5(a, b, tol=tol, method='series')[0]
+        )
+        return integral, np.full(
+            integral.shape, BEIntegralTable.get(-5, 0).rel_err
+        )
+    elif method != 'series':
+        raise ValueError('invalid method.')
+
     # bound is fixed. If changed to another number, the exact integral from bound to infinity later in the code needs to be changed to the appropriate value.
     bound = 2.
 
@@ -1376,7 +1834,7 @@ def F_inv_5(a,b,tol=1e-10):
 
     return integral, err
 
-def F_log(a,b,tol=1e-10):
+def F_log(a,b,tol=1e-10,method=None):
     """Definite integral of log(x)/(exp(x) - 1). 
 
     Parameters
@@ -1387,6 +1845,8 @@ def F_log(a,b,tol=1e-10):
         Upper limit of integration.
     tol : float
         The relative tolerance to be reached.
+    method : {'table', 'series', None}
+        If 'table', the integral is obtained from :class:`BEIntegralTable`; if 'series', from the series expansion. If None, ``default_method`` is used. Default is None.
 
     Returns
     -------
@@ -1395,6 +1855,19 @@ def F_log(a,b,tol=1e-10):
 
     """
 
+    if method is None:
+        method = default_method
+
+    if method == 'table':
+        integral = _table_integral(
+            0, 1, a, b, lambda a, b: F_log(a, b, tol=tol, method='series')[0]
+        )
+        return integral, np.full(
+            integral.shape, BEIntegralTable.get(0, 1).rel_err
+        )
+    elif method != 'series':
+        raise ValueError('invalid method.')
+
     # bound is fixed. If changed to another number, the exact integral from bound to infinity later in the code needs to be changed to the appropriate value.
     bound = 2.
     
@@ -1572,7 +2045,7 @@ def F_log(a,b,tol=1e-10):
 
     return integral, err
 
-def F_x_log(a,b,tol=1e-10):
+def F_x_log(a,b,tol=1e-10,method=None):
     """Definite integral of x log(x)/(exp(x) - 1). 
 
     Parameters
@@ -1583,6 +2056,8 @@ def F_x_log(a,b,tol=1e-10):
         Upper limit of integration. 
     tol : float
         The relative tolerance to be reached. 
+    method : {'table', 'series', None}
+        If 'table', the integral is obtained from :class:`BEIntegralTable`; if 'series', from the series expansion. If None, ``default_method`` is used. Default is None.
 
     Returns
     -------
@@ -1590,6 +2065,19 @@ def F_x_log(a,b,tol=1e-10):
         The resulting integral. 
     """
 
+    if method is None:
+        method = default_method
+
+    if method == 'table':
+        integral = _table_integral(
+            1, 1, a, b, lambda a, b: F_x_log(a, b, tol=tol, method='series')[0]
+        )
+        return integral, np.full(
+            integral.shape, BEIntegralTable.get(1, 1).rel_err
+        )
+    elif method != 'series':
+        raise ValueError('invalid method.')
+
     # bound is fixed. If changed to another number, the exact integral from bound to infinity later in the code needs to be changed to the appropriate value.
     bound = 2.
 
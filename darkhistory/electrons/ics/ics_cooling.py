@@ -4,6 +4,7 @@ import numpy as np
 import pickle
 
 import darkhistory.physics as phys
+import darkhistory.utilities as utils
 import darkhistory.spec.transferfunction as tf
 import darkhistory.spec.spectools as spectools
 
@@ -14,7 +15,7 @@ from darkhistory.electrons.ics.ics_engloss_spectrum import engloss_spec
 
 def get_ics_cooling_tf(
     raw_thomson_tf, raw_rel_tf, raw_engloss_tf,
-    eleceng, photeng, rs, fast=True
+    eleceng, photeng, rs, fast=True, ics_spec_table=None
 ):
 
     """Transfer function for complete electron cooling through ICS.
@@ -35,6 +36,8 @@ def get_ics_cooling_tf(
         The redshift (1+z).
     fast : bool, optional
         If True, uses optimized code (with very little checks)
+    ics_spec_table : ICSSpecTable, optional
+        Table of ICS and energy loss spectra to interpolate instead of calling :func:`.ics_spec` and :func:`.engloss_spec`. Default is None.
 
     Returns
     -------
@@ -52,29 +55,35 @@ def get_ics_cooling_tf(
     if fast:
         return get_ics_cooling_tf_fast(
             raw_thomson_tf, raw_rel_tf, raw_engloss_tf,
-            eleceng, photeng, rs
+            eleceng, photeng, rs, ics_spec_table=ics_spec_table
         )
 
 
     T = phys.TCMB(rs)
 
-    # Photon transfer function for single primary electron single scattering.
-    # This is dN/(dE dt), dt = 1 s.
-    ICS_tf = ics_spec(
-        eleceng, photeng, T, thomson_tf = raw_thomson_tf, rel_tf = raw_rel_tf
-    )
+    if ics_spec_table is None:
 
-    # Downcasting speeds up np.dot
-    ICS_tf._grid_vals = ICS_tf.grid_vals.astype('float64')
+        # Photon transfer function for single primary electron single 
+        # scattering. This is dN/(dE dt), dt = 1 s.
+        ICS_tf = ics_spec(
+            eleceng, photeng, T, 
+            thomson_tf = raw_thomson_tf, rel_tf = raw_rel_tf
+        )
 
-    # Energy loss transfer function for single primary electron
-    # single scattering. This is dN/(dE dt), dt = 1 s.
-    engloss_tf = engloss_spec(
-        eleceng, photeng, T, thomson_tf = raw_engloss_tf, rel_tf = raw_rel_tf
-    )
+        # Energy loss transfer function for single primary electron
+        # single scattering. This is dN/(dE dt), dt = 1 s.
+        engloss_tf = engloss_spec(
+            eleceng, photeng, T, 
+            thomson_tf = raw_engloss_tf, rel_tf = raw_rel_tf
+        )
+
+    else:
+
+        ICS_tf, engloss_tf = ics_spec_table.get_tf(eleceng, photeng, rs)
 
     # Downcasting speeds up np.dot
-    engloss_tf._grid_vals = engloss_tf.grid_vals.astype('float64')
+    ICS_tf._grid_vals = ICS_tf.grid_vals.astype('float64', copy=False)
+    engloss_tf._grid_vals = engloss_tf.grid_vals.astype('float64', copy=False)
 
     # Define some useful lengths.
     N_eleceng = eleceng.size
@@ -351,7 +360,7 @@ def get_ics_cooling_tf(
 
 def get_ics_cooling_tf_fast(
     raw_thomson_tf, raw_rel_tf, raw_engloss_tf,
-    eleceng, photeng, rs
+    eleceng, photeng, rs, ics_spec_table=None
 ):
 
     """ Transfer function for complete electron cooling through ICS.
@@ -370,6 +379,8 @@ def get_ics_cooling_tf_fast(
         The photon energy abscissa.
     rs : float
         The redshift (1+z). 
+    ics_spec_table : ICSSpecTable, optional
+        Table of ICS and energy loss spectra to interpolate instead of calling :func:`.ics_spec` and :func:`.engloss_spec`. Default is None.
 
     Returns
     -------
@@ -388,23 +399,29 @@ def get_ics_cooling_tf_fast(
 
     T = phys.TCMB(rs)
 
-    # Photon transfer function for single primary electron single scattering.
-    # This is dN/(dE dt), dt = 1 s.
-    ICS_tf = ics_spec(
-        eleceng, photeng, T, thomson_tf = raw_thomson_tf, rel_tf = raw_rel_tf
-    )
+    if ics_spec_table is None:
 
-    # Downcasting speeds up np.dot
-    ICS_tf._grid_vals = ICS_tf.grid_vals.astype('float64')
+        # Photon transfer function for single primary electron single 
+        # scattering. This is dN/(dE dt), dt = 1 s.
+        ICS_tf = ics_spec(
+            eleceng, photeng, T, 
+            thomson_tf = raw_thomson_tf, rel_tf = raw_rel_tf
+        )
 
-    # Energy loss transfer function for single primary electron
-    # single scattering. This is dN/(dE dt), dt = 1 s.
-    engloss_tf = engloss_spec(
-        eleceng, photeng, T, thomson_tf = raw_engloss_tf, rel_tf = raw_rel_tf
-    )
+        # Energy loss transfer function for single primary electron
+        # single scattering. This is dN/(dE dt), dt = 1 s.
+        engloss_tf = engloss_spec(
+            eleceng, photeng, T, 
+            thomson_tf = raw_engloss_tf, rel_tf = raw_rel_tf
+        )
+
+    else:
+
+        ICS_tf, engloss_tf = ics_spec_table.get_tf(eleceng, photeng, rs)
 
     # Downcasting speeds up np.dot
-    engloss_tf._grid_vals = engloss_tf.grid_vals.astype('float64')
+    ICS_tf._grid_vals = ICS_tf.grid_vals.astype('float64', copy=False)
+    engloss_tf._grid_vals = engloss_tf.grid_vals.astype('float64', copy=False)
 
     # Switch the spectra type here to type 'N'.
     if ICS_tf.spec_type == 'dNdE':
@@ -666,3 +683,146 @@ def get_ics_cooling_tf_fast(
 
     return (sec_phot_tf, sec_lowengelec_tf, cont_loss_vec, deposited_vec)
 
+
+class ICSSpecTable:
+    """ICS and energy loss spectra tabulated over CMB temperatures.
+
+    Parameters
+    ----------
+    eleceng : ndarray
+        The electron *kinetic* energy abscissa.
+    photeng : ndarray
+        The photon energy abscissa.
+    rs_arr : ndarray
+        Increasing redshifts (1+z) of the table. 
+    raw_thomson_tf : TransFuncAtRedshift
+        Raw Thomson ICS scattered photon spectrum transfer function.
+    raw_rel_tf : TransFuncAtRedshift
+        Raw relativistic ICS scattered photon spectrum transfer function.
+    raw_engloss_tf : TransFuncAtRedshift
+        Raw Thomson ICS scattered electron net energy loss spectrum transfer function.
+
+    Attributes
+    ----------
+    eleceng : ndarray
+        The electron *kinetic* energy abscissa.
+    photeng : ndarray
+        The photon energy abscissa.
+    rs : ndarray
+        Redshifts (1+z) of the table. 
+    ics_grid : ndarray
+        Output of :func:`.ics_spec` at each redshift, indexed by (rs, eleceng, photeng). 
+    engloss_grid : ndarray
+        Output of :func:`.engloss_spec` at each redshift, indexed by (rs, eleceng, photeng). 
+
+    Notes
+    -----
+    Since the CMB temperature is proportional to rs, the spectra are linearly interpolated in log(T) between the two nearest redshifts of the table, with no calls to the interpolation functions of the raw transfer functions. The interpolation error is roughly proportional to the spacing of log(rs): see ``benchmarks/bench_ics_spec_table.py``. The table takes up 2 * rs_arr.size * eleceng.size * photeng.size * 8 bytes. 
+
+    """
+
+    def __init__(
+        self, eleceng, photeng, rs_arr, 
+        raw_thomson_tf, raw_rel_tf, raw_engloss_tf
+    ):
+
+        if np.any(rs_arr <= 0) or np.any(np.diff(rs_arr) <= 0):
+            raise ValueError('rs_arr must be positive and increasing.')
+
+        self.eleceng = eleceng
+        self.photeng = photeng
+        self.rs      = rs_arr
+
+        self.raw_thomson_tf = raw_thomson_tf
+        self.raw_rel_tf     = raw_rel_tf
+        self.raw_engloss_tf = raw_engloss_tf
+
+        shape = (rs_arr.size, eleceng.size, photeng.size)
+        self.ics_grid     = np.empty(shape)
+        self.engloss_grid = np.empty(shape)
+
+        for i, rs in enumerate(rs_arr):
+            ICS_tf, engloss_tf = self._direct(eleceng, photeng, rs)
+            self.ics_grid[i]     = ICS_tf.grid_vals
+            self.engloss_grid[i] = engloss_tf.grid_vals
+
+        self._nodes = (np.log(rs_arr),)
+
+    def _direct(self, eleceng, photeng, rs):
+
+        T = phys.TCMB(rs)
+
+        ICS_tf = ics_spec(
+            eleceng, photeng, T, 
+            thomson_tf = self.raw_thomson_tf, rel_tf = self.raw_rel_tf
+        )
+        engloss_tf = engloss_spec(
+            eleceng, photeng, T, 
+            thomson_tf = self.raw_engloss_tf, rel_tf = self.raw_rel_tf
+        )
+
+        return (ICS_tf, engloss_tf)
+
+    def interp(self, rs):
+        """Interpolates the table.
+
+        Parameters
+        ----------
+        rs : float
+            The redshift (1+z). Must lie within the table. 
+
+        Returns
+        -------
+        tuple of TransFuncAtRedshift
+            The ICS and energy loss spectra, same as :func:`.ics_spec` and :func:`.engloss_spec`, but with float64 values. 
+
+        """
+
+        if rs < self.rs[0] or rs > self.rs[-1]:
+            raise ValueError('redshift lies outside of the table.')
+
+        corners = utils.multilinear_weights(self._nodes, [np.log(rs)])
+
+        # Same as in ics_spec and engloss_spec. 
+        dlnz = -1./(phys.dtdz(rs)*rs)
+
+        return tuple(
+            tf.TransFuncAtRedshift(
+                utils.multilinear_sum(grid, corners), 
+                in_eng = self.eleceng, eng = self.photeng, 
+                rs = np.ones_like(self.eleceng)*rs, dlnz = dlnz,
+                spec_type = 'dNdE'
+            ) for grid in [self.ics_grid, self.engloss_grid]
+        )
+
+    def get_tf(self, eleceng, photeng, rs):
+        """Returns the ICS and energy loss spectra.
+
+        Parameters
+        ----------
+        eleceng : ndarray
+            The electron *kinetic* energy abscissa.
+        photeng : ndarray
+            The photon energy abscissa.
+        rs : float
+            The redshift (1+z). 
+
+        Returns
+        -------
+        tuple of TransFuncAtRedshift
+            The ICS and energy loss spectra, same as :func:`.ics_spec` and :func:`.engloss_spec`. 
+
+        Notes
+        -----
+        The spectra are computed directly with the raw transfer functions of the table if the abscissae differ from those of the table, or if *rs* lies outside of the table. 
+
+        """
+
+        if (
+            rs < self.rs[0] or rs > self.rs[-1]
+            or not np.array_equal(eleceng, self.eleceng)
+            or not np.array_equal(photeng, self.photeng)
+        ):
+            return self._direct(eleceng, photeng, rs)
+
+        return self.interp(rs)
@@ -4,6 +4,8 @@ import numpy as np
 from scipy.interpolate import RegularGridInterpolator
 from scipy.interpolate import interp1d
 
+from darkhistory.utilities import MultilinearInterpMixin
+
 class IonRSArray:
     """Array of objects indexed by ionization and redshift. 
 
@@ -64,7 +66,7 @@ class IonRSArray:
         def __setitem__(self, key, value):
             self.tflist_arr[key] = value
 
-class IonRSInterp:
+class IonRSInterp(MultilinearInterpMixin):
     """Interpolation function over list of IonRSArray objects. 
 
     Parameters
@@ -105,97 +107,61 @@ class IonRSInterp:
             except:
                 self.x.append(None)
 
-        self._log_interp = log_interp
-
-        if self._log_interp:
-            for grid in self.grid_vals:
-                grid[grid <= 0] = 1e-200
-            func = np.log
-        else:
-            print('noninterp')
-            def func(obj):
-                return obj
-
-        self.interp_func = []
-        for x_vals,z,grid in zip(self.x, self.rs, self.grid_vals):
-            if x_vals is None:
-                self.interp_func.append(
-                    interp1d(func(z), func(np.squeeze(grid)), axis=0)
-                )
-            elif x_vals.ndim == 1:
-                # xH dependence.
-                self.interp_func.append(
-                    RegularGridInterpolator(
-                        (func(x_vals), func(z)), func(grid)
-                    )
-                )
-            elif x_vals.ndim == 3:
-                # xH, xHe dependence.
-                xH_arr = x_vals[:,0,0]
-                xHe_arr = x_vals[0,:,1]
-                self.interp_func.append(
-                    RegularGridInterpolator(
-                        (func(xH_arr), func(xHe_arr), func(z)), func(grid)
-                    )
-                )
-            else:
-                raise TypeError('grid has anomalous dimensions (and not in a good QFT way).')
-
-    def get_val(self, xH, xHe, rs):
-
-        if self._log_interp:
-            func = np.log
-            inv_func = np.exp
-        else:
-            def func(obj):
-                return obj
-            inv_func = func
-
-        rs_regime_ind = np.searchsorted(self.rs_nodes, rs)
-        if rs > self.rs[rs_regime_ind][-1] or rs < self.rs[rs_regime_ind][0]:
-            raise TypeError('redshift lies outside of range.')
-
-        rs_regime_interp_func = self.interp_func[rs_regime_ind]
-
-        # Make sure xH, xHe and rs are within bounds.
-        if rs > self.rs[rs_regime_ind][-1]:
-            rs = self.rs[-1]
-        if rs < self.rs[rs_regime_ind][0]:
-            rs = self.rs[0]
-
-        if self.x[rs_regime_ind] is not None:
-            if self.x[rs_regime_ind].ndim == 1:
-                if xH > self.x[rs_regime_ind][-1]:
-                    xH = self.x[rs_regime_ind][-1]
-                if xH < self.x[rs_regime_ind][0]:
-                    xH = self.x[rs_regime_ind][0]
-            elif self.x[rs_regime_ind].ndim == 3:
-                xH_arr = self.x[rs_regime_ind][:,0,0]
-                xHe_arr = self.x[rs_regime_ind][0,:,1]
-                if xH > xH_arr[-1]:
-                    xH = xH_arr[-1]
-                if xH < xH_arr[0]:
-                    xH = xH_arr[0]
-                if xHe > xHe_arr[-1]:
-                    xHe = xHe_arr[-1]
-                if xHe < xHe_arr[0]:
-                    xHe = xHe_arr[0]
-
-        if self.x[rs_regime_ind] is None:
-            out_grid_vals = inv_func(
-                np.squeeze(rs_regime_interp_func(func(rs)))
-            )
-        elif self.x[rs_regime_ind].ndim == 1:
-            out_grid_vals = inv_func(
-                np.squeeze(rs_regime_interp_func([func(xH), func(rs)]))
-            )
-        elif self.x[rs_regime_ind].ndim == 3:
-            out_grid_vals = inv_func(
-                np.squeeze(
-                    rs_regime_interp_func([func(xH), func(xHe), func(rs)])
-                )
-            )
-        else:
-            raise TypeError('x has an anomalous dimension (and not in a good QFT way).')
-
-        return out_grid_vals
\ No newline at end of file
+        self._init_interp(log_interp)
+
+    def _from_weights(self, rs_regime_ind, corners, rs=None, out=None):
+        """Returns the interpolated values given the interpolation weights.
+
+        Parameters
+        ----------
+        rs_regime_ind : int
+            The index of the redshift regime.
+        corners : list of tuple
+            The corners and weights returned by :func:`.multilinear_weights`.
+        rs : float, optional
+            The redshift (1+z). Unused, present for consistency with :meth:`.TransferFuncInterp._from_weights`.
+        out : ndarray, optional
+            Array to store the result in.
+
+        Returns
+        -------
+        ndarray
+            The interpolated values.
+
+        """
+
+        return np.squeeze(
+            self._interp_grid(rs_regime_ind, corners, out=out)
+        )
+
+    def get_val(self, xH, xHe, rs, out=None):
+        """Returns the interpolated values.
+
+        Parameters
+        ----------
+        xH : float
+            The ionization fraction nHII/nH.
+        xHe : float
+            The ionization fraction nHeII/nH.
+        rs : float
+            The redshift (1+z).
+        out : ndarray, optional
+            Array to store the result in. A new array is allocated if not specified.
+
+        Returns
+        -------
+        ndarray
+            The interpolated values.
+
+        Notes
+        -----
+        xH and xHe are clamped to the range of the tabulated values. The interpolation is multilinear over (xH, xHe, rs), in log space if *log_interp* is True. 
+
+        """
+
+        if not hasattr(self, '_interp_nodes'):
+            self._setup_interp()
+
+        rs_regime_ind, corners = self._interp_weights(xH, xHe, rs)
+
+        return self._from_weights(rs_regime_ind, corners, out=out)
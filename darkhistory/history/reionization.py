@@ -146,13 +146,16 @@ def alphaA_recomb(species, T):
         Case-A recombination coefficient in cm^3/s. See astro-ph/0607331.
     """
     if species == 'HII':
-        return np.exp(
-            -28.6130338 - 0.72411256 * np.log(T) 
-            - 2.02604473e-2 * np.log(T)**2 - 2.38086188e-3 * np.log(T)**3
-            - 3.21260521e-4 * np.log(T)**4 - 1.42150291e-5 * np.log(T)**5
-            + 4.98910892e-6 * np.log(T)**6 + 5.75561414e-7 * np.log(T)**7
-            - 1.85676704e-8 * np.log(T)**8 - 3.07113524e-9 * np.log(T)**9
-        )
+        # Polynomial in log(T), evaluated with Horner's rule.
+        log_T = np.log(T)
+        log_rate = -3.07113524e-9
+        for coeff in [
+            -1.85676704e-8, 5.75561414e-7, 4.98910892e-6, -1.42150291e-5,
+            -3.21260521e-4, -2.38086188e-3, -2.02604473e-2, -0.72411256, 
+            -28.6130338
+        ]:
+            log_rate = log_rate*log_T + coeff
+        return np.exp(log_rate)
 
     elif species == 'HeIIr':
         return 3.925e-13 * T**-0.6533
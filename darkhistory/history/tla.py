@@ -5,6 +5,7 @@
 import numpy as np
 import darkhistory.physics as phys
 import darkhistory.history.reionization as reion
+from scipy import sparse
 from scipy.integrate import odeint
 from scipy.integrate import solve_ivp
 from scipy.misc import derivative
@@ -43,6 +44,515 @@ def compton_cooling_rate(xHII, xHeII, xHeIII, T_m, rs):
         * phys.TCMB(rs)**4
     )
 
+class TLAEquations:
+    """Right-hand side of the TLA for several histories at once, and its Jacobian.
+
+    Parameters
+    ----------
+    n_hist : int, optional
+        Number of histories N solved together. Default is 1.
+    f_H_ion : ndarray, float or function, optional
+        f for hydrogen ionization, one value per history. A function takes redshift 1+z as input. Treated as zero if None.
+    f_H_exc : ndarray, float or function, optional
+        f for hydrogen Lyman-alpha excitation, one value per history. A function takes redshift 1+z as input. Treated as zero if None.
+    f_heating : ndarray, float or function, optional
+        f for heating, one value per history. A function takes redshift 1+z as input. Treated as zero if None.
+    f_He_ion : ndarray, float or function, optional
+        f for helium ionization, one value per history. A function takes redshift 1+z as input. Treated as zero if None.
+    injection_rate : function or float, optional
+        Injection rate of DM as a function of redshift, one value per history. Treated as zero if None.
+    reion_switch : bool, optional
+        If True, the equations with the reionization model are available.
+    photoion_rate_func : tuple of functions, optional
+        Functions take redshift 1+z as input, return the photoionization rate in s^-1 of HI, HeI and HeII respectively. If not specified, defaults to `darkhistory.history.reionization.photoion_rate`.
+    photoheat_rate_func : tuple of functions, optional
+        Functions take redshift 1+z as input, return the photoheating rate in s^-1 of HI, HeI and HeII respectively. If not specified, defaults to `darkhistory.history.reionization.photoheat_rate`.
+    GWrate_func : function, optional
+        Additional heating rate in eV/s as a function of redshift 1+z.
+    helium_TLA : bool, optional
+        Specifies whether to track helium before reionization.
+
+    Attributes
+    ----------
+    n_hist : int
+        Number of histories.
+    bandwidth : int
+        Number of non-zero diagonals above and below the main diagonal of the Jacobian.
+
+    Notes
+    -----
+    The equations are identical to those solved by :func:`.get_history`. The state vector is [log T_m, yHII, yHeII, yHeIII] for each history in turn, i.e. ``var.reshape((n_hist, 4))``, so that the Jacobian is block diagonal and banded. Quantities that only depend on redshift are computed once per redshift, and shared between the histories and between :meth:`rhs` and :meth:`jac`.
+
+    The Jacobian is obtained by complex-step differentiation of the right-hand side, which is exact to machine precision. The four perturbed states of every history are stacked along a new leading axis, so that the Jacobian takes a single evaluation of the right-hand side on an array of shape (4, n_hist, 4), for any number of histories. The f values and the injection rate only depend on redshift, and do not enter the Jacobian.
+
+    """
+
+    bandwidth = 3
+
+    def __init__(
+        self, n_hist=1,
+        f_H_ion=None, f_H_exc=None, f_heating=None, f_He_ion=None,
+        injection_rate=None, reion_switch=False,
+        photoion_rate_func=None, photoheat_rate_func=None, GWrate_func=None,
+        helium_TLA=False
+    ):
+
+        self.n_hist = n_hist
+
+        self.f_H_ion        = f_H_ion
+        self.f_H_exc        = f_H_exc
+        self.f_heating      = f_heating
+        self.f_He_ion       = f_He_ion
+        self.injection_rate = injection_rate
+        self.GWrate_func    = GWrate_func
+        self.helium_TLA     = helium_TLA
+        self.reion_switch   = reion_switch
+
+        if reion_switch:
+
+            if photoion_rate_func is None:
+                photoion_rate_func = (
+                    reion.photoion_rate('HI'), reion.photoion_rate('HeI'),
+                    reion.photoion_rate('HeII')
+                )
+            if photoheat_rate_func is None:
+                photoheat_rate_func = (
+                    reion.photoheat_rate('HI'), reion.photoheat_rate('HeI'),
+                    reion.photoheat_rate('HeII')
+                )
+
+        self.photoion_rate_func  = photoion_rate_func
+        self.photoheat_rate_func = photoheat_rate_func
+
+        self._rs_key   = None
+        self._rs_terms = None
+
+    def _per_hist(self, val, rs):
+        """Returns *val* at *rs* as an array with one entry per history, or a float for a single history."""
+
+        if val is None:
+            val = 0.
+        elif callable(val):
+            val = val(rs)
+
+        if self.n_hist == 1:
+            if isinstance(val, float):
+                return val
+            return float(np.squeeze(val))
+
+        return np.broadcast_to(np.array(val, dtype=float), (self.n_hist,))
+
+    def get_rs_terms(self, rs, reion_on=False):
+        """Returns the quantities that only depend on redshift.
+
+        Parameters
+        ----------
+        rs : float
+            The redshift in 1+z.
+        reion_on : bool, optional
+            If True, includes the rates of the reionization model.
+
+        Returns
+        -------
+        dict
+            The quantities at *rs*.
+
+        Notes
+        -----
+        The last result is kept, and returned again for the same arguments. The f values and injection rate are read when the result is computed, so the result must be recomputed after they are changed. Set ``_rs_key`` to None to do so.
+
+        """
+
+        if self._rs_key == (rs, reion_on):
+            return self._rs_terms
+
+        if reion_on and not self.reion_switch:
+            raise ValueError(
+                'reionization model requires reion_switch = True.'
+            )
+
+        chi  = phys.chi
+        T_CMB = phys.TCMB(rs)
+        nH   = phys.nH*rs**3
+        inj_rate = self._per_hist(self.injection_rate, rs)
+
+        terms = {
+            'nH': nH, 'dtdz': phys.dtdz(rs), 'T_CMB': T_CMB,
+            'GW_rate': (
+                0. if self.GWrate_func is None else self.GWrate_func(rs)
+            ),
+            'heat_inj': self._per_hist(self.f_heating, rs) * inj_rate,
+            'H_ion_inj': (
+                self._per_hist(self.f_H_ion, rs) * inj_rate
+                / (phys.rydberg * nH)
+            ),
+            'H_exc_inj': (
+                self._per_hist(self.f_H_exc, rs) * inj_rate
+                / (phys.lya_eng * nH)
+            ),
+            'He_ion_inj': (
+                self._per_hist(self.f_He_ion, rs) * inj_rate
+                / (phys.He_ion_eng * nH)
+            )
+        }
+
+        if reion_on:
+
+            terms['photoion_rate'] = [
+                func(rs) for func in self.photoion_rate_func
+            ]
+            terms['photoheat_rate'] = [
+                func(rs) for func in self.photoheat_rate_func
+            ]
+
+        else:
+
+            terms['H_ion_CMB'] = (
+                4*phys.beta_ion(T_CMB, 'HI') * np.exp(-phys.lya_eng/T_CMB)
+            )
+            terms['d_xe_Saha_dz'] = (
+                phys.d_xe_Saha_dz(rs, 'HI') if rs > 1500 else 0.
+            )
+
+            if self.helium_TLA:
+                terms['He_ion_CMB_singlet'] = (
+                    phys.beta_ion(T_CMB, 'HeI_21s')
+                    * np.exp(-phys.He_exc_eng['21s']/T_CMB)
+                )
+                terms['He_ion_CMB_triplet'] = (
+                    3*phys.beta_ion(T_CMB, 'HeI_23s')
+                    * np.exp(-phys.He_exc_eng['23s']/T_CMB)
+                )
+
+        self._rs_key   = (rs, reion_on)
+        self._rs_terms = terms
+
+        return terms
+
+    def derivs(self, rs, var, reion_on=False):
+        """Returns the derivatives of the state variables.
+
+        Parameters
+        ----------
+        rs : float
+            The redshift in 1+z.
+        var : ndarray, shape (..., n_hist, 4)
+            [log T_m, yHII, yHeII, yHeIII] for each history. May be complex. For a single history, may also have shape (4,), which is faster.
+        reion_on : bool, optional
+            If True, uses the equations with the reionization model.
+
+        Returns
+        -------
+        ndarray
+            The derivatives with respect to rs, with the same shape and dtype as *var*.
+
+        """
+
+        chi = phys.chi
+        t   = self.get_rs_terms(rs, reion_on)
+
+        nH   = t['nH']
+        dtdz = t['dtdz']
+
+        if var.ndim == 1:
+            # Scalar arithmetic is much faster than arithmetic on arrays 
+            # of a single entry.
+            log_T_m, yHII, yHeII, yHeIII = var.tolist()
+        else:
+            log_T_m, yHII, yHeII, yHeIII = (
+                var[...,0], var[...,1], var[...,2], var[...,3]
+            )
+
+        T_m = np.exp(log_T_m)
+
+        x_HII   = 0.5 + 0.5*np.tanh(yHII)
+        x_HeII  = chi/2 + chi/2*np.tanh(yHeII)
+        x_HeIII = chi/2 + chi/2*np.tanh(yHeIII)
+
+        xe   = x_HII + x_HeII + 2*x_HeIII
+        xHI  = 1 - x_HII
+        xHeI = chi - x_HeII - x_HeIII
+
+        # Conversion from dx/dz to dy/dz.
+        dy_dx_H  = 2 * np.cosh(yHII)**2
+        dy_dx_He = 2/chi * np.cosh(yHeII)**2
+
+        # Branches are selected with the real part of the state, so that
+        # the complex step does not change them.
+        if np.iscomplexobj(var):
+            re_x_HII   = np.real(x_HII)
+            re_x_HeII  = np.real(x_HeII)
+            re_x_HeIII = np.real(x_HeIII)
+            re_yHeII   = np.real(yHeII)
+        else:
+            re_x_HII, re_x_HeII, re_x_HeIII = x_HII, x_HeII, x_HeIII
+            re_yHeII = yHeII
+
+        heating_rate = (
+            compton_cooling_rate(x_HII, x_HeII, x_HeIII, T_m, rs)
+            + t['heat_inj']
+        )
+
+        if not reion_on:
+
+            # Temperature.
+            dlogT_dz = (
+                2/rs + dtdz * t['GW_rate']/T_m
+                + dtdz * heating_rate / (3/2 * nH * (1 + chi + xe)) / T_m
+            )
+
+            # Hydrogen.
+            peebles_C = phys.peebles_C(x_HII, rs)
+
+            dyHII_dz = dy_dx_H * dtdz * (
+                - peebles_C * (
+                    phys.alpha_recomb(T_m, 'HI') * x_HII * xe * nH
+                    - t['H_ion_CMB'] * xHI
+                )
+                + t['H_ion_inj'] + (1 - peebles_C) * t['H_exc_inj']
+            )
+
+            if rs > 1500:
+                Saha_thres = 0.999 if self.helium_TLA else 0.99
+                dyHII_dz = np.where(
+                    re_x_HII > Saha_thres,
+                    dy_dx_H * t['d_xe_Saha_dz'], dyHII_dz
+                )
+                # Prior to helium recombination, assume H completely
+                # ionized.
+                dyHII_dz = np.where(re_x_HeII > 0.99*chi, 0., dyHII_dz)
+            if rs < 100:
+                # At this point, leave at 1 - 1e-6.
+                dyHII_dz = np.where(1 - re_x_HII < 1e-6, 0., dyHII_dz)
+
+            # Helium.
+            if self.helium_TLA:
+
+                term_singlet = (
+                    x_HeII * xe * nH * phys.alpha_recomb(T_m, 'HeI_21s')
+                    - t['He_ion_CMB_singlet'] * (chi - x_HeII)
+                )
+                term_triplet = (
+                    x_HeII * xe * nH * phys.alpha_recomb(T_m, 'HeI_23s')
+                    - t['He_ion_CMB_triplet'] * (chi - x_HeII)
+                )
+
+                dyHeII_dz = dy_dx_He * dtdz * (
+                    - phys.C_He(x_HII, x_HeII, rs, 'singlet') * term_singlet
+                    - phys.C_He(x_HII, x_HeII, rs, 'triplet') * term_triplet
+                    + t['He_ion_inj']
+                )
+
+                # Stop the solver from reaching these extremes.
+                dyHeII_dz = np.where(
+                    np.abs(re_yHeII) > 14, 0., dyHeII_dz
+                )
+                if rs < 100:
+                    dyHeII_dz = np.where(
+                        chi - re_x_HeII < 1e-6, 0., dyHeII_dz
+                    )
+
+            else:
+
+                dyHeII_dz = 0.
+
+            dyHeIII_dz = 0.
+
+        else:
+
+            ne = xe * nH
+
+            photoion_HI, photoion_HeI, photoion_HeII = t['photoion_rate']
+            photoheat_HI, photoheat_HeI, photoheat_HeII = t['photoheat_rate']
+
+            alphaA_HII   = reion.alphaA_recomb('HII', T_m)
+            alphaA_HeII  = reion.alphaA_recomb('HeII', T_m)
+            alphaA_HeIII = reion.alphaA_recomb('HeIII', T_m)
+
+            coll_ion_HI   = reion.coll_ion_rate('HI', T_m)
+            coll_ion_HeI  = reion.coll_ion_rate('HeI', T_m)
+            coll_ion_HeII = reion.coll_ion_rate('HeII', T_m)
+
+            # Temperature.
+            heating_rate = (
+                heating_rate
+                + nH * (
+                    xHI * photoheat_HI + xHeI * photoheat_HeI
+                    + x_HeII * photoheat_HeII
+                )
+                + reion.recomb_cooling_rate(x_HII, x_HeII, x_HeIII, T_m, rs)
+                + reion.coll_ion_cooling_rate(
+                    x_HII, x_HeII, x_HeIII, T_m, rs
+                )
+                + reion.coll_exc_cooling_rate(
+                    x_HII, x_HeII, x_HeIII, T_m, rs
+                )
+                + reion.brem_cooling_rate(x_HII, x_HeII, x_HeIII, T_m, rs)
+            )
+
+            dlogT_dz = 1 / T_m * (
+                2 * T_m/rs
+                + dtdz * heating_rate / (3/2 * nH * (1 + chi + xe))
+                + dtdz * t['GW_rate']
+            )
+
+            # Hydrogen.
+            dyHII_dz = dy_dx_H * dtdz * (
+                t['H_ion_inj']
+                + (1 - phys.peebles_C(x_HII, rs)) * t['H_exc_inj']
+                + xHI * photoion_HI
+                + xHI * ne * coll_ion_HI
+                - x_HII * ne * alphaA_HII
+            )
+
+            # Helium.
+            dyHeII_dz = dy_dx_He * dtdz * (
+                xHeI * photoion_HeI
+                + xHeI * ne * coll_ion_HeI
+                + x_HeIII * ne * alphaA_HeIII
+                - x_HeII * photoion_HeII
+                - x_HeII * ne * coll_ion_HeII
+                - x_HeII * ne * alphaA_HeII
+                + t['He_ion_inj']
+            )
+
+            dyHeIII_dz = 2/chi * np.cosh(yHeIII)**2 * dtdz * (
+                x_HeII * photoion_HeII
+                + x_HeII * ne * coll_ion_HeII
+                - x_HeIII * ne * alphaA_HeIII
+            )
+
+            if rs < 100:
+                # At this point, leave at 1 - 1e-6.
+                dyHII_dz   = np.where(1 - re_x_HII < 1e-6, 0., dyHII_dz)
+                dyHeII_dz  = np.where(chi - re_x_HeII < 1e-6, 0., dyHeII_dz)
+                dyHeIII_dz = np.where(
+                    chi - re_x_HeIII < 1e-6, 0., dyHeIII_dz
+                )
+
+        if var.ndim == 1:
+            return np.array(
+                [dlogT_dz, dyHII_dz, dyHeII_dz, dyHeIII_dz], dtype=var.dtype
+            )
+
+        return np.stack(
+            np.broadcast_arrays(dlogT_dz, dyHII_dz, dyHeII_dz, dyHeIII_dz), 
+            axis=-1
+        ).astype(var.dtype, copy=False)
+
+    def rhs(self, rs, var, reion_on=False):
+        """Returns the right-hand side of the TLA.
+
+        Parameters
+        ----------
+        rs : float
+            The redshift in 1+z.
+        var : ndarray
+            The flattened state vector, of length 4 * n_hist.
+        reion_on : bool, optional
+            If True, uses the equations with the reionization model.
+
+        Returns
+        -------
+        ndarray
+            The derivatives with respect to rs, of length 4 * n_hist.
+
+        """
+
+        if self.n_hist == 1:
+            return self.derivs(rs, np.asarray(var, dtype=float), reion_on)
+
+        return self.derivs(
+            rs, np.reshape(var, (self.n_hist, 4)), reion_on
+        ).flatten()
+
+    def jac_blocks(self, rs, var, reion_on=False):
+        """Returns the diagonal blocks of the Jacobian.
+
+        Parameters
+        ----------
+        rs : float
+            The redshift in 1+z.
+        var : ndarray
+            The flattened state vector, of length 4 * n_hist.
+        reion_on : bool, optional
+            If True, uses the equations with the reionization model.
+
+        Returns
+        -------
+        ndarray, shape (n_hist, 4, 4)
+            The derivative of entry i of the right-hand side of each history with respect to state variable j of the same history, stored in [:, i, j].
+
+        """
+
+        # Exact up to terms of order step**2, far below machine precision.
+        step = 1e-30
+
+        # Entry j along the first axis carries the step in variable j, so 
+        # that all four steps are taken in a single evaluation.
+        var_complex = np.array(
+            np.broadcast_to(
+                np.reshape(var, (self.n_hist, 4)), (4, self.n_hist, 4)
+            ), dtype=complex
+        )
+        for j in np.arange(4):
+            var_complex[j,:,j] += 1j*step
+
+        vals = self.derivs(rs, var_complex, reion_on)
+
+        return np.transpose(np.imag(vals), (1, 2, 0)) / step
+
+    def jac(self, rs, var, reion_on=False):
+        """Returns the Jacobian of the right-hand side as a sparse matrix.
+
+        Parameters
+        ----------
+        rs : float
+            The redshift in 1+z.
+        var : ndarray
+            The flattened state vector, of length 4 * n_hist.
+        reion_on : bool, optional
+            If True, uses the equations with the reionization model.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            The Jacobian, of shape (4 * n_hist, 4 * n_hist), for use with *scipy.integrate.solve_ivp*.
+
+        """
+
+        return sparse.block_diag(
+            self.jac_blocks(rs, var, reion_on), format='csr'
+        )
+
+    def jac_banded(self, rs, var, reion_on=False):
+        """Returns the Jacobian of the right-hand side in banded storage.
+
+        Parameters
+        ----------
+        rs : float
+            The redshift in 1+z.
+        var : ndarray
+            The flattened state vector, of length 4 * n_hist.
+        reion_on : bool, optional
+            If True, uses the equations with the reionization model.
+
+        Returns
+        -------
+        ndarray, shape (2 * bandwidth + 1, 4 * n_hist)
+            The Jacobian J, with J[i, j] stored in [i - j + bandwidth, j], as required by *scipy.integrate.odeint* with ``ml = mu = bandwidth``.
+
+        """
+
+        blocks = self.jac_blocks(rs, var, reion_on)
+
+        banded = np.zeros((2*self.bandwidth + 1, 4*self.n_hist))
+        for i in np.arange(4):
+            for j in np.arange(4):
+                banded[i - j + self.bandwidth, j::4] = blocks[:,i,j]
+
+        return banded
+
 def get_history(
     rs_vec, init_cond=None, baseline_f=False,
     inj_particle=None,
@@ -52,7 +562,7 @@ def get_history(
     reion_switch=False, reion_rs=None,
     photoion_rate_func=None, photoheat_rate_func=None,GWrate_func=None,
     xe_reion_func=None, helium_TLA=False, f_He_ion=None, 
-    mxstep = 1000, rtol=1e-4
+    mxstep = 1000, rtol=1e-4, vectorized=True
 ):
     """Returns the ionization and thermal history of the IGM.
 
@@ -100,6 +610,8 @@ def get_history(
         The maximum number of steps allowed for each integration point. See *scipy.integrate.odeint* for more information.
     rtol : float, optional
         The relative error of the solution. See *scipy.integrate.odeint* for more information.
+    vectorized : bool, optional
+        If True, uses :class:`.TLAEquations` and its Jacobian whenever the f values do not depend on the ionization levels. Default is True.
 
     Returns
     -------
@@ -110,6 +622,8 @@ def get_history(
     -----
     The actual differential equation that we solve is expressed in terms of y = arctanh(f*(x - f)), where f = 0.5 for x = xHII, and f = nHe/nH * 0.5 for x = xHeII or xHeIII, where nHe/nH is approximately 0.083.
 
+    If any of the f values is a function, it may depend on the ionization levels, and the equations are solved with a scalar right-hand side instead, with the Jacobian estimated by the solver.
+
     """
 
     # Defines the f(z) functions, which return a constant, 
@@ -644,6 +1158,52 @@ def get_history(
 
         return dlogT_dz(log_T_m, rs)
 
+    if vectorized and not any([
+        callable(f) for f in [f_H_ion, f_H_exc, f_heating, f_He_ion]
+    ]):
+
+        if baseline_f:
+            # f_std only depends on redshift.
+            def _f_std(channel):
+                def f(rs):
+                    return phys.f_std(
+                        mDM, rs, inj_particle=inj_particle,
+                        inj_type=DM_process, struct=struct_bool,
+                        channel=channel
+                    )
+                return f
+            f_vals = [_f_std('H ion'), _f_std('exc'), _f_std('heat')]
+        else:
+            f_vals = [f_H_ion, f_H_exc, f_heating]
+
+        tla_eqs = TLAEquations(
+            f_H_ion=f_vals[0], f_H_exc=f_vals[1], f_heating=f_vals[2],
+            f_He_ion=f_He_ion, injection_rate=_injection_rate,
+            reion_switch=reion_switch, 
+            photoion_rate_func=photoion_rate_func,
+            photoheat_rate_func=photoheat_rate_func,
+            GWrate_func=GWrate_func, helium_TLA=helium_TLA
+        )
+
+    else:
+
+        tla_eqs = None
+
+    def solve_TLA(reion_on, init_cond, rs):
+        # Solves the TLA over rs, with or without reionization.
+        if tla_eqs is None:
+            return odeint(
+                tla_reion if reion_on else tla_before_reion, init_cond, rs,
+                mxstep = mxstep, tfirst=True, rtol=rtol
+            )
+        else:
+            return odeint(
+                tla_eqs.rhs, init_cond, rs, args=(reion_on,), 
+                Dfun=tla_eqs.jac_banded, 
+                ml=tla_eqs.bandwidth, mu=tla_eqs.bandwidth,
+                mxstep = mxstep, tfirst=True, rtol=rtol
+            )
+
     if init_cond is None:
         rs_start = rs_vec[0]
         if helium_TLA:
@@ -690,10 +1250,7 @@ def get_history(
 
     if not reion_switch:
         # No reionization model implemented.
-        soln = odeint(
-                tla_before_reion, _init_cond, rs_vec, 
-                mxstep = mxstep, tfirst=True, rtol=rtol
-            )
+        soln = solve_TLA(False, _init_cond, rs_vec)
         # print(init_cond)
         # print(rs_vec)
         # soln = solve_ivp(
@@ -707,10 +1264,7 @@ def get_history(
 
         # tfirst=True means that tla_before_reion accepts rs as 
         # first argument.
-        soln_no_reion = odeint(
-            tla_before_reion, _init_cond, rs_vec, 
-            mxstep = mxstep, tfirst=True, rtol=rtol
-        )
+        soln_no_reion = solve_TLA(False, _init_cond, rs_vec)
         # soln_no_reion = solve_ivp(
         #     tla_before_reion, (rs_vec[0], rs_vec[-1]),
         #     init_cond, method='BDF', t_eval=rs_vec
@@ -795,10 +1349,7 @@ def get_history(
         # Reionization model implemented. 
         # First, check if required in the first place. 
         if rs_reion_vec.size == 0:
-            soln = odeint(
-                tla_before_reion, _init_cond, 
-                rs_before_reion_vec, mxstep = mxstep, rtol=rtol, tfirst=True
-            )
+            soln = solve_TLA(False, _init_cond, rs_before_reion_vec)
             # soln = solve_ivp(
             #     tla_before_reion, 
             #     (rs_before_reion_vec[0], rs_before_reion_vec[-1]),
@@ -806,10 +1357,7 @@ def get_history(
             # )
         # Conversely, solving before reionization may be unnecessary.
         elif rs_before_reion_vec.size == 0:
-            soln = odeint(
-                tla_reion, _init_cond, rs_reion_vec, 
-                mxstep = mxstep, rtol=rtol, tfirst=True
-            )
+            soln = solve_TLA(True, _init_cond, rs_reion_vec)
             # soln = solve_ivp(
             #     tla_reion, (rs_reion_vec[0], rs_reion_vec[-1]),
             #     init_cond, method='BDF', t_eval=rs_reion_vec
@@ -818,9 +1366,8 @@ def get_history(
         else:
             # First, solve without reionization up to rs = reion_rs.
             rs_before_reion_vec = np.append(rs_before_reion_vec, reion_rs)
-            soln_before_reion = odeint(
-                tla_before_reion, _init_cond, 
-                rs_before_reion_vec, mxstep = mxstep, tfirst=True, rtol=rtol
+            soln_before_reion = solve_TLA(
+                False, _init_cond, rs_before_reion_vec
             )
             # soln_before_reion = solve_ivp(
             #     tla_before_reion, 
@@ -836,10 +1383,7 @@ def get_history(
                 soln_before_reion[-1,2],
                 soln_before_reion[-1,3]
             ]
-            soln_reion = odeint(
-                tla_reion, init_cond_reion, 
-                rs_reion_vec, mxstep = mxstep, tfirst=True, rtol=rtol
-            )
+            soln_reion = solve_TLA(True, init_cond_reion, rs_reion_vec)
             # soln_reion = solve_ivp(
             #     tla_reion, (rs_reion_vec[0], rs_reion_vec[-1]),
             #     init_cond, method='BDF', t_eval=rs_reion_vec
@@ -857,3 +1401,194 @@ def get_history(
     )
 
     return soln
+
+def get_history_batch(
+    rs_vec, init_cond, 
+    f_H_ion=None, f_H_exc=None, f_heating=None, f_He_ion=None,
+    injection_rate=None, 
+    reion_switch=False, reion_rs=None,
+    photoion_rate_func=None, photoheat_rate_func=None, GWrate_func=None,
+    xe_reion_func=None, helium_TLA=False,
+    mxstep = 1000, rtol=1e-4
+):
+    """Returns the ionization and thermal histories of several models at once.
+
+    All models are solved as a single system of ODEs, sharing the same redshift abscissa. 
+
+    Parameters
+    ----------
+    rs_vec : ndarray
+        Abscissa for the solution.
+    init_cond : ndarray, shape (N, 4)
+        Array containing [initial temperature, initial xHII, initial xHeII, initial xHeIII] for each of the N models.
+    f_H_ion : ndarray or float, optional
+        f for hydrogen ionization, one value per model. Treated as zero if None.
+    f_H_exc : ndarray or float, optional
+        f for hydrogen Lyman-alpha excitation, one value per model. Treated as zero if None.
+    f_heating : ndarray or float, optional
+        f for heating, one value per model. Treated as zero if None.
+    f_He_ion : ndarray or float, optional
+        f for helium ionization, one value per model. Treated as zero if None.
+    injection_rate : function, optional
+        Injection rate of DM as a function of redshift, returning an array of length N. Treated as zero if None.
+    reion_switch : bool
+        Reionization model included if True.
+    reion_rs : float, optional
+        Redshift 1+z at which reionization effects turn on.
+    photoion_rate_func : tuple of functions, optional
+        Functions take redshift 1+z as input, return the photoionization rate in s^-1 of HI, HeI and HeII respectively. If not specified, defaults to `darkhistory.history.reionization.photoion_rate`. 
+    photoheat_rate_func : tuple of functions, optional
+        Functions take redshift 1+z as input, return the photoheating rate in s^-1 of HI, HeI and HeII respectively. If not specified, defaults to `darkhistory.history.reionization.photoheat_rate`. 
+    GWrate_func : function, optional
+        Additional heating rate in eV/s as a function of redshift 1+z.
+    xe_reion_func : function, optional
+        Specifies a fixed ionization history after reion_rs.  
+    helium_TLA : bool, optional
+        Specifies whether to track helium before reionization. 
+    mxstep : int, optional
+        The maximum number of steps allowed for each integration point. See *scipy.integrate.odeint* for more information.
+    rtol : float, optional
+        The relative error of the solution. See *scipy.integrate.odeint* for more information.
+
+    Returns
+    -------
+    ndarray, shape (N, rs_vec.size, 4)
+        [temperature solution (in eV), xHII solution, xHeII, xHeIII] for each model.
+
+    See Also
+    --------
+    :func:`.get_history`
+
+    Notes
+    -----
+    The equations solved are identical to :func:`.get_history`, with the f values held constant over *rs_vec*. The fixed ionization history model (*xe_reion_func*) is solved model by model with :func:`.get_history`, since the temperature equation is the only one left to integrate.
+
+    """
+
+    init_cond = np.atleast_2d(np.array(init_cond, dtype=float))
+    N = init_cond.shape[0]
+
+    if init_cond.shape[1] != 4:
+        raise TypeError('init_cond must have shape (N, 4).')
+
+    def _f_arr(f):
+        if f is None:
+            return np.zeros(N)
+        else:
+            return np.broadcast_to(np.array(f, dtype=float), (N,))
+
+    _f_H_ion    = _f_arr(f_H_ion)
+    _f_H_exc    = _f_arr(f_H_exc)
+    _f_heating  = _f_arr(f_heating)
+    _f_He_ion   = _f_arr(f_He_ion)
+
+    def _injection_rate(rs):
+        if injection_rate is None:
+            return np.zeros(N)
+        elif callable(injection_rate):
+            return np.broadcast_to(injection_rate(rs), (N,))
+        else:
+            return np.broadcast_to(injection_rate, (N,))
+
+    def solve_separately():
+        # Solves each model with get_history. 
+        return np.array([
+            get_history(
+                rs_vec, init_cond=init_cond[i], 
+                f_H_ion=_f_H_ion[i], f_H_exc=_f_H_exc[i], 
+                f_heating=_f_heating[i],
+                injection_rate=lambda rs, i=i: _injection_rate(rs)[i],
+                reion_switch=reion_switch, reion_rs=reion_rs,
+                photoion_rate_func=photoion_rate_func,
+                photoheat_rate_func=photoheat_rate_func,
+                GWrate_func=GWrate_func, xe_reion_func=xe_reion_func, 
+                helium_TLA=helium_TLA, f_He_ion=_f_He_ion[i], 
+                mxstep=mxstep, rtol=rtol
+            ) for i in np.arange(N)
+        ])
+
+    if reion_switch and xe_reion_func is not None:
+        # Only the temperature is evolved after reionization, so there 
+        # is little to be gained from solving the models together. 
+        return solve_separately()
+
+    chi = phys.chi
+
+    tla_eqs = TLAEquations(
+        n_hist=N, f_H_ion=_f_H_ion, f_H_exc=_f_H_exc, 
+        f_heating=_f_heating, f_He_ion=_f_He_ion, 
+        injection_rate=_injection_rate, reion_switch=reion_switch,
+        photoion_rate_func=photoion_rate_func, 
+        photoheat_rate_func=photoheat_rate_func,
+        GWrate_func=GWrate_func, helium_TLA=helium_TLA
+    )
+
+    def solve_TLA(reion_on, init_cond, rs):
+        # Solves all models over rs, with or without reionization.
+        soln, info = odeint(
+            tla_eqs.rhs, init_cond, rs, args=(reion_on,), 
+            Dfun=tla_eqs.jac_banded, 
+            ml=tla_eqs.bandwidth, mu=tla_eqs.bandwidth,
+            mxstep = mxstep, tfirst=True, rtol=rtol, full_output=True
+        )
+        return soln, info['message'] == 'Integration successful.'
+
+    _init_cond = np.array(init_cond)
+
+    _init_cond[init_cond[:,1] == 1, 1] = 1 - 1e-12
+    _init_cond[init_cond[:,2] == 0, 2] = 1e-12
+    _init_cond[init_cond[:,2] == chi, 2] = (1. - 1e-12) * chi
+    _init_cond[init_cond[:,3] == 0, 3] = 1e-12
+
+    _init_cond[:,0] = np.log(_init_cond[:,0])
+    _init_cond[:,1] = np.arctanh(2*(_init_cond[:,1] - 0.5))
+    _init_cond[:,2] = np.arctanh(2/chi * (_init_cond[:,2] - chi/2))
+    _init_cond[:,3] = np.arctanh(2/chi *(_init_cond[:,3] - chi/2))
+
+    # Flatten to the state vector of TLAEquations, with the four 
+    # variables of each model in turn.
+    _init_cond = _init_cond.flatten()
+
+    if reion_rs is None: 
+        if photoion_rate_func is None:
+            # Default Puchwein model value.
+            reion_rs = 16.1
+        else:
+            raise TypeError('must specify reion_rs if not using default.')
+
+    rs_before_reion_vec = rs_vec[rs_vec > reion_rs]
+    rs_reion_vec = rs_vec[rs_vec <= reion_rs]
+
+    if not reion_switch or rs_reion_vec.size == 0:
+        soln, success = solve_TLA(False, _init_cond, rs_vec)
+    elif rs_before_reion_vec.size == 0:
+        soln, success = solve_TLA(True, _init_cond, rs_vec)
+    else:
+        # Solve without reionization up to rs = reion_rs, then with 
+        # reionization from reion_rs onwards. 
+        rs_before_reion_vec = np.append(rs_before_reion_vec, reion_rs)
+        soln_before_reion, success_before_reion = solve_TLA(
+            False, _init_cond, rs_before_reion_vec
+        )
+        rs_reion_vec = np.insert(rs_reion_vec, 0, reion_rs)
+        soln_reion, success_reion = solve_TLA(
+            True, soln_before_reion[-1], rs_reion_vec
+        )
+        # Stack the solutions. Remove the solution at reion_rs.
+        soln = np.vstack((soln_before_reion[:-1,:], soln_reion[1:,:]))
+        success = success_before_reion and success_reion
+
+    if not success:
+        # The step size is shared between all models, and a single 
+        # badly-behaved model can stall the solver for all of them.
+        return solve_separately()
+
+    # Reshape to (N, rs_vec.size, 4).
+    soln = np.transpose(np.reshape(soln, (rs_vec.size, N, 4)), (1, 0, 2))
+
+    soln[:,:,0] = np.exp(soln[:,:,0])
+    soln[:,:,1] = 0.5 + 0.5*np.tanh(soln[:,:,1])
+    soln[:,:,2] = chi/2 + chi/2*np.tanh(soln[:,:,2])
+    soln[:,:,3] = chi/2 + chi/2*np.tanh(soln[:,:,3])
+
+    return soln
@@ -7,9 +7,11 @@ import sys
 sys.path.append("../..")
 
 import numpy as np
+from scipy import sparse
 
 from darkhistory import physics as phys
 from darkhistory.spec.spectrum import Spectrum
+from darkhistory.spec.spectra import Spectra
 from darkhistory.spec import spectools
 from darkhistory.low_energy import lowE_electrons
 from darkhistory.low_energy import lowE_photons
@@ -330,3 +332,248 @@ def compute_fs(MEDEA_interp, elec_spec, phot_spec, x, dE_dVdt_inj, dt, highengde
     else: 
 
         raise TypeError('invalid method.')
+
+class DepositionPlan:
+    """ Precomputed data for :func:`compute_fs` on fixed abscissae.
+
+    Everything in :func:`compute_fs` that depends only on the photon and electron abscissae, the method and *cross_check* is computed once here, so that :meth:`compute_fs` only takes a few dot products on the spectra.
+
+    Parameters
+    ----------
+    photeng : ndarray
+        Abscissa of the photon spectra.
+    eleceng : ndarray
+        Abscissa of the electron spectra.
+    method : {'no_He', 'He_recomb', 'He'}
+        Method for evaluating helium ionization. See :func:`compute_fs`.
+    cross_check : bool, optional
+        If True, turns off partial binning, as in :func:`compute_fs`.
+
+    Attributes
+    ----------
+    photeng : ndarray
+        Abscissa of the photon spectra.
+    eleceng : ndarray
+        Abscissa of the electron spectra.
+    method : {'no_He', 'He_recomb', 'He'}
+        Method for evaluating helium ionization.
+    phot_wts : ndarray
+        Weights which give the energy per photon spectrum entry deposited into continuum, HI excitation and (for *'no_He'* and *'He_recomb'*) HI ionization.
+    xsec : ndarray
+        HI and HeI photoionization cross sections at *photeng*. Only used for *'He'* and *'He_recomb'*.
+    ion_elec_mat : list of scipy.sparse.csr_matrix
+        Matrices taking the photon spectrum weighted by the probability of ionizing HI (and HeI) to the electron spectrum of the ionized electrons.
+    recomb_elec_N : ndarray
+        Electron spectrum from one recombining helium atom. Only used for *'He_recomb'*.
+
+    Notes
+    -----
+    Integrating a spectrum between energy bounds, shifting the energy of the ionized electrons and rebinning them into *eleceng* are all linear in the spectrum. They are obtained once by applying the usual :class:`.Spectra` methods to the identity, so that the results are the same as those of :func:`compute_fs` up to rounding.
+
+    """
+
+    def __init__(self, photeng, eleceng, method='no_He', cross_check=False):
+
+        if method not in ['no_He', 'He_recomb', 'He']:
+            raise TypeError('invalid method.')
+
+        self.photeng     = photeng
+        self.eleceng     = eleceng
+        self.method      = method
+        self.cross_check = cross_check
+
+        # Photon spectra with a single photon in each bin.
+        phot_id = Spectra(
+            np.identity(photeng.size), eng=photeng, in_eng=photeng,
+            spec_type='N'
+        )
+
+        # Continuum and HI excitation, as in lowE_photons.compute_fs. 
+        # HI ionization as well for the methods that use 'old' there.
+        if not cross_check:
+            phot_wts = [
+                phot_id.toteng(
+                    bound_type='eng', 
+                    bound_arr=np.array([photeng[0], phys.lya_eng])
+                )[0],
+                phot_id.toteng(
+                    bound_type='eng', 
+                    bound_arr=np.array([phys.lya_eng, phys.rydberg])
+                )[0],
+                phys.rydberg * phot_id.totN(
+                    bound_type='eng', 
+                    bound_arr=np.array([phys.rydberg, 10*photeng[-1]])
+                )[0]
+            ]
+        else:
+            phot_wts = [
+                photeng * (photeng < 10.2),
+                photeng * ((photeng >= 10.2) & (photeng <= 13.6)),
+                phys.rydberg * (photeng > 13.6)
+            ]
+        self.phot_wts = np.array(phot_wts)
+
+        if method == 'no_He':
+            ion_pots = [phys.rydberg]
+        else:
+            ion_pots = [phys.rydberg, phys.He_ion_eng]
+            self.xsec = np.array([
+                phys.photo_ion_xsec(photeng, chan) for chan in ['HI', 'HeI']
+            ])
+
+        # Electrons from photoionization, obtained by integrating the 
+        # photon spectrum in the bins above the ionization potential,
+        # subtracting the potential and rebinning into eleceng.
+        self.ion_elec_mat = []
+        for ion_pot in ion_pots:
+            ion_bounds = spectools.get_bounds_between(photeng, ion_pot)
+            ion_engs = np.exp(
+                (np.log(ion_bounds[1:]) + np.log(ion_bounds[:-1]))/2
+            )
+            ion_N = phot_id.totN(bound_type='eng', bound_arr=ion_bounds)
+
+            ion_id = Spectra(
+                np.identity(ion_engs.size), eng=ion_engs - ion_pot,
+                in_eng=ion_engs, spec_type='N'
+            )
+            ion_id.rebin(eleceng)
+
+            self.ion_elec_mat.append(sparse.csr_matrix(
+                np.dot(np.transpose(ion_id.grid_vals), ion_N)
+            ))
+
+        if method == 'He_recomb':
+            # Every ionized helium recombines to produce an 11 eV electron. 
+            self.recomb_elec_N = spectools.rebin_N_arr(
+                np.array([1.]), np.array([phys.He_ion_eng - phys.rydberg]), 
+                eleceng
+            ).N
+
+    def compute_fs(
+        self, MEDEA_interp, elec_N, phot_N, x, dE_dVdt_inj, dt, highengdep, 
+        rs, cmbloss=0, separate_higheng=True
+    ):
+        """ Compute f(z) fractions for continuum photons, photoexcitation of HI, and photoionization of HI, HeI, HeII
+
+        Several models at the same redshift can be computed at once by stacking their inputs along a leading axis.
+
+        Parameters
+        ----------
+        MEDEA_interp : object
+            Interpolator over the MEDEA results, from :func:`.make_interpolator`.
+        elec_N : ndarray
+            Number of electrons per baryon in each bin of *eleceng*, of shape (eleceng.size, ) or (N, eleceng.size) for N models.
+        phot_N : ndarray
+            Number of photons per baryon in each bin of *photeng*, of shape (photeng.size, ) or (N, photeng.size).
+        x : ndarray
+            number of (HI, HeI, HeII) divided by nH at redshift rs, of shape (3, ) or (N, 3).
+        dE_dVdt_inj : float or ndarray
+            DM energy injection rate, dE/dVdt injected.  This is for unclustered DM (i.e. without structure formation). Of shape (N, ) for N models.
+        dt : float
+            time in seconds over which these spectra were deposited.
+        highengdep : ndarray
+            total amount of energy deposited by high energy particles into {H_ionization, H_excitation, heating, continuum} per baryon per time, in that order, of shape (4, ) or (N, 4).
+        rs : float
+            The redshift (1+z) of the spectra.
+        cmbloss : float or ndarray
+            Total amount of energy in upscattered photons that came from the CMB, per baryon per time, (1/n_B)dE/dVdt. Default is zero.
+        separate_higheng : bool, optional
+            If True, returns separate high energy deposition. 
+
+        Returns
+        -------
+        ndarray or tuple of ndarray
+            The same as :func:`compute_fs`, with a leading axis of length N for N models.
+
+        Notes
+        -----
+        Models with the same value of HI are computed with the same MEDEA deposition fractions, which are obtained only once. 
+
+        """
+
+        elec_N      = np.asarray(elec_N)
+        phot_N      = np.asarray(phot_N)
+        x           = np.asarray(x, dtype=float)
+        dE_dVdt_inj = np.asarray(dE_dVdt_inj, dtype=float)
+        highengdep  = np.asarray(highengdep, dtype=float)
+
+        norm_fac = phys.nB * rs**3 / (dt * dE_dVdt_inj)
+
+        # {continuum, HI excitation, HI ionization} energy from photons.
+        phot_eng_dep = np.dot(phot_N, self.phot_wts.T)
+
+        if self.method == 'no_He':
+
+            elec_N_tot = elec_N + self.ion_elec_mat[0].dot(phot_N.T).T
+            ion_eng_He = 0.
+
+        else:
+
+            # Neglect HeII photoionization. Probability of photoionizing 
+            # HI vs. HeI.
+            n = phys.nH*rs**3*x
+            rates = n[..., :2, None] * self.xsec
+            norm_prob = np.sum(rates, axis=-2)
+            prob = np.divide(
+                rates, norm_prob[..., None, :], out=np.zeros_like(rates),
+                where=(self.photeng > phys.rydberg)
+            )
+
+            phot_N_HI  = phot_N*prob[..., 0, :]
+            phot_N_HeI = phot_N*prob[..., 1, :]
+
+            elec_N_tot = (
+                elec_N + self.ion_elec_mat[0].dot(phot_N_HI.T).T
+                + self.ion_elec_mat[1].dot(phot_N_HeI.T).T
+            )
+
+            if self.method == 'He':
+                # Photoionization as in lowE_photons with 'helium'. 
+                phot_eng_dep[..., 2] = phys.rydberg * np.sum(
+                    phot_N_HI, axis=-1
+                )
+                ion_eng_He = phys.He_ion_eng * np.sum(phot_N_HeI, axis=-1)
+            else:
+                # Every photon that photoionizes goes into hydrogen 
+                # ionization.
+                elec_N_tot = (
+                    elec_N_tot 
+                    + np.sum(phot_N_HeI, axis=-1)[..., None] 
+                    * self.recomb_elec_N
+                )
+                ion_eng_He = 0.
+
+        f_phot = phot_eng_dep * norm_fac[..., None]
+
+        # Electrons, as in lowE_electrons.compute_fs. 
+        xe = 1 - x[..., 0]
+        f_elec = np.zeros(xe.shape + (5,))
+        for xe_val in np.unique(xe):
+            fracs_grid = MEDEA_interp.get_vals(xe_val, self.eleceng)
+            fracs_grid /= np.sum(fracs_grid, axis=1)[:, np.newaxis]
+
+            same_xe = xe == xe_val
+            f_elec[same_xe] = np.dot(
+                self.eleceng * elec_N_tot[same_xe], fracs_grid
+            )
+        f_elec *= norm_fac[..., None]
+
+        # f_low is {H ion, He ion, Lya Excitation, Heating, Continuum}
+        f_low = np.stack([
+            f_phot[..., 2]+f_elec[..., 2],
+            ion_eng_He*norm_fac+f_elec[..., 3],
+            f_phot[..., 1]+f_elec[..., 1],
+            f_elec[..., 0],
+            f_phot[..., 0]+f_elec[..., 4] 
+                - cmbloss*phys.nB*rs**3 / dE_dVdt_inj
+        ], axis=-1)
+
+        f_high = np.stack([
+            highengdep[..., 0], np.zeros_like(highengdep[..., 0]), 
+            highengdep[..., 1], highengdep[..., 2], highengdep[..., 3]
+        ], axis=-1) * phys.nB * rs**3 / dE_dVdt_inj[..., None]
+
+        if separate_higheng:
+            return (f_low, f_high)
+        else:
+            return f_low + f_high
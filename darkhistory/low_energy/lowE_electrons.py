@@ -13,40 +13,40 @@ import darkhistory.physics as phys
 import darkhistory.utilities as utils
 
 import os
-cwd = os.getcwd()
 abspath = os.path.abspath(__file__)
 dir_path = os.path.dirname(abspath)
 #dir_path = os.path.dirname(os.path.realpath(__file__))
 
-def make_interpolator(interp_type='2D', cross_check=False):
-    """Creates cubic splines that interpolate the Medea Data.  Stores them in globally defined variables so that these functions are only computed once
+def load_MEDEA_data(cross_check=False):
+    """Loads the MEDEA results.
 
     Assumes that the data files are in the same directory as this script.
 
     Parameters
     ----------
-
-    interp_type : {'1D', '2D'}, optional
-        Returns the type of interpolation over the MEDEA data. 
+    cross_check : bool, optional
+        If True, only the energies of the original MEDEA files are used.
 
     Returns
     -------
-
-    Interpolator2D or function
-        The interpolating function (takes x_e and electron energy)
+    tuple of ndarray
+        The ionization fractions xe, the electron energies and the deposition fractions, indexed by (xe, energy, channel).
     """
 
     if cross_check:
         engs = np.array([14., 30, 60, 100, 300, 3000])
     else:
         engs = np.array([10.2, 13.6, 14, 30, 60, 100, 300, 3000])
-    #print('AHHHHHH NOOOOOO!')
 
+    file_names = [
+        os.path.join(
+            dir_path, 'results-'+str(eng)+'ev-xH-xHe_e-10-yp024.dat'
+        ) for eng in engs
+    ]
     grid_vals = np.zeros((26, len(engs), 5))
-    os.chdir(dir_path)
     # load MEDEA files
-    for i, eng in enumerate(engs):
-        with open('results-'+str(eng)+'ev-xH-xHe_e-10-yp024.dat','r') as f:
+    for i, file_name in enumerate(file_names):
+        with open(file_name,'r') as f:
             lines_list = f.readlines()
 
             # load ionization levels only once
@@ -63,13 +63,140 @@ def make_interpolator(interp_type='2D', cross_check=False):
                 ] for k in [1,2,3,4,5]
             ]))
 
-    os.chdir(cwd)
+    return xes, engs, grid_vals
+
+class MEDEAInterpolator:
+    """Interpolator over the MEDEA results.
+
+    The interpolation is linear in the log of the deposition fractions over log xe and log energy, the same as :class:`.Interpolator2D` with *logInterp* set to True. 
+
+    Parameters
+    ----------
+    xes : ndarray
+        The ionization fractions of the MEDEA results.
+    engs : ndarray
+        The electron energies of the MEDEA results.
+    grid_vals : ndarray
+        The deposition fractions, indexed by (xe, energy, channel).
+
+    Attributes
+    ----------
+    xes : ndarray
+        The ionization fractions of the MEDEA results.
+    engs : ndarray
+        The electron energies of the MEDEA results.
+
+    Notes
+    -----
+    For each energy abscissa passed to :meth:`get_vals`, the results are interpolated in energy for every tabulated xe once, and stored. Each call then only interpolates between two of these rows. 
+
+    """
+
+    def __init__(self, xes, engs, grid_vals):
+
+        self.xes  = xes
+        self.engs = engs
+
+        self._log_xes   = np.log(xes)
+        self._log_engs  = np.log(engs)
+        self._log_grid  = np.log(grid_vals)
+
+        # Grid interpolated in energy, keyed by the energy abscissa. 
+        self._eng_tables = {}
+
+    def _get_eng_table(self, eng):
+        """Returns the log of the grid interpolated to *eng*, indexed by (xe, eng, channel)."""
+
+        key = eng.tobytes()
+
+        if key not in self._eng_tables:
+
+            # Energies must lie within the tabulated values.
+            log_eng = np.log(np.clip(eng, self.engs[0], self.engs[-1]))
+
+            ind = np.clip(
+                np.searchsorted(self._log_engs, log_eng, side='right') - 1,
+                0, self.engs.size - 2
+            )
+            t = (log_eng - self._log_engs[ind])/(
+                self._log_engs[ind+1] - self._log_engs[ind]
+            )
+
+            self._eng_tables[key] = (
+                self._log_grid[:, ind] * (1. - t)[:, None]
+                + self._log_grid[:, ind+1] * t[:, None]
+            )
+
+        return self._eng_tables[key]
+
+    def get_vals(self, xe, eng):
+        """Returns the deposition fractions.
+
+        Parameters
+        ----------
+        xe : float
+            The ionization fraction ne/nH.
+        eng : ndarray
+            The electron energies.
+
+        Returns
+        -------
+        ndarray
+            The deposition fractions, indexed by (eng, channel). 
+        """
+
+        eng_table = self._get_eng_table(np.asarray(eng, dtype=float))
+
+        # xe must lie between the tabulated values. 
+        corners = utils.multilinear_weights([self._log_xes], [np.log(xe)])
+
+        log_vals = 0.
+        for (i,), wt in corners:
+            log_vals = log_vals + wt * eng_table[i]
+
+        return np.exp(log_vals)
+
+    def get_val(self, xe, eng):
+        """Returns the deposition fractions at a single energy.
+
+        Parameters
+        ----------
+        xe : float
+            The ionization fraction ne/nH.
+        eng : float
+            The electron energy.
+
+        Returns
+        -------
+        ndarray
+            The deposition fractions in each channel. 
+        """
+
+        return self.get_vals(xe, np.array([eng]))[0]
+
+def make_interpolator(interp_type='2D', cross_check=False):
+    """Creates cubic splines that interpolate the Medea Data.  Stores them in globally defined variables so that these functions are only computed once
+
+    The data is loaded with :func:`load_MEDEA_data`.
+
+    Parameters
+    ----------
+
+    interp_type : {'1D', '2D'}, optional
+        Returns the type of interpolation over the MEDEA data. 
+
+    Returns
+    -------
+
+    MEDEAInterpolator or function
+        The interpolating function (takes x_e and electron energy)
+    """
+
+    xes, engs, grid_vals = load_MEDEA_data(cross_check=cross_check)
 
     if interp_type == '2D':
 
-        MEDEA_interp = utils.Interpolator2D(
-            xes, 'xes', engs, 'engs', grid_vals, logInterp=True
-        )
+        MEDEA_interp = MEDEAInterpolator(xes, engs, grid_vals)
 
     elif interp_type == '1D':
 
@@ -12,6 +12,50 @@ import darkhistory.physics as phys
 import darkhistory.spec.spectools as spectools
 import time
 
+# Quantities used by get_kappa_2s that only depend on the photon energy
+# abscissa, keyed by the abscissa. 
+_kappa_2s_data = {}
+
+def _get_kappa_2s_data(eng):
+    """ Returns the quantities used by get_kappa_2s for an energy abscissa.
+
+    Parameters
+    ----------
+    eng : ndarray
+        The photon energy abscissa.
+
+    Returns
+    -------
+    tuple of ndarray
+        The energies below lya_eng/2, the index of the bin containing lya_eng minus each of these energies, and the integration weights (bin size times the 2s to 1s decay rate per nu).
+    """
+    key = eng.tobytes()
+
+    if key not in _kappa_2s_data:
+
+        lya_eng = phys.lya_eng
+
+        bounds = spectools.get_bin_bound(eng)
+        mid = spectools.get_indx(bounds, lya_eng/2)
+
+        # Index of the bin in which lya_eng - eng[k] resides, never
+        # above the bin containing lya_eng - eng[0]. 
+        comp_indx = np.minimum(
+            np.searchsorted(bounds, lya_eng - eng[:mid], side='right') - 1,
+            spectools.get_indx(bounds, lya_eng - eng[0])
+        )
+
+        # Bin sizes
+        diffs = np.append(bounds[1:mid], lya_eng/2) - np.insert(bounds[1:mid], 0, 0)
+        diffs /= (2 * np.pi * phys.hbar)
+
+        dLam_dnu = phys.get_dLam2s_dnu()
+        rates = dLam_dnu(eng[:mid]/(2 * np.pi * phys.hbar))
+
+        _kappa_2s_data[key] = (eng[:mid].copy(), comp_indx, diffs * rates)
+
+    return _kappa_2s_data[key]
+
 def get_kappa_2s(photspec):
     """ Compute kappa_2s for use in kappa_DM function
 
@@ -24,54 +68,34 @@ def get_kappa_2s(photspec):
     -------
     kappa_2s : float
         The added photoionization rate from the 1s to the 2s state due to DM photons.
+
+    Notes
+    -----
+    The complementary bins and the 2s to 1s decay profile only depend on the energy abscissa, and are computed once for each abscissa.
     """
     # Convenient Variables
     eng = photspec.eng
     rs = photspec.rs
-    Lambda = phys.width_2s1s_H
     Tcmb = phys.TCMB(rs)
     lya_eng = phys.lya_eng
 
-    # Photon phase space density (E >> kB*T approximation)
-    def Boltz(E):
-        return np.exp(-E/Tcmb)
-
-    bounds = spectools.get_bin_bound(eng)
-    mid = spectools.get_indx(bounds, lya_eng/2)
+    eng_low, comp_indx, weights = _get_kappa_2s_data(eng)
 
     # Phase Space Density of DM
     f_nu = photspec.dNdE * phys.c**3 / (
         8 * np.pi * (eng/phys.hbar)**2
     )
 
-    # Complementary (E - h\nu) phase space density of DM
-    f_nu_p = np.zeros(mid)
-
-    # Index of point complementary to eng[k]
-    comp_indx = spectools.get_indx(bounds, lya_eng - eng[0])
-
-    # Find the bin in which lya_eng - eng[k] resides. Store f_nu of that bin in f_nu_p.
-    for k in np.arange(mid):
-        while (lya_eng - eng[k]) < bounds[comp_indx]:
-            comp_indx -= 1
-        f_nu_p[k] = f_nu[comp_indx]
-
-    # Setting up the numerical integration
-
-    # Bin sizes
-    diffs = np.append(bounds[1:mid], lya_eng/2) - np.insert(bounds[1:mid], 0, 0)
-    diffs /= (2 * np.pi * phys.hbar)
-
-    dLam_dnu = phys.get_dLam2s_dnu()
-    rates = dLam_dnu(eng[:mid]/(2 * np.pi * phys.hbar))
-
-    boltz = Boltz(eng[:mid])
-    boltz_p = Boltz(lya_eng - eng[:mid])
+    # Photon phase space density (E >> kB*T approximation), added to the 
+    # phase space density of DM at E and at the complementary 
+    # energy lya_eng - E.
+    occ   = f_nu[:eng_low.size] + np.exp(-eng_low/Tcmb)
+    occ_p = f_nu[comp_indx] + np.exp(-(lya_eng - eng_low)/Tcmb)
 
     # The Numerical Integral
-    kappa_2s = np.sum(
-        diffs * rates * (f_nu[:mid] + boltz) * (f_nu_p + boltz_p)
-    )/phys.width_2s1s_H - Boltz(lya_eng)
+    kappa_2s = np.dot(
+        weights, occ * occ_p
+    )/phys.width_2s1s_H - np.exp(-lya_eng/Tcmb)
 
     return kappa_2s
 
@@ -0,0 +1,199 @@
+""" On-disk storage for the results of :func:`main.evolve`.
+
+"""
+
+import os
+
+import numpy as np
+
+import darkhistory.utilities as utils
+from darkhistory.spec.spectra import Spectra
+
+class ChunkedOutput:
+    """Stores the results of :func:`main.evolve` step by step in a directory.
+
+    Results are kept in memory until *chunk_size* steps have been received, and then written to a new ``.npz`` file, so that memory usage does not grow with the number of steps. Pass an instance as *output_sink* to :func:`main.evolve`.
+
+    Parameters
+    ----------
+    directory : str
+        Directory to store the chunks in. Created if it does not exist.
+    chunk_size : int, optional
+        Number of steps per chunk. Default is 100.
+
+    Attributes
+    ----------
+    n_steps : int
+        Number of steps received so far, including steps already on disk.
+
+    Notes
+    -----
+    Each chunk is named after the index of its first step, ``step_<index>.npz``. :func:`main.evolve` flushes the chunks whenever it writes a checkpoint, and calls :meth:`truncate` when it starts or resumes a run, so that the chunks on disk always match the run.
+
+    """
+
+    spec_keys = ['highengphot', 'lowengphot', 'lowengelec']
+
+    def __init__(self, directory, chunk_size=100):
+
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1.')
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory  = directory
+        self.chunk_size = chunk_size
+
+        self._buffer  = []
+        self.n_steps  = sum(
+            [n_chunk for start, n_chunk, file_name in self._chunks()]
+        )
+
+    def _chunks(self):
+        """Returns (first step, number of steps, file name) of each chunk, sorted by first step."""
+
+        chunks = []
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith('step_') and file_name.endswith('.npz'):
+                file_name = os.path.join(self.directory, file_name)
+                with np.load(file_name) as chunk:
+                    n_chunk = chunk['rs'].size
+                start = int(os.path.basename(file_name)[5:-4])
+                chunks.append((start, n_chunk, file_name))
+
+        return sorted(chunks)
+
+    def __call__(self, step_data):
+        """Receives the results of one step.
+
+        Parameters
+        ----------
+        step_data : dict
+            Results of the step, as passed by :func:`main.evolve`.
+
+        Returns
+        -------
+        None
+
+        """
+
+        self._buffer.append(step_data)
+        self.n_steps += 1
+
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Writes all steps held in memory to disk.
+
+        Returns
+        -------
+        None
+
+        """
+
+        if len(self._buffer) == 0:
+            return
+
+        start = self.n_steps - len(self._buffer)
+
+        chunk = {
+            'rs':     np.array([step['rs'] for step in self._buffer]),
+            'x':      np.array([step['x'] for step in self._buffer]),
+            'Tm':     np.array([step['Tm'] for step in self._buffer]),
+            'f_low':  np.array([step['f_low'] for step in self._buffer]),
+            'f_high': np.array([step['f_high'] for step in self._buffer])
+        }
+        for key in self.spec_keys:
+            specs = [step[key] for step in self._buffer]
+            chunk[key+'_eng']  = specs[0].eng
+            chunk[key+'_N']    = np.array([spec.N for spec in specs])
+            chunk[key+'_info'] = np.array([
+                [
+                    spec.rs, spec.in_eng,
+                    spec.underflow['N'], spec.underflow['eng']
+                ] for spec in specs
+            ])
+
+        # An interrupted write does not leave a corrupted chunk.
+        utils.atomic_savez(
+            os.path.join(self.directory, 'step_%08d.npz' % start), **chunk
+        )
+
+        self._buffer = []
+
+    def truncate(self, n_steps):
+        """Discards all steps after the first *n_steps*.
+
+        Parameters
+        ----------
+        n_steps : int
+            Number of steps to keep.
+
+        Returns
+        -------
+        None
+
+        """
+
+        self.flush()
+
+        for start, n_chunk, file_name in self._chunks():
+            if start >= n_steps:
+                os.remove(file_name)
+            elif start + n_chunk > n_steps:
+                with np.load(file_name) as chunk:
+                    chunk = {
+                        key: (
+                            val if key.endswith('_eng')
+                            else val[:n_steps - start]
+                        ) for key, val in chunk.items()
+                    }
+                utils.atomic_savez(file_name, **chunk)
+
+        self.n_steps = min(self.n_steps, n_steps)
+
+    def load(self):
+        """Loads all stored steps.
+
+        Returns
+        -------
+        dict
+            The results in the same format as returned by :func:`main.evolve`.
+
+        """
+
+        self.flush()
+
+        chunks = []
+        for start, n_chunk, file_name in self._chunks():
+            with np.load(file_name) as chunk:
+                chunks.append({key: val for key, val in chunk.items()})
+
+        if len(chunks) == 0:
+            raise ValueError('no steps have been stored.')
+
+        def stack(key):
+            return np.concatenate([chunk[key] for chunk in chunks])
+
+        data = {'rs': stack('rs'), 'x': stack('x'), 'Tm': stack('Tm')}
+
+        for key in self.spec_keys:
+            info = stack(key+'_info')
+            data[key] = Spectra(
+                stack(key+'_N'), eng=chunks[0][key+'_eng'],
+                in_eng=info[:,1], rs=info[:,0], spec_type='N'
+            )
+            data[key]._N_underflow   = info[:,2]
+            data[key]._eng_underflow = info[:,3]
+
+        f_labels = ['H ion', 'He ion', 'exc', 'heat', 'cont']
+        data['f'] = {
+            level: {
+                label: f_vals[:,i] for i,label in enumerate(f_labels)
+            } for level, f_vals in zip(
+                ['low', 'high'], [stack('f_low'), stack('f_high')]
+            )
+        }
+
+        return data
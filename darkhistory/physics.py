@@ -591,6 +591,10 @@ def peebles_C(xHII, rs):
 
     return rate_exc/(rate_exc + rate_ion)
 
+# Hydrogen photoionization cross sections at the energies of the HeI 21p and
+# 23p states, used by C_He. Computed on first use.
+_sigma_H_photo_ion_He = {}
+
 def C_He(xHII, xHeII, rs, species):
     """Helium C coefficients. 
 
@@ -598,9 +602,9 @@ def C_He(xHII, xHeII, rs, species):
 
     Parameters
     ----------
-    xHII : float
+    xHII : float or ndarray
         The HI ionization fraction nHII/nH.
-    xHeII : float
+    xHeII : float or ndarray
         The HeI ionization fraction nHeII/nH.
     rs : float
         The redshift in 1+z.
@@ -609,7 +613,7 @@ def C_He(xHII, xHeII, rs, species):
 
     Returns
     -------
-    float
+    float or ndarray
         The C coefficient.
     """
 
@@ -635,19 +639,25 @@ def C_He(xHII, xHeII, rs, species):
         a = 0.36
         b = 0.86
 
-        sigma_H_photo_ion = photo_ion_xsec(He_exc_eng['21p'], 'HI')
+        if '21p' not in _sigma_H_photo_ion_He:
+            _sigma_H_photo_ion_He['21p'] = photo_ion_xsec(
+                He_exc_eng['21p'], 'HI'
+            )
+        sigma_H_photo_ion = _sigma_H_photo_ion_He['21p']
         Delta_nu = (c/He_exc_lambda['21p'])*np.sqrt(2 * T / mHe)
 
         gamma_numer = 3*A_He_21p*(chi - xHeII)*He_exc_lambda['21p']**2
         gamma_denom = 8*np.pi**(3/2)*sigma_H_photo_ion*Delta_nu*(1 - xHII)
 
-        if xHII >= 1:
+        # For xHII >= 1, gamma is infinite and p_H vanishes.
+        fully_ion = np.real(xHII) >= 1
+        if np.any(fully_ion):
             # Avoid dividing by zero.
-            gamma = np.inf
+            gamma = gamma_numer/np.where(fully_ion, 1., gamma_denom)
+            p_H = np.where(fully_ion, 0., 1/(1 + a*gamma**b))
         else:
             gamma = gamma_numer/gamma_denom
-
-        p_H = 1/(1 + a*gamma**b)
+            p_H = 1/(1 + a*gamma**b)
 
         # rate for excitation to 21p
         K = (1/3)/(A_He_21p * (p_He + p_H) * (nH*rs**3) * (chi - xHeII))
@@ -680,26 +690,34 @@ def C_He(xHII, xHeII, rs, species):
         a = 0.66
         b = 0.9
 
-        sigma_H_photo_ion = photo_ion_xsec(He_exc_eng['23p'], 'HI')
+        if '23p' not in _sigma_H_photo_ion_He:
+            _sigma_H_photo_ion_He['23p'] = photo_ion_xsec(
+                He_exc_eng['23p'], 'HI'
+            )
+        sigma_H_photo_ion = _sigma_H_photo_ion_He['23p']
         Delta_nu = (c/He_exc_lambda['23p'])*np.sqrt(2 * T / mHe)
 
         gamma_numer = 3*A_He_23P1*(chi - xHeII)*He_exc_lambda['23p']**2
         gamma_denom = 8*np.pi**(3/2)*sigma_H_photo_ion*Delta_nu*(1 - xHII)
 
-        if xHII >= 1:
-            # Avoid dividing by zero. 
-            gamma = np.inf
+        # For xHII >= 1, gamma is infinite and p_H vanishes.
+        fully_ion = np.real(xHII) >= 1
+        if np.any(fully_ion):
+            # Avoid dividing by zero.
+            gamma = gamma_numer/np.where(fully_ion, 1., gamma_denom)
+            p_H = np.where(fully_ion, 0., 1/(1 + a*gamma**b))
         else:
             gamma = gamma_numer/gamma_denom
+            p_H = 1/(1 + a*gamma**b)
 
-        p_H = 1/(1 + a*gamma**b)
+        beta_23s = beta_ion(T, 'HeI_23s')
 
-        if beta_ion(TCMB(rs), 'HeI_23s') == 0.:
+        if beta_23s == 0.:
             return 1.
         else:
             # Numerator agrees with astro-ph/0703438, but not RECFAST.
             C_He_triplet = A_He_23P1*(p_He + p_H)*np.exp(-E_ps/T)
-            C_He_triplet /= beta_ion(TCMB(rs), 'HeI_23s') + C_He_triplet
+            C_He_triplet /= beta_23s + C_He_triplet
 
         return C_He_triplet
 
@@ -1340,6 +1358,37 @@ def f_std(mDM, rs, inj_particle=None, inj_type=None, struct=False, channel=None)
             f_data_baseline((np.log10(Einj), np.log(rs)))[:,ind]
     )
 
+def get_dLam2s_dnu():
+    """Hydrogen 2s to 1s two-photon decay rate per nu as a function of nu (unitless).
+
+    nu is the frequency of the more energetic photon.
+    To find the total decay rate (8.22 s^-1), integrate from 5.1eV/h to 10.2eV/h
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    Lam : function
+        Decay rate per nu.
+    """
+    coeff = 9 * alpha**6 * rydberg /(
+        2**10 * 2 * np.pi * hbar
+    )
+
+    # coeff * psi(y) * dy = probability of emitting a photon in the window nu_alpha * [y, y+dy)
+    # interpolating points come from Spitzer and Greenstein, 1951
+    y = np.arange(0, 1.05, .05)
+    psi = np.array([0, 1.725, 2.783, 3.481, 3.961, 4.306, 4.546, 4.711, 4.824, 4.889, 4.907,
+                   4.889, 4.824, 4.711, 4.546, 4.306, 3.961, 3.481, 2.783, 1.725, 0])
+
+    # evaluation outside of interpolation window yields 0.
+    f = interp1d(y, psi, kind='cubic', fill_value=(0,0))
+    def dLam2s_dnu(nu):
+        return coeff * f(nu/lya_freq) * width_2s1s_H/8.26548398114 / lya_freq
+
+    return dLam2s_dnu
+
 # Unused for now.
 
 
@@ -1360,39 +1409,6 @@ def f_std(mDM, rs, inj_particle=None, inj_type=None, struct=False, channel=None)
 
 #     return nH * rs ** 3 * xsec * c / (hubble(rs) * lya_omega)
 
-# def get_dLam2s_dnu():
-#     """Hydrogen 2s to 1s two-photon decay rate per nu as a function of nu (unitless).
-
-#     nu is the frequency of the more energetic photon.
-#     To find the total decay rate (8.22 s^-1), integrate from 5.1eV/h to 10.2eV/h
-
-#     Parameters
-#     ----------
-
-#     Returns
-#     -------
-#     Lam : ndarray
-#         Decay rate per nu.
-#     """
-#     coeff = 9 * alpha**6 * rydberg /(
-#         2**10 * 2 * np.pi * hbar
-#     )
-#     #print(coeff)
-
-#     # coeff * psi(y) * dy = probability of emitting a photon in the window nu_alpha * [y, y+dy)
-#     # interpolating points come from Spitzer and Greenstein, 1951
-#     y = np.arange(0, 1.05, .05)
-#     psi = np.array([0, 1.725, 2.783, 3.481, 3.961, 4.306, 4.546, 4.711, 4.824, 4.889, 4.907,
-#                    4.889, 4.824, 4.711, 4.546, 4.306, 3.961, 3.481, 2.783, 1.725, 0])
-
-#     # evaluation outside of interpolation window yields 0.
-#     f = interp1d(y, psi, kind='cubic', fill_value=(0,0))
-#     def dLam2s_dnu(nu):
-#         return coeff * f(nu/lya_freq) * width_2s1s_H/8.26548398114 / lya_freq
-
-#     return dLam2s_dnu
-
-
 # # CMB
 
 
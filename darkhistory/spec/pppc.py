@@ -2,17 +2,42 @@
 
 """
 
+import os
 import sys
+import hashlib
 import numpy as np
 import json
+from collections import OrderedDict
 
 # from config import data_path
 from config import load_data
 
 import darkhistory.physics as phys
+import darkhistory.utilities as utils
 from darkhistory.spec.spectrum import Spectrum
+from darkhistory.spec.spectra import Spectra
+from darkhistory.spec.spectools import Abscissa
+from darkhistory.spec.spectools import RebinOperator
 from darkhistory.spec.spectools import rebin_N_arr
 
+# Maximum number of spectra kept in memory by get_pppc_spec.
+spec_cache_size = 256
+
+# Directory to also store the spectra computed by get_pppc_spec in, so that
+# they are kept between sessions. Not used if None.
+cache_dir = None
+
+# Least-recently-used cache of spectra, keyed by the arguments of
+# get_pppc_spec.
+_spec_cache = OrderedDict()
+
+# Number of Gauss-Legendre nodes in each bin for method='integrate'.
+_n_quad = 8
+
+# Maximum number of points at which get_pppc_specs evaluates the 
+# interpolator at once, which sets its peak memory use.
+_batch_size = 2**20
+
 
 # Mass threshold for mDM to annihilate into the primaries.
 mass_threshold = {
@@ -33,7 +58,7 @@ mass_threshold = {
     'VV_to_4tau' : 2*phys.mass['tau']
 }
 
-def get_pppc_spec(mDM, eng, pri, sec, decay=False):
+def get_pppc_spec(mDM, eng, pri, sec, decay=False, method='rebin'):
 
     """ Returns the PPPC4DMID spectrum. 
 
@@ -61,11 +86,19 @@ def get_pppc_spec(mDM, eng, pri, sec, decay=False):
         The secondary spectrum to obtain. 
     decay : bool, optional
         If ``True``, returns the result for decays.
+    method : {'rebin', 'integrate'}, optional
+        How the spectrum is binned into *eng*. Default is 'rebin'. See Notes.
 
     Returns
     -------
     Spectrum
         Output :class:`.Spectrum` object, ``spec_type == 'dNdE'``.
+
+    Notes
+    -----
+    With *method* = 'rebin', the interpolated spectrum is evaluated on a fine grid of at least 50,000 points and then rebinned into *eng* with :meth:`.Spectrum.rebin`. With *method* = 'integrate', the interpolated spectrum is integrated over each bin of *eng* by Gauss-Legendre quadrature instead, which is much faster and conserves the number of particles, but conserves energy only up to the size of the bins. 
+
+    Spectra other than ``elec_delta`` and ``phot_delta`` are cached in memory, with up to *spec_cache_size* spectra. If *cache_dir* is set, they are also stored in that directory and reused in later sessions. A new :class:`.Spectrum` is returned every time, so it can be modified freely. 
     
     """
 
@@ -131,42 +164,370 @@ def get_pppc_spec(mDM, eng, pri, sec, decay=False):
         else:
             raise ValueError('invalid sec.')
     
-    log10x = np.log10(eng/_mDM)
+    # Get the interpolator. 
+    dlNdlxIEW_interp = load_data('pppc')
 
-    # Refine the binning so that the spectrum is accurate. 
-    # Do this by checking that in the relevant range, there are at
-    # least 50,000 bins. If not, double (unless an absurd number
-    # of bins already). 
+    if method == 'rebin':
+        get_spec = _get_spec_rebin
+    elif method == 'integrate':
+        get_spec = _get_spec_integrate
+    else:
+        raise ValueError('invalid method.')
 
-    if (
-        log10x[(log10x < 1) & (log10x > 1e-9)].size > 0
-        and log10x.size < 500000
-    ):
-        while log10x[(log10x < 1) & (log10x > 1e-9)].size < 50000:
-            log10x = np.interp(
-                np.arange(0, log10x.size-0.5, 0.5), 
-                np.arange(log10x.size), 
-                log10x
+    eng = np.asarray(eng)
+    eng_hash = hashlib.sha1(
+        (eng.dtype.str).encode() + eng.tobytes()
+    ).hexdigest()
+    cache_key = (
+        id(dlNdlxIEW_interp), float(mDM), pri, sec, bool(decay), method,
+        eng_hash
+    )
+
+    if cache_key in _spec_cache:
+        _spec_cache.move_to_end(cache_key)
+        spec_vals = _spec_cache[cache_key]
+    else:
+        if cache_dir is not None:
+            file_name = os.path.join(cache_dir, '%s_%s_%s_%s_%.17g_%s.npz' % (
+                pri, sec, 'decay' if decay else 'swave', method, mDM, 
+                eng_hash
+            ))
+        if cache_dir is not None and os.path.isfile(file_name):
+            with np.load(file_name) as cache_file:
+                spec_vals = cache_file['spec_vals']
+        else:
+            spec_vals = get_spec(
+                _mDM, eng, dlNdlxIEW_interp[sec][pri]
             )
-    # Get the interpolator. 
-    dlNdlxIEW_interp = load_data('pppc')
+            if cache_dir is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                # An interrupted write does not leave a corrupted file.
+                utils.atomic_savez(file_name, spec_vals=spec_vals)
 
-    # Get the spectrum from the interpolator.
-    dN_dlog10x = 10**dlNdlxIEW_interp[sec][pri].get_val(_mDM/1e9, log10x)
+        if spec_cache_size > 0:
+            _spec_cache[cache_key] = spec_vals
+            while len(_spec_cache) > spec_cache_size:
+                _spec_cache.popitem(last=False)
+
+    spec = Spectrum(
+        np.array(eng, dtype=float), np.array(spec_vals[:-2]), 
+        spec_type='dNdE'
+    )
+    spec.underflow['N']   = spec_vals[-2]
+    spec.underflow['eng'] = spec_vals[-1]
 
-    # Recall that dN/dE = dN/dlog10x * dlog10x/dE
-    x = 10**log10x
-    spec = Spectrum(x*_mDM, dN_dlog10x/(x*_mDM*np.log(10)), spec_type='dNdE')
-    
-    # Rebin down to the original binning.
-
-    # The highest bin of spec.eng should be the same as eng[-1], based on
-    # the interpolation strategy above. However, sometimes a floating point
-    # error is picked up. We'll get rid of this so that rebin doesn't
-    # complain.
-    spec.eng[-1] = eng[-1]
-    spec.rebin(eng)
-        
     return spec
 
+def get_pppc_specs(mDM, eng, pri, sec, decay=False, method='rebin'):
+
+    """ Returns the PPPC4DMID spectra for many dark matter masses.
+
+    Parameters
+    ----------
+    mDM : ndarray
+        The masses of the annihilating/decaying dark matter particle (in eV). 
+    eng : ndarray
+        The energy abscissa for the output spectra (in eV). 
+    pri : string
+        One of the available channels, see :func:`get_pppc_spec`. 
+    sec : {'elec', 'phot'}
+        The secondary spectrum to obtain. 
+    decay : bool, optional
+        If ``True``, returns the result for decays.
+    method : {'rebin', 'integrate'}, optional
+        How the spectra are binned into *eng*. Default is 'rebin'. See :func:`get_pppc_spec`.
+
+    Returns
+    -------
+    Spectra
+        Output :class:`.Spectra` object with one spectrum for each mass, ``spec_type == 'dNdE'`` and *in_eng* set to *mDM*. 
+
+    Notes
+    -----
+    The interpolator over the mass is evaluated once for all masses, and the spectra of all masses are then interpolated and rebinned together. With *method* = 'rebin', masses that need the same refinement of *eng* share one fine grid, so that the results agree with :func:`get_pppc_spec` up to rounding. The spectra are not cached. 
+
+    """
+
+    mDM = np.atleast_1d(np.asarray(mDM, dtype=float))
+    eng = np.asarray(eng)
+
+    if decay:
+        # Primary energies is for 1 GeV decay = 0.5 GeV annihilation.
+        _mDM = mDM/2.
+    else:
+        _mDM = mDM
+
+    if np.any(_mDM < mass_threshold[pri]):
+        raise ValueError('mDM is below the threshold to produce pri particles.')
+
+    if pri == 'elec_delta' or pri == 'phot_delta':
+        # Nothing to interpolate.
+        spec_list = []
+        for m in mDM:
+            spec = get_pppc_spec(m, eng, pri, sec, decay=decay)
+            spec.in_eng = m
+            spec_list.append(spec)
+        return Spectra(spec_list)
+
+    if method == 'rebin':
+        get_specs = _get_specs_rebin
+    elif method == 'integrate':
+        get_specs = _get_specs_integrate
+    else:
+        raise ValueError('invalid method.')
+
+    spec_vals = get_specs(_mDM, eng, load_data('pppc')[sec][pri])
+
+    specs = Spectra(
+        spec_vals[:, :-2], eng=np.array(eng, dtype=float), in_eng=mDM, 
+        spec_type='dNdE'
+    )
+    specs._N_underflow   = spec_vals[:, -2]
+    specs._eng_underflow = spec_vals[:, -1]
+
+    return specs
+
+def _get_spec_rebin(_mDM, eng, interp):
+    """Evaluates the spectrum on a fine grid and rebins it into *eng*.
+
+    Parameters
+    ----------
+    _mDM : float
+        Mass of the annihilating dark matter particle (in eV), or half the mass for decays.
+    eng : ndarray
+        The energy abscissa for the output spectrum (in eV). 
+    interp : PchipInterpolator2D
+        The interpolator for the channel.
+
+    Returns
+    -------
+    ndarray
+        dN/dE in each bin, followed by the underflow number and energy.
+
+    See Also
+    --------
+    :func:`_get_specs_rebin`
+
+    """
+
+    return _get_specs_rebin(np.array([_mDM]), eng, interp)[0]
+
+def _get_spec_integrate(_mDM, eng, interp):
+    """Integrates the spectrum over each bin of *eng*.
+
+    Parameters
+    ----------
+    _mDM : float
+        Mass of the annihilating dark matter particle (in eV), or half the mass for decays.
+    eng : ndarray
+        The energy abscissa for the output spectrum (in eV). 
+    interp : PchipInterpolator2D
+        The interpolator for the channel.
+
+    Returns
+    -------
+    ndarray
+        dN/dE in each bin, followed by the underflow number and energy, which are zero.
+
+    """
+
+    abscissa = Abscissa.get(eng)
+    log10x_bound = np.log10(abscissa.bin_bound/_mDM)
+
+    # Gauss-Legendre nodes in log10x in each bin. 
+    nodes, weights = np.polynomial.legendre.leggauss(_n_quad)
+    half_width = np.diff(log10x_bound)/2
+    mid = (log10x_bound[:-1] + log10x_bound[1:])/2
+    log10x = mid[:, np.newaxis] + half_width[:, np.newaxis]*nodes
+
+    dN_dlog10x = 10**interp.get_val(
+        _mDM/1e9, log10x.ravel()
+    ).reshape(log10x.shape)
+
+    N = half_width * np.dot(dN_dlog10x, weights)
+
+    return np.concatenate([
+        N/(abscissa.eng*abscissa.log_bin_width), [0., 0.]
+    ])
+
+
+def _refine(log10x):
+    """Doubles the number of points of an abscissa.
+
+    Parameters
+    ----------
+    log10x : ndarray
+        The abscissa.
+
+    Returns
+    -------
+    ndarray
+        The abscissa with the midpoint of each pair of neighbouring points inserted.
+
+    """
+
+    refined = np.empty(2*log10x.size - 1)
+    refined[::2] = log10x
+    # Same as linear interpolation at the midpoints with np.interp.
+    refined[1::2] = np.diff(log10x)*0.5 + log10x[:-1]
+
+    return refined
+
+def _get_specs_rebin(_mDM, eng, interp):
+    """Evaluates the spectra on fine grids and rebins them into *eng*.
+
+    Parameters
+    ----------
+    _mDM : ndarray
+        Masses of the annihilating dark matter particle (in eV), or half the masses for decays.
+    eng : ndarray
+        The energy abscissa for the output spectra (in eV). 
+    interp : PchipInterpolator2D
+        The interpolator for the channel.
+
+    Returns
+    -------
+    ndarray
+        dN/dE in each bin, followed by the underflow number and energy, with one row for each mass.
+
+    Notes
+    -----
+    For each mass, *eng* is refined by repeatedly inserting the midpoint of each pair of neighbouring points in log10(eng), until there are at least 50,000 points between the mass and 10 times the mass, unless there are no points in that range to begin with or *eng* already has more than 500,000 points. The spectrum is evaluated on this fine grid, and rebinned into *eng* with :class:`.RebinOperator`. 
+
+    Masses with the same number of refinements share the fine grid, and are evaluated and rebinned together. Since rebinning treats each point of the fine grid separately, long fine grids are processed in blocks of *_batch_size* points, which bounds the memory used. 
+
+    """
+
+    log10_mDM = np.log10(_mDM)
+
+    # Successive refinements of log10(eng), shared by all masses. 
+    log10eng_list = [np.log10(eng)]
+
+    def n_in_range(log10eng, ind):
+        # Number of points with 1e-9 < log10x < 1 for the masses in ind.
+        return (
+            np.searchsorted(log10eng, log10_mDM[ind] + 1, side='left')
+            - np.searchsorted(log10eng, log10_mDM[ind] + 1e-9, side='right')
+        )
+
+    # Find the number of refinements needed for each mass. 
+    all_ind = np.arange(_mDM.size)
+    n_points = n_in_range(log10eng_list[0], all_ind)
+    level = np.zeros(_mDM.size, dtype=int)
+    refine = (n_points > 0) & (eng.size < 500000) & (n_points < 50000)
+    while np.any(refine):
+        log10eng_list.append(_refine(log10eng_list[-1]))
+        # Only keep the fine grids that are used. 
+        if not np.any(level[~refine] == len(log10eng_list) - 2):
+            log10eng_list[-2] = None
+        level[refine] += 1
+        n_points[refine] = n_in_range(log10eng_list[-1], all_ind[refine])
+        refine &= n_points < 50000
+
+    out = np.zeros((_mDM.size, eng.size + 2))
+
+    for i in np.unique(level):
+
+        log10eng = log10eng_list[i]
+        n_fine = log10eng.size
+
+        ind = all_ind[level == i]
+        n_batch = max(1, _batch_size // n_fine)
+        block_size = min(n_fine, _batch_size)
+
+        for start in np.arange(0, n_fine, block_size):
+
+            stop = min(start + block_size, n_fine)
+
+            # Include the neighbouring points, so that the log bin widths
+            # are those of the full fine grid. 
+            low  = max(start - 1, 0)
+            upp  = min(stop + 1, n_fine)
+            fine_eng = 10**log10eng[low:upp]
+            if upp == n_fine:
+                # Avoid a floating point error in the highest bin, so 
+                # that rebinning does not complain.
+                fine_eng[-1] = eng[-1]
+            fine_log_bin_width = (
+                Abscissa(fine_eng).log_bin_width[start-low:stop-low]
+            )
+            fine_eng = fine_eng[start-low:stop-low]
+
+            # Not obtained from Abscissa.get, since fine grids are 
+            # large and rarely reused. 
+            rebin_op = RebinOperator(fine_eng, eng)
+
+            for chunk in np.array_split(ind, -(-ind.size//n_batch)):
+
+                dN_dlog10x = 10**interp.get_vals(
+                    _mDM[chunk]/1e9, 
+                    log10eng[start:stop] - log10_mDM[chunk, np.newaxis]
+                )
+
+                # Recall that dN/dE = dN/dlog10x * dlog10x/dE
+                dNdE = dN_dlog10x/(fine_eng*np.log(10))
+
+                new_N, N_underflow, eng_underflow = rebin_op.apply(
+                    dNdE * fine_eng * fine_log_bin_width
+                )
+
+                out[chunk, :-2] += new_N
+                out[chunk, -2]  += N_underflow
+                out[chunk, -1]  += eng_underflow
+
+    # E_dlogE only depends on eng, and is the same for all blocks.
+    out[:, :-2] /= rebin_op.E_dlogE
+
+    return out
+
+def _get_specs_integrate(_mDM, eng, interp):
+    """Integrates the spectra over each bin of *eng*.
+
+    Parameters
+    ----------
+    _mDM : ndarray
+        Masses of the annihilating dark matter particle (in eV), or half the masses for decays.
+    eng : ndarray
+        The energy abscissa for the output spectra (in eV). 
+    interp : PchipInterpolator2D
+        The interpolator for the channel.
+
+    Returns
+    -------
+    ndarray
+        dN/dE in each bin, followed by the underflow number and energy, which are zero, with one row for each mass.
+
+    See Also
+    --------
+    :func:`_get_spec_integrate`
+
+    """
+
+    abscissa = Abscissa.get(eng)
+    log10_bound = np.log10(abscissa.bin_bound)
+
+    # Gauss-Legendre nodes in log10(eng) in each bin, the same for all
+    # masses. 
+    nodes, weights = np.polynomial.legendre.leggauss(_n_quad)
+    half_width = np.diff(log10_bound)/2
+    mid = (log10_bound[:-1] + log10_bound[1:])/2
+    log10eng = (mid[:, np.newaxis] + half_width[:, np.newaxis]*nodes).ravel()
+
+    log10_mDM = np.log10(_mDM)
+
+    out = np.zeros((_mDM.size, eng.size + 2))
+
+    n_batch = max(1, _batch_size // log10eng.size)
+    for chunk in np.array_split(
+        np.arange(_mDM.size), -(-_mDM.size//n_batch)
+    ):
+
+        dN_dlog10x = 10**interp.get_vals(
+            _mDM[chunk]/1e9, log10eng - log10_mDM[chunk, np.newaxis]
+        ).reshape((chunk.size, eng.size, _n_quad))
+
+        N = half_width * np.dot(dN_dlog10x, weights)
+
+        out[chunk, :-2] = N/(abscissa.eng*abscissa.log_bin_width)
 
+    return out
@@ -7,12 +7,285 @@ from darkhistory import utilities as utils
 from darkhistory.numpy_groupies import aggregate as agg
 import matplotlib.pyplot as plt
 import warnings
+from collections import OrderedDict
 
 from scipy import integrate
+from scipy import sparse
 from scipy.interpolate import interp1d
 from scipy.interpolate import InterpolatedUnivariateSpline
 
 
+class Abscissa:
+    """An energy abscissa, together with quantities that only depend on it.
+
+    Instances should be obtained with :meth:`Abscissa.get`, which returns the same instance for abscissae with the same values, so that the quantities are computed once and shared by every spectrum on the same abscissa.
+
+    Parameters
+    ----------
+    eng : ndarray
+        The abscissa. A read-only copy is stored.
+
+    Attributes
+    ----------
+    eng : ndarray
+        The abscissa, read-only.
+
+    Notes
+    -----
+    All arrays returned are read-only, since they are shared.
+
+    """
+
+    # Maximum number of abscissae kept by get, and of rebinning 
+    # operators kept by each abscissa.
+    max_instances = 128
+    max_rebin_ops = 16
+
+    # Least-recently-used instances, keyed by the abscissa. 
+    _instances = OrderedDict()
+
+    def __init__(self, eng):
+
+        self.eng = np.array(eng)
+        self.eng.setflags(write=False)
+
+        self._bin_bound     = None
+        self._log_bin_width = None
+        self._rebin_ops     = OrderedDict()
+
+    @staticmethod
+    def _key(eng):
+        return (eng.dtype.str, eng.tobytes())
+
+    @classmethod
+    def get(cls, eng):
+        """Returns the shared instance for an abscissa.
+
+        Parameters
+        ----------
+        eng : ndarray
+            The abscissa.
+
+        Returns
+        -------
+        Abscissa
+        """
+
+        eng = np.asarray(eng)
+        key = cls._key(eng)
+
+        if key in cls._instances:
+            cls._instances.move_to_end(key)
+            return cls._instances[key]
+
+        abscissa = cls(eng)
+        cls._instances[key] = abscissa
+        while len(cls._instances) > cls.max_instances:
+            cls._instances.popitem(last=False)
+
+        return abscissa
+
+    @property
+    def bin_bound(self):
+        """ndarray : The bin boundaries. See :func:`get_bin_bound`."""
+
+        if self._bin_bound is None:
+
+            eng = self.eng
+
+            if eng.size <= 1:
+                raise TypeError("There needs to be more than 1 bin to get a bin width.")
+
+            log_bin_width_low = np.log(eng[1]) - np.log(eng[0])
+            log_bin_width_upp = np.log(eng[-1]) - np.log(eng[-2])
+
+            bin_boundary = np.zeros(eng.size + 1)
+
+            bin_boundary[1:-1] = np.sqrt(eng[:-1] * eng[1:])
+
+            low_lim = np.exp(np.log(eng[0]) - log_bin_width_low / 2)
+            upp_lim = np.exp(np.log(eng[-1]) + log_bin_width_upp / 2)
+            bin_boundary[0] = low_lim
+            bin_boundary[-1] = upp_lim
+
+            bin_boundary.setflags(write=False)
+            self._bin_bound = bin_boundary
+
+        return self._bin_bound
+
+    @property
+    def log_bin_width(self):
+        """ndarray : The log bin widths. See :func:`get_log_bin_width`."""
+
+        if self._log_bin_width is None:
+            log_bin_width = np.diff(np.log(self.bin_bound))
+            log_bin_width.setflags(write=False)
+            self._log_bin_width = log_bin_width
+
+        return self._log_bin_width
+
+    def rebin_operator(self, out_eng):
+        """Returns the operator rebinning from this abscissa into another.
+
+        Parameters
+        ----------
+        out_eng : ndarray
+            The abscissa to rebin into.
+
+        Returns
+        -------
+        RebinOperator
+            The operator, created once for each *out_eng*. 
+
+        """
+
+        out_eng = np.asarray(out_eng)
+        key = self._key(out_eng)
+
+        if key in self._rebin_ops:
+            self._rebin_ops.move_to_end(key)
+            return self._rebin_ops[key]
+
+        rebin_op = RebinOperator(self.eng, out_eng)
+
+        self._rebin_ops[key] = rebin_op
+        while len(self._rebin_ops) > self.max_rebin_ops:
+            self._rebin_ops.popitem(last=False)
+
+        return rebin_op
+
+class RebinOperator:
+    """ Number and energy conserving rebinning between two abscissae.
+
+    Rebinning is linear in the number of particles in each bin, and is stored as a sparse matrix together with the fraction of each bin that goes into the underflow. Instances should be obtained with :meth:`Abscissa.rebin_operator`, so that they are only created once for each pair of abscissae.
+
+    Parameters
+    ----------
+    in_eng : ndarray
+        The abscissa to rebin from.
+    out_eng : ndarray
+        The abscissa to rebin into.
+
+    Attributes
+    ----------
+    in_eng : ndarray
+        The abscissa to rebin from.
+    out_eng : ndarray
+        The abscissa to rebin into, as floats.
+    mat : scipy.sparse.csr_matrix
+        Matrix of shape (out_eng.size, in_eng.size) taking the number of particles in each bin of *in_eng* to *out_eng*.
+    N_underflow : ndarray
+        Fraction of the particles in each bin of *in_eng* assigned to the underflow.
+    eng_underflow : ndarray
+        Energy assigned to the underflow per particle in each bin of *in_eng*.
+    E_dlogE : ndarray
+        Energy times log bin width of *out_eng*, converting number of particles into dN/dE.
+    overflow : bool
+        True if some bins of *in_eng* lie above *out_eng*. Particles in these bins are discarded.
+
+    Notes
+    -----
+    The particles in a bin of energy :math:`E` are assigned to the two adjacent bins of *out_eng*, as described in :meth:`.Spectrum.rebin`. Particles in bins below the lowest bin of *out_eng* are partly assigned to that bin, and the rest of the particles and their energy are assigned to the underflow. 
+
+    """
+
+    def __init__(self, in_eng, out_eng):
+
+        self.in_eng = in_eng
+
+        # Forces out_eng to be float, avoids strange problems with 
+        # np.insert below if out_eng is of type int. 
+        out_eng = np.asarray(out_eng).astype(float)
+        self.out_eng = out_eng
+
+        # Add an additional bin at the lower end of out_eng so that 
+        # underflow can be treated easily.
+        first_bin_eng = np.exp(
+            np.log(out_eng[0]) - (np.log(out_eng[1]) - np.log(out_eng[0]))
+        )
+        new_eng = np.insert(out_eng, 0, first_bin_eng)
+
+        # Find the relative bin indices for in_eng wrt new_eng. The first
+        # bin in new_eng has bin index -1. Underflow has index -2, 
+        # overflow corresponds to new_eng.size.
+        bin_ind = np.interp(
+            in_eng, new_eng, np.arange(new_eng.size)-1,
+            left = -2, right = new_eng.size
+        )
+
+        # Locate where bin_ind is below 0, above self.length-1 and in
+        # between.
+        ind_low  = np.where(bin_ind < 0)[0]
+        ind_high = np.where(bin_ind == new_eng.size)[0]
+        ind_reg  = np.where(
+            (bin_ind >= 0) & (bin_ind <= new_eng.size - 1)
+        )[0]
+
+        self.overflow = ind_high.size > 0
+
+        # reg_bin_low is the array of the lower bins to be allocated the
+        # particles in the regular bins, similarly reg_bin_upp. This
+        # should also take care of the case where bin_ind is an integer.
+        reg_bin_low = np.floor(bin_ind[ind_reg]).astype(int)
+        reg_bin_upp = reg_bin_low + 1
+
+        # Takes care of the case where in_eng[-1] = out_eng[-1].
+        reg_bin_low[reg_bin_low == new_eng.size-2] = new_eng.size - 3
+        reg_bin_upp[reg_bin_upp == new_eng.size-1] = new_eng.size - 2
+
+        # Low bins: the part above the underflow goes into the lowest 
+        # bin of out_eng.
+        low_bin_low = np.floor(bin_ind[ind_low]).astype(int)
+        frac_above_underflow = bin_ind[ind_low] - low_bin_low
+
+        # Indices into new_eng, with the additional bin at index 0.
+        rows = np.concatenate([
+            reg_bin_low+1, reg_bin_upp+1, np.ones_like(ind_low)
+        ])
+        cols = np.concatenate([ind_reg, ind_reg, ind_low])
+        vals = np.concatenate([
+            reg_bin_upp - bin_ind[ind_reg], bin_ind[ind_reg] - reg_bin_low,
+            frac_above_underflow
+        ])
+
+        # Entries for the additional bin are dropped.
+        keep = rows > 0
+        self.mat = sparse.csr_matrix(
+            (vals[keep], (rows[keep]-1, cols[keep])), 
+            shape=(out_eng.size, in_eng.size)
+        )
+
+        self.N_underflow = np.zeros(in_eng.size)
+        self.N_underflow[ind_low] = 1. - frac_above_underflow
+
+        self.eng_underflow = np.zeros(in_eng.size)
+        self.eng_underflow[ind_low] = (
+            in_eng[ind_low] - frac_above_underflow * new_eng[1]
+        )
+
+        self.E_dlogE = (new_eng * get_log_bin_width(new_eng))[1:]
+
+    def apply(self, N_arr):
+        """Rebins the number of particles in each bin.
+
+        Parameters
+        ----------
+        N_arr : ndarray
+            Number of particles in each bin of *in_eng*, with shape (in_eng.size,) or (n_spec, in_eng.size).
+
+        Returns
+        -------
+        tuple of ndarray
+            The number of particles in each bin of *out_eng*, and the number and energy assigned to the underflow, for each spectrum. 
+
+        """
+
+        return (
+            self.mat.dot(N_arr.T).T,
+            np.dot(N_arr, self.N_underflow),
+            np.dot(N_arr, self.eng_underflow)
+        )
+
 def get_bin_bound(eng):
     """Returns the bin boundary of an abscissa.
 
@@ -26,35 +299,51 @@ def get_bin_bound(eng):
     Returns
     -------
     ndarray
-        The bin boundaries.
+        The bin boundaries, read-only.
+
+    Notes
+    -----
+    The result is computed once for each abscissa, see :class:`Abscissa`.
     """
-    if eng.size <= 1:
-        raise TypeError("There needs to be more than 1 bin to get a bin width.")
+    return Abscissa.get(eng).bin_bound
 
-    log_bin_width_low = np.log(eng[1]) - np.log(eng[0])
-    log_bin_width_upp = np.log(eng[-1]) - np.log(eng[-2])
+def get_log_bin_width(eng):
+    """Return the log bin width of the abscissa.
 
-    bin_boundary = np.zeros(eng.size + 1)
+    Returns
+    -------
+    ndarray
+        The log bin widths, read-only.
 
-    bin_boundary[1:-1] = np.sqrt(eng[:-1] * eng[1:])
+    Notes
+    -----
+    The result is computed once for each abscissa, see :class:`Abscissa`.
 
-    low_lim = np.exp(np.log(eng[0]) - log_bin_width_low / 2)
-    upp_lim = np.exp(np.log(eng[-1]) + log_bin_width_upp / 2)
-    bin_boundary[0] = low_lim
-    bin_boundary[-1] = upp_lim
+    """
+    return Abscissa.get(eng).log_bin_width
 
-    return bin_boundary
+def same_abscissa(eng1, eng2):
+    """Checks if two abscissae are the same.
 
-def get_log_bin_width(eng):
-    """Return the log bin width of the abscissa.
+    Parameters
+    ----------
+    eng1 : ndarray
+        The first abscissa.
+    eng2 : ndarray
+        The second abscissa.
 
     Returns
     -------
-    ndarray
+    bool
+        True if the abscissae have the same values. 
+
+    Notes
+    -----
+    Spectra on the same abscissa usually share the same array, so this is checked first before comparing values.
 
     """
-    bin_boundary = get_bin_bound(eng)
-    return np.diff(np.log(bin_boundary))
+
+    return eng1 is eng2 or np.array_equal(eng1, eng2)
 
 def get_bounds_between(eng, E1, E2=None, bound_type='inc'):
     """Returns the bin boundary of an abscissa between two energies.
@@ -170,89 +459,23 @@ def rebin_N_arr(
         raise TypeError("new abscissa must be ordered in increasing energy.")
     if out_eng[-1] < in_eng[-1]:
         raise OverflowError("the new abscissa lies below the old one: this function cannot handle overflow (yet?).")
-    # Get the bin indices that the current abscissa (self.eng) corresponds to in the new abscissa (new_eng). Can be any number between 0 and self.length-1. Bin indices are wrt the bin centers.
-
-    # Add an additional bin at the lower end of out_eng so that underflow can be treated easily.
-
-    first_bin_eng = np.exp(np.log(out_eng[0]) - (np.log(out_eng[1]) - np.log(out_eng[0])))
-    new_eng = np.insert(out_eng, 0, first_bin_eng)
-
-    # Find the relative bin indices for in_eng wrt new_eng. The first bin in new_eng has bin index -1.
-
-
-    bin_ind_interp = interp1d(
-        new_eng, np.arange(new_eng.size)-1,
-        bounds_error = False, fill_value = (-2, new_eng.size)
-    )
-
-    bin_ind = bin_ind_interp(in_eng)
 
-    # Locate where bin_ind is below 0, above self.length-1 and in between.
-    ind_low = np.where(bin_ind < 0)
-    ind_high = np.where(bin_ind == new_eng.size)
-    ind_reg = np.where( (bin_ind >= 0) & (bin_ind <= new_eng.size - 1) )
+    # Sparse rebinning operator, computed once for each pair of abscissae.
+    rebin_op = Abscissa.get(in_eng).rebin_operator(out_eng)
 
-    # if ind_high[0].size > 0:
-    #     raise OverflowError("the new abscissa lies below the old one: this function cannot handle overflow (yet?).")
-
-    # Get the total N and toteng in each bin
-    toteng_arr = N_arr*in_eng
-
-    N_arr_low = N_arr[ind_low]
-    N_arr_high = N_arr[ind_high]
-    N_arr_reg = N_arr[ind_reg]
-
-    toteng_arr_low = toteng_arr[ind_low]
+    new_N, N_underflow, eng_underflow = rebin_op.apply(N_arr)
 
     # Bin width of the new array. Use only the log bin width, so that dN/dE = N/(E d log E)
     if log_bin_width is None:
-        new_E_dlogE = new_eng * np.diff(np.log(get_bin_bound(new_eng)))
+        new_E_dlogE = rebin_op.E_dlogE
     else:
-        new_log_bin_width = np.insert(
-            log_bin_width, 0, log_bin_width[0]
-        )
-        new_E_dlogE = new_eng * new_log_bin_width
-
-    # Regular bins first, done in a completely vectorized fashion.
-
-    # reg_bin_low is the array of the lower bins to be allocated the particles in N_arr_reg, similarly reg_bin_upp. This should also take care of the fact that bin_ind is an integer.
-    reg_bin_low = np.floor(bin_ind[ind_reg]).astype(int)
-    reg_bin_upp = reg_bin_low + 1
-
-    # Takes care of the case where in_eng[-1] = out_eng[-1]
-    reg_bin_low[reg_bin_low == new_eng.size-2] = new_eng.size - 3
-    reg_bin_upp[reg_bin_upp == new_eng.size-1] = new_eng.size - 2
-
-    reg_N_low = (reg_bin_upp - bin_ind[ind_reg]) * N_arr_reg
-    reg_N_upp = (bin_ind[ind_reg] - reg_bin_low) * N_arr_reg
-
-    reg_dNdE_low = ((reg_bin_upp - bin_ind[ind_reg]) * N_arr_reg
-                   /new_E_dlogE[reg_bin_low+1])
-    reg_dNdE_upp = ((bin_ind[ind_reg] - reg_bin_low) * N_arr_reg
-                   /new_E_dlogE[reg_bin_upp+1])
-
-    # Low bins.
-    low_bin_low = np.floor(bin_ind[ind_low]).astype(int)
-
-    N_above_underflow = np.sum((bin_ind[ind_low] - low_bin_low)
-        * N_arr_low)
-    eng_above_underflow = N_above_underflow * new_eng[1]
+        new_E_dlogE = rebin_op.out_eng * log_bin_width
 
-    N_underflow = np.sum(N_arr_low) - N_above_underflow
-    eng_underflow = np.sum(toteng_arr_low) - eng_above_underflow
-    low_dNdE = N_above_underflow/new_E_dlogE[1]
-
-    new_dNdE = np.zeros(new_eng.size)
-    new_dNdE[1] += low_dNdE
-    # reg_dNdE_low = -1 refers to new_eng[0]
-    np.add.at(new_dNdE, reg_bin_low+1, reg_dNdE_low)
-    np.add.at(new_dNdE, reg_bin_upp+1, reg_dNdE_upp)
-    # new_dNdE[reg_bin_low+1] += reg_dNdE_low
-    # new_dNdE[reg_bin_upp+1] += reg_dNdE_upp
+    new_dNdE = new_N/new_E_dlogE
 
     # Generate the new Spectrum.
 
-    out_spec = Spectrum(new_eng[1:], new_dNdE[1:])
+    out_spec = Spectrum(np.array(rebin_op.out_eng), new_dNdE)
     if spec_type == 'N':
         out_spec.switch_spec_type()
     elif spec_type != 'dNdE':
@@ -527,11 +750,13 @@ class EnglossRebinData:
         Marks grid points that have some component assigned to underflow.
     in_eng_mask : ndarray
         in_eng index of every point on the grid.
+    rebin_mat : scipy.sparse.csr_matrix
+        Sparse matrix mapping the flattened (in_eng, engloss_arr) grid to the flattened (in_eng, final_eng) grid.
 
     Notes
     -----
     This class is used to store data for energy loss rebinning
-    that only depends on the abscissae specified. 
+    that only depends on the abscissae specified. Rebinning is linear in the grid values, so all of this is stored in *rebin_mat*, and :meth:`rebin` is a single sparse matrix product.
 
     """
 
@@ -615,62 +840,66 @@ class EnglossRebinData:
             np.ones_like(self.engloss_arr, dtype=int)
         )
 
-    def rebin(self, grid_vals):
-
-        # Flip grid_vals, since sec_spec_eng is flipped. 
-        N_arr = np.fliplr(grid_vals)
-
-        # Initialize arrays that will store the number of particles
-        # to assign to lower/upper bins.
+        # Build the rebinning matrix. Row in_eng_ind*final_eng.size + k 
+        # is bin k of final_eng for in_eng[in_eng_ind], and column 
+        # in_eng_ind*engloss_arr.size + j is engloss_arr[j], remembering 
+        # that bin_ind is flipped with respect to engloss_arr. 
+        engloss_ind = np.fliplr(np.outer(
+            np.ones_like(self.in_eng, dtype=int), 
+            np.arange(self.engloss_arr.size, dtype=int)
+        ))
+        cols = self.in_eng_mask*self.engloss_arr.size + engloss_ind
+        row_offset = self.in_eng_mask*self.final_eng.size
+
+        # Particles assigned to the lower and upper bins in the grid. 
+        # The extra first bin of new_eng has index -1, and is discarded.
+        ind_reg_low = self.ind_reg & (self.reg_bin_low >= 0)
+        # Particles partly assigned to the first bin, and partly to 
+        # underflow. 
+        ind_low = self.ind_low
+
+        rows = np.concatenate([
+            (row_offset + self.reg_bin_low)[ind_reg_low],
+            (row_offset + self.reg_bin_upp)[self.ind_reg],
+            row_offset[ind_low]
+        ])
+        data = np.concatenate([
+            (self.reg_bin_upp - self.bin_ind)[ind_reg_low],
+            (self.bin_ind - self.reg_bin_low)[self.ind_reg],
+            (self.bin_ind - self.low_bin_low)[ind_low]
+        ])
+        cols = np.concatenate([
+            cols[ind_reg_low], cols[self.ind_reg], cols[ind_low]
+        ])
+
+        # Duplicate entries are summed. 
+        self.rebin_mat = sparse.coo_matrix(
+            (data, (rows, cols)), shape=(
+                self.in_eng.size*self.final_eng.size, 
+                self.in_eng.size*self.engloss_arr.size
+            )
+        ).tocsr()
+        self.rebin_mat.eliminate_zeros()
 
-        reg_data_low = np.zeros_like(self.bin_ind)
-        reg_data_upp = np.zeros_like(self.bin_ind)
-
-        # Compute the assignments.
-        reg_data_low[self.ind_reg] = (
-            (self.reg_bin_upp[self.ind_reg] - self.bin_ind[self.ind_reg]) 
-            * N_arr[self.ind_reg]
-        )
-        reg_data_upp[self.ind_reg] = (
-            (self.bin_ind[self.ind_reg] - self.reg_bin_low[self.ind_reg]) 
-            * N_arr[self.ind_reg]
-        )
+    def rebin(self, grid_vals):
+        """ Rebins energy loss data into *final_eng*.
 
-        # Handle case where some gets assigned to underflow, some to the 
-        # first bin.
-        N_above_underflow = np.zeros_like(self.bin_ind)
+        Parameters
+        ----------
+        grid_vals : ndarray
+            The number of particles, indexed by (in_eng, engloss_arr).
 
-        N_above_underflow[self.ind_low] = (
-            (self.bin_ind[self.ind_low] - self.low_bin_low[self.ind_low]) 
-            * N_arr[self.ind_low]
-        )
+        Returns
+        -------
+        ndarray
+            The number of particles after rebinning, indexed by (in_eng, final_eng). Particles below the first bin of *final_eng* are discarded.
 
-        new_data = np.zeros((self.in_eng.size, self.new_eng.size))
-        new_data[:,1] += np.sum(N_above_underflow, axis=1)
-
-        # Get number of particles assigned into lower energy bin.
-        low_data = agg.aggregate(
-            np.array([
-                self.in_eng_mask[self.ind_reg], 
-                self.reg_bin_low[self.ind_reg]+1
-            ]),
-            reg_data_low[self.ind_reg],
-            size = new_data.shape, func='sum', fill_value = 0
-        )
+        """
 
-        upp_data = agg.aggregate(
-            np.array([
-                self.in_eng_mask[self.ind_reg], 
-                self.reg_bin_upp[self.ind_reg]+1
-            ]),
-            reg_data_upp[self.ind_reg],
-            size = new_data.shape, func='sum', fill_value = 0
+        return (self.rebin_mat @ grid_vals.reshape(-1)).reshape(
+            (self.in_eng.size, self.final_eng.size)
         )
 
-        new_data += (low_data + upp_data)
-
-        return new_data[:, 1:]
-
 
     
 
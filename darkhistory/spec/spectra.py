@@ -2,8 +2,10 @@
 
 import numpy as np
 from darkhistory import utilities as utils
+from darkhistory.spec.spectools import Abscissa
 from darkhistory.spec.spectools import get_log_bin_width
 from darkhistory.spec.spectools import rebin_N_arr
+from darkhistory.spec.spectools import same_abscissa
 from darkhistory.spec.spectrum import Spectrum
 from darkhistory.spec.spectools import get_bin_bound
 
@@ -80,6 +82,12 @@ class Spectra:
 
     __array_priority__ = 1
 
+    __slots__ = (
+        '_grid_vals', '_spec_type', '_eng', '_in_eng', '_rs',
+        '_N_underflow', '_eng_underflow', 'n',
+        '_append_bufs', '_append_owner', '_append_views', '_owned_grid_vals'
+    )
+
     def __init__(
         self, spec_arr, eng=None, in_eng=None, rs=None,
         spec_type='dNdE', rebin_eng=None
@@ -199,6 +207,10 @@ class Spectra:
 
     def __getitem__(self, key):
 
+        # The returned spectra are views of the grid values, which must 
+        # therefore no longer be updated in place.
+        self._owned_grid_vals = None
+
         if np.issubdtype(type(key), np.int64):
             out_spec = Spectrum(
                 self.eng, self._grid_vals[key],
@@ -291,7 +303,7 @@ class Spectra:
         """
         if np.issubclass_(type(other), Spectra):
 
-            if not np.array_equal(self.eng, other.eng):
+            if not same_abscissa(self.eng, other.eng):
                 raise TypeError('abscissae are different for the two spectra.')
 
             if self.spec_type != other.spec_type:
@@ -347,7 +359,7 @@ class Spectra:
         """
         if npissubclass_(type(other), Spectra):
 
-            if not np.array_equal(self.eng, other.eng):
+            if not same_abscissa(self.eng, other.eng):
                 raise TypeError('abscissae are different from the two spectra.')
 
             if self.spec_type != other.spec_type:
@@ -495,7 +507,7 @@ class Spectra:
 
         elif np.issubclass_(type(other), Spectra):
 
-            if not np.array_equal(self.eng, other.eng):
+            if not same_abscissa(self.eng, other.eng):
                 raise TypeError('the two spectra do not have the same abscissa.')
 
             out_spectra = Spectra([])
@@ -568,7 +580,7 @@ class Spectra:
 
         elif np.issubclass_(type(other), Spectra):
 
-            if not np.array_equal(self.eng, other.eng):
+            if not same_abscissa(self.eng, other.eng):
                 raise TypeError('the two spectra do not have the same abscissa.')
 
             out_spectra = Spectra([])
@@ -651,6 +663,142 @@ class Spectra:
 
         return other * inv_spectra
 
+    def _set_grid_vals(self, ufunc, other):
+        """Applies a binary ufunc to the grid values, in place where possible.
+
+        Parameters
+        ----------
+        ufunc : numpy.ufunc
+            The function to apply.
+        other : ndarray, float or int
+            The second argument of *ufunc*.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        The grid values are only overwritten if they were allocated by an earlier call to this method, and no rows have been taken from them since with :meth:`Spectra.__getitem__`. Arrays passed in by the user are never modified; the first in-place operation on such an object allocates a new array instead.
+
+        """
+
+        if (
+            self._grid_vals is getattr(self, '_owned_grid_vals', None)
+            and self._grid_vals.flags.writeable
+            and np.result_type(self._grid_vals, other)
+            == self._grid_vals.dtype
+        ):
+            ufunc(self._grid_vals, other, out=self._grid_vals)
+        else:
+            self._grid_vals = ufunc(self._grid_vals, other)
+            self._owned_grid_vals = self._grid_vals
+
+    def __iadd__(self, other):
+        """Adds a :class:`Spectra` or an array to this :class:`Spectra` in place.
+
+        Parameters
+        ----------
+        other : Spectra or ndarray
+            The object to add to the current :class:`Spectra` object.
+
+        Returns
+        -------
+        Spectra
+            This :class:`Spectra`, with the summed spectra.
+
+        Notes
+        -----
+        The underflow is reset to zero if *other* is not a :class:`Spectra` object. The grid values are updated in place if they are owned by this object (see :meth:`Spectra._set_grid_vals`); otherwise a new array is allocated, so that arrays shared with other objects are never modified.
+
+        See Also
+        --------
+        :meth:`Spectra.__add__`
+
+        """
+        if np.issubclass_(type(other), Spectra):
+
+            if not same_abscissa(self.eng, other.eng):
+                raise TypeError('abscissae are different for the two spectra.')
+
+            if self.spec_type != other.spec_type:
+                raise TypeError('adding spectra of N to spectra of dN/dE.')
+
+            if not np.array_equal(self.in_eng, other.in_eng):
+                self._in_eng = -1.*np.ones_like(self.in_eng)
+            if not np.array_equal(self.rs, other.rs):
+                self._rs = -1.*np.ones_like(self.rs)
+
+            self._set_grid_vals(np.add, other.grid_vals)
+            self._N_underflow   = self.N_underflow + other.N_underflow
+            self._eng_underflow = self.eng_underflow + other.eng_underflow
+
+        elif isinstance(other, np.ndarray):
+
+            self._set_grid_vals(np.add, other)
+            self._N_underflow = 0
+            self._eng_underflow = 0
+
+        else:
+            raise TypeError('adding an object that is not compatible.')
+
+        return self
+
+    def __imul__(self, other):
+        """Multiplies this :class:`Spectra` by a :class:`Spectra` object, array or number in place.
+
+        Parameters
+        ----------
+        other : Spectra, int, float or ndarray
+            The object to multiply to the current :class:`Spectra` object. An array multiplies each spectrum by the corresponding entry.
+
+        Returns
+        -------
+        Spectra
+            This :class:`Spectra`, with the multiplied spectra.
+
+        Notes
+        -----
+        The underflow is set to zero if *other* is not a number. The grid values are updated in place if they are owned by this object (see :meth:`Spectra._set_grid_vals`); otherwise a new array is allocated, so that arrays shared with other objects are never modified.
+
+        See Also
+        --------
+        :meth:`Spectra.__mul__`
+
+        """
+        if np.isscalar(other):
+
+            self._set_grid_vals(np.multiply, other)
+            self._N_underflow = self.N_underflow*other
+            self._eng_underflow = self.eng_underflow*other
+
+        elif isinstance(other, np.ndarray):
+
+            self._set_grid_vals(np.multiply, other[:, np.newaxis])
+            self._N_underflow = self.N_underflow*0
+            self._eng_underflow = self.eng_underflow*0
+
+        elif np.issubclass_(type(other), Spectra):
+
+            if not same_abscissa(self.eng, other.eng):
+                raise TypeError('the two spectra do not have the same abscissa.')
+
+            if not np.array_equal(self.in_eng, other.in_eng):
+                self._in_eng = -1.*np.ones_like(self.in_eng)
+            if not np.array_equal(self.rs, other.rs):
+                self._rs = -1.*np.ones_like(self.rs)
+            if self.spec_type != other.spec_type:
+                self._spec_type = 'dNdE'
+
+            self._set_grid_vals(np.multiply, other.grid_vals)
+            self._N_underflow = self.N_underflow*0
+            self._eng_underflow = self.eng_underflow*0
+
+        else:
+            raise TypeError('multiplying an object that is not compatible.')
+
+        return self
+
     def switch_spec_type(self, target=None):
         """Switches between the type of values to be stored.
 
@@ -701,20 +849,94 @@ class Spectra:
         if rs_arr.size != self.rs.size:
             raise TypeError('rs_arr must have the same size as the number of Spectrum objects stored.')
 
-        for i,(rs, new_rs, in_eng) in enumerate(
-            zip(self.rs, rs_arr, self.in_eng)
-        ):
-            spec = Spectrum(
-                self.eng, self.grid_vals[i],
-                rs=rs, in_eng=in_eng,
-                spec_type=self.spec_type
-            )
+        if np.any(self.rs <= 0):
+            raise ValueError('self.rs must be initialized.')
 
-            spec.redshift(new_rs)
-            self._grid_vals[i] = spec._data
-            self._N_underflow[i] += spec.underflow['N']
-            self._eng_underflow[i] += spec.underflow['eng']
+        fac = rs_arr/self.rs
 
+        n_spec = self.rs.size
+        n_eng  = self.eng.size
+
+        # Each spectrum is shifted to the abscissa eng*fac, and then
+        # rebinned back into eng, as in Spectrum.redshift. Add an
+        # additional bin at the lower end of eng so that underflow can be
+        # treated easily.
+        eng = self.eng.astype(float)
+        first_bin_eng = np.exp(np.log(eng[0]) - (np.log(eng[1]) - np.log(eng[0])))
+        new_eng = np.insert(eng, 0, first_bin_eng)
+
+        # Relative bin indices of all shifted abscissae at once. The
+        # first bin in new_eng has bin index -1. Underflow has index -2,
+        # overflow corresponds to new_eng.size.
+        shifted_eng = np.outer(fac, eng)
+        bin_ind = np.interp(
+            shifted_eng, new_eng, np.arange(new_eng.size)-1,
+            left = -2, right = new_eng.size
+        )
+
+        if np.any(bin_ind == new_eng.size):
+            warnings.warn("The new abscissa lies below the old one: only bins that lie within the new abscissa will be rebinned, bins above the abscissa will be discarded.", RuntimeWarning)
+
+        # Number of particles is unchanged by the shift.
+        N_arr = self.totN('bin')
+
+        row = np.broadcast_to(np.arange(n_spec)[:,None], bin_ind.shape)
+
+        ind_low = bin_ind < 0
+        ind_reg = (bin_ind >= 0) & (bin_ind <= new_eng.size - 1)
+
+        # Regular bins. reg_bin_low is the array of the lower bins to be
+        # allocated the particles, similarly reg_bin_upp.
+        reg_bin_ind = bin_ind[ind_reg]
+        reg_bin_low = np.floor(reg_bin_ind).astype(int)
+        reg_bin_upp = reg_bin_low + 1
+
+        # Takes care of the case where eng*fac[-1] = eng[-1].
+        reg_bin_low[reg_bin_low == new_eng.size-2] = new_eng.size - 3
+        reg_bin_upp[reg_bin_upp == new_eng.size-1] = new_eng.size - 2
+
+        N_reg   = N_arr[ind_reg]
+        row_reg = row[ind_reg]
+
+        # Low bins: the part above the underflow goes into the lowest bin.
+        N_low   = N_arr[ind_low]
+        row_low = row[ind_low]
+        N_above_underflow = (
+            bin_ind[ind_low] - np.floor(bin_ind[ind_low])
+        ) * N_low
+
+        # Scatter-add into the flattened (n_spec, new_eng.size) array,
+        # with the extra bin at index 0 of each row.
+        flat_ind = np.concatenate([
+            row_reg*new_eng.size + reg_bin_low + 1,
+            row_reg*new_eng.size + reg_bin_upp + 1,
+            row_low*new_eng.size + 1
+        ])
+        flat_N = np.concatenate([
+            (reg_bin_upp - reg_bin_ind) * N_reg,
+            (reg_bin_ind - reg_bin_low) * N_reg,
+            N_above_underflow
+        ])
+        new_N = np.bincount(
+            flat_ind, weights=flat_N, minlength=n_spec*new_eng.size
+        ).reshape((n_spec, new_eng.size))[:,1:]
+
+        # Underflow is tracked for each spectrum.
+        N_underflow = np.bincount(
+            row_low, weights=N_low - N_above_underflow, minlength=n_spec
+        )
+        eng_underflow = np.bincount(
+            row_low,
+            weights=N_low*shifted_eng[ind_low] - N_above_underflow*eng[0],
+            minlength=n_spec
+        )
+
+        if self.spec_type == 'dNdE':
+            new_N /= eng * get_log_bin_width(eng)
+
+        self._grid_vals[:] = new_N
+        self._N_underflow   += N_underflow
+        self._eng_underflow += eng_underflow
 
         self._rs = rs_arr
 
@@ -1023,7 +1245,7 @@ class Spectra:
         else:
             raise TypeError('weight must be an ndarray of the correct dimensions.')
 
-    def sum_specs(self, weight=None):
+    def sum_specs(self, weight=None, out=None):
         """Sums all of spectra with some weight.
 
         The weight is over each spectrum, and has the same length as `self.in_eng` and `self.rs`.
@@ -1032,6 +1254,8 @@ class Spectra:
         ----------
         weight : ndarray or Spectrum, optional
             The weight in each redshift bin, with weight of 1 for every bin if not specified.
+        out : Spectrum, optional
+            `Spectrum` to store the result in. Its data array is reused if it is owned by *out* (see :meth:`Spectrum.__iadd__`) and has the correct size and type, and must not share memory with this `Spectra` or *weight*. A new `Spectrum` is returned if not specified.
 
         Returns
         -------
@@ -1043,21 +1267,47 @@ class Spectra:
             weight = np.ones_like(self.rs)
 
         if isinstance(weight, np.ndarray):
-            new_data = np.dot(weight, self.grid_vals)
-            return Spectrum(self.eng, new_data, spec_type=self.spec_type)
+            weight_N  = weight
+            spec_type = self.spec_type
         elif isinstance(weight, Spectrum):
             if not np.array_equal(self.in_eng, weight.eng):
                 raise TypeError('spectra.in_eng must equal weight.eng')
 
-            # new_data = np.dot(weight._data, self.grid_vals)
             # Should always take the dot with type 'N'. 
-            new_data = np.dot(weight.N, self.grid_vals)
-            return Spectrum(
-                self.eng, new_data, spec_type=weight.spec_type
-            )
+            weight_N  = weight.N
+            spec_type = weight.spec_type
         else:
             raise TypeError('weight must be an ndarray or Spectrum.')
 
+        if out is None:
+            out_spec = Spectrum(
+                self.eng, np.dot(weight_N, self.grid_vals),
+                spec_type=spec_type
+            )
+            # The data is newly allocated, and can be updated in place.
+            out_spec._owned_data = out_spec._data
+            return out_spec
+
+        data = out._data
+        if (
+            data is getattr(out, '_owned_data', None)
+            and data.shape == self.eng.shape
+            and data.dtype == np.result_type(weight_N, self.grid_vals)
+            and data.flags.c_contiguous and data.flags.writeable
+        ):
+            np.dot(weight_N, self.grid_vals, out=data)
+        else:
+            out._data = np.dot(weight_N, self.grid_vals)
+            out._owned_data = out._data
+
+        out.eng        = self.eng
+        out.length     = self.eng.size
+        out.rs         = -1.
+        out.in_eng     = -1.
+        out._spec_type = spec_type
+        out.underflow  = {'N': 0., 'eng': 0.}
+
+        return out
 
     def rebin(self, out_eng):
         """ Re-bins all `Spectrum` objects according to a new abscissa.
@@ -1080,136 +1330,25 @@ class Spectra:
         if not np.all(np.diff(out_eng) > 0):
             raise TypeError('new abscissa must be ordered in increasing energy.')
 
-        # Get the bin indices that the current abscissa (self.eng)
-        # corresponds to in the new abscissa (new_eng). Bin indices are
-        # with respect to bin centers.
-
-        # Add an additional bin at the lower end of out_eng so that
-        # underflow can be treated easily.
-
-        first_bin_eng = np.exp(
-            np.log(out_eng[0])
-            - (np.log(out_eng[1]) - np.log(out_eng[0]))
-        )
-        new_eng = np.insert(out_eng, 0, first_bin_eng)
-
-        # Find the relative bin indices for self.eng. The first bin in
-        # new_eng has bin index -1. Underflow has index -2, overflow
-        # corresponds to new_eng.size
-
-        bin_ind = np.interp(
-            self.eng, new_eng, np.arange(new_eng.size)-1,
-            left = -2, right = new_eng.size
-        )
-
-        # Locate where bin_ind is below 0, above self.length-1
-        # or in between.
+        # Sparse rebinning operator, computed once for each pair of
+        # abscissae. All spectra are rebinned in one sparse product.
+        rebin_op = Abscissa.get(self.eng).rebin_operator(out_eng)
 
-        ind_low  = np.where(bin_ind < 0)[0]
-        ind_high = np.where(bin_ind == new_eng.size)[0]
-        ind_reg  = np.where(
-            (bin_ind >= 0) & (bin_ind <= new_eng.size - 1)
-        )[0]
-
-        if ind_high.size > 0:
+        if rebin_op.overflow:
             warnings.warn("The new abscissa lies below the old one: only bins that lie within the new abscissa will be rebinned, bins above the abscissa will be discarded.", RuntimeWarning)
 
-        # These arrays are of size in_eng x eng.
-        N_arr = self.totN('bin')
-        toteng_arr = self.toteng('bin')
-
-        N_arr_low  = N_arr[:,ind_low]
-        N_arr_high = N_arr[:,ind_high]
-        N_arr_reg  = N_arr[:,ind_reg]
-
-        toteng_arr_low = toteng_arr[:,ind_low]
+        # This array is of size in_eng x eng.
+        new_data, N_underflow, eng_underflow = rebin_op.apply(
+            self.totN('bin')
+        )
 
         # Factor depends on the spec_type.
         if self.spec_type == 'dNdE':
             # E dlog E of the new array.
-            fac = new_eng * get_log_bin_width(new_eng)
-        elif self.spec_type == 'N':
-            fac = np.ones_like(new_eng)
-
-
-        # Regular bins first.
-
-        # reg_bin_low is the array of the lower bins to be allocated the
-        # particles in N_arr_reg, similarly reg_bin_upp. This should also
-        # take care of the case where bin_ind is an integer.
-
-        reg_bin_low = np.floor(bin_ind[ind_reg]).astype(int)
-        reg_bin_upp = reg_bin_low + 1
-
-        # Takes care of the case where eng[-1] = new_eng[-1], which falls
-        # under regular indices. Remember the extra bin on the left.
-        reg_bin_low[reg_bin_low == new_eng.size-2] = new_eng.size - 3
-        reg_bin_upp[reg_bin_upp == new_eng.size-1] = new_eng.size - 2
-
-        # Split the particles up into the lower bin and upper bin.
-        # Remember there's an extra bin on the left when indexing into
-        # new_E_dlogE.
-        reg_data_low = (
-            (reg_bin_upp - bin_ind[ind_reg]) * N_arr_reg
-            / fac[reg_bin_low+1]
-        )
-        reg_data_upp = (
-            (bin_ind[ind_reg] - reg_bin_low) * N_arr_reg
-            / fac[reg_bin_upp+1]
-        )
-
-        # Handle low bins.
-        low_bin_low = np.floor(bin_ind[ind_low]).astype(int)
-
-        N_above_underflow = np.sum(
-            (bin_ind[ind_low] - low_bin_low) * N_arr_low, axis = 1
-        )
-        eng_above_underflow = N_above_underflow * new_eng[1]
-
-        N_underflow = np.sum(N_arr_low, axis=1) - N_above_underflow
-        eng_underflow = (
-            np.sum(toteng_arr_low, axis=1) - eng_above_underflow
-        )
-        low_data = N_above_underflow/fac[1]
-
-        # Add up, obtain the new dN/dE.
+            new_data /= rebin_op.E_dlogE
 
-        new_data = np.zeros((self.in_eng.size, new_eng.size))
-        new_data[:,1] += low_data
-
-
-        # np.add.at(new_data, (slice(None), reg_bin_low+1), reg_data_low)
-        # np.add.at(new_data, (slice(None), reg_bin_upp+1), reg_data_upp)
-
-        # Replace with agg.aggregate
-        from darkhistory.numpy_groupies import aggregate as agg
-
-        # low_data = agg.aggregate(
-        #     reg_bin_low+1, reg_data_low, func='sum', fill_value=0, axis=1, size=new_eng.size
-        # )
-
-        # upp_data = agg.aggregate(
-        #     reg_bin_upp+1, reg_data_upp, func='sum', fill_value=0, axis=1, size=new_eng.size
-        # )
-        # new_data = (low_data + upp_data)
-
-        low_data = agg.aggregate(
-            reg_bin_low+1, np.transpose(reg_data_low), func='sum', 
-            fill_value=0, axis=0, size=new_eng.size
-        )
-
-        upp_data = agg.aggregate(
-            reg_bin_upp+1, np.transpose(reg_data_upp), func='sum', 
-            fill_value=0, axis=0, size=new_eng.size
-        )
-
-        new_data += np.transpose(low_data + upp_data)
-
-        # new_data[:,reg_bin_low+1] += reg_data_low
-        # new_data[:,reg_bin_upp+1] += reg_data_upp
-
-        self._eng = new_eng[1:]
-        self._grid_vals = new_data[:,1:]
+        self._eng = np.array(rebin_op.out_eng)
+        self._grid_vals = new_data
         self._N_underflow += N_underflow
         self._eng_underflow += eng_underflow
 
@@ -1220,6 +1359,10 @@ class Spectra:
         ----------
         spec : Spectrum
             The new spectrum to append.
+
+        Notes
+        -----
+        The stored arrays are views into buffers that grow geometrically, so appending N spectra one at a time takes O(N) copies instead of O(N\ :sup:`2`). 
         """
         # Checks if spec_arr is empty
         if self.eng.size != 0:
@@ -1229,20 +1372,70 @@ class Spectra:
         if self.spec_type != spec.spec_type:
             raise TypeError("new Spectrum is not of the same type as the Spectra.")
 
-        self._in_eng = np.append(self.in_eng, spec.in_eng)
-        self._rs = np.append(self.rs, spec.rs)
-        self._N_underflow = np.append(self._N_underflow, spec.underflow['N'])
-        self._eng_underflow = np.append(
-            self._eng_underflow, spec.underflow['eng']
-        )
-
         if self.eng.size == 0:
             self._eng = spec.eng
-            self._grid_vals = np.atleast_2d(spec._data)
+            n_specs = 0
         else:
-            self._grid_vals = np.concatenate(
-                (self.grid_vals, np.atleast_2d(spec._data))
-            )
+            n_specs = self._grid_vals.shape[0]
+
+        arrs = [
+            self._grid_vals, self._in_eng, self._rs, 
+            self._N_underflow, self._eng_underflow
+        ]
+
+        # The buffers can only be reused if they belong to this object, 
+        # none of the attributes have been replaced and there is space left.
+        bufs = getattr(self, '_append_bufs', None)
+        if (
+            bufs is None or self._append_owner is not self
+            or n_specs == bufs[0].shape[0]
+            or not all([
+                arr is view and view.base is buf for arr, view, buf 
+                in zip(arrs, self._append_views, bufs)
+            ])
+        ):
+            capacity = max(2*n_specs, 16)
+            bufs = [np.empty(
+                (capacity, self.eng.size), 
+                dtype=np.result_type(self._grid_vals, spec._data)
+            )] + [np.empty(capacity) for arr in arrs[1:]]
+            if n_specs > 0:
+                for buf, arr in zip(bufs, arrs):
+                    buf[:n_specs] = arr
+            self._append_bufs  = bufs
+            self._append_owner = self
+
+        for buf, val in zip(bufs, [
+            spec._data, spec.in_eng, spec.rs, 
+            spec.underflow['N'], spec.underflow['eng']
+        ]):
+            buf[n_specs] = val
+
+        self._append_views = [buf[:n_specs+1] for buf in bufs]
+        (
+            self._grid_vals, self._in_eng, self._rs,
+            self._N_underflow, self._eng_underflow
+        ) = self._append_views
+
+    def __getstate__(self):
+        # Attributes of subclasses are stored in __dict__.
+        state = getattr(self, '__dict__', {}).copy()
+        state.update({
+            key: getattr(self, key) for key in Spectra.__slots__
+            if hasattr(self, key)
+        })
+        # Append buffers are recreated when needed.
+        for key in ['_append_bufs', '_append_owner', '_append_views']:
+            state.pop(key, None)
+        # Copies must not update shared grid values in place.
+        state.pop('_owned_grid_vals', None)
+        return state
+
+    def __setstate__(self, state):
+        # Objects pickled before __slots__ was used store their
+        # attributes in the same way.
+        for key, val in state.items():
+            setattr(self, key, val)
 
     def at_rs(
         self, new_rs, interp_type='val',
@@ -2,9 +2,11 @@
 
 import numpy as np
 from darkhistory import utilities as utils
+from darkhistory.spec.spectools import Abscissa
 from darkhistory.spec.spectools import get_bin_bound
 from darkhistory.spec.spectools import get_log_bin_width
 from darkhistory.spec.spectools import rebin_N_arr
+from darkhistory.spec.spectools import same_abscissa
 import matplotlib.pyplot as plt
 import warnings
 
@@ -51,6 +53,11 @@ class Spectrum:
     # ndarray first, which isn't what we want.
     __array_priority__ = 1
 
+    __slots__ = (
+        'eng', '_data', 'rs', 'in_eng', '_spec_type', 'length', 'underflow',
+        '_owned_data'
+    )
+
     def __init__(self, eng, data, rs=-1., in_eng=-1., spec_type='dNdE'):
 
         if eng.size != data.size:
@@ -103,6 +110,52 @@ class Spectrum:
     def spec_type(self):
         return self._spec_type
 
+    def __getstate__(self):
+        # Copies must not update shared data in place.
+        return {
+            key: getattr(self, key) for key in self.__slots__
+            if hasattr(self, key) and key != '_owned_data'
+        }
+
+    def __setstate__(self, state):
+        # Objects pickled before __slots__ was used store their
+        # attributes in the same way.
+        for key, val in state.items():
+            setattr(self, key, val)
+
+    def _set_data(self, ufunc, other):
+        """Applies a binary ufunc to the data, in place where possible.
+
+        Parameters
+        ----------
+        ufunc : numpy.ufunc
+            The function to apply.
+        other : ndarray, float or int
+            The second argument of *ufunc*.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        The data is only overwritten if it was allocated by an earlier call
+        to this method. Arrays passed in by the user, or views into a
+        :class:`.Spectra` object, are never modified; the first in-place
+        operation on such a spectrum allocates a new array instead.
+
+        """
+
+        if (
+            self._data is getattr(self, '_owned_data', None)
+            and self._data.flags.writeable
+            and np.result_type(self._data, other) == self._data.dtype
+        ):
+            ufunc(self._data, other, out=self._data)
+        else:
+            self._data = ufunc(self._data, other)
+            self._owned_data = self._data
+
 
     def __add__(self, other):
         """Adds two :class:`Spectrum` instances together, or an array to the spectrum. The :class:`Spectrum` object is on the left.
@@ -133,7 +186,7 @@ class Spectrum:
 
         if type(other) == type(self):
             # Some typical errors.
-            if not np.array_equal(self.eng, other.eng):
+            if not same_abscissa(self.eng, other.eng):
                 raise TypeError("abscissae are different for the two Spectrum objects.")
             if self._spec_type != other._spec_type:
                 raise TypeError("cannot add N to dN/dE.")
@@ -198,7 +251,7 @@ class Spectrum:
 
         if type(other) == type(self):
             # Some typical errors.
-            if not np.array_equal(self.eng, other.eng):
+            if not same_abscissa(self.eng, other.eng):
                 raise TypeError("abscissae are different for the two :class:`Spectrum` objects.")
             if self._spec_type != other._spec_type:
                 raise TypeError("cannot add N to dN/dE.")
@@ -359,7 +412,7 @@ class Spectrum:
                 new_rs = self.rs
             if self.in_eng == other.in_eng:
                 new_in_eng = self.in_eng
-            if not np.array_equal(self.eng, other.eng):
+            if not same_abscissa(self.eng, other.eng):
                 raise TypeError("energy abscissae are not the same.")
             return Spectrum(
                 self.eng, self._data*other._data,
@@ -475,6 +528,181 @@ class Spectrum:
         invSpec = Spectrum(self.eng, 1/self._data, self.rs, self.in_eng)
         return other*invSpec
 
+    def __iadd__(self, other):
+        """Adds a :class:`Spectrum` or an array to this :class:`Spectrum` in place.
+
+        Parameters
+        ----------
+        other : Spectrum or ndarray
+            The object to add to the current :class:`Spectrum` object.
+
+        Returns
+        -------
+        Spectrum
+            This :class:`Spectrum`, with the summed spectrum.
+
+        Notes
+        -----
+        The result is the same as :meth:`Spectrum.__add__`, including the underflow being reset to zero if *other* is not a :class:`Spectrum` object. The data is updated in place if it is owned by this :class:`Spectrum`, i.e. if it was allocated by an earlier in-place operation; otherwise a new array is allocated, so that arrays shared with other objects are never modified.
+
+        See Also
+        --------
+        :meth:`Spectrum.__add__`
+
+        """
+
+        if type(other) == type(self):
+            # Some typical errors.
+            if not same_abscissa(self.eng, other.eng):
+                raise TypeError("abscissae are different for the two Spectrum objects.")
+            if self._spec_type != other._spec_type:
+                raise TypeError("cannot add N to dN/dE.")
+            if not np.array_equal(self.rs, other.rs):
+                self.rs = -1
+            if not np.array_equal(self.in_eng, other.in_eng):
+                self.in_eng = -1
+
+            self._set_data(np.add, other._data)
+            self.underflow['N']   += other.underflow['N']
+            self.underflow['eng'] += other.underflow['eng']
+
+        elif isinstance(other, np.ndarray):
+
+            self._set_data(np.add, other)
+            self.underflow = {'N': 0., 'eng': 0.}
+
+        else:
+
+            raise TypeError("cannot add object to Spectrum.")
+
+        return self
+
+    def __isub__(self, other):
+        """Subtracts a :class:`Spectrum` or an array from this :class:`Spectrum` in place.
+
+        Parameters
+        ----------
+        other : Spectrum or ndarray
+            The object to subtract from the current :class:`Spectrum` object.
+
+        Returns
+        -------
+        Spectrum
+            This :class:`Spectrum`, with the subtracted spectrum.
+
+        Notes
+        -----
+        The result is the same as :meth:`Spectrum.__sub__`. See :meth:`Spectrum.__iadd__` for when the data is updated in place.
+
+        See Also
+        --------
+        :meth:`Spectrum.__iadd__`
+
+        """
+
+        if type(other) == type(self):
+            # Some typical errors.
+            if not same_abscissa(self.eng, other.eng):
+                raise TypeError("abscissae are different for the two Spectrum objects.")
+            if self._spec_type != other._spec_type:
+                raise TypeError("cannot add N to dN/dE.")
+            if not np.array_equal(self.rs, other.rs):
+                self.rs = -1
+            if not np.array_equal(self.in_eng, other.in_eng):
+                self.in_eng = -1
+
+            self._set_data(np.subtract, other._data)
+            self.underflow['N']   -= other.underflow['N']
+            self.underflow['eng'] -= other.underflow['eng']
+
+        elif isinstance(other, np.ndarray):
+
+            self._set_data(np.subtract, other)
+            self.underflow = {'N': 0., 'eng': 0.}
+
+        else:
+
+            raise TypeError("cannot add object to Spectrum.")
+
+        return self
+
+    def __imul__(self, other):
+        """Multiplies this :class:`Spectrum` by a :class:`Spectrum` object, array or number in place.
+
+        Parameters
+        ----------
+        other : Spectrum, ndarray, float or int
+            The object to multiply to the current :class:`Spectrum` object.
+
+        Returns
+        -------
+        Spectrum
+            This :class:`Spectrum`, with the multiplied spectrum.
+
+        Notes
+        -----
+        The result is the same as :meth:`Spectrum.__mul__`, including the underflow being set to zero if *other* is not a number. The data is updated in place if it is owned by this :class:`Spectrum`, i.e. if it was allocated by an earlier in-place operation; otherwise a new array is allocated, so that arrays shared with other objects are never modified.
+
+        See Also
+        --------
+        :meth:`Spectrum.__mul__`
+
+        """
+        if (
+            np.issubdtype(type(other),np.float64)
+            or np.issubdtype(type(other),np.int64)
+        ):
+            self._set_data(np.multiply, other)
+            self.underflow['N']   *= other
+            self.underflow['eng'] *= other
+
+        elif isinstance(other, np.ndarray):
+
+            self._set_data(np.multiply, other)
+            self.underflow = {'N': 0., 'eng': 0.}
+
+        elif isinstance(other, Spectrum):
+
+            if not same_abscissa(self.eng, other.eng):
+                raise TypeError("energy abscissae are not the same.")
+            if self._spec_type != other._spec_type:
+                # If they are not the same, defaults to dNdE.
+                self._spec_type = 'dNdE'
+            if self.rs != other.rs:
+                self.rs = -1
+            if self.in_eng != other.in_eng:
+                self.in_eng = -1
+
+            self._set_data(np.multiply, other._data)
+            self.underflow = {'N': 0., 'eng': 0.}
+
+        else:
+
+            raise TypeError("cannot multiply object to Spectrum.")
+
+        return self
+
+    def __itruediv__(self, other):
+        """Divides this :class:`Spectrum` by an array or number in place.
+
+        Parameters
+        ----------
+        other : ndarray, float or int
+            The object to divide the current :class:`Spectrum` object by.
+
+        Returns
+        -------
+        Spectrum
+            This :class:`Spectrum`, with the divided spectrum.
+
+        See Also
+        --------
+        :meth:`Spectrum.__imul__`
+
+        """
+        self *= 1/other
+        return self
+
     def switch_spec_type(self, target=None):
         """Switches between data being stored as N or dN/dE.
 
@@ -828,111 +1056,21 @@ class Spectrum:
         #     raise OverflowError("the new abscissa lies below the old one: this function cannot handle overflow (yet?).")
         # Get the bin indices that the current abscissa (self.eng) corresponds to in the new abscissa (new_eng). Can be any number between 0 and self.length-1. Bin indices are wrt the bin centers.
 
-        # Add an additional bin at the lower end of out_eng so that underflow can be treated easily.
-
-        # Forces out_eng to be float, avoids strange problems with np.insert
-        # below if out_eng is of type int. 
-
-        out_eng = out_eng.astype(float)
-
-        first_bin_eng = np.exp(np.log(out_eng[0]) - (np.log(out_eng[1]) - np.log(out_eng[0])))
-
-        new_eng = np.insert(out_eng, 0, first_bin_eng)
-
-        # Find the relative bin indices for self.eng wrt new_eng. The first bin in new_eng has bin index -1.
-
-        bin_ind_interp = interp1d(
-            new_eng, np.arange(new_eng.size)-1,
-            bounds_error = False, fill_value = (-2, new_eng.size)
-        )
-
-        bin_ind = bin_ind_interp(self.eng)
-
-
-        # bin_ind = np.interp(self.eng, new_eng,
-        #     np.arange(new_eng.size)-1, left = -2, right = new_eng.size)
+        # Sparse rebinning operator, computed once for each pair of abscissae.
+        rebin_op = Abscissa.get(self.eng).rebin_operator(out_eng)
 
-        # Locate where bin_ind is below 0, above self.length-1 and in between.
-        ind_low = np.where(bin_ind < 0)
-        ind_high = np.where(bin_ind == new_eng.size)
-        ind_reg = np.where( (bin_ind >= 0) & (bin_ind <= new_eng.size - 1) )
-
-        if ind_high[0].size > 0:
+        if rebin_op.overflow:
             warnings.warn("The new abscissa lies below the old one: only bins that lie within the new abscissa will be rebinned, bins above the abscissa will be discarded.", RuntimeWarning)
             # raise OverflowError("the new abscissa lies below the old one: this function cannot handle overflow (yet?).")
 
-        # Get the total N and toteng in each bin of self._data
-        if self._spec_type == 'dNdE':
-            N_arr = self.totN('bin')
-            toteng_arr = self.toteng('bin')
-        elif self._spec_type == 'N':
-            N_arr = self.N
-            toteng_arr = self.N*self.eng
-
-        N_arr_low = N_arr[ind_low]
-        N_arr_high = N_arr[ind_high]
-        N_arr_reg = N_arr[ind_reg]
-
-        toteng_arr_low = toteng_arr[ind_low]
-
-        # Bin width of the new array. Use only the log bin width, so that dN/dE = N/(E d log E)
-        if self._spec_type == 'dNdE':
-            new_E_dlogE = new_eng * get_log_bin_width(new_eng)
-
-        # Regular bins first, done in a completely vectorized fashion.
-
-        # reg_bin_low is the array of the lower bins to be allocated the particles in N_arr_reg, similarly reg_bin_upp. This should also take care of the fact that bin_ind is an integer.
-        reg_bin_low = np.floor(bin_ind[ind_reg]).astype(int)
-        reg_bin_upp = reg_bin_low + 1
-
-        # Takes care of the case where eng[-1] = new_eng[-1]
-        reg_bin_low[reg_bin_low == new_eng.size-2] = new_eng.size - 3
-        reg_bin_upp[reg_bin_upp == new_eng.size-1] = new_eng.size - 2
-
-        if self._spec_type == 'dNdE':
-            reg_dNdE_low = (
-                (reg_bin_upp - bin_ind[ind_reg]) * N_arr_reg
-                /new_E_dlogE[reg_bin_low+1]
-            )
-            reg_dNdE_upp = (
-                (bin_ind[ind_reg] - reg_bin_low) * N_arr_reg
-                           /new_E_dlogE[reg_bin_upp+1]
-            )
-        elif self._spec_type == 'N':
-            reg_N_low = (reg_bin_upp - bin_ind[ind_reg]) * N_arr_reg
-            reg_N_upp = (bin_ind[ind_reg] - reg_bin_low) * N_arr_reg
-
-        # Low bins.
-        low_bin_low = np.floor(bin_ind[ind_low]).astype(int)
-        N_above_underflow = np.sum((bin_ind[ind_low] - low_bin_low)
-            * N_arr_low)
-        eng_above_underflow = N_above_underflow * new_eng[1]
-
-        N_underflow = np.sum(N_arr_low) - N_above_underflow
-        eng_underflow = np.sum(toteng_arr_low) - eng_above_underflow
-        if self._spec_type == 'dNdE':
-            low_dNdE = N_above_underflow/new_E_dlogE[1]
+        new_N, N_underflow, eng_underflow = rebin_op.apply(self.N)
 
-        # Add up, obtain the new data.
-        new_data = np.zeros(new_eng.size)
+        # Implement changes. Use only the log bin width, so that dN/dE = N/(E d log E)
+        self.eng = np.array(rebin_op.out_eng)
         if self._spec_type == 'dNdE':
-            new_data[1] += low_dNdE
-            # reg_dNdE_low = -1 refers to new_eng[0]
-            np.add.at(new_data, reg_bin_low+1, reg_dNdE_low)
-            np.add.at(new_data, reg_bin_upp+1, reg_dNdE_upp)
-            # print(new_data[reg_bin_low+1])
-            # new_data[reg_bin_low+1] += reg_dNdE_low
-            # new_data[reg_bin_upp+1] += reg_dNdE_upp
+            self._data = new_N/rebin_op.E_dlogE
         elif self._spec_type == 'N':
-            new_data[1] += N_above_underflow
-            np.add.at(new_data, reg_bin_low+1, reg_N_low)
-            np.add.at(new_data, reg_bin_upp+1, reg_N_upp)
-            # new_data[reg_bin_low+1] += reg_N_low
-            # new_data[reg_bin_upp+1] += reg_N_upp
-
-        # Implement changes.
-        self.eng = new_eng[1:]
-        self._data = new_data[1:]
+            self._data = new_N
         self.length = self.eng.size
         self.underflow['N'] += N_underflow
         self.underflow['eng'] += eng_underflow
@@ -958,55 +1096,11 @@ class Spectrum:
 
         """
 
-        first_bin_eng = np.exp(np.log(out_eng[0]) - (np.log(out_eng[1]) - np.log(out_eng[0])))
-        new_eng = np.insert(out_eng, 0, first_bin_eng)
-
-
-        # Find the relative bin indices for self.eng wrt new_eng. The first bin in new_eng has bin index -1.
-
-        bin_ind_interp = interp1d(
-            new_eng, np.arange(new_eng.size)-1,
-            bounds_error = False, fill_value = (-2, new_eng.size)
-        )
-
-        bin_ind = bin_ind_interp(self.eng)
-
-        # Locate where bin_ind is in between.
-        ind_low = np.where(bin_ind < 0)
-        ind_reg = np.where( (bin_ind >= 0) & (bin_ind <= new_eng.size - 1) )
-
-        N_arr = self.N
-
-        N_arr_low = N_arr[ind_low]
-        N_arr_reg = N_arr[ind_reg]
-
-        # Regular bins first, done in a completely vectorized fashion.
-
-        # reg_bin_low is the array of the lower bins to be allocated the particles in N_arr_reg, similarly reg_bin_upp. This should also take care of the fact that bin_ind is an integer.
-        reg_bin_low = np.floor(bin_ind[ind_reg]).astype(int)
-        reg_bin_upp = reg_bin_low + 1
-
-        # Takes care of the case where eng[-1] = new_eng[-1]
-        reg_bin_low[reg_bin_low == new_eng.size-2] = new_eng.size - 3
-        reg_bin_upp[reg_bin_upp == new_eng.size-1] = new_eng.size - 2
-
-        reg_N_low = (reg_bin_upp - bin_ind[ind_reg]) * N_arr_reg
-        reg_N_upp = (bin_ind[ind_reg] - reg_bin_low) * N_arr_reg
-
-        # Low bins.
-        low_bin_low = np.floor(bin_ind[ind_low]).astype(int)
-        N_above_underflow = np.sum((bin_ind[ind_low] - low_bin_low)
-            * N_arr_low)
-
-        # Add up, obtain the new data.
-        new_data = np.zeros(new_eng.size)
-        new_data[1] += N_above_underflow
-        np.add.at(new_data, reg_bin_low+1, reg_N_low)
-        np.add.at(new_data, reg_bin_upp+1, reg_N_upp)
+        rebin_op = Abscissa.get(self.eng).rebin_operator(out_eng)
 
         # Implement changes.
-        self.eng = new_eng[1:]
-        self._data = new_data[1:]
+        self.eng = np.array(rebin_op.out_eng)
+        self._data = rebin_op.mat.dot(self._data)
         self.length = self.eng.size
 
     def engloss_rebin(
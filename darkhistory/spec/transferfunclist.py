@@ -6,6 +6,7 @@ from scipy.interpolate import RegularGridInterpolator
 from scipy.interpolate import interp1d
 
 from darkhistory.utilities import arrays_equal
+from darkhistory.utilities import MultilinearInterpMixin
 from darkhistory.spec.spectrum import Spectrum
 from darkhistory.spec.spectra import Spectra
 import darkhistory.spec.transferfunction as tf
@@ -297,24 +298,8 @@ class TransferFuncList:
 
             for (i,tfunc) in enumerate(new_tflist):
 
-                in_eng_arr = tfunc.in_eng
-                new_grid_val = matrix_power(
-                    tfunc._grid_vals,dlnz_factor
-                )
-                new_spec_arr = [
-                    Spectrum(
-                        tfunc.eng, new_grid_val[i],
-                        spec_type = tfunc.spec_type,
-                        rs = tfunc.rs[0], in_eng = in_eng_arr[i]
-                    )
-                    for i in np.arange(in_eng_arr.size)
-                ]
-
-                self._tflist.append(
-                    tf.TransFuncAtRedshift(
-                        new_spec_arr, self.dlnz*dlnz_factor
-                    )
-                )
+                # Keeps the storage of tfunc, dense or sparse.
+                self._tflist.append(tfunc.matrix_power(dlnz_factor))
 
         else:
             raise TypeError('invalid coarsen_type.')
@@ -505,7 +490,7 @@ class TransferFuncListArray:
 
 
 
-class TransferFuncInterp:
+class TransferFuncInterp(MultilinearInterpMixin):
 
     """Interpolation function over list of TransferFuncList objects.
 
@@ -592,97 +577,46 @@ class TransferFuncInterp:
             except:
                 self.x.append(None)
 
-        self._log_interp = log_interp
+        self._init_interp(log_interp)
 
-        if self._log_interp:
-            for grid in self.grid_vals:
-                grid[grid <= 0] = 1e-200
-            func = np.log
-        else:
-            print('noninterp')
-            def func(obj):
-                return obj
-
-        self.interp_func = []
-        for x_vals,z,grid in zip(self.x, self.rs, self.grid_vals):
-            if grid.ndim == 3:
-                # No xe dependence.
-                self.interp_func.append(
-                    interp1d(func(z), func(np.squeeze(grid)), axis=0)
-                )
-            elif grid.ndim == 4:
-                # xH dependence. 
-                self.interp_func.append(
-                    RegularGridInterpolator(
-                        (func(x_vals), func(z)), func(grid)
-                    )
-                )
-            elif grid.ndim == 5:
-                #xH, xHe dependence.
-                xH_arr = x_vals[:,0,0]
-                xHe_arr = x_vals[0,:,1]
-                self.interp_func.append(
-                    RegularGridInterpolator(
-                        (func(xH_arr), func(xHe_arr), func(z)), func(grid)
-                    )
-                )
-            else:
-                raise TypeError('grid has anomalous dimensions (and not in a good QFT way).')
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The scratch buffer is recreated when needed.
+        state.pop('_interp_buf', None)
+        return state
 
-    def get_tf(self, xH, xHe, rs):
+    def _from_weights(self, rs_regime_ind, corners, rs, out=None):
+        """Returns the transfer function given the interpolation weights.
 
-        if self._log_interp:
-            func = np.log
-            inv_func = np.exp
-        else:
-            def func(obj):
-                return obj
-            inv_func = func
-
-        rs_regime_ind = np.searchsorted(self.rs_nodes, rs)
-        if rs > self.rs[rs_regime_ind][-1] or rs < self.rs[rs_regime_ind][0]:
-            raise TypeError('redshift lies outside of range.')
-
-        rs_regime_interp_func = self.interp_func[rs_regime_ind]
-
-        # Make sure xH, xHe and rs are within bounds.
-        if rs > self.rs[rs_regime_ind][-1]:
-            rs = self.rs[-1]
-        if rs < self.rs[rs_regime_ind][0]:
-            rs = self.rs[0]
-
-        if self.x[rs_regime_ind] is not None:
-            if self.x[rs_regime_ind].ndim == 1:
-                if xH > self.x[rs_regime_ind][-1]:
-                    xH = self.x[rs_regime_ind][-1]
-                if xH < self.x[rs_regime_ind][0]:
-                    xH = self.x[rs_regime_ind][0]
-            elif self.x[rs_regime_ind].ndim == 3:
-                xH_arr = self.x[rs_regime_ind][:,0,0]
-                xHe_arr = self.x[rs_regime_ind][0,:,1]
-                if xH > xH_arr[-1]:
-                    xH = xH_arr[-1]
-                if xH < xH_arr[0]:
-                    xH = xH_arr[0]
-                if xHe > xHe_arr[-1]:
-                    xHe = xHe_arr[-1]
-                if xHe < xHe_arr[0]:
-                    xHe = xHe_arr[0]
-
-        if self.grid_vals[rs_regime_ind].ndim == 3:
-            out_grid_vals = inv_func(
-                np.squeeze(rs_regime_interp_func(func(rs)))
-            )
-        elif self.grid_vals[rs_regime_ind].ndim == 4:
-            out_grid_vals = inv_func(
-                np.squeeze(rs_regime_interp_func([func(xH), func(rs)]))
-            )
-        elif self.grid_vals[rs_regime_ind].ndim == 5:
-            out_grid_vals = inv_func(
-                np.squeeze(
-                    rs_regime_interp_func([func(xH), func(xHe), func(rs)])
-                )
-            )
+        Parameters
+        ----------
+        rs_regime_ind : int
+            The index of the redshift regime.
+        corners : list of tuple
+            The corners and weights returned by :func:`.multilinear_weights`.
+        rs : float
+            The redshift (1+z).
+        out : ndarray, optional
+            Array to store the grid values of the result in.
+
+        Returns
+        -------
+        TransFuncAtRedshift
+            The interpolated transfer function.
+
+        """
+
+        grid = self._interp_grid_vals[rs_regime_ind]
+        out_shape = grid.shape[len(corners[0][0]):]
+
+        buf = getattr(self, '_interp_buf', None)
+        if buf is None or buf.shape != out_shape:
+            buf = np.empty(out_shape)
+            self._interp_buf = buf
+
+        out_grid_vals = self._interp_grid(
+            rs_regime_ind, corners, out=out, buf=buf
+        )
 
         return tf.TransFuncAtRedshift(
             out_grid_vals, eng=self.eng, in_eng=self.in_eng,
@@ -690,6 +624,38 @@ class TransferFuncInterp:
             spec_type = self.spec_type
         )
 
+    def get_tf(self, xH, xHe, rs, out=None):
+        """Returns the interpolated transfer function.
+
+        Parameters
+        ----------
+        xH : float
+            The ionization fraction nHII/nH.
+        xHe : float
+            The ionization fraction nHeII/nH.
+        rs : float
+            The redshift (1+z).
+        out : ndarray, optional
+            Array of shape (in_eng, eng) to store the grid values of the result in. A new array is allocated if not specified.
+
+        Returns
+        -------
+        TransFuncAtRedshift
+            The interpolated transfer function.
+
+        Notes
+        -----
+        xH and xHe are clamped to the range of the tabulated values. The interpolation is multilinear over (xH, xHe, rs), in log space if *log_interp* is True. 
+
+        """
+
+        if not hasattr(self, '_interp_nodes'):
+            self._setup_interp()
+
+        rs_regime_ind, corners = self._interp_weights(xH, xHe, rs)
+
+        return self._from_weights(rs_regime_ind, corners, rs, out=out)
+
 
     # def __init__(
     #     self, tflist_arr, x_arr=None, rs_nodes=None, log_interp=True
@@ -844,3 +810,91 @@ class TransferFuncInterps:
     def get_tf(self, xe, rs):
         interpInd = np.searchsorted(self.rs_nodes, rs)
         return self.tfInterps[interpInd].get_tf(xe,rs)
+
+def _same_interp_nodes(interp_1, interp_2):
+    """Checks if two interpolation objects share the same nodes.
+
+    Parameters
+    ----------
+    interp_1, interp_2 : TransferFuncInterp or IonRSInterp
+        The objects to compare.
+
+    Returns
+    -------
+    bool
+        True if the interpolation weights of one object can be used for the other.
+
+    """
+
+    if interp_1 is interp_2:
+        return True
+
+    if (
+        interp_1._log_interp != interp_2._log_interp
+        or len(interp_1._interp_nodes) != len(interp_2._interp_nodes)
+        or (interp_1.rs_nodes is None) != (interp_2.rs_nodes is None)
+    ):
+        return False
+
+    if (
+        interp_1.rs_nodes is not None
+        and not np.array_equal(interp_1.rs_nodes, interp_2.rs_nodes)
+    ):
+        return False
+
+    for nodes_1, nodes_2, bounds_1, bounds_2 in zip(
+        interp_1._interp_nodes, interp_2._interp_nodes,
+        interp_1._interp_bounds, interp_2._interp_bounds
+    ):
+        if bounds_1 != bounds_2 or len(nodes_1) != len(nodes_2):
+            return False
+        if not all(
+            [np.array_equal(a, b) for a,b in zip(nodes_1, nodes_2)]
+        ):
+            return False
+
+    return True
+
+def interp_jointly(interps, xH, xHe, rs):
+    """Interpolates several transfer functions at the same point.
+
+    Parameters
+    ----------
+    interps : list of TransferFuncInterp or IonRSInterp
+        The objects to interpolate.
+    xH : float
+        The ionization fraction nHII/nH.
+    xHe : float
+        The ionization fraction nHeII/nH.
+    rs : float
+        The redshift (1+z).
+
+    Returns
+    -------
+    list
+        The result of :meth:`TransferFuncInterp.get_tf` or :meth:`.IonRSInterp.get_val` for each entry of *interps*. 
+
+    Notes
+    -----
+    The bracketing cell and interpolation weights are only computed once for all objects sharing the same nodes, which is the case for the deposition transfer functions loaded by :func:`config.load_data`.
+
+    """
+
+    weights = []
+    out = []
+
+    for interp in interps:
+
+        if not hasattr(interp, '_interp_nodes'):
+            interp._setup_interp()
+
+        for other, regime_and_corners in weights:
+            if _same_interp_nodes(interp, other):
+                break
+        else:
+            regime_and_corners = interp._interp_weights(xH, xHe, rs)
+            weights.append((interp, regime_and_corners))
+
+        out.append(interp._from_weights(*regime_and_corners, rs))
+
+    return out
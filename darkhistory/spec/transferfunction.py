@@ -1,13 +1,19 @@
 """Functions and classes for processing transfer functions."""
 
 import numpy as np
+import warnings
+from numpy.linalg import matrix_power
 from scipy import interpolate
+from scipy import sparse
 from tqdm import tqdm_notebook as tqdm
 
 import darkhistory.physics as phys
+from darkhistory.spec.spectools import Abscissa
+from darkhistory.spec.spectools import get_log_bin_width
 from darkhistory.spec.spectools import rebin_N_arr
+from darkhistory.spec.spectools import same_abscissa
 from darkhistory.spec.spectra import Spectra
-# from darkhistory.spec.spectrum import Spectrum
+from darkhistory.spec.spectrum import Spectrum
 
 
 class TransFuncAtEnergy(Spectra):
@@ -217,6 +223,8 @@ class TransFuncAtRedshift(Spectra):
         New abscissa to rebin all of the Spectrum objects into.
     with_interp_func : bool
         If true, also returns an interpolation function of the grid.
+    storage : {'dense', 'sparse'}, optional
+        Whether to store the grid values as an ndarray or as a scipy.sparse.csr_matrix. Default is 'dense'.
 
 
     Attributes
@@ -229,12 +237,19 @@ class TransFuncAtRedshift(Spectra):
         Redshift of this transfer function.
     interp_func : function
         The 2D interpolation function.
+    storage : {'dense', 'sparse'}
+        How the grid values are stored.
+
+    Notes
+    -----
+    Transfer functions are often mostly zero, e.g. lower triangular since particles only lose energy. With sparse storage, memory and the cost of :meth:`sum_specs`, :meth:`rebin`, :meth:`matrix_power`, :meth:`switch_spec_type`, :meth:`append` and arithmetic scale with the number of nonzero entries, and these methods keep the grid values sparse. Other methods use *grid_vals*, which always returns a dense array, at the cost of creating the dense array, and return transfer functions with dense storage, e.g. :meth:`at_in_eng`.
 
     """
 
     def __init__(
         self, spec_arr, eng=None, in_eng=None, rs=None,
-        dlnz=-1, spec_type='dNdE', rebin_eng=None, with_interp_func = False
+        dlnz=-1, spec_type='dNdE', rebin_eng=None, with_interp_func = False,
+        storage='dense'
     ):
 
         super().__init__(
@@ -262,6 +277,278 @@ class TransFuncAtRedshift(Spectra):
             #     bounds_error = False, fill_value = 1e-200
             # )
 
+        self.switch_storage(storage)
+
+    @property
+    def storage(self):
+        if sparse.issparse(self._grid_vals):
+            return 'sparse'
+        else:
+            return 'dense'
+
+    @property
+    def grid_vals(self):
+        if sparse.issparse(self._grid_vals):
+            return self._grid_vals.toarray()
+        else:
+            return self._grid_vals
+
+    def switch_storage(self, target=None):
+        """Switches between storing the grid values as an ndarray or a sparse matrix.
+
+        Parameters
+        ----------
+        target : {'dense', 'sparse'}, optional
+            The storage to switch to. Switches to the other storage if not specified.
+
+        Returns
+        -------
+        None
+
+        """
+
+        if target is None:
+            target = 'dense' if self.storage == 'sparse' else 'sparse'
+
+        if target == 'sparse':
+            if not sparse.issparse(self._grid_vals):
+                self._grid_vals = sparse.csr_matrix(self._grid_vals)
+        elif target == 'dense':
+            if sparse.issparse(self._grid_vals):
+                self._grid_vals = self._grid_vals.toarray()
+        else:
+            raise TypeError("storage must be either 'dense' or 'sparse'.")
+
+    def _new_tf(self, grid_vals, N_underflow, eng_underflow, dlnz=None):
+        """Returns a transfer function with the same abscissae and new grid values.
+
+        Parameters
+        ----------
+        grid_vals : ndarray or scipy.sparse matrix
+            The grid values.
+        N_underflow : ndarray
+            The underflow number of particles of each spectrum.
+        eng_underflow : ndarray
+            The underflow energy of each spectrum.
+        dlnz : float, optional
+            d ln(1+z) of the new transfer function. Same as *self.dlnz* if not specified.
+
+        Returns
+        -------
+        TransFuncAtRedshift
+
+        """
+
+        new_tf = TransFuncAtRedshift([])
+
+        if sparse.issparse(grid_vals):
+            new_tf._grid_vals = grid_vals.tocsr()
+        else:
+            new_tf._grid_vals = np.asarray(grid_vals)
+
+        new_tf._spec_type     = self.spec_type
+        new_tf._eng           = self.eng
+        new_tf._in_eng        = self.in_eng
+        new_tf._rs            = self.rs
+        new_tf._N_underflow   = N_underflow
+        new_tf._eng_underflow = eng_underflow
+        new_tf.dlnz           = self.dlnz if dlnz is None else dlnz
+
+        return new_tf
+
+    def __getitem__(self, key):
+
+        if (
+            sparse.issparse(self._grid_vals)
+            and np.issubdtype(type(key), np.int64)
+        ):
+            out_spec = Spectrum(
+                self.eng, self._grid_vals[key].toarray()[0],
+                in_eng=self.in_eng[key], rs=self.rs[key],
+                spec_type=self.spec_type
+            )
+            out_spec.underflow['N']   = self.N_underflow[key]
+            out_spec.underflow['eng'] = self.eng_underflow[key]
+            return out_spec
+
+        return super().__getitem__(key)
+
+    def __add__(self, other):
+        """Adds a transfer function or an array to this transfer function.
+
+        Parameters
+        ----------
+        other : Spectra or ndarray
+            The object to add to the current transfer function.
+
+        Returns
+        -------
+        TransFuncAtRedshift or Spectra
+            A :class:`TransFuncAtRedshift` if the grid values are stored as a sparse matrix, otherwise the same as :meth:`Spectra.__add__`.
+
+        Notes
+        -----
+        The result is stored as a sparse matrix if both grid values are sparse, and as an ndarray otherwise.
+
+        """
+
+        if not sparse.issparse(self._grid_vals):
+            return super().__add__(other)
+
+        if isinstance(other, Spectra):
+
+            if not same_abscissa(self.eng, other.eng):
+                raise TypeError('abscissae are different for the two spectra.')
+
+            if self.spec_type != other.spec_type:
+                raise TypeError('adding spectra of N to spectra of dN/dE.')
+
+            return self._new_tf(
+                self._grid_vals + other._grid_vals,
+                self.N_underflow + other.N_underflow,
+                self.eng_underflow + other.eng_underflow
+            )
+
+        elif isinstance(other, np.ndarray):
+
+            return self._new_tf(
+                self._grid_vals + other,
+                self.N_underflow*0, self.eng_underflow*0
+            )
+
+        else:
+            raise TypeError('adding an object that is not compatible.')
+
+    def __radd__(self, other):
+
+        if not sparse.issparse(self._grid_vals):
+            return super().__radd__(other)
+
+        return self + other
+
+    def __mul__(self, other):
+        """Multiplies this transfer function by a transfer function, array or number.
+
+        Parameters
+        ----------
+        other : Spectra, ndarray, float or int
+            The object to multiply to the current transfer function. An array multiplies each spectrum by the corresponding entry.
+
+        Returns
+        -------
+        TransFuncAtRedshift or Spectra
+            A :class:`TransFuncAtRedshift` if the grid values are stored as a sparse matrix, otherwise the same as :meth:`Spectra.__mul__`.
+
+        Notes
+        -----
+        Products are taken element-wise, as in :meth:`Spectra.__mul__`. Use :meth:`matrix_power` for matrix products.
+
+        """
+
+        if not sparse.issparse(self._grid_vals):
+            return super().__mul__(other)
+
+        if np.isscalar(other):
+
+            return self._new_tf(
+                self._grid_vals*other,
+                self.N_underflow*other, self.eng_underflow*other
+            )
+
+        elif isinstance(other, np.ndarray):
+
+            return self._new_tf(
+                sparse.diags(other).dot(self._grid_vals),
+                self.N_underflow*0, self.eng_underflow*0
+            )
+
+        elif isinstance(other, Spectra):
+
+            if not same_abscissa(self.eng, other.eng):
+                raise TypeError('the two spectra do not have the same abscissa.')
+
+            return self._new_tf(
+                self._grid_vals.multiply(other._grid_vals),
+                self.N_underflow*0, self.eng_underflow*0
+            )
+
+        else:
+            raise TypeError('multiplying an object that is not compatible.')
+
+    def __rmul__(self, other):
+
+        if not sparse.issparse(self._grid_vals):
+            return super().__rmul__(other)
+
+        return self*other
+
+    def __iadd__(self, other):
+
+        if not sparse.issparse(self._grid_vals):
+            return super().__iadd__(other)
+
+        # Sparse matrices cannot be updated in place in general.
+        new_tf = self + other
+        self._grid_vals     = new_tf._grid_vals
+        self._N_underflow   = new_tf._N_underflow
+        self._eng_underflow = new_tf._eng_underflow
+
+        return self
+
+    def __imul__(self, other):
+
+        if not sparse.issparse(self._grid_vals):
+            return super().__imul__(other)
+
+        new_tf = self*other
+        self._grid_vals     = new_tf._grid_vals
+        self._N_underflow   = new_tf._N_underflow
+        self._eng_underflow = new_tf._eng_underflow
+
+        return self
+
+    def matrix_power(self, n):
+        """Multiplies the transfer function with itself.
+
+        Parameters
+        ----------
+        n : int
+            The number of times to apply the transfer function.
+
+        Returns
+        -------
+        TransFuncAtRedshift
+            The transfer function applied *n* times, with dlnz multiplied by *n* and the same storage.
+
+        Notes
+        -----
+        The transfer function must be square, i.e. *in_eng* and *eng* have the same size. Underflow is set to zero.
+
+        """
+
+        if self.in_eng.size != self.eng.size:
+            raise TypeError('transfer function is not square.')
+
+        if not sparse.issparse(self._grid_vals):
+            new_grid_vals = matrix_power(self._grid_vals, n)
+        else:
+            # Exponentiation by squaring.
+            new_grid_vals = sparse.identity(
+                self.eng.size, dtype=self._grid_vals.dtype, format='csr'
+            )
+            square = self._grid_vals
+            k = n
+            while k > 0:
+                if k % 2 == 1:
+                    new_grid_vals = new_grid_vals.dot(square)
+                k //= 2
+                if k > 0:
+                    square = square.dot(square)
+
+        return self._new_tf(
+            new_grid_vals, np.zeros_like(self.in_eng, dtype=float),
+            np.zeros_like(self.in_eng, dtype=float), dlnz=self.dlnz*n
+        )
 
         # if spec_arr != []:
         #     self._grid_vals = np.atleast_2d(
@@ -700,7 +987,7 @@ class TransFuncAtRedshift(Spectra):
         else:
             raise TypeError("indtype must be either ind or in_eng.")
 
-    def sum_specs(self, weight=None):
+    def sum_specs(self, weight=None, out=None):
         """Sums the spectrum in each energy bin, weighted by `weight`.
 
         Applies Spectra.sum_specs, but sets `rs` of the output `Spectrum` correctly.
@@ -709,6 +996,8 @@ class TransFuncAtRedshift(Spectra):
         ----------
         weight : ndarray or Spectrum, optional
             The weight in each redshift bin, with weight of 1 for every bin if not specified.
+        out : Spectrum, optional
+            `Spectrum` to store the result in. See :meth:`Spectra.sum_specs`.
 
         Returns
         -------
@@ -716,7 +1005,33 @@ class TransFuncAtRedshift(Spectra):
             An array or `Spectrum` of weight sums, one for each energy in `self.eng`, with length `self.length`.
 
         """
-        out_spec = super().sum_specs(weight)
+        if sparse.issparse(self._grid_vals):
+            if weight is None:
+                weight = np.ones_like(self.rs)
+            if isinstance(weight, Spectrum):
+                if not np.array_equal(self.in_eng, weight.eng):
+                    raise TypeError('spectra.in_eng must equal weight.eng')
+                spec_type = weight.spec_type
+                weight    = weight.N
+            elif isinstance(weight, np.ndarray):
+                spec_type = self.spec_type
+            else:
+                raise TypeError('weight must be an ndarray or Spectrum.')
+
+            new_data = self._grid_vals.T.dot(weight)
+            if out is None:
+                out_spec = Spectrum(self.eng, new_data, spec_type=spec_type)
+            else:
+                out_spec = out
+                out_spec._data      = new_data
+                out_spec.eng        = self.eng
+                out_spec.length     = self.eng.size
+                out_spec.in_eng     = -1.
+                out_spec._spec_type = spec_type
+                out_spec.underflow  = {'N': 0., 'eng': 0.}
+            out_spec._owned_data = new_data
+        else:
+            out_spec = super().sum_specs(weight, out=out)
         # Remember that self.rs is an array, all with the
         # same value of rs.
         out_spec.rs = self.rs[0]
@@ -724,6 +1039,52 @@ class TransFuncAtRedshift(Spectra):
             out_spec._spec_type = 'dNdE'
         return out_spec
 
+    def rebin(self, out_eng):
+        """ Re-bins all `Spectrum` objects according to a new abscissa.
+
+        Applies Spectra.rebin, but keeps sparse grid values sparse.
+
+        Parameters
+        ----------
+        out_eng : ndarray
+            The new abscissa to bin into.
+
+        Returns
+        -------
+        None
+
+        """
+
+        if not sparse.issparse(self._grid_vals):
+            return super().rebin(out_eng)
+
+        if not np.all(np.diff(out_eng) > 0):
+            raise TypeError('new abscissa must be ordered in increasing energy.')
+
+        abscissa = Abscissa.get(self.eng)
+        rebin_op = abscissa.rebin_operator(out_eng)
+
+        if rebin_op.overflow:
+            warnings.warn("The new abscissa lies below the old one: only bins that lie within the new abscissa will be rebinned, bins above the abscissa will be discarded.", RuntimeWarning)
+
+        N_grid = self._grid_vals
+        if self.spec_type == 'dNdE':
+            N_grid = N_grid.multiply(self.eng * abscissa.log_bin_width)
+        N_grid = sparse.csr_matrix(N_grid)
+
+        new_grid_vals = N_grid.dot(rebin_op.mat.T)
+        if self.spec_type == 'dNdE':
+            new_grid_vals = new_grid_vals.multiply(1/rebin_op.E_dlogE)
+
+        self._eng = np.array(rebin_op.out_eng)
+        self._grid_vals = sparse.csr_matrix(new_grid_vals)
+        self._N_underflow = self._N_underflow + N_grid.dot(
+            rebin_op.N_underflow
+        )
+        self._eng_underflow = self._eng_underflow + N_grid.dot(
+            rebin_op.eng_underflow
+        )
+
     def append(self, spec):
         """Appends a new Spectrum.
 
@@ -740,7 +1101,53 @@ class TransFuncAtRedshift(Spectra):
             if self.rs[-1] != spec.rs:
                 raise TypeError('redshift of the new Spectrum must be the same.')
 
-        super().append(spec)
+        if not sparse.issparse(self._grid_vals):
+            return super().append(spec)
+
+        if not np.array_equal(self.eng, spec.eng):
+            raise TypeError("new Spectrum does not have the same energy abscissa.")
+        if self.spec_type != spec.spec_type:
+            raise TypeError("new Spectrum is not of the same type as the Spectra.")
+
+        # Each append copies the nonzero entries, so sparse transfer 
+        # functions should be built densely and then switched.
+        self._grid_vals = sparse.vstack(
+            [self._grid_vals, sparse.csr_matrix(spec._data)], format='csr'
+        )
+        self._in_eng        = np.append(self._in_eng, spec.in_eng)
+        self._rs            = np.append(self._rs, spec.rs)
+        self._N_underflow   = np.append(
+            self._N_underflow, spec.underflow['N']
+        )
+        self._eng_underflow = np.append(
+            self._eng_underflow, spec.underflow['eng']
+        )
+
+    def switch_spec_type(self, target=None):
+        """Switches between the type of values to be stored.
+
+        Applies Spectra.switch_spec_type, but keeps sparse grid values sparse.
+
+        Parameters
+        ----------
+        target : {'N', 'dNdE'}
+            The target type to switch to.
+        """
+
+        if not sparse.issparse(self._grid_vals):
+            return super().switch_spec_type(target)
+
+        log_bin_width = get_log_bin_width(self.eng)
+        if self.spec_type == 'N' and not target == 'N':
+            self._grid_vals = sparse.csr_matrix(
+                self._grid_vals.multiply(1/(self.eng * log_bin_width))
+            )
+            self._spec_type = 'dNdE'
+        elif self.spec_type == 'dNdE' and not target == 'dNdE':
+            self._grid_vals = sparse.csr_matrix(
+                self._grid_vals.multiply(self.eng * log_bin_width)
+            )
+            self._spec_type = 'N'
 
 
 # def process_raw_tf(file):
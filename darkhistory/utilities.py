@@ -2,8 +2,11 @@
 
 """
 
+import os
+
 import numpy as np
 from scipy.interpolate import RegularGridInterpolator
+from scipy.interpolate import interp1d
 
 
 def arrays_equal(ndarray_list):
@@ -331,6 +334,309 @@ def check_err(val, err, epsrel):
 
     return None
 
+def atomic_savez(file_name, **arrays):
+    """ Saves arrays into an uncompressed ``.npz`` file, replacing it atomically.
+
+    Parameters
+    ----------
+    file_name : str
+        The file to write. Unlike *numpy.savez*, no extension is added.
+    **arrays : ndarray
+        The arrays to save, see *numpy.savez*.
+
+    Returns
+    -------
+    None
+
+    Notes
+    -----
+    The arrays are written to *file_name* + ``'.tmp'`` first, which is then renamed to *file_name*, so that an interrupted write never leaves a partial file behind and never corrupts an existing file.
+    """
+
+    with open(file_name+'.tmp', 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(file_name+'.tmp', file_name)
+
+def multilinear_weights(nodes, pts):
+    """ Returns the corners and weights for multilinear interpolation.
+
+    Parameters
+    ----------
+    nodes : sequence of ndarray
+        The increasing abscissae of each axis of the grid.
+    pts : sequence of float
+        The point to interpolate at, one value per axis. Values outside of the abscissae are clamped to the boundary.
+
+    Returns
+    -------
+    list of tuple
+        Each entry is (index, weight), where index is a tuple of indices of a corner of the bracketing cell. Corners with zero weight are omitted.
+
+    Notes
+    -----
+    The grid value at the point is the sum of weight times the grid value at index over all entries, which is the same as ``scipy.interpolate.RegularGridInterpolator`` with ``method='linear'``.
+    """
+
+    corners = [((), 1.)]
+
+    for abscissa, pt in zip(nodes, pts):
+
+        if abscissa.size == 1:
+            corners = [(ind + (0,), wt) for ind, wt in corners]
+            continue
+
+        if pt <= abscissa[0]:
+            i, t = 0, 0.
+        elif pt >= abscissa[-1]:
+            i, t = abscissa.size - 2, 1.
+        else:
+            i = np.searchsorted(abscissa, pt, side='right') - 1
+            t = (pt - abscissa[i])/(abscissa[i+1] - abscissa[i])
+
+        new_corners = []
+        for ind, wt in corners:
+            if t < 1:
+                new_corners.append((ind + (i,), wt*(1. - t)))
+            if t > 0:
+                new_corners.append((ind + (i+1,), wt*t))
+        corners = new_corners
+
+    return corners
+
+def multilinear_sum(grid, corners, out=None, buf=None):
+    """ Weighted sum of grid values at the corners of a cell.
+
+    Parameters
+    ----------
+    grid : ndarray
+        The grid, with the leading axes indexed by the corner indices.
+    corners : list of tuple
+        Corners and weights, as returned by :func:`multilinear_weights`.
+    out : ndarray, optional
+        Array to store the result in.
+    buf : ndarray, optional
+        Scratch array with the same shape as *out*, used when there is more than one corner.
+
+    Returns
+    -------
+    ndarray
+        The weighted sum.
+
+    """
+
+    ind, wt = corners[0]
+    out = np.multiply(grid[ind], wt, out=out)
+
+    if len(corners) > 1 and buf is None:
+        buf = np.empty_like(out)
+
+    for ind, wt in corners[1:]:
+        np.multiply(grid[ind], wt, out=buf)
+        out += buf
+
+    return out
+
+class MultilinearInterpMixin:
+
+    """Multilinear interpolation over ionization and redshift.
+
+    Shared by :class:`.TransferFuncInterp` and :class:`.IonRSInterp`, which set the attributes below and call :meth:`_init_interp` at the end of initialization.
+
+    Attributes
+    ----------
+    rs : list of ndarray
+        Increasing redshift abscissa of each redshift regime.
+    x : list of None or ndarray
+        None, array of xH or array of (xH, xHe) of each redshift regime.
+    rs_nodes : None or ndarray
+        List of redshifts to transition between redshift regimes.
+    grid_vals : list of ndarray
+        The grid values in each redshift regime, indexed by (rs, ...), (xH, rs, ...) or (xH, xHe, rs, ...).
+    interp_func : list of function
+        An interpolation function over xH (optionally xHe) and rs for each redshift regime.
+
+    Notes
+    -----
+    Values are interpolated with :func:`multilinear_weights` and :func:`multilinear_sum` on the grids in *_interp_grid_vals*, which are the log of the grid values if *_log_interp* is True.
+
+    """
+
+    def _interp_space(self):
+        """Returns the function taking values into the space used for interpolation.
+
+        Returns
+        -------
+        function
+            np.log if *_log_interp* is True, and the identity otherwise.
+
+        """
+
+        if self._log_interp:
+            return np.log
+        else:
+            def func(obj):
+                return obj
+            return func
+
+    def _init_interp(self, log_interp):
+        """Computes the grids and interpolation functions.
+
+        Parameters
+        ----------
+        log_interp : bool
+            If True, interpolates over the log of the grid values. Grid values that are not positive are set to 1e-200 first.
+
+        Returns
+        -------
+        None
+
+        """
+
+        self._log_interp = log_interp
+
+        if self._log_interp:
+            for grid in self.grid_vals:
+                grid[grid <= 0] = 1e-200
+        else:
+            print('noninterp')
+
+        func = self._interp_space()
+
+        # Grid values in the space used for interpolation, computed once.
+        self._interp_grid_vals = [func(grid) for grid in self.grid_vals]
+
+        self.interp_func = []
+        for x_vals,z,grid in zip(self.x, self.rs, self._interp_grid_vals):
+            if x_vals is None:
+                # No xe dependence.
+                self.interp_func.append(
+                    interp1d(func(z), np.squeeze(grid), axis=0)
+                )
+            elif x_vals.ndim == 1:
+                # xH dependence.
+                self.interp_func.append(
+                    RegularGridInterpolator(
+                        (func(x_vals), func(z)), grid
+                    )
+                )
+            elif x_vals.ndim == 3:
+                # xH, xHe dependence.
+                xH_arr = x_vals[:,0,0]
+                xHe_arr = x_vals[0,:,1]
+                self.interp_func.append(
+                    RegularGridInterpolator(
+                        (func(xH_arr), func(xHe_arr), func(z)), grid
+                    )
+                )
+            else:
+                raise TypeError('grid has anomalous dimensions (and not in a good QFT way).')
+
+        self._setup_interp()
+
+    def _setup_interp(self):
+        """Stores the abscissae of each redshift regime in the space used for interpolation.
+
+        Returns
+        -------
+        None
+
+        """
+
+        func = self._interp_space()
+
+        if not hasattr(self, '_interp_grid_vals'):
+            # Objects pickled before the interpolation grid was stored.
+            self._interp_grid_vals = [
+                interp.y if isinstance(interp, interp1d) else interp.values
+                for interp in self.interp_func
+            ]
+
+        self._interp_nodes  = []
+        self._interp_bounds = []
+        for x_vals,z in zip(self.x, self.rs):
+            if x_vals is None:
+                x_axes = []
+            elif x_vals.ndim == 1:
+                x_axes = [x_vals]
+            elif x_vals.ndim == 3:
+                x_axes = [x_vals[:,0,0], x_vals[0,:,1]]
+            else:
+                raise TypeError('x has an anomalous dimension (and not in a good QFT way).')
+
+            self._interp_bounds.append([(arr[0], arr[-1]) for arr in x_axes])
+            self._interp_nodes.append(
+                tuple([func(arr) for arr in x_axes] + [func(z)])
+            )
+
+    def _interp_weights(self, xH, xHe, rs):
+        """Finds the bracketing cell and the interpolation weights.
+
+        Parameters
+        ----------
+        xH : float
+            The ionization fraction nHII/nH.
+        xHe : float
+            The ionization fraction nHeII/nH.
+        rs : float
+            The redshift (1+z).
+
+        Returns
+        -------
+        tuple
+            The index of the redshift regime, and the corners and weights returned by :func:`multilinear_weights`.
+
+        """
+
+        func = self._interp_space()
+
+        if self.rs_nodes is None:
+            rs_regime_ind = 0
+        else:
+            rs_regime_ind = np.searchsorted(self.rs_nodes, rs)
+        if rs > self.rs[rs_regime_ind][-1] or rs < self.rs[rs_regime_ind][0]:
+            raise TypeError('redshift lies outside of range.')
+
+        # Make sure xH and xHe are within bounds.
+        pts = [
+            func(min(max(x, lo), hi)) for x,(lo,hi) in zip(
+                (xH, xHe), self._interp_bounds[rs_regime_ind]
+            )
+        ]
+        pts.append(func(rs))
+
+        return rs_regime_ind, multilinear_weights(
+            self._interp_nodes[rs_regime_ind], pts
+        )
+
+    def _interp_grid(self, rs_regime_ind, corners, out=None, buf=None):
+        """Returns the interpolated grid values given the interpolation weights.
+
+        Parameters
+        ----------
+        rs_regime_ind : int
+            The index of the redshift regime.
+        corners : list of tuple
+            The corners and weights returned by :func:`multilinear_weights`.
+        out : ndarray, optional
+            Array to store the result in.
+        buf : ndarray, optional
+            Scratch array, see :func:`multilinear_sum`.
+
+        Returns
+        -------
+        ndarray
+            The interpolated grid values.
+
+        """
+
+        out_grid_vals = multilinear_sum(
+            self._interp_grid_vals[rs_regime_ind], corners, out=out, buf=buf
+        )
+        if self._log_interp:
+            np.exp(out_grid_vals, out=out_grid_vals)
+
+        return out_grid_vals
+
 class Interpolator2D:
 
     """Interpolation function over a list of objects.
@@ -1,8 +1,12 @@
 """ The main DarkHistory function.
 
 """
+import os
+import time
+import hashlib
+import types
+
 import numpy as np
-from numpy.linalg import matrix_power
 
 # from config import data_path, photeng, eleceng
 # from tf_data import *
@@ -11,18 +15,19 @@ from config import load_data
 
 
 import darkhistory.physics as phys
+import darkhistory.utilities as utils
 
 from   darkhistory.spec import pppc
 from   darkhistory.spec.spectrum import Spectrum
 from   darkhistory.spec.spectra import Spectra
 import darkhistory.spec.transferfunction as tf
-from   darkhistory.spec.spectools import rebin_N_arr
+from   darkhistory.spec.transferfunclist import interp_jointly
 from   darkhistory.spec.spectools import EnglossRebinData
 
 from darkhistory.electrons import positronium as pos
 from darkhistory.electrons.elec_cooling import get_elec_cooling_tf
 
-from darkhistory.low_energy.lowE_deposition import compute_fs
+from darkhistory.low_energy.lowE_deposition import DepositionPlan
 from darkhistory.low_energy.lowE_electrons import make_interpolator
 
 from darkhistory.history import tla
@@ -37,7 +42,9 @@ def evolve(
     photoion_rate_func=None, photoheat_rate_func=None, xe_reion_func=None,
     init_cond=None, coarsen_factor=1, backreaction=True, 
     compute_fs_method='no_He', mxstep=1000, rtol=1e-4,
-    use_tqdm=True, cross_check=False
+    use_tqdm=True, cross_check=False, output_sink=None, store_output=True,
+    checkpoint_file=None, checkpoint_interval=100, elec_cooling_table=None,
+    ics_spec_table=None
 ):
     """
     Main function computing histories and spectra. 
@@ -96,6 +103,18 @@ def evolve(
         Uses tqdm if *True*. Default is *True*. 
     cross_check : bool, optional
         If *True*, compare against 1604.02457 by using original MEDEA files, turning off partial binning, etc. Default is *False*.
+    output_sink : function, optional
+        Called at the end of every step with a dict containing the redshift *rs*, *x*, *Tm*, the :class:`.Spectrum` objects *highengphot*, *lowengphot* and *lowengelec* and the arrays *f_low* and *f_high* of that step. See :class:`.ChunkedOutput` for a sink that stores the results on disk. 
+    store_output : bool, optional
+        If *False*, the output spectra are not kept in memory, and are set to *None* in the returned dict. Use together with *output_sink* for long runs. Default is *True*.
+    checkpoint_file : str, optional
+        File to save the state of the run to every *checkpoint_interval* steps. If the file exists, the run resumes from the saved state, and a *ValueError* is raised if the file was saved by a run with different arguments. The file is removed once the run completes. 
+    checkpoint_interval : int, optional
+        Number of steps between checkpoints. Default is 100.
+    elec_cooling_table : :class:`.ElecCoolingTable`, optional
+        Table of electron cooling transfer functions to interpolate instead of calling :func:`.get_elec_cooling_tf` at every step. See :class:`.ElecCoolingTable` for the fallback to direct computation. 
+    ics_spec_table : :class:`.ICSSpecTable`, optional
+        Table of ICS and energy loss spectra to interpolate instead of calling :func:`.ics_spec` and :func:`.engloss_spec` at every step. Must have the same abscissae as the default binning to be used. 
 
     Examples
     --------
@@ -163,71 +182,15 @@ def evolve(
 
 
     # Handle the case where a DM process is specified. 
-    if DM_process == 'swave':
-        if sigmav is None or start_rs is None:
-            raise ValueError(
-                'sigmav and start_rs must be specified.'
-            )
-        
-        # Get input spectra from PPPC. 
-        in_spec_elec = pppc.get_pppc_spec(mDM, eleceng, primary, 'elec')
-        in_spec_phot = pppc.get_pppc_spec(mDM, photeng, primary, 'phot')
-        # Initialize the input spectrum redshift. 
-        in_spec_elec.rs = start_rs
-        in_spec_phot.rs = start_rs
-        # Convert to type 'N'. 
-        in_spec_elec.switch_spec_type('N')
-        in_spec_phot.switch_spec_type('N')
-
-        # If struct_boost is none, just set to 1. 
-        if struct_boost is None:
-            def struct_boost(rs):
-                return 1.
-
-        # Define the rate functions. 
-        def rate_func_N(rs):
-            return (
-                phys.inj_rate('swave', rs, mDM=mDM, sigmav=sigmav)
-                * struct_boost(rs) / (2*mDM)
-            )
-        def rate_func_eng(rs):
-            return (
-                phys.inj_rate('swave', rs, mDM=mDM, sigmav=sigmav) 
-                * struct_boost(rs)
-            )
-
-    if DM_process == 'decay':
-        if lifetime is None or start_rs is None:
-            raise ValueError(
-                'lifetime and start_rs must be specified.'
-            )
-
-        # The decay rate is insensitive to structure formation
-        def struct_boost(rs):
-            return 1
-        
-        # Get spectra from PPPC.
-        in_spec_elec = pppc.get_pppc_spec(
-            mDM, eleceng, primary, 'elec', decay=True
-        )
-        in_spec_phot = pppc.get_pppc_spec(
-            mDM, photeng, primary, 'phot', decay=True
-        )
-
-        # Initialize the input spectrum redshift. 
-        in_spec_elec.rs = start_rs
-        in_spec_phot.rs = start_rs
-        # Convert to type 'N'. 
-        in_spec_elec.switch_spec_type('N')
-        in_spec_phot.switch_spec_type('N')
-
-        # Define the rate functions. 
-        def rate_func_N(rs):
-            return (
-                phys.inj_rate('decay', rs, mDM=mDM, lifetime=lifetime) / mDM
-            )
-        def rate_func_eng(rs):
-            return phys.inj_rate('decay', rs, mDM=mDM, lifetime=lifetime) 
+    (
+        in_spec_elec, in_spec_phot, rate_func_N, rate_func_eng, struct_boost
+    ) = get_injection(
+        eleceng, photeng, in_spec_elec=in_spec_elec, 
+        in_spec_phot=in_spec_phot, rate_func_N=rate_func_N, 
+        rate_func_eng=rate_func_eng, DM_process=DM_process, mDM=mDM, 
+        sigmav=sigmav, lifetime=lifetime, primary=primary, 
+        struct_boost=struct_boost, start_rs=start_rs
+    )
     
     #####################################
     # Input Checks                      #
@@ -284,12 +247,14 @@ def evolve(
     # coarsening. 
     dt   = dlnz * coarsen_factor / phys.hubble(rs)
 
+    # The number of steps, so that the results can be stored in 
+    # preallocated arrays.
+    n_steps = _get_n_steps(start_rs, end_rs, dlnz * coarsen_factor)
+
     # tqdm set-up.
     if use_tqdm:
         from tqdm import tqdm_notebook as tqdm
-        pbar = tqdm(
-            total=np.ceil((np.log(rs) - np.log(end_rs))/dlnz/coarsen_factor)
-        ) 
+        pbar = tqdm(total=n_steps) 
 
     def norm_fac(rs):
         # Normalization to convert from per injection event to 
@@ -337,31 +302,178 @@ def evolve(
     #########################################################################
     #########################################################################
 
-    # Initialize the arrays that will contain x and Tm results. 
-    x_arr  = np.array([[xH_init, xHe_init]])
-    Tm_arr = np.array([Tm_init])
-
-    # Initialize Spectra objects to contain all of the output spectra.
+    # All results are written into arrays allocated once here, indexed by 
+    # the step i_step. 
+    i_step = 0
 
-    out_highengphot_specs = Spectra([], spec_type='N')
-    out_lowengphot_specs  = Spectra([], spec_type='N')
-    out_lowengelec_specs  = Spectra([], spec_type='N')
+    # Initialize the arrays that will contain x and Tm results. 
+    x_arr  = np.zeros((max(n_steps, 1), 2))
+    Tm_arr = np.zeros(max(n_steps, 1))
+
+    x_arr[0]  = [xH_init, xHe_init]
+    Tm_arr[0] = Tm_init
+
+    # Initialize arrays to contain all of the output spectra, indexed by 
+    # (step, eng). These are stored in Spectra objects at the end. 
+    out_specs_eng = {
+        'highengphot': in_spec_phot.eng,
+        'lowengphot':  in_spec_phot.eng,
+        'lowengelec':  in_spec_elec.eng
+    }
+    out_specs_N = {
+        key: np.zeros((n_steps if store_output else 0, eng.size)) 
+        for key, eng in out_specs_eng.items()
+    }
+    # Redshift, injection energy, N underflow and energy underflow 
+    # of each output spectrum.
+    out_specs_info = {
+        key: np.zeros((n_steps, 4)) for key in out_specs_eng
+    }
 
-    # Define these methods for speed.
-    append_highengphot_spec = out_highengphot_specs.append
-    append_lowengphot_spec  = out_lowengphot_specs.append
-    append_lowengelec_spec  = out_lowengelec_specs.append
+    def save_spec(key, spec):
+        # Store spec as the output spectrum at step i_step. 
+        out_specs_info[key][i_step] = [
+            spec.rs, spec.in_eng, spec.underflow['N'], spec.underflow['eng']
+        ]
+        if store_output:
+            out_specs_N[key][i_step] = spec.N
 
     # Initialize arrays to store f values. 
-    f_low  = np.empty((0,5))
-    f_high = np.empty((0,5))
+    f_low  = np.zeros((n_steps, 5))
+    f_high = np.zeros((n_steps, 5))
 
     # Initialize array to store high-energy energy deposition rate. 
-    highengdep_grid = np.empty((0,4))
+    highengdep_grid = np.zeros((n_steps, 4))
 
 
     # Object to help us interpolate over MEDEA results. 
-    MEDEA_interp = make_interpolator(interp_type='2D', cross_check=cross_check)
+    MEDEA_interp = get_MEDEA_interp(cross_check=cross_check)
+
+    # Parts of compute_fs that only depend on the abscissae. 
+    deposition_plan = DepositionPlan(
+        photeng, eleceng, method=compute_fs_method, cross_check=cross_check
+    )
+
+    #####################################
+    # Checkpoints                       #
+    #####################################
+
+    spec_keys = ['highengphot', 'lowengphot', 'lowengelec']
+
+    if checkpoint_file is not None:
+        # Identifies the arguments of this run, so that a checkpoint saved 
+        # by a different run is not resumed. 
+        fingerprint = _evolve_fingerprint(
+            {
+                'in_spec_elec': in_spec_elec, 'in_spec_phot': in_spec_phot,
+                'DM_process': DM_process, 'mDM': mDM, 'sigmav': sigmav, 
+                'lifetime': lifetime, 'primary': primary, 
+                'end_rs': end_rs, 'helium_TLA': helium_TLA, 
+                'reion_switch': reion_switch, 'reion_rs': reion_rs,
+                'init_cond': init_cond, 'coarsen_factor': coarsen_factor,
+                'backreaction': backreaction, 
+                'compute_fs_method': compute_fs_method, 'mxstep': mxstep,
+                'rtol': rtol, 'cross_check': cross_check
+            }, 
+            {
+                'rate_func_N': rate_func_N, 'rate_func_eng': rate_func_eng,
+                'struct_boost': struct_boost, 
+                'photoion_rate_func': photoion_rate_func,
+                'photoheat_rate_func': photoheat_rate_func,
+                'xe_reion_func': xe_reion_func
+            },
+            np.exp(np.linspace(np.log(start_rs), np.log(end_rs), 10))
+        )
+
+    def save_checkpoint():
+        # Save everything needed to restart the loop at step i_step. 
+        ckpt = {
+            'fingerprint': fingerprint,
+            'rs': rs, 'i_step': i_step, 'n_steps': n_steps, 
+            'start_rs': start_rs, 'step_dlnz': dlnz * coarsen_factor,
+            'x': x_arr[:i_step+1], 'Tm': Tm_arr[:i_step+1],
+            'f_low': f_low[:i_step], 'f_high': f_high[:i_step],
+            'highengdep_grid': highengdep_grid[:i_step],
+            'highengdep_at_rs': highengdep_at_rs
+        }
+        for key, spec in zip(spec_keys, [
+            highengphot_spec_at_rs, lowengphot_spec_at_rs, 
+            lowengelec_spec_at_rs
+        ]):
+            ckpt[key+'_at_rs_data'] = spec._data
+            ckpt[key+'_at_rs_eng']  = spec.eng
+            ckpt[key+'_at_rs_info'] = [
+                spec.rs, spec.in_eng, 
+                spec.underflow['N'], spec.underflow['eng']
+            ]
+            ckpt[key+'_at_rs_spec_type'] = spec.spec_type
+            ckpt[key+'_info'] = out_specs_info[key][:i_step]
+            if store_output:
+                ckpt[key+'_N'] = out_specs_N[key][:i_step]
+
+        if output_sink is not None and hasattr(output_sink, 'flush'):
+            output_sink.flush()
+
+        # An interrupted write does not corrupt the previous checkpoint. 
+        utils.atomic_savez(checkpoint_file, **ckpt)
+
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+
+        with np.load(checkpoint_file) as ckpt:
+
+            if (
+                'fingerprint' not in ckpt
+                or str(ckpt['fingerprint']) != fingerprint
+            ):
+                raise ValueError('checkpoint_file was saved by a run with different arguments.')
+
+            if (
+                int(ckpt['n_steps']) != n_steps
+                or float(ckpt['start_rs']) != start_rs
+                or float(ckpt['step_dlnz']) != dlnz * coarsen_factor
+                or ('highengphot_N' in ckpt) != store_output
+            ):
+                raise ValueError('checkpoint_file does not match this run.')
+
+            rs     = float(ckpt['rs'])
+            i_step = int(ckpt['i_step'])
+
+            x_arr[:i_step+1]  = ckpt['x']
+            Tm_arr[:i_step+1] = ckpt['Tm']
+            f_low[:i_step]    = ckpt['f_low']
+            f_high[:i_step]   = ckpt['f_high']
+            highengdep_grid[:i_step] = ckpt['highengdep_grid']
+            highengdep_at_rs = ckpt['highengdep_at_rs']
+
+            specs_at_rs = []
+            for key in spec_keys:
+                info = ckpt[key+'_at_rs_info']
+                spec = Spectrum(
+                    ckpt[key+'_at_rs_eng'], ckpt[key+'_at_rs_data'],
+                    rs=info[0], in_eng=info[1], 
+                    spec_type=str(ckpt[key+'_at_rs_spec_type'])
+                )
+                spec.underflow['N']   = info[2]
+                spec.underflow['eng'] = info[3]
+                specs_at_rs.append(spec)
+
+                out_specs_info[key][:i_step] = ckpt[key+'_info']
+                if store_output:
+                    out_specs_N[key][:i_step] = ckpt[key+'_N']
+
+            (
+                highengphot_spec_at_rs, lowengphot_spec_at_rs, 
+                lowengelec_spec_at_rs
+            ) = specs_at_rs
+
+        dt = dlnz * coarsen_factor / phys.hubble(rs)
+
+        if use_tqdm:
+            pbar.update(i_step)
+
+    # Discard any results stored by the sink beyond the current step. 
+    if output_sink is not None and hasattr(output_sink, 'truncate'):
+        output_sink.truncate(i_step)
 
     #########################################################################
     #########################################################################
@@ -375,6 +487,12 @@ def evolve(
         if use_tqdm:
             pbar.update(1)
 
+        if (
+            checkpoint_file is not None and i_step > 0 
+            and i_step % checkpoint_interval == 0
+        ):
+            save_checkpoint()
+
         #############################
         # First Step Special Cases  #
         #############################
@@ -399,17 +517,14 @@ def evolve(
         if elec_processes:
 
             if backreaction:
-                xHII_elec_cooling  = x_arr[-1, 0]
-                xHeII_elec_cooling = x_arr[-1, 1]
+                xHII_elec_cooling  = x_arr[i_step, 0]
+                xHeII_elec_cooling = x_arr[i_step, 1]
             else:
                 xHII_elec_cooling  = phys.xHII_std(rs)
                 xHeII_elec_cooling = phys.xHeII_std(rs)
 
-            (
-                ics_sec_phot_tf, elec_processes_lowengelec_tf,
-                deposited_ion_arr, deposited_exc_arr, deposited_heat_arr,
-                continuum_loss, deposited_ICS_arr
-            ) = get_elec_cooling_tf(
+            def get_elec_cooling_tf_direct():
+                return get_elec_cooling_tf(
                     eleceng, photeng, rs,
                     xHII_elec_cooling, xHeII=xHeII_elec_cooling,
                     raw_thomson_tf=ics_thomson_ref_tf, 
@@ -417,9 +532,25 @@ def evolve(
                     raw_engloss_tf=engloss_ref_tf,
                     coll_ion_sec_elec_specs=coll_ion_sec_elec_specs, 
                     coll_exc_sec_elec_specs=coll_exc_sec_elec_specs,
-                    ics_engloss_data=ics_engloss_data
+                    ics_engloss_data=ics_engloss_data,
+                    ics_spec_table=ics_spec_table
                 )
 
+            if elec_cooling_table is None:
+                elec_cooling_tfs = get_elec_cooling_tf_direct()
+            else:
+                elec_cooling_tfs = elec_cooling_table.get_tf(
+                    eleceng, photeng, rs, 
+                    xHII_elec_cooling, xHeII_elec_cooling, 
+                    get_elec_cooling_tf_direct
+                )
+
+            (
+                ics_sec_phot_tf, elec_processes_lowengelec_tf,
+                deposited_ion_arr, deposited_exc_arr, deposited_heat_arr,
+                continuum_loss, deposited_ICS_arr
+            ) = elec_cooling_tfs
+
             # Apply the transfer function to the input electron spectrum. 
 
             # Low energy electrons from electron cooling, per injection event.
@@ -428,9 +559,8 @@ def evolve(
             )
 
             # Add this to lowengelec_at_rs. 
-            lowengelec_spec_at_rs += (
-                elec_processes_lowengelec_spec*norm_fac(rs)
-            )
+            elec_processes_lowengelec_spec *= norm_fac(rs)
+            lowengelec_spec_at_rs += elec_processes_lowengelec_spec
 
             # High-energy deposition into ionization, 
             # *per baryon in this step*. 
@@ -470,10 +600,13 @@ def evolve(
 
         # Add injected photons + photons from injected electrons
         # to the photon spectrum that got propagated forward. 
+        # ics_phot_spec and positronium_phot_spec are new in every step,
+        # and are updated in place.
         if elec_processes:
-            highengphot_spec_at_rs += (
-                in_spec_phot + ics_phot_spec + positronium_phot_spec
-            ) * norm_fac(rs)
+            ics_phot_spec += in_spec_phot
+            ics_phot_spec += positronium_phot_spec
+            ics_phot_spec *= norm_fac(rs)
+            highengphot_spec_at_rs += ics_phot_spec
         else:
             highengphot_spec_at_rs += in_spec_phot * norm_fac(rs)
 
@@ -488,9 +621,9 @@ def evolve(
 
         # At this point, highengphot_at_rs, lowengphot_at_rs and 
         # lowengelec_at_rs have been computed for this redshift. 
-        append_highengphot_spec(highengphot_spec_at_rs)
-        append_lowengphot_spec(lowengphot_spec_at_rs)
-        append_lowengelec_spec(lowengelec_spec_at_rs)
+        save_spec('highengphot', highengphot_spec_at_rs)
+        save_spec('lowengphot',  lowengphot_spec_at_rs)
+        save_spec('lowengelec',  lowengelec_spec_at_rs)
 
         #####################################################################
         #####################################################################
@@ -510,7 +643,10 @@ def evolve(
         if backreaction:
             # Use the previous values with backreaction.
             x_vec_for_f = np.array(
-                [1. - x_arr[-1, 0], phys.chi - x_arr[-1, 1], x_arr[-1, 1]]
+                [
+                    1. - x_arr[i_step, 0], phys.chi - x_arr[i_step, 1], 
+                    x_arr[i_step, 1]
+                ]
             )
         else:
             # Use baseline values if no backreaction. 
@@ -520,22 +656,29 @@ def evolve(
                     phys.xHeII_std(rs)
             ])
 
-        f_raw = compute_fs(
-            MEDEA_interp, lowengelec_spec_at_rs, lowengphot_spec_at_rs,
+        f_raw = deposition_plan.compute_fs(
+            MEDEA_interp, lowengelec_spec_at_rs.N, lowengphot_spec_at_rs.N,
             x_vec_for_f, rate_func_eng_unclustered(rs), dt,
-            highengdep_at_rs, method=compute_fs_method, cross_check=cross_check
+            highengdep_at_rs, rs
         )
 
         # Save the f_c(z) values.
-        f_low  = np.concatenate((f_low,  [f_raw[0]]))
-        f_high = np.concatenate((f_high, [f_raw[1]]))
+        f_low[i_step]  = f_raw[0]
+        f_high[i_step] = f_raw[1]
 
         # print(f_low, f_high)
 
         # Save CMB upscattered rate and high-energy deposition rate.
-        highengdep_grid = np.concatenate(
-            (highengdep_grid, [highengdep_at_rs])
-        )
+        highengdep_grid[i_step] = highengdep_at_rs
+
+        if output_sink is not None:
+            output_sink({
+                'rs': rs, 'x': x_arr[i_step].copy(), 'Tm': Tm_arr[i_step],
+                'highengphot': highengphot_spec_at_rs,
+                'lowengphot':  lowengphot_spec_at_rs,
+                'lowengelec':  lowengelec_spec_at_rs,
+                'f_low': f_raw[0], 'f_high': f_raw[1]
+            })
 
         # Compute f for TLA: sum of low and high. 
         f_H_ion = f_raw[0][0] + f_raw[1][0]
@@ -567,7 +710,7 @@ def evolve(
         # Initial conditions for the TLA, (Tm, xHII, xHeII, xHeIII). 
         # This is simply the last set of these variables. 
         init_cond_TLA = np.array(
-            [Tm_arr[-1], x_arr[-1,0], x_arr[-1,1], 0]
+            [Tm_arr[i_step], x_arr[i_step,0], x_arr[i_step,1], 0]
         )
 
         # Solve the TLA for x, Tm for the *next* step. 
@@ -596,8 +739,8 @@ def evolve(
             xHeII_to_interp = phys.xHeII_std(rs)
         else:
             # Interpolate using the current xHII, xHeII values.
-            xHII_to_interp  = x_arr[-1,0]
-            xHeII_to_interp = x_arr[-1,1]
+            xHII_to_interp  = x_arr[i_step,0]
+            xHeII_to_interp = x_arr[i_step,1]
 
         highengphot_tf, lowengphot_tf, lowengelec_tf, highengdep_arr = (
             get_tf(
@@ -607,22 +750,24 @@ def evolve(
         )
 
         # Get the spectra for the next step by applying the 
-        # transfer functions. 
+        # transfer functions to the spectrum saved in this step. 
+        highengphot_spec_saved = highengphot_spec_at_rs
+
         highengdep_at_rs = np.dot(
             np.swapaxes(highengdep_arr, 0, 1),
-            out_highengphot_specs[-1].N
+            highengphot_spec_saved.N
         )
 
         highengphot_spec_at_rs = highengphot_tf.sum_specs(
-            out_highengphot_specs[-1]
+            highengphot_spec_saved
         )
         
         lowengphot_spec_at_rs  = lowengphot_tf.sum_specs(
-            out_highengphot_specs[-1]
+            highengphot_spec_saved
         )
 
         lowengelec_spec_at_rs  = lowengelec_tf.sum_specs(
-            out_highengphot_specs[-1]
+            highengphot_spec_saved
         )
 
 
@@ -635,22 +780,19 @@ def evolve(
             # values for the next redshift.
 
             # Save the x, Tm data for the next step in x_arr and Tm_arr.
-            Tm_arr = np.append(Tm_arr, new_vals[-1, 0])
+            Tm_arr[i_step+1] = new_vals[-1, 0]
 
             if helium_TLA:
-                # Append the calculated xHe to x_arr. 
-                x_arr  = np.append(
-                        x_arr,  [[new_vals[-1,1], new_vals[-1,2]]], axis=0
-                    )
+                # Save the calculated xHe in x_arr. 
+                x_arr[i_step+1] = [new_vals[-1,1], new_vals[-1,2]]
             else:
-                # Append the baseline solution value. 
-                x_arr  = np.append(
-                    x_arr,  [[new_vals[-1,1], phys.xHeII_std(next_rs)]], axis=0
-                )
+                # Save the baseline solution value. 
+                x_arr[i_step+1] = [new_vals[-1,1], phys.xHeII_std(next_rs)]
 
         # Re-define existing variables. 
         rs = next_rs
         dt = dlnz * coarsen_factor/phys.hubble(rs)
+        i_step += 1
 
     #########################################################################
     #########################################################################
@@ -662,6 +804,26 @@ def evolve(
     if use_tqdm:
         pbar.close()
 
+    if output_sink is not None and hasattr(output_sink, 'flush'):
+        output_sink.flush()
+
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+
+    # Store the output spectra. 
+    out_specs = {}
+    for key in spec_keys:
+        if not store_output:
+            out_specs[key] = None
+            continue
+        out_specs[key] = Spectra(
+            out_specs_N[key], eng=out_specs_eng[key], 
+            in_eng=out_specs_info[key][:,1], rs=out_specs_info[key][:,0],
+            spec_type='N'
+        )
+        out_specs[key]._N_underflow   = out_specs_info[key][:,2]
+        out_specs[key]._eng_underflow = out_specs_info[key][:,3]
+
     f_to_return = (f_low, f_high)
     
     # Some processing to get the data into presentable shape. 
@@ -685,164 +847,1172 @@ def evolve(
     }
 
     data = {
-        'rs': out_highengphot_specs.rs,
+        'rs': out_specs_info['highengphot'][:,0],
         'x': x_arr, 'Tm': Tm_arr, 
-        'highengphot': out_highengphot_specs,
-        'lowengphot': out_lowengphot_specs, 
-        'lowengelec': out_lowengelec_specs,
+        'highengphot': out_specs['highengphot'],
+        'lowengphot': out_specs['lowengphot'], 
+        'lowengelec': out_specs['lowengelec'],
         'f': f
     }
 
     return data
 
-def get_elec_cooling_data(eleceng, photeng):
+def evolve_batch(
+    models, end_rs=4, helium_TLA=False,
+    reion_switch=False, reion_rs=None,
+    photoion_rate_func=None, photoheat_rate_func=None, xe_reion_func=None,
+    coarsen_factor=1, backreaction=True, 
+    compute_fs_method='no_He', mxstep=1000, rtol=1e-4,
+    use_tqdm=True, cross_check=False, output_sink=None, store_output=True,
+    checkpoint_file=None, checkpoint_interval=100, elec_cooling_table=None,
+    ics_spec_table=None
+):
     """
-    Returns electron cooling data for use in :func:`main.evolve`.
+    Computes histories and spectra for many injection models at once. 
+
+    All models are evolved through a single redshift loop. Spectra are stored as stacked arrays, transfer functions are shared between models with the same ionization state, and the TLA is solved for all models as a single system. 
 
     Parameters
-    ----------
-    eleceng : ndarray
-        The electron energy abscissa. 
-    photeng : ndarray
-        The photon energy abscissa. 
+    -----------
+    models : list of dict
+        Each dictionary specifies one injection model through the keyword arguments *in_spec_elec*, *in_spec_phot*, *rate_func_N*, *rate_func_eng*, *DM_process*, *mDM*, *sigmav*, *lifetime*, *primary*, *struct_boost*, *start_rs* and *init_cond* of :func:`evolve`. All models must start at the same redshift. 
+    end_rs : float, optional
+        Final redshift :math:`(1+z)` to evolve to. Default is 1+z = 4. 
+    helium_TLA : bool
+        If *True*, the TLA is solved with helium. Default is *False*.
+    reion_switch : bool
+        Reionization model included if *True*, default is *False*. 
+    reion_rs : float, optional
+        Redshift :math:`(1+z)` at which reionization effects turn on. 
+    photoion_rate_func : tuple of functions, optional
+        Functions take redshift :math:`1+z` as input, return the photoionization rate in s\ :sup:`-1` of HI, HeI and HeII respectively. If not specified, defaults to :func:`.photoion_rate`.
+    photoheat_rate_func : tuple of functions, optional
+        Functions take redshift :math:`1+z` as input, return the photoheating rate in s\ :sup:`-1` of HI, HeI and HeII respectively. If not specified, defaults to :func:`.photoheat_rate`.
+    xe_reion_func : function, optional
+        Specifies a fixed ionization history after reion_rs.
+    coarsen_factor : int
+        Coarsening to apply to the transfer function matrix. Default is 1. 
+    backreaction : bool
+        If *False*, uses the baseline TLA solution to calculate :math:`f_c(z)`. Default is True.
+    compute_fs_method : {'no_He', 'He_recomb', 'He'}
+
+    mxstep : int, optional
+        The maximum number of steps allowed for each integration point. See *scipy.integrate.odeint()* for more information. Default is *1000*. 
+    rtol : float, optional
+        The relative error of the solution. See *scipy.integrate.odeint()* for more information. Default is *1e-4*.
+    use_tqdm : bool, optional
+        Uses tqdm if *True*. Default is *True*. 
+    cross_check : bool, optional
+        If *True*, compare against 1604.02457 by using original MEDEA files, turning off partial binning, etc. Default is *False*.
+    output_sink : list of function, optional
+        One entry per model, each called at the end of every step with the same dict as *output_sink* of :func:`evolve` for that model. Entries may be None. 
+    store_output : bool, optional
+        If *False*, the output spectra are not kept in memory, and are set to *None* in the returned dicts. Default is *True*.
+    checkpoint_file : str, optional
+        File to save the state of the run to every *checkpoint_interval* steps, as in :func:`evolve`. 
+    checkpoint_interval : int, optional
+        Number of steps between checkpoints. Default is 100.
+    elec_cooling_table : :class:`.ElecCoolingTable`, optional
+        Table of electron cooling transfer functions. See :func:`evolve`. 
+    ics_spec_table : :class:`.ICSSpecTable`, optional
+        Table of ICS and energy loss spectra. See :func:`evolve`. 
 
     Returns
     -------
-    tuple of ndarray
-        A tuple with containing 3 tuples. The first tuple contains the 
-        normalized collisional ionization scattered electron spectrum for 
-        HI, HeI and HeII. The second contains the normalized collisional 
-        excitation scattered electron spectrum for HI, HeI and HeII. The 
-        last tuple is an 
-        :class:`.EnglossRebinData` object for use in rebinning ICS energy loss data to obtain the ICS scattered 
-        electron spectrum. 
-    """
-
-    # Compute the (normalized) collisional ionization spectra.
-    coll_ion_sec_elec_specs = (
-        phys.coll_ion_sec_elec_spec(eleceng, eleceng, species='HI'),
-        phys.coll_ion_sec_elec_spec(eleceng, eleceng, species='HeI'),
-        phys.coll_ion_sec_elec_spec(eleceng, eleceng, species='HeII')
-    )
-    # Compute the (normalized) collisional excitation spectra.
-    id_mat = np.identity(eleceng.size)
-
-    # Electron with energy eleceng produces a spectrum with one particle
-    # of energy eleceng - phys.lya.eng. Similar for helium. 
-    coll_exc_sec_elec_tf_HI = tf.TransFuncAtRedshift(
-        np.squeeze(id_mat[:, np.where(eleceng > phys.lya_eng)]),
-        in_eng = eleceng, rs = -1*np.ones_like(eleceng),
-        eng = eleceng[eleceng > phys.lya_eng] - phys.lya_eng,
-        dlnz = -1, spec_type = 'N'
-    )
+    list of dict
+        The output of :func:`evolve` for each model, in the same order as *models*. 
 
-    coll_exc_sec_elec_tf_HeI = tf.TransFuncAtRedshift(
-        np.squeeze(
-            id_mat[:, np.where(eleceng > phys.He_exc_eng['23s'])]
-        ),
-        in_eng = eleceng, rs = -1*np.ones_like(eleceng),
-        eng = (
-            eleceng[eleceng > phys.He_exc_eng['23s']] 
-            - phys.He_exc_eng['23s']
-        ), 
-        dlnz = -1, spec_type = 'N'
-    )
+    Examples
+    --------
 
-    coll_exc_sec_elec_tf_HeII = tf.TransFuncAtRedshift(
-        np.squeeze(id_mat[:, np.where(eleceng > 4*phys.lya_eng)]),
-        in_eng = eleceng, rs = -1*np.ones_like(eleceng),
-        eng = eleceng[eleceng > 4*phys.lya_eng] - 4*phys.lya_eng,
-        dlnz = -1, spec_type = 'N'
-    )
+    Dark matter annihilation to :math:`b \\bar{b}` for several masses, solved without backreaction so that all models share the same transfer functions: ::
 
-    # Rebin the data so that the spectra stored above now have an abscissa
-    # of eleceng again (instead of eleceng - phys.lya_eng for HI etc.)
-    coll_exc_sec_elec_tf_HI.rebin(eleceng)
-    coll_exc_sec_elec_tf_HeI.rebin(eleceng)
-    coll_exc_sec_elec_tf_HeII.rebin(eleceng)
+        out_list = evolve_batch(
+            [
+                {
+                    'DM_process': 'swave', 'mDM': mDM, 'sigmav': 3e-26,
+                    'primary': 'b', 'start_rs': 3000.
+                } for mDM in [1e10, 1e11, 1e12]
+            ], 
+            backreaction=False
+        )
 
-    # Put them in a tuple.
-    coll_exc_sec_elec_specs = (
-        coll_exc_sec_elec_tf_HI.grid_vals,
-        coll_exc_sec_elec_tf_HeI.grid_vals,
-        coll_exc_sec_elec_tf_HeII.grid_vals
-    )
+    See Also
+    ---------
+    :func:`.evolve`
 
-    # Store the ICS rebinning data for speed. Contains information
-    # that makes converting an energy loss spectrum to a scattered
-    # electron spectrum fast. 
-    ics_engloss_data = EnglossRebinData(eleceng, photeng, eleceng)
+    :func:`.get_history_batch`
 
-    return (
-        coll_ion_sec_elec_specs, coll_exc_sec_elec_specs, ics_engloss_data
-    )
+    Notes
+    -----
+    Transfer functions are computed once per distinct ionization state, and applied to all models in that state with a single matrix multiplication. Without backreaction, this is one set of transfer functions per step for all models. 
 
-def get_tf(rs, xHII, xHeII, dlnz, coarsen_factor=1):
     """
-    Returns the interpolated transfer functions. 
-
-    Parameters
-    ----------
-    rs : float
-        The current redshift (1+z) to obtain the functions. 
-    xHII : float
-        The ionization fraction nHII/nH.
-    xHeII : float
-        The ionization fraction nHeII/nH.
-    dlnz : float
-        The dlnz of the output transfer functions.
-    coarsen_factor : int
-        The coarsening factor for the output transfer functions.
 
-    Returns
-    -------
-    tuple
-        Contains the high-energy photon, low-energy photon, low-energy
-        electron, upscattered CMB photon energy and high-energy deposition
-        transfer functions. 
-    """
+    #########################################################################
+    #########################################################################
+    # Input                                                                 #
+    #########################################################################
+    #########################################################################
 
     # Load data.
+    binning = load_data('binning')
+    photeng = binning['phot']
+    eleceng = binning['elec']
 
     dep_tf_data = load_data('dep_tf')
 
     highengphot_tf_interp = dep_tf_data['highengphot']
     lowengphot_tf_interp  = dep_tf_data['lowengphot']
     lowengelec_tf_interp  = dep_tf_data['lowengelec']
-    highengdep_interp     = dep_tf_data['highengdep']
 
-    if coarsen_factor > 1:
-        # rs_to_interpolate = rs
-        rs_to_interpolate = np.exp(np.log(rs) - dlnz * coarsen_factor/2)
-    else:
-        rs_to_interpolate = rs
+    ics_tf_data = load_data('ics_tf')
+
+    ics_thomson_ref_tf  = ics_tf_data['thomson']
+    ics_rel_ref_tf      = ics_tf_data['rel']
+    engloss_ref_tf      = ics_tf_data['engloss']
+
+    if len(models) == 0:
+        raise ValueError('models must contain at least one model.')
+
+    model_keys = {
+        'in_spec_elec', 'in_spec_phot', 'rate_func_N', 'rate_func_eng',
+        'DM_process', 'mDM', 'sigmav', 'lifetime', 'primary', 
+        'struct_boost', 'start_rs', 'init_cond'
+    }
+
+    in_specs_elec  = []
+    in_specs_phot  = []
+    rate_funcs_N   = []
+    rate_funcs_eng = []
+    struct_boosts  = []
+    init_conds     = []
+
+    for model in models:
+
+        if not set(model).issubset(model_keys):
+            raise ValueError(
+                'invalid model parameters: '
+                + ', '.join(sorted(set(model) - model_keys))
+            )
+
+        (
+            in_spec_elec, in_spec_phot, rate_func_N, rate_func_eng, 
+            struct_boost
+        ) = get_injection(
+            eleceng, photeng, **{
+                key: model[key] for key in model if key != 'init_cond'
+            }
+        )
+
+        in_specs_elec.append(in_spec_elec)
+        in_specs_phot.append(in_spec_phot)
+        rate_funcs_N.append(rate_func_N)
+        rate_funcs_eng.append(rate_func_eng)
+        struct_boosts.append(struct_boost)
+        init_conds.append(model.get('init_cond'))
+
+    #####################################
+    # Input Checks                      #
+    #####################################
+
+    for in_spec_elec, in_spec_phot in zip(in_specs_elec, in_specs_phot):
+
+        if (
+            not np.array_equal(in_spec_elec.eng, eleceng) 
+            or not np.array_equal(in_spec_phot.eng, photeng)
+        ):
+            raise ValueError('in_spec_elec and in_spec_phot must use config.photeng and config.eleceng respectively as abscissa.')
+
+        if in_spec_elec.rs != in_spec_phot.rs:
+            raise ValueError('Input spectra must have the same rs.')
+
+    if (
+        highengphot_tf_interp.dlnz    != lowengphot_tf_interp.dlnz
+        or highengphot_tf_interp.dlnz != lowengelec_tf_interp.dlnz
+        or lowengphot_tf_interp.dlnz  != lowengelec_tf_interp.dlnz
+    ):
+        raise ValueError('TransferFuncInterp objects must all have the same dlnz.')
+
+    if len(set([in_spec_elec.rs for in_spec_elec in in_specs_elec])) != 1:
+        raise ValueError('All models must have the same starting rs.')
+
+    if output_sink is not None and len(output_sink) != len(models):
+        raise ValueError('output_sink must have one entry per model.')
+
+    if cross_check:
+        print('cross_check has been set to True -- No longer using all MEDEA files and no longer using partial-binning.')
+
+    #####################################
+    # Initialization                    #
+    #####################################
+
+    # Number of models. 
+    N = len(models)
+
+    if output_sink is None:
+        output_sink = [None]*N
+
+    start_rs = in_specs_elec[0].rs
+
+    # Stacked input spectra, type 'N'. 
+    in_elec_N = np.array([spec.N for spec in in_specs_elec])
+    in_phot_N = np.array([spec.N for spec in in_specs_phot])
+
+    # Underflow (N, eng) per injection event of the injected photons, 
+    # and of the photons from positron annihilation added below. As in 
+    # evolve, this is the underflow of the output high-energy photon 
+    # spectrum of each step. 
+    in_phot_underflow = np.array([
+        [spec.underflow['N'], spec.underflow['eng']] 
+        for spec in in_specs_phot
+    ])
+
+    dlnz = highengphot_tf_interp.dlnz[-1]
+
+    rs   = start_rs
+    dt   = dlnz * coarsen_factor / phys.hubble(rs)
+
+    n_steps = _get_n_steps(start_rs, end_rs, dlnz * coarsen_factor)
+
+    # tqdm set-up.
+    if use_tqdm:
+        from tqdm import tqdm_notebook as tqdm
+        pbar = tqdm(total=n_steps) 
+
+    def norm_fac(rs):
+        # Normalization to convert from per injection event to 
+        # per baryon per dlnz step, one entry per model. 
+        return np.array([
+            rate_func_N(rs) for rate_func_N in rate_funcs_N
+        ]) * (
+            dlnz * coarsen_factor / phys.hubble(rs) / (phys.nB * rs**3)
+        )
+
+    def rate_func_eng_unclustered(rs):
+        # The rate excluding structure formation, one entry per model.
+        return np.array([
+            rate_func_eng(rs)/struct_boost(rs) if struct_boost is not None
+            else rate_func_eng(rs)
+            for rate_func_eng, struct_boost in zip(
+                rate_funcs_eng, struct_boosts
+            )
+        ])
+
+    # If there are no electrons, we get a speed up by ignoring them. 
+    elec_processes = np.any(np.sum(in_elec_N, axis=1) > 0)
+
+    if elec_processes:
+
+        (
+            coll_ion_sec_elec_specs, coll_exc_sec_elec_specs,
+            ics_engloss_data
+        ) = get_elec_cooling_data(eleceng, photeng)
+
+        # Photon spectrum from positron annihilation, per injected positron.
+        positronium_phot_spec = pos.weighted_photon_spec(photeng)
+        positronium_phot_spec.switch_spec_type('N')
+        # Only half of in_spec_elec is positrons!
+        positronium_phot_N = np.outer(
+            np.sum(in_elec_N, axis=1)/2, positronium_phot_spec.N
+        )
+        in_phot_underflow += np.outer(
+            np.sum(in_elec_N, axis=1)/2, [
+                positronium_phot_spec.underflow['N'], 
+                positronium_phot_spec.underflow['eng']
+            ]
+        )
+
+    # Injection energy of the output spectra. As in evolve, only the 
+    # spectra of the first step keep the injection energy of the input 
+    # spectra, unless secondaries from electron cooling are added.
+    elec_models = np.sum(in_elec_N, axis=1) > 0
+    first_in_eng = {
+        'highengphot': np.where(
+            elec_models, -1., [spec.in_eng for spec in in_specs_phot]
+        ),
+        'lowengphot': np.array([spec.in_eng for spec in in_specs_phot]),
+        'lowengelec': np.where(
+            elec_models, -1., [spec.in_eng for spec in in_specs_elec]
+        )
+    }
+
+    #########################################################################
+    #########################################################################
+    # Pre-Loop Preliminaries                                                #
+    #########################################################################
+    #########################################################################
+
+    # All results are written into arrays allocated once here, indexed by 
+    # (model, step i_step, ...). 
+    i_step = 0
+
+    x_arr  = np.zeros((N, max(n_steps, 1), 2))
+    Tm_arr = np.zeros((N, max(n_steps, 1)))
+
+    for i,init_cond in enumerate(init_conds):
+        if init_cond is None:
+            # Default to baseline
+            x_arr[i,0]  = [phys.xHII_std(start_rs), phys.xHeII_std(start_rs)]
+            Tm_arr[i,0] = phys.Tm_std(start_rs)
+        else:
+            # User-specified.
+            x_arr[i,0]  = [init_cond[0], init_cond[1]]
+            Tm_arr[i,0] = init_cond[2]
+
+    spec_keys = ['highengphot', 'lowengphot', 'lowengelec']
+    out_specs_eng = {
+        'highengphot': photeng, 'lowengphot': photeng, 'lowengelec': eleceng
+    }
+    out_specs_N = {
+        key: np.zeros((N, n_steps if store_output else 0, eng.size)) 
+        for key, eng in out_specs_eng.items()
+    }
+
+    rs_arr = np.zeros(n_steps)
+    highengphot_underflow = np.zeros((N, n_steps, 2))
+    f_low  = np.zeros((N, n_steps, 5))
+    f_high = np.zeros((N, n_steps, 5))
+
+    # Stacked spectra at the current redshift, type 'N'. 
+    highengphot_N_at_rs = np.zeros((N, photeng.size))
+    lowengphot_N_at_rs  = np.zeros((N, photeng.size))
+    lowengelec_N_at_rs  = np.zeros((N, eleceng.size))
+    highengdep_at_rs    = np.zeros((N, 4))
+
+    # Object to help us interpolate over MEDEA results. 
+    MEDEA_interp = get_MEDEA_interp(cross_check=cross_check)
+
+    # Parts of compute_fs that only depend on the abscissae. 
+    deposition_plan = DepositionPlan(
+        photeng, eleceng, method=compute_fs_method, cross_check=cross_check
+    )
+
+    #####################################
+    # Checkpoints                       #
+    #####################################
+
+    if checkpoint_file is not None:
+        # Identifies the arguments of this run. The injection of each 
+        # model is fully specified by the output of get_injection. 
+        vals = {
+            'end_rs': end_rs, 'helium_TLA': helium_TLA, 
+            'reion_switch': reion_switch, 'reion_rs': reion_rs,
+            'coarsen_factor': coarsen_factor, 'backreaction': backreaction,
+            'compute_fs_method': compute_fs_method, 'mxstep': mxstep,
+            'rtol': rtol, 'cross_check': cross_check
+        }
+        funcs = {
+            'photoion_rate_func': photoion_rate_func,
+            'photoheat_rate_func': photoheat_rate_func,
+            'xe_reion_func': xe_reion_func
+        }
+        for i in np.arange(N):
+            vals['in_spec_elec_'+str(i)] = in_specs_elec[i]
+            vals['in_spec_phot_'+str(i)] = in_specs_phot[i]
+            vals['init_cond_'+str(i)]    = init_conds[i]
+            funcs['rate_func_N_'+str(i)]   = rate_funcs_N[i]
+            funcs['rate_func_eng_'+str(i)] = rate_funcs_eng[i]
+            funcs['struct_boost_'+str(i)]  = struct_boosts[i]
+
+        fingerprint = _evolve_fingerprint(
+            vals, funcs, 
+            np.exp(np.linspace(np.log(start_rs), np.log(end_rs), 10))
+        )
+
+    def save_checkpoint():
+        # Save everything needed to restart the loop at step i_step. 
+        ckpt = {
+            'fingerprint': fingerprint,
+            'rs': rs, 'i_step': i_step, 'n_steps': n_steps, 
+            'start_rs': start_rs, 'step_dlnz': dlnz * coarsen_factor,
+            'x': x_arr[:,:i_step+1], 'Tm': Tm_arr[:,:i_step+1],
+            'rs_arr': rs_arr[:i_step],
+            'f_low': f_low[:,:i_step], 'f_high': f_high[:,:i_step],
+            'highengphot_underflow': highengphot_underflow[:,:i_step],
+            'highengphot_at_rs': highengphot_N_at_rs,
+            'lowengphot_at_rs':  lowengphot_N_at_rs,
+            'lowengelec_at_rs':  lowengelec_N_at_rs,
+            'highengdep_at_rs':  highengdep_at_rs
+        }
+        if store_output:
+            for key in spec_keys:
+                ckpt[key+'_N'] = out_specs_N[key][:,:i_step]
+
+        for sink in output_sink:
+            if sink is not None and hasattr(sink, 'flush'):
+                sink.flush()
+
+        # An interrupted write does not corrupt the previous checkpoint. 
+        utils.atomic_savez(checkpoint_file, **ckpt)
+
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+
+        with np.load(checkpoint_file) as ckpt:
+
+            if (
+                'fingerprint' not in ckpt
+                or str(ckpt['fingerprint']) != fingerprint
+            ):
+                raise ValueError('checkpoint_file was saved by a run with different arguments.')
+
+            if (
+                int(ckpt['n_steps']) != n_steps
+                or float(ckpt['start_rs']) != start_rs
+                or float(ckpt['step_dlnz']) != dlnz * coarsen_factor
+                or ('highengphot_N' in ckpt) != store_output
+            ):
+                raise ValueError('checkpoint_file does not match this run.')
+
+            rs     = float(ckpt['rs'])
+            i_step = int(ckpt['i_step'])
+
+            x_arr[:,:i_step+1]  = ckpt['x']
+            Tm_arr[:,:i_step+1] = ckpt['Tm']
+            rs_arr[:i_step]     = ckpt['rs_arr']
+            f_low[:,:i_step]    = ckpt['f_low']
+            f_high[:,:i_step]   = ckpt['f_high']
+            highengphot_underflow[:,:i_step] = ckpt['highengphot_underflow']
+
+            highengphot_N_at_rs = ckpt['highengphot_at_rs']
+            lowengphot_N_at_rs  = ckpt['lowengphot_at_rs']
+            lowengelec_N_at_rs  = ckpt['lowengelec_at_rs']
+            highengdep_at_rs    = ckpt['highengdep_at_rs']
+
+            if store_output:
+                for key in spec_keys:
+                    out_specs_N[key][:,:i_step] = ckpt[key+'_N']
+
+        dt = dlnz * coarsen_factor / phys.hubble(rs)
+
+        if use_tqdm:
+            pbar.update(i_step)
+
+    # Discard any results stored by the sinks beyond the current step. 
+    for sink in output_sink:
+        if sink is not None and hasattr(sink, 'truncate'):
+            sink.truncate(i_step)
+
+    #########################################################################
+    #########################################################################
+    # LOOP! LOOP! LOOP! LOOP!                                               #
+    #########################################################################
+    #########################################################################
+
+    while rs > end_rs:
+
+        # Update tqdm. 
+        if use_tqdm:
+            pbar.update(1)
+
+        if (
+            checkpoint_file is not None and i_step > 0 
+            and i_step % checkpoint_interval == 0
+        ):
+            save_checkpoint()
+
+        norm_fac_at_rs = norm_fac(rs)
+
+        #####################################################################
+        # Electron Cooling                                                  #
+        #####################################################################
+
+        if elec_processes:
+
+            if backreaction:
+                x_elec_cooling = x_arr[:, i_step]
+            else:
+                x_elec_cooling = np.tile(
+                    [phys.xHII_std(rs), phys.xHeII_std(rs)], (N, 1)
+                )
+
+            ics_phot_N = np.zeros((N, photeng.size))
+            deposited  = np.zeros((N, 4))
+
+            # Models with the same ionization state share transfer 
+            # functions. 
+            x_unique, ind_unique = np.unique(
+                x_elec_cooling, axis=0, return_inverse=True
+            )
+
+            for i, (xHII_elec_cooling, xHeII_elec_cooling) in enumerate(
+                x_unique
+            ):
+
+                in_group = ind_unique == i
+
+                def get_elec_cooling_tf_direct():
+                    return get_elec_cooling_tf(
+                        eleceng, photeng, rs,
+                        xHII_elec_cooling, xHeII=xHeII_elec_cooling,
+                        raw_thomson_tf=ics_thomson_ref_tf, 
+                        raw_rel_tf=ics_rel_ref_tf, 
+                        raw_engloss_tf=engloss_ref_tf,
+                        coll_ion_sec_elec_specs=coll_ion_sec_elec_specs, 
+                        coll_exc_sec_elec_specs=coll_exc_sec_elec_specs,
+                        ics_engloss_data=ics_engloss_data,
+                        ics_spec_table=ics_spec_table
+                    )
+
+                if elec_cooling_table is None:
+                    elec_cooling_tfs = get_elec_cooling_tf_direct()
+                else:
+                    elec_cooling_tfs = elec_cooling_table.get_tf(
+                        eleceng, photeng, rs, 
+                        xHII_elec_cooling, xHeII_elec_cooling, 
+                        get_elec_cooling_tf_direct
+                    )
+
+                (
+                    ics_sec_phot_tf, elec_processes_lowengelec_tf,
+                    deposited_ion_arr, deposited_exc_arr, deposited_heat_arr,
+                    continuum_loss, deposited_ICS_arr
+                ) = elec_cooling_tfs
+
+                # Low energy electrons from electron cooling, 
+                # per baryon in this step.
+                lowengelec_N_at_rs[in_group] += np.matmul(
+                    in_elec_N[in_group]*norm_fac_at_rs[in_group, np.newaxis],
+                    elec_processes_lowengelec_tf.grid_vals
+                )
+
+                # High-energy deposition into ionization, excitation, 
+                # heating and numerical error, per baryon in this step.
+                deposited[in_group] = np.matmul(
+                    in_elec_N[in_group]*norm_fac_at_rs[in_group, np.newaxis],
+                    np.transpose([
+                        deposited_ion_arr, deposited_exc_arr,
+                        deposited_heat_arr, deposited_ICS_arr
+                    ])
+                )
+
+                # ICS secondary photon spectrum after electron cooling, 
+                # per injection event.
+                ics_phot_N[in_group] = np.matmul(
+                    in_elec_N[in_group], ics_sec_phot_tf.grid_vals
+                )
+
+            highengphot_N_at_rs += (
+                in_phot_N + ics_phot_N + positronium_phot_N
+            ) * norm_fac_at_rs[:, np.newaxis]
+
+        else:
+
+            highengphot_N_at_rs += in_phot_N * norm_fac_at_rs[:, np.newaxis]
+
+        #####################################################################
+        # Save the Spectra!                                                 #
+        #####################################################################
+
+        rs_arr[i_step] = rs
+        highengphot_underflow[:, i_step] = (
+            in_phot_underflow * norm_fac_at_rs[:, np.newaxis]
+        )
+        if store_output:
+            out_specs_N['highengphot'][:, i_step] = highengphot_N_at_rs
+            out_specs_N['lowengphot'][:, i_step]  = lowengphot_N_at_rs
+            out_specs_N['lowengelec'][:, i_step]  = lowengelec_N_at_rs
+
+        #####################################################################
+        # Compute f_c(z)                                                    #
+        #####################################################################
+
+        if elec_processes:
+            highengdep_at_rs += deposited/dt
+
+        # Values of (xHI, xHeI, xHeII) to use for computing f.
+        if backreaction:
+            x_for_f = x_arr[:, i_step]
+        else:
+            x_for_f = np.tile(
+                [phys.xHII_std(rs), phys.xHeII_std(rs)], (N, 1)
+            )
+
+        x_vec_for_f = np.transpose([
+            1. - x_for_f[:,0], phys.chi - x_for_f[:,1], x_for_f[:,1]
+        ])
+
+        # All models at once. 
+        f_low[:, i_step], f_high[:, i_step] = deposition_plan.compute_fs(
+            MEDEA_interp, lowengelec_N_at_rs, lowengphot_N_at_rs,
+            x_vec_for_f, rate_func_eng_unclustered(rs), dt,
+            highengdep_at_rs, rs
+        )
+
+        for i, sink in enumerate(output_sink):
+            if sink is None:
+                continue
+            in_eng = {
+                key: first_in_eng[key][i] if i_step == 0 else -1.
+                for key in spec_keys
+            }
+            specs = {
+                key: Spectrum(
+                    out_specs_eng[key], N_at_rs[i].copy(), rs=rs, 
+                    in_eng=in_eng[key], spec_type='N'
+                ) for key, N_at_rs in [
+                    ('highengphot', highengphot_N_at_rs),
+                    ('lowengphot',  lowengphot_N_at_rs),
+                    ('lowengelec',  lowengelec_N_at_rs)
+                ]
+            }
+            specs['highengphot'].underflow = {
+                'N':   highengphot_underflow[i, i_step, 0],
+                'eng': highengphot_underflow[i, i_step, 1]
+            }
+            sink(dict(
+                specs, rs=rs, x=x_arr[i, i_step].copy(), 
+                Tm=Tm_arr[i, i_step], 
+                f_low=f_low[i, i_step].copy(), f_high=f_high[i, i_step].copy()
+            ))
+
+        # Compute f for TLA: sum of low and high. 
+        f_H_ion = f_low[:, i_step, 0] + f_high[:, i_step, 0]
+        f_exc   = f_low[:, i_step, 2] + f_high[:, i_step, 2]
+        f_heat  = f_low[:, i_step, 3] + f_high[:, i_step, 3]
+
+        if compute_fs_method == 'old':
+            # The old method neglects helium.
+            f_He_ion = np.zeros(N)
+        else:
+            f_He_ion = f_low[:, i_step, 1] + f_high[:, i_step, 1]
+
+        #####################################################################
+        # ********* AFTER THIS, COMPUTE QUANTITIES FOR NEXT STEP *********  #
+        #####################################################################
+
+        # Define the next redshift step. 
+        next_rs = np.exp(np.log(rs) - dlnz * coarsen_factor)
+
+        #####################################################################
+        # TLA Integration                                                   #
+        #####################################################################
+
+        # Initial conditions for the TLA, (Tm, xHII, xHeII, xHeIII). 
+        init_cond_TLA = np.transpose([
+            Tm_arr[:, i_step], x_arr[:, i_step, 0], x_arr[:, i_step, 1], 
+            np.zeros(N)
+        ])
+
+        # Solve the TLA for x, Tm for the *next* step, for all models.
+        new_vals = tla.get_history_batch(
+            np.array([rs, next_rs]), init_cond_TLA, 
+            f_H_ion=f_H_ion, f_H_exc=f_exc, f_heating=f_heat,
+            f_He_ion=f_He_ion, injection_rate=rate_func_eng_unclustered,
+            reion_switch=reion_switch, reion_rs=reion_rs,
+            photoion_rate_func=photoion_rate_func,
+            photoheat_rate_func=photoheat_rate_func,
+            xe_reion_func=xe_reion_func, helium_TLA=helium_TLA,
+            mxstep=mxstep, rtol=rtol
+        )
+
+        #####################################################################
+        # Photon Cooling Transfer Functions                                 #
+        #####################################################################
+
+        if not backreaction:
+            # Interpolate using the baseline solution.
+            x_to_interp = np.tile(
+                [phys.xHII_std(rs), phys.xHeII_std(rs)], (N, 1)
+            )
+        else:
+            # Interpolate using the current xHII, xHeII values.
+            x_to_interp = x_arr[:, i_step]
+
+        next_highengphot_N = np.zeros_like(highengphot_N_at_rs)
+        next_lowengphot_N  = np.zeros_like(lowengphot_N_at_rs)
+        next_lowengelec_N  = np.zeros_like(lowengelec_N_at_rs)
+        next_highengdep    = np.zeros_like(highengdep_at_rs)
+
+        x_unique, ind_unique = np.unique(
+            x_to_interp, axis=0, return_inverse=True
+        )
+
+        for i, (xHII_to_interp, xHeII_to_interp) in enumerate(x_unique):
+
+            in_group = ind_unique == i
+
+            highengphot_tf, lowengphot_tf, lowengelec_tf, highengdep_arr = (
+                get_tf(
+                    rs, xHII_to_interp, xHeII_to_interp, 
+                    dlnz, coarsen_factor=coarsen_factor
+                )
+            )
+
+            # Get the spectra for the next step by applying the 
+            # transfer functions to all models in the group at once. 
+            highengphot_N_group = highengphot_N_at_rs[in_group]
+
+            next_highengdep[in_group] = np.matmul(
+                highengphot_N_group, highengdep_arr
+            )
+            next_highengphot_N[in_group] = np.matmul(
+                highengphot_N_group, highengphot_tf.grid_vals
+            )
+            next_lowengphot_N[in_group] = np.matmul(
+                highengphot_N_group, lowengphot_tf.grid_vals
+            )
+            next_lowengelec_N[in_group] = np.matmul(
+                highengphot_N_group, lowengelec_tf.grid_vals
+            )
+
+        highengphot_N_at_rs = next_highengphot_N
+        lowengphot_N_at_rs  = next_lowengphot_N
+        lowengelec_N_at_rs  = next_lowengelec_N
+        highengdep_at_rs    = next_highengdep
+
+        if next_rs > end_rs:
+            # Only save if next_rs < end_rs, since these are the x, Tm
+            # values for the next redshift.
+            Tm_arr[:, i_step+1] = new_vals[:, -1, 0]
+
+            if helium_TLA:
+                # Use the calculated xHe. 
+                x_arr[:, i_step+1] = new_vals[:, -1, 1:3]
+            else:
+                # Use the baseline solution value. 
+                x_arr[:, i_step+1, 0] = new_vals[:, -1, 1]
+                x_arr[:, i_step+1, 1] = phys.xHeII_std(next_rs)
+
+        # Re-define existing variables. 
+        rs = next_rs
+        dt = dlnz * coarsen_factor/phys.hubble(rs)
+        i_step += 1
+
+    #########################################################################
+    #########################################################################
+    # END OF LOOP! END OF LOOP!                                             #
+    #########################################################################
+    #########################################################################
+
+    if use_tqdm:
+        pbar.close()
+
+    for sink in output_sink:
+        if sink is not None and hasattr(sink, 'flush'):
+            sink.flush()
+
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+
+    out_in_eng = {
+        key: -1.*np.ones((N, n_steps)) for key in spec_keys
+    }
+    for key in spec_keys:
+        out_in_eng[key][:,:1] = first_in_eng[key][:, np.newaxis]
+
+    channels = ['H ion', 'He ion', 'exc', 'heat', 'cont']
+
+    data_list = []
+
+    for i in np.arange(N):
+
+        f = {
+            'low':  {
+                chan: f_low[i,:,j] for j,chan in enumerate(channels)
+            }, 
+            'high': {
+                chan: f_high[i,:,j] for j,chan in enumerate(channels)
+            }
+        }
+
+        out_specs = {}
+        for key in spec_keys:
+            if not store_output:
+                out_specs[key] = None
+                continue
+            out_specs[key] = Spectra(
+                out_specs_N[key][i], eng=out_specs_eng[key], 
+                in_eng=out_in_eng[key][i], rs=np.array(rs_arr), 
+                spec_type='N'
+            )
+        if store_output:
+            out_specs['highengphot']._N_underflow = (
+                highengphot_underflow[i,:,0]
+            )
+            out_specs['highengphot']._eng_underflow = (
+                highengphot_underflow[i,:,1]
+            )
+
+        data_list.append({
+            'rs': np.array(rs_arr),
+            'x': x_arr[i], 'Tm': Tm_arr[i], 
+            'highengphot': out_specs['highengphot'],
+            'lowengphot':  out_specs['lowengphot'],
+            'lowengelec':  out_specs['lowengelec'],
+            'f': f
+        })
+
+    return data_list
+
+def _get_n_steps(start_rs, end_rs, step_dlnz):
+    """ Number of steps of :func:`evolve` from *start_rs* to *end_rs*. 
+
+    Parameters
+    ----------
+    start_rs : float
+        The initial redshift :math:`(1+z)`. 
+    end_rs : float
+        The final redshift :math:`(1+z)`. 
+    step_dlnz : float
+        The step in :math:`\\ln(1+z)`, including coarsening. 
+
+    Returns
+    -------
+    int
+        The number of steps. 
+
+    Notes
+    -----
+    The steps are obtained with the same operations as in the main loop, so that the results can be stored in preallocated arrays. 
+    """
+
+    n_steps = 0
+    next_rs = start_rs
+    while next_rs > end_rs:
+        n_steps += 1
+        next_rs = np.exp(np.log(next_rs) - step_dlnz)
+
+    return n_steps
+
+def _evolve_fingerprint(vals, funcs, rs_arr):
+    """ Hash identifying the arguments of a run of :func:`evolve`. 
+
+    Parameters
+    ----------
+    vals : dict
+        Arguments that are numbers, strings, arrays, :class:`.Spectrum` objects or None. 
+    funcs : dict
+        Arguments that are functions of redshift, tuples of such functions, or None. 
+    rs_arr : ndarray
+        Redshifts at which the functions are evaluated. 
+
+    Returns
+    -------
+    str
+        The hash. 
+
+    Notes
+    -----
+    Functions are compared through their values at *rs_arr*, since neither their names nor their repr identify them. 
+    """
+
+    h = hashlib.sha1()
+
+    for key in sorted(vals):
+        val = vals[key]
+        h.update(key.encode())
+        if isinstance(val, Spectrum):
+            h.update(repr((val.rs, val.in_eng, val.spec_type)).encode())
+            h.update(np.ascontiguousarray(val.eng, dtype=float).tobytes())
+            h.update(np.ascontiguousarray(val._data, dtype=float).tobytes())
+        elif isinstance(val, (list, tuple, np.ndarray)):
+            h.update(np.ascontiguousarray(val, dtype=float).tobytes())
+        else:
+            h.update(repr(val).encode())
+
+    for key in sorted(funcs):
+        func_list = funcs[key]
+        h.update(key.encode())
+        if func_list is None:
+            h.update(b'None')
+            continue
+        if not isinstance(func_list, (list, tuple)):
+            func_list = [func_list]
+        for func in func_list:
+            h.update(np.ascontiguousarray(
+                [func(rs) for rs in rs_arr], dtype=float
+            ).tobytes())
+
+    return h.hexdigest()
+
+# MEDEA interpolators, created once per process. See get_MEDEA_interp. 
+_MEDEA_interps = {}
+
+def get_MEDEA_interp(cross_check=False):
+    """
+    Returns the interpolator over MEDEA results, creating it only once.
+
+    Parameters
+    ----------
+    cross_check : bool, optional
+        If *True*, uses the original MEDEA files. See :func:`evolve`. 
+
+    Returns
+    -------
+    MEDEAInterpolator
+        The result of :func:`.make_interpolator` with *interp_type* = '2D'.
+    """
+
+    if cross_check not in _MEDEA_interps:
+        _MEDEA_interps[cross_check] = make_interpolator(
+            interp_type='2D', cross_check=cross_check
+        )
+
+    return _MEDEA_interps[cross_check]
+
+def get_injection(
+    eleceng, photeng, in_spec_elec=None, in_spec_phot=None,
+    rate_func_N=None, rate_func_eng=None,
+    DM_process=None, mDM=None, sigmav=None, lifetime=None, primary=None,
+    struct_boost=None, start_rs=None
+):
+    """
+    Returns the injected spectra and rates for :func:`main.evolve`.
+
+    If *DM_process* is specified, the spectra and rate functions are 
+    computed from PPPC and the dark matter parameters. Otherwise, the 
+    inputs are returned unchanged. 
+
+    Parameters
+    ----------
+    eleceng : ndarray
+        The electron energy abscissa. 
+    photeng : ndarray
+        The photon energy abscissa. 
+    in_spec_elec : :class:`.Spectrum`, optional
+        Spectrum per injection event into electrons. 
+    in_spec_phot : :class:`.Spectrum`, optional
+        Spectrum per injection event into photons. 
+    rate_func_N : function, optional
+        Function returning number of injection events per volume per time, with redshift :math:`(1+z)` as an input.  
+    rate_func_eng : function, optional
+        Function returning energy injected per volume per time, with redshift :math:`(1+z)` as an input. 
+    DM_process : {'swave', 'decay'}, optional
+        Dark matter process to use. 
+    mDM : float, optional
+        Dark matter mass in eV. 
+    sigmav : float, optional
+        Thermally averaged cross section for dark matter annihilation. 
+    lifetime : float, optional
+        Decay lifetime for dark matter decay.
+    primary : string, optional
+        Primary channel of annihilation/decay. 
+    struct_boost : function, optional
+        Energy injection boost factor due to structure formation.
+    start_rs : float, optional
+        Starting redshift :math:`(1+z)`. 
+
+    Returns
+    -------
+    tuple
+        *(in_spec_elec, in_spec_phot, rate_func_N, rate_func_eng, struct_boost)*.
+    """
+
+    if DM_process == 'swave':
+        if sigmav is None or start_rs is None:
+            raise ValueError(
+                'sigmav and start_rs must be specified.'
+            )
+        
+        # Get input spectra from PPPC. 
+        in_spec_elec = pppc.get_pppc_spec(mDM, eleceng, primary, 'elec')
+        in_spec_phot = pppc.get_pppc_spec(mDM, photeng, primary, 'phot')
+        # Initialize the input spectrum redshift. 
+        in_spec_elec.rs = start_rs
+        in_spec_phot.rs = start_rs
+        # Convert to type 'N'. 
+        in_spec_elec.switch_spec_type('N')
+        in_spec_phot.switch_spec_type('N')
+
+        # If struct_boost is none, just set to 1. 
+        if struct_boost is None:
+            def struct_boost(rs):
+                return 1.
+
+        # Define the rate functions. 
+        def rate_func_N(rs):
+            return (
+                phys.inj_rate('swave', rs, mDM=mDM, sigmav=sigmav)
+                * struct_boost(rs) / (2*mDM)
+            )
+        def rate_func_eng(rs):
+            return (
+                phys.inj_rate('swave', rs, mDM=mDM, sigmav=sigmav) 
+                * struct_boost(rs)
+            )
+
+    if DM_process == 'decay':
+        if lifetime is None or start_rs is None:
+            raise ValueError(
+                'lifetime and start_rs must be specified.'
+            )
+
+        # The decay rate is insensitive to structure formation
+        def struct_boost(rs):
+            return 1
+        
+        # Get spectra from PPPC.
+        in_spec_elec = pppc.get_pppc_spec(
+            mDM, eleceng, primary, 'elec', decay=True
+        )
+        in_spec_phot = pppc.get_pppc_spec(
+            mDM, photeng, primary, 'phot', decay=True
+        )
+
+        # Initialize the input spectrum redshift. 
+        in_spec_elec.rs = start_rs
+        in_spec_phot.rs = start_rs
+        # Convert to type 'N'. 
+        in_spec_elec.switch_spec_type('N')
+        in_spec_phot.switch_spec_type('N')
+
+        # Define the rate functions. 
+        def rate_func_N(rs):
+            return (
+                phys.inj_rate('decay', rs, mDM=mDM, lifetime=lifetime) / mDM
+            )
+        def rate_func_eng(rs):
+            return phys.inj_rate('decay', rs, mDM=mDM, lifetime=lifetime) 
+    
+    return (
+        in_spec_elec, in_spec_phot, rate_func_N, rate_func_eng, struct_boost
+    )
+
+def get_elec_cooling_data(eleceng, photeng):
+    """
+    Returns electron cooling data for use in :func:`main.evolve`.
+
+    Parameters
+    ----------
+    eleceng : ndarray
+        The electron energy abscissa. 
+    photeng : ndarray
+        The photon energy abscissa. 
+
+    Returns
+    -------
+    tuple of ndarray
+        A tuple with containing 3 tuples. The first tuple contains the 
+        normalized collisional ionization scattered electron spectrum for 
+        HI, HeI and HeII. The second contains the normalized collisional 
+        excitation scattered electron spectrum for HI, HeI and HeII. The 
+        last tuple is an 
+        :class:`.EnglossRebinData` object for use in rebinning ICS energy loss data to obtain the ICS scattered 
+        electron spectrum. 
+    """
+
+    # Compute the (normalized) collisional ionization spectra.
+    coll_ion_sec_elec_specs = (
+        phys.coll_ion_sec_elec_spec(eleceng, eleceng, species='HI'),
+        phys.coll_ion_sec_elec_spec(eleceng, eleceng, species='HeI'),
+        phys.coll_ion_sec_elec_spec(eleceng, eleceng, species='HeII')
+    )
+    # Compute the (normalized) collisional excitation spectra.
+    id_mat = np.identity(eleceng.size)
+
+    # Electron with energy eleceng produces a spectrum with one particle
+    # of energy eleceng - phys.lya.eng. Similar for helium. 
+    coll_exc_sec_elec_tf_HI = tf.TransFuncAtRedshift(
+        np.squeeze(id_mat[:, np.where(eleceng > phys.lya_eng)]),
+        in_eng = eleceng, rs = -1*np.ones_like(eleceng),
+        eng = eleceng[eleceng > phys.lya_eng] - phys.lya_eng,
+        dlnz = -1, spec_type = 'N'
+    )
+
+    coll_exc_sec_elec_tf_HeI = tf.TransFuncAtRedshift(
+        np.squeeze(
+            id_mat[:, np.where(eleceng > phys.He_exc_eng['23s'])]
+        ),
+        in_eng = eleceng, rs = -1*np.ones_like(eleceng),
+        eng = (
+            eleceng[eleceng > phys.He_exc_eng['23s']] 
+            - phys.He_exc_eng['23s']
+        ), 
+        dlnz = -1, spec_type = 'N'
+    )
 
-    highengphot_tf = highengphot_tf_interp.get_tf(
-        xHII, xHeII, rs_to_interpolate
+    coll_exc_sec_elec_tf_HeII = tf.TransFuncAtRedshift(
+        np.squeeze(id_mat[:, np.where(eleceng > 4*phys.lya_eng)]),
+        in_eng = eleceng, rs = -1*np.ones_like(eleceng),
+        eng = eleceng[eleceng > 4*phys.lya_eng] - 4*phys.lya_eng,
+        dlnz = -1, spec_type = 'N'
     )
-    lowengphot_tf  = lowengphot_tf_interp.get_tf(
-        xHII, xHeII, rs_to_interpolate
+
+    # Rebin the data so that the spectra stored above now have an abscissa
+    # of eleceng again (instead of eleceng - phys.lya_eng for HI etc.)
+    coll_exc_sec_elec_tf_HI.rebin(eleceng)
+    coll_exc_sec_elec_tf_HeI.rebin(eleceng)
+    coll_exc_sec_elec_tf_HeII.rebin(eleceng)
+
+    # Put them in a tuple.
+    coll_exc_sec_elec_specs = (
+        coll_exc_sec_elec_tf_HI.grid_vals,
+        coll_exc_sec_elec_tf_HeI.grid_vals,
+        coll_exc_sec_elec_tf_HeII.grid_vals
     )
-    lowengelec_tf  = lowengelec_tf_interp.get_tf(
-        xHII, xHeII, rs_to_interpolate
+
+    # Store the ICS rebinning data for speed. Contains information
+    # that makes converting an energy loss spectrum to a scattered
+    # electron spectrum fast. 
+    ics_engloss_data = EnglossRebinData(eleceng, photeng, eleceng)
+
+    return (
+        coll_ion_sec_elec_specs, coll_exc_sec_elec_specs, ics_engloss_data
     )
-    highengdep_arr = highengdep_interp.get_val(
-        xHII, xHeII, rs_to_interpolate
+
+def get_tf(rs, xHII, xHeII, dlnz, coarsen_factor=1):
+    """
+    Returns the interpolated transfer functions. 
+
+    Parameters
+    ----------
+    rs : float
+        The current redshift (1+z) to obtain the functions. 
+    xHII : float
+        The ionization fraction nHII/nH.
+    xHeII : float
+        The ionization fraction nHeII/nH.
+    dlnz : float
+        The dlnz of the output transfer functions.
+    coarsen_factor : int
+        The coarsening factor for the output transfer functions.
+
+    Returns
+    -------
+    tuple
+        Contains the high-energy photon, low-energy photon, low-energy
+        electron, upscattered CMB photon energy and high-energy deposition
+        transfer functions. 
+    """
+
+    # Load data.
+
+    dep_tf_data = load_data('dep_tf')
+
+    highengphot_tf_interp = dep_tf_data['highengphot']
+    lowengphot_tf_interp  = dep_tf_data['lowengphot']
+    lowengelec_tf_interp  = dep_tf_data['lowengelec']
+    highengdep_interp     = dep_tf_data['highengdep']
+
+    if coarsen_factor > 1:
+        # rs_to_interpolate = rs
+        rs_to_interpolate = np.exp(np.log(rs) - dlnz * coarsen_factor/2)
+    else:
+        rs_to_interpolate = rs
+
+    # The transfer functions share the same nodes, so the interpolation
+    # weights are only computed once.
+    highengphot_tf, lowengphot_tf, lowengelec_tf, highengdep_arr = (
+        interp_jointly(
+            [
+                highengphot_tf_interp, lowengphot_tf_interp,
+                lowengelec_tf_interp, highengdep_interp
+            ],
+            xHII, xHeII, rs_to_interpolate
+        )
     )
 
     if coarsen_factor > 1:
-        prop_tf = np.zeros_like(highengphot_tf._grid_vals)
-        for i in np.arange(coarsen_factor):
-            prop_tf += matrix_power(highengphot_tf._grid_vals, i)
+        highengphot_tf._grid_vals, prop_tf = get_propagators(
+            highengphot_tf._grid_vals, coarsen_factor
+        )
         lowengphot_tf._grid_vals = np.matmul(
             prop_tf, lowengphot_tf._grid_vals
         )
         lowengelec_tf._grid_vals = np.matmul(
             prop_tf, lowengelec_tf._grid_vals
         )
-        highengphot_tf._grid_vals = matrix_power(
-            highengphot_tf._grid_vals, coarsen_factor
-        )
         # cmbloss_arr = np.matmul(prop_tf, cmbloss_arr)/coarsen_factor
         highengdep_arr = (
             np.matmul(prop_tf, highengdep_arr)/coarsen_factor
@@ -858,3 +2028,252 @@ def get_tf(rs, xHII, xHeII, dlnz, coarsen_factor=1):
     #     cmbloss_arr, highengdep_arr
     # )
 
+def get_propagators(tf_grid, coarsen_factor):
+    """
+    Returns the power and geometric sum of a transfer function matrix.
+
+    Parameters
+    ----------
+    tf_grid : ndarray
+        The (in_eng, eng) transfer function matrix M, with in_eng = eng. 
+    coarsen_factor : int
+        The power k.
+
+    Returns
+    -------
+    tuple of ndarray
+        M^k and the sum of M^i for i = 0, ..., k-1.
+
+    Notes
+    -----
+    Both are obtained together by repeated squaring, using O(log k) matrix multiplications instead of O(k). 
+    """
+
+    # Start with k = 1, i.e. M^1 and M^0, then build up the binary
+    # digits of coarsen_factor from the most significant digit.
+    power   = tf_grid
+    geo_sum = np.identity(tf_grid.shape[0])
+
+    for digit in bin(coarsen_factor)[3:]:
+        # k -> 2k.
+        geo_sum = geo_sum + np.matmul(power, geo_sum)
+        power   = np.matmul(power, power)
+        if digit == '1':
+            # k -> k + 1.
+            geo_sum = geo_sum + power
+            power   = np.matmul(power, tf_grid)
+
+    return power, geo_sum
+
+def _plain_repr(val):
+    # repr of val if it identifies val, and None otherwise. Module-level 
+    # functions are identified by name, since their repr changes between 
+    # processes. Lambdas, closures, partials and other objects are not 
+    # identified by either.
+    if val is None or isinstance(val, (bool, int, float, str, np.number)):
+        return repr(val)
+    if isinstance(val, np.ndarray) and val.dtype.kind in 'biuf':
+        return repr(val.tolist())
+    if isinstance(val, (list, tuple)):
+        reprs = [_plain_repr(v) for v in val]
+        if None in reprs:
+            return None
+        return type(val).__name__+'('+', '.join(reprs)+')'
+    if (
+        isinstance(val, (types.FunctionType, types.BuiltinFunctionType))
+        and '<' not in val.__qualname__
+    ):
+        return val.__module__+'.'+val.__qualname__
+    return None
+
+def _scan_point_key(point, evolve_kwargs):
+    # A string identifying the arguments of evolve for a scan point, used 
+    # to check that results stored on disk belong to the same point. None 
+    # if any argument cannot be identified, in which case the point is 
+    # always recomputed. 
+    reprs = [
+        (key, _plain_repr(val)) 
+        for key, val in list(point.items()) + list(evolve_kwargs.items())
+        if key != 'use_tqdm'
+    ]
+    if any([val is None for key, val in reprs]):
+        return None
+    return repr(sorted(reprs))
+
+def _scan_init():
+    # Loads the data needed by evolve in each worker process. Under fork, 
+    # these have already been loaded by the parent process and are shared.
+    load_data('binning')
+    load_data('dep_tf')
+    load_data('ics_tf')
+
+# Arguments of the current scan, inherited by worker processes under fork
+# so that they do not need to be pickled. 
+_scan_args = None
+
+def _scan_point(ind, point=None, evolve_kwargs=None, output_dir=None):
+    # Runs evolve for one scan point, and saves the result if output_dir 
+    # is specified. If only ind is given, the arguments are taken from 
+    # _scan_args. 
+
+    if point is None:
+        points, evolve_kwargs, output_dir = _scan_args
+        point = points[ind]
+
+    start_time = time.time()
+
+    out = evolve(**point, **evolve_kwargs)
+
+    f_labels = ['H ion', 'He ion', 'exc', 'heat', 'cont']
+    result = {
+        'rs': out['rs'], 'x': out['x'], 'Tm': out['Tm'],
+        'f_low':  np.transpose([out['f']['low'][l]  for l in f_labels]),
+        'f_high': np.transpose([out['f']['high'][l] for l in f_labels])
+    }
+
+    if output_dir is not None:
+        file_name = os.path.join(output_dir, 'point_%06d.npz' % ind)
+        utils.atomic_savez(
+            file_name, point_key=str(_scan_point_key(point, evolve_kwargs)), 
+            **result
+        )
+
+    return ind, os.getpid(), time.time() - start_time, result
+
+def scan(points, n_workers=None, output_dir=None, **evolve_kwargs):
+    """
+    Runs :func:`evolve` over a list of parameter points in parallel.
+
+    Parameters
+    ----------
+    points : list of dict
+        Keyword arguments of :func:`evolve` that differ between points, e.g. *mDM*, *sigmav* or *lifetime*, *primary* and *struct_boost*. 
+    n_workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs. If 1, the points are evaluated in this process. 
+    output_dir : str, optional
+        Directory to save the result of each point to as it finishes. Points that already have a result in *output_dir* with the same parameters and *evolve_kwargs* are skipped, so that an interrupted scan can be resumed. Points with arguments that cannot be identified from their repr or name, such as lambdas, closures, partials or :class:`.Spectrum` objects, are always recomputed. 
+    **evolve_kwargs
+        Keyword arguments of :func:`evolve` common to all points. *use_tqdm* defaults to *False*. 
+
+    Returns
+    -------
+    dict
+        Results indexed by point, with keys 'params', 'rs', 'x', 'Tm', 'f' and 'workers'. 'params' contains an array of the values of each parameter, for parameters that are numbers or strings. 'rs', 'x', 'Tm' and each entry of 'f' are stacked with the point as the first index if all points have the same number of steps, and are lists otherwise. 'workers' contains the number of points, busy time and points per second of each worker process, by process ID. 
+
+    Notes
+    -----
+    Where available, the worker processes are started by forking after the transfer functions have been loaded, so that they are shared between workers instead of being loaded by each of them. The MEDEA interpolator is created once per worker. Only the histories and f values are returned, not the spectra. 
+    """
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    evolve_kwargs.setdefault('use_tqdm', False)
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    results = [None for point in points]
+    to_run  = []
+
+    for ind, point in enumerate(points):
+        file_name = (
+            os.path.join(output_dir, 'point_%06d.npz' % ind) 
+            if output_dir is not None else None
+        )
+        point_key = _scan_point_key(point, evolve_kwargs)
+        if (
+            file_name is not None and point_key is not None 
+            and os.path.exists(file_name)
+        ):
+            with np.load(file_name) as saved:
+                if str(saved['point_key']) == point_key:
+                    results[ind] = {
+                        key: saved[key] for key in saved.files 
+                        if key != 'point_key'
+                    }
+                    continue
+        to_run.append(ind)
+
+    print(
+        'Running '+str(len(to_run))+' of '+str(len(points))+' points.'
+    )
+
+    workers = {}
+
+    def record(ind, pid, elapsed, result):
+        results[ind] = result
+        if pid not in workers:
+            workers[pid] = {'n_points': 0, 'time': 0.}
+        workers[pid]['n_points'] += 1
+        workers[pid]['time']     += elapsed
+
+    if n_workers == 1:
+        _scan_init()
+        for ind in to_run:
+            record(*_scan_point(ind, points[ind], evolve_kwargs, output_dir))
+    elif len(to_run) > 0:
+        global _scan_args
+        fork = 'fork' in multiprocessing.get_all_start_methods()
+        if fork:
+            # Load once here, and share the data and the arguments, which 
+            # may contain functions that cannot be pickled, with the 
+            # workers through fork. 
+            _scan_init()
+            _scan_args = (points, evolve_kwargs, output_dir)
+            mp_context = multiprocessing.get_context('fork')
+        else:
+            mp_context = None
+        try:
+            with ProcessPoolExecutor(
+                max_workers=n_workers, mp_context=mp_context, 
+                initializer=_scan_init
+            ) as executor:
+                futures = [
+                    executor.submit(_scan_point, ind) if fork
+                    else executor.submit(
+                        _scan_point, ind, points[ind], 
+                        evolve_kwargs, output_dir
+                    ) for ind in to_run
+                ]
+                for future in as_completed(futures):
+                    record(*future.result())
+        finally:
+            _scan_args = None
+
+    for pid, worker in workers.items():
+        worker['points_per_s'] = (
+            worker['n_points']/worker['time'] if worker['time'] > 0 
+            else np.inf
+        )
+        print(
+            'Worker '+str(pid)+': '+str(worker['n_points'])+' points, '
+            +'{:.3g}'.format(worker['points_per_s'])+' points/s.'
+        )
+
+    def stack(arrs):
+        if len(set([arr.shape for arr in arrs])) == 1:
+            return np.stack(arrs)
+        return list(arrs)
+
+    params = {}
+    for key in set([key for point in points for key in point]):
+        vals = [point.get(key) for point in points]
+        if all([isinstance(val, (int, float, str, np.number)) for val in vals]):
+            params[key] = np.array(vals)
+
+    f_labels = ['H ion', 'He ion', 'exc', 'heat', 'cont']
+    f = {}
+    for level in ['low', 'high']:
+        f[level] = {
+            label: stack([res['f_'+level][:,i] for res in results])
+            for i,label in enumerate(f_labels)
+        }
+
+    return {
+        'params': params,
+        'rs': stack([res['rs'] for res in results]), 
+        'x':  stack([res['x'] for res in results]), 
+        'Tm': stack([res['Tm'] for res in results]),
+        'f': f, 'workers': workers
+    }
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from pytest import approx
+from scipy.integrate import quad
+
+from darkhistory.electrons.ics import BE_integrals as BE
+from darkhistory.electrons.ics.BE_integrals import BEIntegralTable
+
+# Series expansion of the integral of x^p (log x)^q/(e^x - 1), for each
+# (p, q) of BEIntegralTable.
+series_funcs = {
+    (2, 0):  lambda a, b: BE.F2(a, b, method='series')[0],
+    (1, 0):  lambda a, b: BE.F1(a, b, method='series'),
+    (0, 0):  lambda a, b: BE.F0(a, b, method='series'),
+    (-1, 0): lambda a, b: BE.F_inv(a, b, method='series')[0],
+    (0, 1):  lambda a, b: BE.F_log(a, b, method='series')[0],
+    (1, 1):  lambda a, b: BE.F_x_log(a, b, method='series')[0],
+    (-3, 0): lambda a, b: BE.F_inv_3(a, b, method='series')[0],
+    (-5, 0): lambda a, b: BE.F_inv_5(a, b, method='series')[0],
+    (-7, 0): lambda a, b: BE.F_inv_n(a, b, 7, method='series')[0]
+}
+
+def limits():
+
+    # Limits on both sides of BEIntegralTable.bound, and not so close
+    # together that the series suffers from cancellation.
+    rng = np.random.default_rng(0)
+    a = 10**rng.uniform(-3, 2, 200)
+    b = a*(1 + 10**rng.uniform(-0.5, 1, 200))
+    b[::5] = np.inf
+    return a, b
+
+@pytest.mark.parametrize('p, q', list(series_funcs))
+def test_table_vs_series(p, q):
+
+    a, b = limits()
+    table = BEIntegralTable.get(p, q)
+    series = np.array(series_funcs[(p, q)](a, b), dtype=float)
+    assert table.integral(a, b) == approx(series, rel=1e-9)
+    assert table.rel_err < 1e-12
+
+@pytest.mark.parametrize('p, q', [(2, 0), (-1, 0), (0, 1)])
+def test_table_vs_quad(p, q):
+
+    # Includes intervals short enough to use Gauss-Legendre quadrature.
+    table = BEIntegralTable.get(p, q)
+    a = np.array([1e-3, 0.5, 1.9, 2.1, 30., 0.01, 1.5])
+    b = np.array([1.001e-3, 0.52, 2.05, 2.11, 31., 100., np.inf])
+    ref = [quad(table.integrand, a_i, b_i, epsabs=0, epsrel=1e-13)[0]
+        for a_i, b_i in zip(a, b)]
+    assert table.integral(a, b) == approx(ref, rel=1e-10)
+
+@pytest.mark.parametrize('p, q', [(2, 0), (1, 1), (-5, 0)])
+def test_table_limits(p, q):
+
+    table = BEIntegralTable.get(p, q)
+    a, b = limits()
+
+    # Equal limits.
+    assert np.array_equal(table.integral(a, a), np.zeros_like(a))
+
+    # Reversed limits.
+    finite = np.isfinite(b)
+    assert table.integral(b[finite], a[finite]) == approx(
+        -table.integral(a[finite], b[finite]), rel=1e-14
+    )
+
+    # Infinite upper limit: the integral above x_max is neglected.
+    assert table.integral(a, np.inf) == approx(
+        table.integral(a, table.x_max), rel=1e-14
+    )
+
+def test_default_method():
+
+    a, b = limits()
+    assert BE.default_method == 'series'
+    assert np.array_equal(BE.F2(a, b)[0], BE.F2(a, b, method='series')[0])
+
+def test_check_table(monkeypatch):
+
+    a, b = limits()
+    monkeypatch.setattr(BE, 'check_table', True)
+    BE.F2(a, b, method='table')
+
+    monkeypatch.setattr(BE, 'check_rtol', 0.)
+    with pytest.raises(RuntimeError, match='relative difference is'):
+        BE.F2(a, b, method='table')
@@ -0,0 +1,87 @@
+import os
+import pickle
+
+import numpy as np
+
+from pytest import approx
+
+import config
+from darkhistory.spec.transferfunction import TransFuncAtRedshift
+from darkhistory.spec.transferfunclist import TransferFuncList
+from darkhistory.spec.transferfunclist import TransferFuncListArray
+from darkhistory.spec.transferfunclist import TransferFuncInterp
+from darkhistory.history.histools import IonRSArray
+from darkhistory.history.histools import IonRSInterp
+
+def test_convert_tf_to_binary(tmp_path, monkeypatch):
+
+    rng = np.random.default_rng(0)
+    eng = 10**np.linspace(-2, 4, 8)
+    in_eng = 10**np.linspace(0, 4, 6)
+    xH_nodes  = np.array([1e-4, 1.])
+    xHe_nodes = np.array([1e-6, 0.1])
+    x_arr = np.stack(
+        np.meshgrid(xH_nodes, xHe_nodes, indexing='ij'), axis=-1
+    )
+    rs_arr = np.exp(np.linspace(np.log(3000), np.log(3), 4))
+
+    def tf(rs):
+        return TransFuncAtRedshift(
+            rng.random((in_eng.size, eng.size)), in_eng=in_eng,
+            rs=rs*np.ones_like(in_eng), eng=eng, dlnz=0.001, spec_type='N'
+        )
+
+    tf_objs = {
+        'tf_interp': TransferFuncInterp([TransferFuncListArray([[
+            TransferFuncList([tf(rs) for rs in rs_arr])
+            for xHe in xHe_nodes
+        ] for xH in xH_nodes], x_arr)], log_interp=True),
+        'ion_interp': IonRSInterp([IonRSArray(
+            rng.random((2, 2, rs_arr.size, in_eng.size, 4)), x_arr, rs_arr
+        )], log_interp=True),
+        'tf': tf(1000.)
+    }
+
+    monkeypatch.setattr(config, 'data_path', str(tmp_path))
+    monkeypatch.setattr(
+        config, 'dep_tf_file_names', {key: key for key in tf_objs}
+    )
+    for key,tf_obj in tf_objs.items():
+        with open(str(tmp_path/(key+'.raw')), 'wb') as f:
+            pickle.dump(tf_obj, f)
+
+    assert not config.binary_tf_exists('dep_tf')
+    config.convert_tf_to_binary('dep_tf')
+    assert config.binary_tf_exists('dep_tf')
+    assert not any(name.endswith('.tmp') for name in os.listdir(tmp_path))
+
+    pt = (0.3, 0.05, 17.)
+
+    loaded = config.load_binary_tf('tf_interp')
+    assert isinstance(loaded, TransferFuncInterp)
+    assert np.array_equal(loaded.in_eng, tf_objs['tf_interp'].in_eng)
+    assert np.array_equal(loaded.eng, tf_objs['tf_interp'].eng)
+    assert loaded.grid_vals[0] == approx(
+        tf_objs['tf_interp'].grid_vals[0], rel=1e-13
+    )
+    assert loaded.get_tf(*pt).grid_vals == approx(
+        tf_objs['tf_interp'].get_tf(*pt).grid_vals, rel=1e-13
+    )
+
+    loaded = config.load_binary_tf('ion_interp')
+    assert isinstance(loaded, IonRSInterp)
+    assert loaded.grid_vals[0] == approx(
+        tf_objs['ion_interp'].grid_vals[0], rel=1e-13
+    )
+    assert loaded.get_val(*pt) == approx(
+        tf_objs['ion_interp'].get_val(*pt), rel=1e-13
+    )
+
+    loaded = config.load_binary_tf('tf')
+    assert isinstance(loaded, TransFuncAtRedshift)
+    assert np.array_equal(loaded.grid_vals, tf_objs['tf'].grid_vals)
+    assert np.array_equal(loaded.in_eng, tf_objs['tf'].in_eng)
+    assert np.array_equal(loaded.eng, tf_objs['tf'].eng)
+    assert loaded.rs == approx(tf_objs['tf'].rs)
+    assert loaded.dlnz == tf_objs['tf'].dlnz
+    assert loaded.spec_type == tf_objs['tf'].spec_type
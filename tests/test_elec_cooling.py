@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+
+import darkhistory.physics as phys
+import darkhistory.electrons.elec_cooling as elec_cooling
+from darkhistory.spec.transferfunction import TransFuncAtRedshift
+
+eleceng = 10**np.linspace(0, 5, 20)
+photeng = 10**np.linspace(-4, 5, 25)
+
+class FakeICSSpecTable:
+
+    # Smooth ICS and energy loss spectra in place of ICSSpecTable, which
+    # needs the downloaded ICS transfer functions.
+    def get_tf(self, eleceng, photeng, rs):
+        T = phys.TCMB(rs)
+        grid = (
+            np.outer(eleceng, 1/photeng)
+            * np.exp(-photeng/(1e3*T))[np.newaxis, :]*T**2*1e-8
+        )
+        return tuple(
+            TransFuncAtRedshift(
+                grid*fac, in_eng=eleceng, eng=photeng,
+                rs=rs*np.ones_like(eleceng), dlnz=-1, spec_type='dNdE'
+            ) for fac in [1., 1e-3]
+        )
+
+@pytest.fixture
+def elec_cooling_kwargs(monkeypatch):
+    monkeypatch.setattr(
+        elec_cooling, 'load_data',
+        lambda data_type: {'thomson': None, 'rel': None, 'engloss': None}
+    )
+    return {'ics_spec_table': FakeICSSpecTable()}
+
+def direct(rs, xHII, xHeII, elec_cooling_kwargs):
+    return elec_cooling.get_elec_cooling_tf(
+        eleceng, photeng, rs, xHII, xHeII=xHeII, **elec_cooling_kwargs
+    )
+
+def max_rel_diff(out, ref):
+    # Largest difference of each output relative to its largest value, as
+    # in ElecCoolingTable.get_tf.
+    diffs = []
+    for val, ref_val in zip(out, ref):
+        if isinstance(ref_val, TransFuncAtRedshift):
+            val, ref_val = val.grid_vals, ref_val.grid_vals
+        diffs.append(np.max(np.abs(val - ref_val))/np.max(np.abs(ref_val)))
+    return max(diffs)
+
+def test_elec_cooling_table(tmp_path, elec_cooling_kwargs):
+
+    rs_arr    = np.array([100., 105.])
+    xHII_arr  = np.array([0.01, 0.011])
+    xHeII_arr = np.array([1e-6, 1e-5])
+
+    file_name = str(tmp_path/'elec_cooling')
+    elec_cooling.make_elec_cooling_table(
+        file_name, eleceng, photeng, rs_arr, xHII_arr, xHeII_arr,
+        **elec_cooling_kwargs
+    )
+    table = elec_cooling.ElecCoolingTable(file_name, check_interval=2)
+
+    # Exact at the nodes.
+    for pt in [(100., 0.01, 1e-6), (105., 0.011, 1e-5), (100., 0.011, 1e-5)]:
+        assert max_rel_diff(
+            table.interp(*pt), direct(*pt, elec_cooling_kwargs)
+        ) < 1e-12
+
+    # Close in between. The first call is checked against the direct 
+    # computation and returns it, the second returns the table.
+    for pt in [(102., 0.0105, 3e-6), (104., 0.0102, 8e-6)]:
+        direct_out = direct(*pt, elec_cooling_kwargs)
+        assert max_rel_diff(table.interp(*pt), direct_out) < 2e-3
+
+        out = table.get_tf(
+            eleceng, photeng, *pt, 
+            lambda: direct(*pt, elec_cooling_kwargs)
+        )
+        assert max_rel_diff(out, direct_out) == 0
+        assert table.use_table
+
+        out = table.get_tf(eleceng, photeng, *pt, None)
+        assert max_rel_diff(out, table.interp(*pt)) == 0
+
+def test_elec_cooling_table_fallback(tmp_path, elec_cooling_kwargs):
+
+    rs_arr    = np.array([100., 120.])
+    xHII_arr  = np.array([0.01, 0.1])
+    xHeII_arr = np.array([1e-6, 1e-5])
+
+    file_name = str(tmp_path/'elec_cooling')
+    elec_cooling.make_elec_cooling_table(
+        file_name, eleceng, photeng, rs_arr, xHII_arr, xHeII_arr,
+        **elec_cooling_kwargs
+    )
+    table = elec_cooling.ElecCoolingTable(file_name)
+
+    direct_out = (object(),)
+    for pt in [(90., 0.05, 5e-6), (110., 0.5, 5e-6), (110., 0.05, 1e-4)]:
+        assert not table.in_table(*pt)
+        with pytest.raises(ValueError):
+            table.interp(*pt)
+        assert table.get_tf(
+            eleceng, photeng, *pt, lambda: direct_out
+        ) is direct_out
+
+    # Different abscissae.
+    assert table.get_tf(
+        eleceng[:-1], photeng, 110., 0.05, 5e-6, lambda: direct_out
+    ) is direct_out
+
+    # A failed comparison switches to the direct computation for good.
+    bad_out = list(table.interp(110., 0.05, 5e-6))
+    bad_out[2] = 2*bad_out[2]
+    with pytest.warns(UserWarning):
+        table.get_tf(eleceng, photeng, 110., 0.05, 5e-6, lambda: bad_out)
+    assert not table.use_table
+    assert table.get_tf(
+        eleceng, photeng, 110., 0.05, 5e-6, lambda: direct_out
+    ) is direct_out
+
+def test_make_elec_cooling_table_abscissae(tmp_path):
+
+    with pytest.raises(ValueError):
+        elec_cooling.make_elec_cooling_table(
+            str(tmp_path/'elec_cooling'), eleceng, photeng,
+            np.array([120., 100.]), np.array([0.01, 0.1]),
+            np.array([1e-6, 1e-5])
+        )
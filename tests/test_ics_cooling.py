@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from pytest import approx
+
+import darkhistory.physics as phys
+import darkhistory.electrons.ics.ics_cooling as ics_cooling
+from darkhistory.spec.transferfunction import TransFuncAtRedshift
+
+eleceng = 10**np.linspace(0, 5, 20)
+photeng = 10**np.linspace(-4, 5, 25)
+
+@pytest.fixture
+def direct_calls(monkeypatch):
+
+    # Spectra linear in log(T) in place of ics_spec and engloss_spec, which
+    # need the downloaded ICS transfer functions, so that interpolating in
+    # log(T) is exact.
+    calls = []
+
+    def fake_spec(fac):
+        def spec(eleceng, photeng, T, thomson_tf=None, rel_tf=None):
+            calls.append((T, thomson_tf, rel_tf))
+            return TransFuncAtRedshift(
+                np.outer(eleceng, 1/photeng)*(1 + np.log(T))*fac,
+                in_eng=eleceng, eng=photeng, rs=np.ones_like(eleceng),
+                dlnz=-1, spec_type='dNdE'
+            )
+        return spec
+
+    monkeypatch.setattr(ics_cooling, 'ics_spec', fake_spec(1.))
+    monkeypatch.setattr(ics_cooling, 'engloss_spec', fake_spec(1e-3))
+    return calls
+
+def test_ics_spec_table(direct_calls):
+
+    rs_arr = np.array([10., 100., 1000.])
+    table = ics_cooling.ICSSpecTable(
+        eleceng, photeng, rs_arr, 'thomson', 'rel', 'engloss'
+    )
+    assert table.ics_grid.shape == (3, eleceng.size, photeng.size)
+    assert [call[1:] for call in direct_calls] == [
+        ('thomson', 'rel'), ('engloss', 'rel')
+    ]*3
+
+    for rs in [10., 31., 100., 512., 1000.]:
+        del direct_calls[:]
+        ICS_tf, engloss_tf = table.get_tf(eleceng, photeng, rs)
+        assert direct_calls == []
+        T = phys.TCMB(rs)
+        for out, fac in [(ICS_tf, 1.), (engloss_tf, 1e-3)]:
+            assert out.grid_vals == approx(
+                np.outer(eleceng, 1/photeng)*(1 + np.log(T))*fac, rel=1e-12
+            )
+            assert np.array_equal(out.in_eng, eleceng)
+            assert np.array_equal(out.eng, photeng)
+            assert out.rs == approx(rs*np.ones_like(eleceng))
+            assert out.dlnz == approx(-1./(phys.dtdz(rs)*rs))
+            assert out.spec_type == 'dNdE'
+
+def test_ics_spec_table_fallback(direct_calls):
+
+    table = ics_cooling.ICSSpecTable(
+        eleceng, photeng, np.array([10., 100.]), 'thomson', 'rel', 'engloss'
+    )
+
+    for args in [
+        (eleceng, photeng, 5.), (eleceng, photeng, 200.),
+        (eleceng[1:], photeng, 50.), (eleceng, photeng[1:], 50.)
+    ]:
+        del direct_calls[:]
+        ICS_tf, engloss_tf = table.get_tf(*args)
+        assert [call[0] for call in direct_calls] == [phys.TCMB(args[2])]*2
+        assert np.array_equal(ICS_tf.in_eng, args[0])
+        assert np.array_equal(ICS_tf.eng, args[1])
+
+    with pytest.raises(ValueError):
+        table.interp(200.)
+
+    with pytest.raises(ValueError):
+        ics_cooling.ICSSpecTable(
+            eleceng, photeng, np.array([100., 10.]),
+            'thomson', 'rel', 'engloss'
+        )
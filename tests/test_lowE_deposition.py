@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from pytest import approx
+
+from darkhistory.spec.spectrum import Spectrum
+from darkhistory.low_energy import lowE_deposition
+
+photeng = 10**np.linspace(-4, 12, 80)
+eleceng = 10**np.linspace(0, 12, 60)
+
+class FakeMEDEAInterp:
+
+    # Smooth positive deposition fractions in place of the MEDEA results.
+    def get_vals(self, xe, eng):
+        return np.stack([
+            np.abs(np.sin(np.log(eng)*(k+1) + xe)) + 0.1 for k in range(5)
+        ], axis=1)
+
+def make_inputs(rng):
+    return {
+        'elec_N': rng.random(eleceng.size),
+        'phot_N': rng.random(photeng.size),
+        'x': np.array([
+            0.3*rng.random() + 0.01, 0.01*rng.random() + 1e-4, 1e-5
+        ]),
+        'dE_dVdt_inj': 1e-20*(1 + rng.random()),
+        'highengdep': rng.random(4),
+        'cmbloss': 1e-3*rng.random(),
+        'rs': rng.uniform(10, 2000)
+    }
+
+@pytest.mark.parametrize('method', ['no_He', 'He_recomb', 'He'])
+@pytest.mark.parametrize('cross_check', [False, True])
+def test_deposition_plan(method, cross_check):
+
+    rng = np.random.default_rng(0)
+    dt = 1e10
+    plan = lowE_deposition.DepositionPlan(
+        photeng, eleceng, method=method, cross_check=cross_check
+    )
+
+    inputs = [make_inputs(rng) for i in range(3)]
+    for inp in inputs:
+        ref = lowE_deposition.compute_fs(
+            FakeMEDEAInterp(),
+            Spectrum(eleceng, inp['elec_N'].copy(), rs=inp['rs'], spec_type='N'),
+            Spectrum(photeng, inp['phot_N'].copy(), rs=inp['rs'], spec_type='N'),
+            inp['x'], inp['dE_dVdt_inj'], dt, inp['highengdep'],
+            cmbloss=inp['cmbloss'], method=method, cross_check=cross_check
+        )
+        out = plan.compute_fs(
+            FakeMEDEAInterp(), inp['elec_N'], inp['phot_N'], inp['x'],
+            inp['dE_dVdt_inj'], dt, inp['highengdep'], inp['rs'],
+            cmbloss=inp['cmbloss']
+        )
+        for f, f_ref in zip(out, ref):
+            assert f == approx(f_ref, rel=1e-15, abs=1e-15*np.max(f_ref))
+
+    # Several models at the same redshift at once.
+    rs = inputs[0]['rs']
+    batch = [make_inputs(rng) for i in range(3)]
+    # Models with the same ionization share MEDEA fractions.
+    batch[2]['x'] = batch[0]['x']
+    batch_out = plan.compute_fs(
+        FakeMEDEAInterp(),
+        *[np.array([inp[key] for inp in batch]) for key in [
+            'elec_N', 'phot_N', 'x', 'dE_dVdt_inj'
+        ]], dt, np.array([inp['highengdep'] for inp in batch]), rs,
+        cmbloss=np.array([inp['cmbloss'] for inp in batch])
+    )
+    for i, inp in enumerate(batch):
+        out = plan.compute_fs(
+            FakeMEDEAInterp(), inp['elec_N'], inp['phot_N'], inp['x'],
+            inp['dE_dVdt_inj'], dt, inp['highengdep'], rs,
+            cmbloss=inp['cmbloss']
+        )
+        for f_batch, f in zip(batch_out, out):
+            assert f_batch[i] == approx(f, rel=1e-15, abs=1e-15*np.max(f))
+
+def test_deposition_plan_method():
+
+    with pytest.raises(TypeError):
+        lowE_deposition.DepositionPlan(photeng, eleceng, method='helium')
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from pytest import approx
+
+import main
+import darkhistory.physics as phys
+from darkhistory.spec.spectrum import Spectrum
+from darkhistory.spec.transferfunction import TransFuncAtRedshift
+from darkhistory.spec.transferfunclist import TransferFuncList
+from darkhistory.spec.transferfunclist import TransferFuncListArray
+from darkhistory.spec.transferfunclist import TransferFuncInterp
+from darkhistory.history.histools import IonRSArray
+from darkhistory.history.histools import IonRSInterp
+
+photeng = 10**np.linspace(-4, 12, 40)
+eleceng = 10**np.linspace(-3, 12, 30)
+
+@pytest.fixture
+def fake_data(monkeypatch):
+
+    # Random transfer functions on a small grid of nodes, in place of the 
+    # downloaded data.
+    rng = np.random.default_rng(0)
+    xH_nodes  = np.array([1e-4, 1.])
+    xHe_nodes = np.array([1e-6, 0.1])
+    x_arr = np.stack(
+        np.meshgrid(xH_nodes, xHe_nodes, indexing='ij'), axis=-1
+    )
+    rs_arr = np.exp(np.linspace(np.log(3000), np.log(3), 4))
+
+    def tf_interp(out_eng, scale):
+        return TransferFuncInterp([TransferFuncListArray([[
+            TransferFuncList([
+                TransFuncAtRedshift(
+                    rng.random((photeng.size, out_eng.size))*scale, 
+                    in_eng=photeng, rs=rs*np.ones_like(photeng), 
+                    eng=out_eng, dlnz=0.001, spec_type='N'
+                ) for rs in rs_arr
+            ]) for xHe in xHe_nodes
+        ] for xH in xH_nodes], x_arr)], log_interp=True)
+
+    data = {
+        'binning': {'phot': photeng, 'elec': eleceng},
+        'dep_tf': {
+            'highengphot': tf_interp(photeng, 0.02), 
+            'lowengphot':  tf_interp(photeng, 0.001),
+            'lowengelec':  tf_interp(eleceng, 0.001), 
+            'highengdep':  IonRSInterp([IonRSArray(
+                rng.random((2, 2, rs_arr.size, photeng.size, 4))*1e-3, 
+                x_arr, rs_arr
+            )], log_interp=True)
+        },
+        'ics_tf': {'thomson': None, 'rel': None, 'engloss': None}
+    }
+
+    monkeypatch.setattr(main, 'load_data', lambda data_type: data[data_type])
+    monkeypatch.setattr(phys, 'xHII_std', lambda rs: 0.1 + 1e-4*rs)
+    monkeypatch.setattr(phys, 'xHeII_std', lambda rs: 1e-3 + 0*rs)
+    monkeypatch.setattr(phys, 'Tm_std', lambda rs: phys.TCMB(rs))
+
+def make_model(i):
+
+    in_spec_phot = Spectrum(
+        photeng, np.zeros_like(photeng), rs=1000., in_eng=1e8*(i+1), 
+        spec_type='N'
+    )
+    in_spec_phot.N[25+i] = 1.
+    in_spec_phot.underflow = {'N': 0.1*i, 'eng': 1e-3*i}
+    in_spec_elec = Spectrum(
+        eleceng, np.zeros_like(eleceng), rs=1000., spec_type='N'
+    )
+    return {
+        'in_spec_phot': in_spec_phot, 'in_spec_elec': in_spec_elec,
+        'rate_func_N':   lambda rs: 1e-28*(1+i)*rs**3, 
+        'rate_func_eng': lambda rs: 1e-28*(1+i)*rs**3*photeng[25+i]
+    }
+
+@pytest.mark.parametrize('backreaction', [True, False])
+def test_evolve_batch(fake_data, backreaction):
+
+    kwargs = {
+        'end_rs': 990., 'coarsen_factor': 2, 'backreaction': backreaction,
+        'rtol': 1e-10, 'use_tqdm': False
+    }
+    models = [make_model(i) for i in range(3)]
+    batch_out = main.evolve_batch(models, **kwargs)
+
+    # The TLA is solved for all models as one system, so the results 
+    # agree up to the tolerance of the solver.
+    for model, out in zip(models, batch_out):
+        ref = main.evolve(**model, **kwargs)
+        assert np.array_equal(out['rs'], ref['rs'])
+        assert out['x'] == approx(ref['x'], rel=1e-6)
+        assert out['Tm'] == approx(ref['Tm'], rel=1e-6)
+        for key in ['highengphot', 'lowengphot', 'lowengelec']:
+            assert out[key].grid_vals == approx(
+                ref[key].grid_vals, rel=1e-6, abs=1e-300
+            )
+            assert np.array_equal(out[key].in_eng, ref[key].in_eng)
+            assert np.array_equal(out[key].rs, ref[key].rs)
+        assert out['highengphot'].N_underflow == approx(
+            ref['highengphot'].N_underflow, rel=1e-12
+        )
+        assert out['highengphot'].eng_underflow == approx(
+            ref['highengphot'].eng_underflow, rel=1e-12
+        )
+        for level in ['low', 'high']:
+            for chan in ['H ion', 'He ion', 'exc', 'heat', 'cont']:
+                assert out['f'][level][chan] == approx(
+                    ref['f'][level][chan], rel=1e-6, abs=1e-300
+                )
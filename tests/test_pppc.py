@@ -0,0 +1,183 @@
+import json
+
+import numpy as np
+import pytest
+
+from collections import OrderedDict
+from pytest import approx
+
+import config
+from darkhistory.spec import pppc
+
+eng = 10**np.linspace(-4, 12.6, 200)
+
+@pytest.fixture
+def pppc_data(tmp_path, monkeypatch):
+
+    # Small synthetic PPPC4DMID tables in place of the downloaded ones,
+    # smooth in the mass and peaked in log10x at a different place for
+    # each channel.
+    mDM_in_GeV = 10**np.linspace(0.5, 5, 20)
+    log10x = np.linspace(-9, 0, 20)
+    coords = [[
+        [list(mDM_in_GeV), list(log10x)] for chan in config.pppc_table_chans
+    ] for sec in ['elec', 'phot']]
+    values = [[
+        list(map(list, np.log10(
+            np.exp(-(log10x[None, :] + 1.5 + 0.1*j)**2/(1 + 0.2*i))
+            * (1 + 0.1*np.log10(mDM_in_GeV)[:, None]) + 1e-30
+        ))) for j in range(len(config.pppc_table_chans))
+    ] for i in range(2)]
+
+    with open(str(tmp_path/'dlNdlxIEW_coords_table.txt'), 'w') as f:
+        json.dump(coords, f)
+    with open(str(tmp_path/'dlNdlxIEW_values_table.txt'), 'w') as f:
+        json.dump(values, f)
+
+    monkeypatch.setattr(config, 'data_path', str(tmp_path))
+    monkeypatch.setattr(config, 'glob_pppc_data', None)
+    monkeypatch.setattr(pppc, '_spec_cache', OrderedDict())
+    monkeypatch.setattr(pppc, 'cache_dir', None)
+
+    return tmp_path
+
+class RecordingDict(dict):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read = []
+
+    def __getitem__(self, key):
+        self.read.append(key)
+        return super().__getitem__(key)
+
+def test_pppc_lazy_loading(pppc_data):
+
+    json_data = config.load_data('pppc')
+    assert len(json_data['elec']) == 0 and len(json_data['phot']) == 0
+
+    interp = json_data['elec']['b']
+    assert list(json_data['elec']) == ['b'] and len(json_data['phot']) == 0
+    assert json_data['elec']['b'] is interp
+    with pytest.raises(KeyError):
+        json_data['elec']['not_a_channel']
+
+    config.convert_pppc_to_binary()
+    assert config.pppc_binary_exists()
+    config.glob_pppc_data = None
+    binary_data = config.load_data('pppc')
+    assert config.load_data('pppc') is binary_data
+    assert isinstance(binary_data['elec']._coords_data, np.lib.npyio.NpzFile)
+
+    for sec in ['elec', 'phot']:
+        for pri in ['b', 'e', 'W']:
+            assert binary_data[sec][pri].get_val(100., -3.) == approx(
+                json_data[sec][pri].get_val(100., -3.), rel=1e-14
+            )
+
+    # Only the tables of the channels needed are read.
+    with np.load(str(pppc_data/(config.pppc_file_name+'.npz'))) as f:
+        tables = RecordingDict({key: f[key] for key in f.files})
+    interp_dict = config.PPPCInterpDict(tables, None, 'phot')
+    interp_dict['W']
+    assert sorted(set(tables.read)) == [
+        'phot_W_L_log10x', 'phot_W_L_mDM', 'phot_W_L_values',
+        'phot_W_T_log10x', 'phot_W_T_mDM', 'phot_W_T_values'
+    ]
+
+def test_pppc_cache(pppc_data, monkeypatch):
+
+    spec = pppc.get_pppc_spec(1e12, eng, 'b', 'phot')
+    assert len(pppc._spec_cache) == 1
+
+    # Cached spectra are returned as new objects.
+    spec.dNdE[:] = 0
+    cached = pppc.get_pppc_spec(1e12, eng, 'b', 'phot')
+    assert cached is not spec
+    assert len(pppc._spec_cache) == 1
+    assert np.any(cached.dNdE > 0)
+
+    get_spec_rebin = pppc._get_spec_rebin
+    def not_cached(*args):
+        raise AssertionError('spectrum was not cached.')
+    monkeypatch.setattr(pppc, '_get_spec_rebin', not_cached)
+    assert np.array_equal(
+        pppc.get_pppc_spec(1e12, eng, 'b', 'phot').dNdE, cached.dNdE
+    )
+    monkeypatch.setattr(pppc, '_get_spec_rebin', get_spec_rebin)
+
+    # Different arguments are cached separately, and the least recently
+    # used spectrum is dropped first.
+    monkeypatch.setattr(pppc, 'spec_cache_size', 2)
+    pppc.get_pppc_spec(1e12, eng, 'b', 'phot', decay=True)
+    pppc.get_pppc_spec(1e12, eng, 'b', 'phot')
+    pppc.get_pppc_spec(1e12, eng[:-1], 'b', 'phot')
+    assert [key[4] for key in pppc._spec_cache] == [False, False]
+    assert [key[2:4] for key in pppc._spec_cache] == [('b', 'phot')]*2
+
+    # Spectra stored in cache_dir are reused in later sessions.
+    monkeypatch.setattr(pppc, 'cache_dir', str(pppc_data/'cache'))
+    spec = pppc.get_pppc_spec(3e11, eng, 'W', 'elec')
+    pppc._spec_cache.clear()
+    monkeypatch.setattr(pppc, '_get_spec_rebin', not_cached)
+    from_disk = pppc.get_pppc_spec(3e11, eng, 'W', 'elec')
+    assert np.array_equal(from_disk.dNdE, spec.dNdE)
+    assert from_disk.underflow == spec.underflow
+
+@pytest.mark.parametrize('method', ['rebin', 'integrate'])
+@pytest.mark.parametrize('decay', [False, True])
+def test_get_pppc_specs(pppc_data, method, decay):
+
+    mDM = np.array([3e11, 1e12, 1e12, 5e13])
+    for pri, sec in [('b', 'phot'), ('W', 'elec')]:
+        specs = pppc.get_pppc_specs(
+            mDM, eng, pri, sec, decay=decay, method=method
+        )
+        assert np.array_equal(specs.in_eng, mDM)
+        assert specs.spec_type == 'dNdE'
+        for i, m in enumerate(mDM):
+            spec = pppc.get_pppc_spec(
+                m, eng, pri, sec, decay=decay, method=method
+            )
+            assert specs.grid_vals[i] == approx(
+                spec.dNdE, rel=1e-12, abs=1e-12*np.max(spec.dNdE)
+            )
+            assert specs.N_underflow[i] == approx(
+                spec.underflow['N'], rel=1e-12, abs=1e-300
+            )
+            assert specs.eng_underflow[i] == approx(
+                spec.underflow['eng'], rel=1e-12, abs=1e-300
+            )
+
+    for pri in ['elec_delta', 'phot_delta']:
+        specs = pppc.get_pppc_specs(mDM, eng, pri, 'phot', decay=decay)
+        for i, m in enumerate(mDM):
+            spec = pppc.get_pppc_spec(m, eng, pri, 'phot', decay=decay)
+            assert np.array_equal(specs.grid_vals[i], spec.dNdE)
+
+    with pytest.raises(ValueError):
+        pppc.get_pppc_specs(
+            np.array([1e12, 1e2]), eng, 'b', 'phot', decay=decay
+        )
+
+@pytest.mark.parametrize('decay', [False, True])
+def test_get_pppc_spec_integrate(pppc_data, decay):
+
+    # Integrating each bin instead of rebinning a fine grid changes dN/dE 
+    # by at most about 0.6% of its peak on these tables (about 0.7% on 
+    # the PPPC4DMID tables), and the total energy by at most 0.6%. 
+    for pri, sec in [('b', 'phot'), ('e', 'elec')]:
+        for mDM in [3e11, 5e13]:
+            spec = pppc.get_pppc_spec(
+                mDM, eng, pri, sec, decay=decay, method='integrate'
+            )
+            ref = pppc.get_pppc_spec(
+                mDM, eng, pri, sec, decay=decay, method='rebin'
+            )
+            assert spec.dNdE == approx(ref.dNdE, abs=1e-2*np.max(ref.dNdE))
+            assert spec.totN() == approx(ref.totN(), rel=1e-3)
+            assert spec.toteng() == approx(ref.toteng(), rel=1e-2)
+            assert spec.underflow['N'] == 0 and spec.underflow['eng'] == 0
+
+    with pytest.raises(ValueError):
+        pppc.get_pppc_spec(1e12, eng, 'b', 'phot', method='trapz')
@@ -0,0 +1,183 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from pytest import approx
+
+from darkhistory.spec.spectrum import Spectrum
+from darkhistory.spec.spectra import Spectra
+from darkhistory.spec.spectools import Abscissa, rebin_N_arr
+from darkhistory.spec.spectools import EnglossRebinData
+from darkhistory.numpy_groupies import aggregate as agg
+
+def rebin_ref(N_arr, in_eng, out_eng):
+
+    # Rebins one bin at a time, following the original implementation
+    # of rebin_N_arr. Particles above out_eng[-1] are discarded.
+    new_eng = np.insert(out_eng, 0, out_eng[0]**2/out_eng[1])
+    bin_ind = np.interp(in_eng, new_eng, np.arange(new_eng.size) - 1.)
+
+    new_N = np.zeros(out_eng.size)
+    N_underflow = 0.
+    eng_underflow = 0.
+    for N, eng, ind in zip(N_arr, in_eng, bin_ind):
+        if eng < new_eng[0]:
+            N_underflow += N
+            eng_underflow += N*eng
+        elif ind < 0:
+            N_above = (ind + 1)*N
+            new_N[0] += N_above
+            N_underflow += N - N_above
+            eng_underflow += N*eng - N_above*out_eng[0]
+        elif eng <= out_eng[-1]:
+            low = min(int(np.floor(ind)), out_eng.size - 2)
+            new_N[low] += (low + 1 - ind)*N
+            new_N[low + 1] += (ind - low)*N
+
+    return new_N, N_underflow, eng_underflow
+
+@pytest.mark.parametrize('out_eng', [
+    # Same abscissa.
+    10**np.linspace(0, 3, 40),
+    # Coarser, with underflow.
+    10**np.linspace(0.5, 3, 15),
+    # Finer, with underflow.
+    10**np.linspace(0.3, 3.5, 90),
+    # Coarser, with overflow.
+    10**np.linspace(-1, 2.5, 12),
+    # Underflow and overflow.
+    10**np.linspace(1, 2, 20)
+])
+def test_rebin_operator(out_eng):
+
+    in_eng = 10**np.linspace(0, 3, 40)
+    N_arr = np.random.default_rng(0).random((3, in_eng.size))
+
+    rebin_op = Abscissa.get(in_eng).rebin_operator(out_eng)
+    new_N, N_underflow, eng_underflow = rebin_op.apply(N_arr)
+
+    assert rebin_op.overflow == (in_eng[-1] > out_eng[-1])
+    for i in range(N_arr.shape[0]):
+        ref_N, ref_N_underflow, ref_eng_underflow = rebin_ref(
+            N_arr[i], in_eng, out_eng
+        )
+        assert new_N[i] == approx(ref_N, rel=1e-12, abs=1e-15)
+        assert N_underflow[i] == approx(ref_N_underflow, abs=1e-12)
+        assert eng_underflow[i] == approx(ref_eng_underflow, abs=1e-12)
+
+    # Number and energy of particles within out_eng are conserved.
+    kept = in_eng <= out_eng[-1]
+    assert np.sum(new_N, axis=1) + N_underflow == approx(
+        np.sum(N_arr[:, kept], axis=1)
+    )
+    assert np.dot(new_N, out_eng) + eng_underflow == approx(
+        np.dot(N_arr[:, kept], in_eng[kept])
+    )
+
+def test_rebin_N_arr():
+
+    in_eng = 10**np.linspace(0, 3, 40)
+    out_eng = 10**np.linspace(0.5, 3, 15)
+    N_arr = np.random.default_rng(1).random(in_eng.size)
+    ref_N, ref_N_underflow, ref_eng_underflow = rebin_ref(
+        N_arr, in_eng, out_eng
+    )
+
+    spec = rebin_N_arr(N_arr, in_eng, out_eng, spec_type='N')
+    assert spec.N == approx(ref_N, rel=1e-12, abs=1e-15)
+    assert spec.underflow['N'] == approx(ref_N_underflow)
+    assert spec.underflow['eng'] == approx(ref_eng_underflow)
+
+    spec = rebin_N_arr(N_arr, in_eng, out_eng)
+    assert spec.spec_type == 'dNdE'
+    assert spec.N == approx(ref_N, rel=1e-12, abs=1e-15)
+
+    with pytest.raises(OverflowError):
+        rebin_N_arr(N_arr, in_eng, out_eng[:-1])
+
+def test_rebin_overflow():
+
+    in_eng = 10**np.linspace(0, 3, 40)
+    out_eng = 10**np.linspace(1, 2, 20)
+    N_arr = np.random.default_rng(2).random((2, in_eng.size))
+
+    spec = Spectrum(in_eng, N_arr[0], spec_type='N')
+    with pytest.warns(RuntimeWarning):
+        spec.rebin(out_eng)
+    ref_N, ref_N_underflow, ref_eng_underflow = rebin_ref(
+        N_arr[0], in_eng, out_eng
+    )
+    assert spec.N == approx(ref_N, rel=1e-12, abs=1e-15)
+    assert spec.underflow['N'] == approx(ref_N_underflow)
+    assert spec.underflow['eng'] == approx(ref_eng_underflow)
+
+    spectra = Spectra(
+        N_arr, eng=in_eng, in_eng=np.array([1., 2.]), spec_type='N'
+    )
+    with pytest.warns(RuntimeWarning):
+        spectra.rebin(out_eng)
+    assert spectra.grid_vals[0] == approx(spec.N, rel=1e-12, abs=1e-15)
+
+    # No warning without overflow.
+    spec = Spectrum(in_eng, N_arr[0], spec_type='N')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        spec.rebin(10**np.linspace(0.5, 3, 15))
+
+def engloss_rebin_ref(rebin_data, grid_vals):
+
+    # Original implementation of EnglossRebinData.rebin, which assigns
+    # particles to bins with aggregate instead of a sparse matrix.
+    bin_ind = rebin_data.bin_ind
+    ind_reg = rebin_data.ind_reg
+    ind_low = rebin_data.ind_low
+    reg_bin_low = rebin_data.reg_bin_low
+    reg_bin_upp = rebin_data.reg_bin_upp
+
+    # Flip grid_vals, since sec_spec_eng is flipped. 
+    N_arr = np.fliplr(grid_vals)
+
+    # Number of particles to assign to the lower/upper bins.
+    reg_data_low = np.zeros_like(bin_ind)
+    reg_data_upp = np.zeros_like(bin_ind)
+    reg_data_low[ind_reg] = (
+        (reg_bin_upp[ind_reg] - bin_ind[ind_reg]) * N_arr[ind_reg]
+    )
+    reg_data_upp[ind_reg] = (
+        (bin_ind[ind_reg] - reg_bin_low[ind_reg]) * N_arr[ind_reg]
+    )
+
+    # Particles partly assigned to underflow, partly to the first bin.
+    N_above_underflow = np.zeros_like(bin_ind)
+    N_above_underflow[ind_low] = (
+        (bin_ind[ind_low] - rebin_data.low_bin_low[ind_low]) * N_arr[ind_low]
+    )
+
+    new_data = np.zeros((rebin_data.in_eng.size, rebin_data.new_eng.size))
+    new_data[:,1] += np.sum(N_above_underflow, axis=1)
+
+    for reg_bin, reg_data in [
+        (reg_bin_low, reg_data_low), (reg_bin_upp, reg_data_upp)
+    ]:
+        new_data += agg.aggregate(
+            np.array([
+                rebin_data.in_eng_mask[ind_reg], reg_bin[ind_reg]+1
+            ]),
+            reg_data[ind_reg], 
+            size = new_data.shape, func='sum', fill_value = 0
+        )
+
+    return new_data[:, 1:]
+
+def test_engloss_rebin_data():
+
+    eleceng = 10**np.linspace(-3, 12, 60)
+    photeng = 10**np.linspace(-4, 12, 70)
+    grid_vals = np.random.default_rng(0).random((eleceng.size, photeng.size))
+
+    rebin_data = EnglossRebinData(eleceng, photeng, eleceng)
+
+    assert rebin_data.rebin(grid_vals) == approx(
+        engloss_rebin_ref(rebin_data, grid_vals), rel=1e-12, abs=1e-15
+    )
@@ -0,0 +1,195 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from pytest import approx
+
+from darkhistory.spec.spectrum import Spectrum
+from darkhistory.spec.spectra import Spectra
+
+from tests.test_spectrum import _DictState
+
+def make_spectra():
+
+    eng = np.array([1., 10., 100.])
+    grid_vals = np.array([[1., 2., 3.], [4., 5., 6.]])
+    return Spectra(
+        grid_vals, eng=eng, in_eng=np.array([5., 50.]), spec_type='N'
+    )
+
+def test_iadd_imul_in_place():
+
+    spectra = make_spectra()
+    grid_vals = spectra.grid_vals
+    other = Spectra(
+        grid_vals, eng=spectra.eng, in_eng=spectra.in_eng, spec_type='N'
+    )
+
+    # The first operation copies the grid values, which are not owned.
+    spectra += np.ones((2, 3))
+    assert spectra.grid_vals is not grid_vals
+    owned = spectra.grid_vals
+    spectra *= np.array([1., 2.])
+    assert spectra.grid_vals is owned
+    assert np.array_equal(
+        spectra.grid_vals, np.array([[2., 3., 4.], [10., 12., 14.]])
+    )
+    assert np.array_equal(
+        other.grid_vals, np.array([[1., 2., 3.], [4., 5., 6.]])
+    )
+
+def test_row_in_place():
+
+    spectra = make_spectra()
+    spectra *= 1.
+    grid_vals = spectra.grid_vals.copy()
+
+    # In-place operations on a row do not change the parent.
+    spec = spectra[0]
+    spec *= 5.
+    spec += np.ones(3)
+    spec -= np.ones(3)
+    spec /= 2.
+    assert np.array_equal(spectra.grid_vals, grid_vals)
+    assert spec.N == approx(np.array([2.5, 5., 7.5]))
+
+    # In-place operations on the parent do not change the row.
+    spec = spectra[1]
+    spectra *= 2.
+    assert np.array_equal(spec.N, np.array([4., 5., 6.]))
+    assert np.array_equal(spectra.grid_vals, 2*grid_vals)
+
+def test_iadd_imul_new_array():
+
+    eng = np.array([1., 10., 100.])
+    grid_vals = np.array([[1, 2, 3], [4, 5, 6]])
+    spectra = Spectra(
+        grid_vals, eng=eng, in_eng=np.array([5., 50.]), spec_type='N'
+    )
+    spectra *= 0.5
+    assert spectra.grid_vals is not grid_vals
+    assert np.array_equal(
+        spectra.grid_vals, np.array([[0.5, 1., 1.5], [2., 2.5, 3.]])
+    )
+    assert np.array_equal(grid_vals, np.array([[1, 2, 3], [4, 5, 6]]))
+
+    grid_vals = np.array([[1., 2., 3.], [4., 5., 6.]])
+    grid_vals.flags.writeable = False
+    spectra = Spectra(
+        grid_vals, eng=eng, in_eng=np.array([5., 50.]), spec_type='N'
+    )
+    spectra += np.ones((2, 3))
+    assert spectra.grid_vals is not grid_vals
+    assert np.array_equal(grid_vals, np.array([[1., 2., 3.], [4., 5., 6.]]))
+
+def test_pickle():
+
+    spectra = make_spectra()
+    spectra.append(Spectrum(
+        spectra.eng, np.array([7., 8., 9.]), in_eng=500., spec_type='N'
+    ))
+    new_spectra = pickle.loads(pickle.dumps(spectra))
+    assert np.array_equal(new_spectra.grid_vals, spectra.grid_vals)
+    assert np.array_equal(new_spectra.in_eng, spectra.in_eng)
+    assert new_spectra.spec_type == 'N'
+    # Appending still works after unpickling.
+    new_spectra.append(Spectrum(
+        spectra.eng, np.array([1., 1., 1.]), in_eng=5000., spec_type='N'
+    ))
+    assert new_spectra.grid_vals.shape == (4, 3)
+    assert spectra.grid_vals.shape == (3, 3)
+
+def test_unpickle_dict_state():
+
+    # Spectra objects pickled before __slots__ was used, with their
+    # attributes in __dict__.
+    state = {
+        '_grid_vals': np.array([[1., 2., 3.], [4., 5., 6.]]),
+        '_spec_type': 'N', '_eng': np.array([1., 10., 100.]),
+        '_in_eng': np.array([5., 50.]), '_rs': np.array([-1., -1.]),
+        '_N_underflow': np.zeros(2), '_eng_underflow': np.zeros(2),
+        'n': 1.
+    }
+    spectra = pickle.loads(pickle.dumps(_DictState(Spectra, state)))
+    assert isinstance(spectra, Spectra)
+    assert np.array_equal(spectra.grid_vals, state['_grid_vals'])
+    assert np.array_equal(spectra.in_eng, np.array([5., 50.]))
+    assert spectra.sum_specs().N == approx(np.array([5., 7., 9.]))
+
+def test_sum_specs_out():
+
+    spectra = make_spectra()
+    weight = np.array([1., 2.])
+    expected = spectra.sum_specs(weight)
+
+    # The data of a previous result is reused.
+    out = spectra.sum_specs()
+    out.rs = 10.
+    data = out._data
+    res = spectra.sum_specs(weight, out=out)
+    assert res is out
+    assert out._data is data
+    assert np.array_equal(out.N, expected.N)
+    assert out.spec_type == 'N'
+    assert out.rs == -1.
+
+    # Incompatible data arrays are replaced.
+    out = Spectrum(spectra.eng, np.zeros(3, dtype=int), spec_type='N')
+    data = out._data
+    spectra.sum_specs(weight, out=out)
+    assert out._data is not data
+    assert np.array_equal(out.N, expected.N)
+
+    # Arrays that are not owned by out are not overwritten.
+    data = np.zeros(3)
+    out = Spectrum(spectra.eng, data, spec_type='N')
+    spectra.sum_specs(weight, out=out)
+    assert out._data is not data
+    assert np.array_equal(data, np.zeros(3))
+    assert np.array_equal(out.N, expected.N)
+
+@pytest.mark.parametrize('spec_type', ['N', 'dNdE'])
+def test_redshift(spec_type):
+
+    rng = np.random.default_rng(0)
+    eng = 10**np.linspace(-2, 3, 30)
+    rs = np.array([1000., 1000., 1000., 1000., 1000., 1000.])
+    # No shift, small shifts, shifts moving most of a row and a whole row
+    # below the abscissa, and a blueshift moving bins above it.
+    rs_arr = np.array([1000., 999., 900., 10., 1e-5, 1100.])
+    spectra = Spectra(
+        rng.random((rs.size, eng.size)), eng=eng, in_eng=np.arange(6.), 
+        rs=rs, spec_type=spec_type
+    )
+    spectra._N_underflow = rng.random(rs.size)
+    spectra._eng_underflow = 1e-2*rng.random(rs.size)
+
+    # As in Spectrum.redshift for each row, with the underflow of the 
+    # shift added to the previous underflow.
+    expected = []
+    with pytest.warns(RuntimeWarning):
+        for i, new_rs in enumerate(rs_arr):
+            spec = Spectrum(
+                eng, spectra.grid_vals[i].copy(), rs=rs[i], 
+                spec_type=spec_type
+            )
+            spec.redshift(new_rs)
+            expected.append((
+                spec._data, spectra.N_underflow[i] + spec.underflow['N'],
+                spectra.eng_underflow[i] + spec.underflow['eng']
+            ))
+
+    with pytest.warns(RuntimeWarning):
+        spectra.redshift(rs_arr)
+
+    assert np.array_equal(spectra.rs, rs_arr)
+    assert spectra.spec_type == spec_type
+    for i, (data, N_underflow, eng_underflow) in enumerate(expected):
+        assert spectra.grid_vals[i] == approx(data, rel=1e-12, abs=1e-300)
+        assert spectra.N_underflow[i] == approx(N_underflow, rel=1e-12)
+        assert spectra.eng_underflow[i] == approx(eng_underflow, rel=1e-12)
+
+    # Nothing is left on the grid after the largest shift.
+    assert np.all(spectra.grid_vals[4] == 0)
+    assert spectra.N_underflow[4] > spectra.N_underflow[0]
@@ -1,3 +1,5 @@
+import pickle
+
 import numpy as np
 
 from pytest import approx
@@ -14,3 +16,95 @@ def test_redshift():
     spec.redshift(842.10)
     assert spec.totN() == approx(orig_totN)
     assert spec.toteng() == approx(orig_toteng*842.10/2302.3)
+
+def test_iadd_imul_in_place():
+
+    eng = np.array([1., 10., 100.])
+    data = np.array([1., 2., 3.])
+    spec = Spectrum(eng, data, spec_type='N')
+    other = Spectrum(eng, data, spec_type='N')
+
+    # The first operation copies the data, which is not owned by spec.
+    spec += np.array([1., 1., 1.])
+    assert spec._data is not data
+    owned = spec._data
+    spec *= 2.
+    spec -= np.array([1., 1., 1.])
+    spec /= 2.
+    spec -= other
+    assert spec._data is owned
+    assert spec.N == approx(np.array([0.5, 0.5, 0.5]))
+    assert np.array_equal(data, np.array([1., 2., 3.]))
+    assert np.array_equal(other.N, np.array([1., 2., 3.]))
+
+def test_isub():
+
+    eng = np.array([1., 10., 100.])
+    spec = Spectrum(eng, np.array([1., 2., 3.]), rs=10., spec_type='N')
+    spec.underflow = {'N': 1., 'eng': 2.}
+    other = Spectrum(eng, np.array([3., 2., 1.]), rs=10., spec_type='N')
+    other.underflow = {'N': 0.5, 'eng': 0.5}
+    expected = spec - other
+    spec -= other
+    assert np.array_equal(spec.N, expected.N)
+    assert spec.underflow == expected.underflow
+    assert spec.rs == 10.
+
+def test_iadd_imul_new_array():
+
+    eng = np.array([1., 10., 100.])
+
+    # Float added to integer data must not be truncated.
+    data = np.array([1, 2, 3])
+    spec = Spectrum(eng, data, spec_type='N')
+    spec += np.array([0.5, 0.5, 0.5])
+    assert spec._data is not data
+    assert np.array_equal(spec.N, np.array([1.5, 2.5, 3.5]))
+    assert np.array_equal(data, np.array([1, 2, 3]))
+
+    data = np.array([1., 2., 3.])
+    data.flags.writeable = False
+    spec = Spectrum(eng, data, spec_type='N')
+    spec *= 2.
+    assert spec._data is not data
+    assert np.array_equal(spec.N, np.array([2., 4., 6.]))
+    assert np.array_equal(data, np.array([1., 2., 3.]))
+
+def test_pickle():
+
+    eng = np.array([1., 10., 100.])
+    spec = Spectrum(eng, np.array([1., 2., 3.]), rs=10., spec_type='N')
+    spec.underflow['N'] = 0.5
+    new_spec = pickle.loads(pickle.dumps(spec))
+    assert np.array_equal(new_spec.eng, spec.eng)
+    assert np.array_equal(new_spec.N, spec.N)
+    assert new_spec.rs == 10.
+    assert new_spec.spec_type == 'N'
+    assert new_spec.underflow == spec.underflow
+
+def test_unpickle_dict_state():
+
+    # Spectrum objects pickled before __slots__ was used, with their
+    # attributes in __dict__.
+    state = {
+        'eng': np.array([1., 10., 100.]), '_data': np.array([1., 2., 3.]),
+        'rs': 10., 'in_eng': -1., '_spec_type': 'N', 'length': 3,
+        'underflow': {'N': 0.5, 'eng': 1.}
+    }
+    stream = pickle.dumps(_DictState(Spectrum, state))
+    spec = pickle.loads(stream)
+    assert isinstance(spec, Spectrum)
+    assert np.array_equal(spec.N, np.array([1., 2., 3.]))
+    assert spec.rs == 10.
+    assert spec.length == 3
+    assert spec.underflow == {'N': 0.5, 'eng': 1.}
+
+class _DictState:
+
+    # Pickles as an instance of cls with a __dict__ holding state.
+    def __init__(self, cls, state):
+        self.cls = cls
+        self.state = state
+
+    def __reduce_ex__(self, protocol):
+        return self.cls.__new__, (self.cls,), self.state
@@ -0,0 +1,186 @@
+import numpy as np
+import pytest
+
+from pytest import approx
+from scipy import sparse
+
+from darkhistory.spec.spectrum import Spectrum
+from darkhistory.spec.transferfunction import TransFuncAtRedshift
+
+def make_tfs(spec_type='dNdE'):
+
+    # Lower triangular, as for particles that only lose energy.
+    eng = 10**np.linspace(0, 2, 20)
+    grid_vals = np.tril(np.random.default_rng(0).random((20, 20)))
+    grid_vals[grid_vals < 0.5] = 0.
+    tfs = [
+        TransFuncAtRedshift(
+            grid_vals.copy(), eng=eng, in_eng=eng, rs=np.full(20, 100.),
+            dlnz=0.001, spec_type=spec_type, storage=storage
+        ) for storage in ['dense', 'sparse']
+    ]
+    tfs[0]._N_underflow = np.linspace(0, 1, 20)
+    tfs[1]._N_underflow = np.linspace(0, 1, 20)
+    return tfs
+
+def assert_same(dense, sparse_tf):
+
+    assert np.array_equal(dense.eng, sparse_tf.eng)
+    assert np.array_equal(dense.in_eng, sparse_tf.in_eng)
+    assert dense.spec_type == sparse_tf.spec_type
+    assert sparse_tf.grid_vals == approx(dense.grid_vals, rel=1e-12)
+    assert sparse_tf.N_underflow == approx(dense.N_underflow, rel=1e-12)
+    assert sparse_tf.eng_underflow == approx(dense.eng_underflow, rel=1e-12)
+
+def test_switch_storage():
+
+    dense, sparse_tf = make_tfs()
+    assert dense.storage == 'dense'
+    assert sparse_tf.storage == 'sparse'
+    assert sparse.issparse(sparse_tf._grid_vals)
+    assert isinstance(sparse_tf.grid_vals, np.ndarray)
+    assert_same(dense, sparse_tf)
+
+    sparse_tf.switch_storage()
+    assert sparse_tf.storage == 'dense'
+    assert_same(dense, sparse_tf)
+    sparse_tf.switch_storage('sparse')
+    assert sparse_tf.storage == 'sparse'
+
+    with pytest.raises(TypeError):
+        sparse_tf.switch_storage('csr')
+
+def test_getitem():
+
+    dense, sparse_tf = make_tfs()
+    for i in [np.int64(0), np.int64(7), np.int64(19)]:
+        assert sparse_tf[i].dNdE == approx(dense[i].dNdE)
+        assert sparse_tf[i].in_eng == dense[i].in_eng
+        assert sparse_tf[i].underflow == dense[i].underflow
+
+@pytest.mark.parametrize('spec_type', ['N', 'dNdE'])
+def test_sum_specs(spec_type):
+
+    dense, sparse_tf = make_tfs(spec_type)
+    weight = np.random.default_rng(1).random(20)
+    for w in [None, weight, Spectrum(dense.in_eng, weight, spec_type='N')]:
+        dense_spec = dense.sum_specs(w)
+        sparse_spec = sparse_tf.sum_specs(w)
+        assert sparse_spec.dNdE == approx(dense_spec.dNdE, rel=1e-12)
+        assert sparse_spec.spec_type == dense_spec.spec_type
+        assert sparse_spec.rs == dense_spec.rs == 100.
+
+    out = Spectrum(dense.eng, np.zeros(20), spec_type='N')
+    res = sparse_tf.sum_specs(weight, out=out)
+    assert res is out
+    assert out.dNdE == approx(dense.sum_specs(weight).dNdE, rel=1e-12)
+    assert out.rs == 100.
+
+def test_arithmetic():
+
+    dense, sparse_tf = make_tfs()
+    other_dense, other_sparse = make_tfs()
+    arr = np.random.default_rng(2).random((20, 20))
+    weight = np.random.default_rng(3).random(20)
+
+    assert_same(dense + other_dense, sparse_tf + other_sparse)
+    assert_same(dense + other_dense, sparse_tf + other_dense)
+    sum_arr = sparse_tf + arr
+    assert sum_arr.grid_vals == approx(dense.grid_vals + arr, rel=1e-12)
+    assert np.all(sum_arr.N_underflow == 0.)
+    assert_same(dense*3., sparse_tf*3.)
+    assert_same(3.*dense, 3.*sparse_tf)
+    assert_same(dense*weight, sparse_tf*weight)
+    assert_same(dense*other_dense, sparse_tf*other_sparse)
+
+    assert (sparse_tf + other_sparse).storage == 'sparse'
+    assert (sparse_tf*weight).storage == 'sparse'
+
+    dense += other_dense
+    sparse_tf += other_sparse
+    assert_same(dense, sparse_tf)
+    dense *= weight
+    sparse_tf *= weight
+    assert_same(dense, sparse_tf)
+    dense *= 2.
+    sparse_tf *= 2.
+    assert_same(dense, sparse_tf)
+    assert sparse_tf.storage == 'sparse'
+
+def test_rebin():
+
+    dense, sparse_tf = make_tfs()
+    out_eng = 10**np.linspace(0.3, 2, 12)
+    dense.rebin(out_eng)
+    sparse_tf.rebin(out_eng)
+    assert_same(dense, sparse_tf)
+    assert sparse_tf.storage == 'sparse'
+
+@pytest.mark.parametrize('target', ['N', 'dNdE', None])
+def test_switch_spec_type(target):
+
+    dense, sparse_tf = make_tfs()
+    dense.switch_spec_type(target)
+    sparse_tf.switch_spec_type(target)
+    assert sparse_tf.storage == 'sparse'
+    assert_same(dense, sparse_tf)
+
+    dense.switch_spec_type()
+    sparse_tf.switch_spec_type()
+    assert sparse_tf.storage == 'sparse'
+    assert_same(dense, sparse_tf)
+
+def test_append():
+
+    dense, sparse_tf = make_tfs()
+    spec = Spectrum(
+        dense.eng, np.linspace(0, 1, 20), in_eng=200., rs=100.
+    )
+    spec.underflow = {'N': 0.5, 'eng': 2.}
+    dense.append(spec)
+    sparse_tf.append(spec)
+    assert sparse_tf.storage == 'sparse'
+    assert sparse_tf._grid_vals.shape == (21, 20)
+    assert_same(dense, sparse_tf)
+    assert np.array_equal(sparse_tf.rs, dense.rs)
+
+    bad_spec = Spectrum(dense.eng, np.ones(20), in_eng=300., rs=100.)
+    bad_spec.switch_spec_type('N')
+    with pytest.raises(TypeError):
+        sparse_tf.append(bad_spec)
+    with pytest.raises(TypeError):
+        sparse_tf.append(Spectrum(
+            2*dense.eng, np.ones(20), in_eng=300., rs=100.
+        ))
+
+def test_at_in_eng():
+
+    dense, sparse_tf = make_tfs()
+    new_eng = 10**np.linspace(0.1, 1.9, 7)
+    assert_same(dense.at_in_eng(new_eng), sparse_tf.at_in_eng(new_eng))
+
+@pytest.mark.parametrize('n', [0, 1, 2, 5])
+def test_matrix_power(n):
+
+    dense, sparse_tf = make_tfs()
+    dense_pow = dense.matrix_power(n)
+    sparse_pow = sparse_tf.matrix_power(n)
+
+    assert dense_pow.grid_vals == approx(
+        np.linalg.matrix_power(dense.grid_vals, n), rel=1e-12
+    )
+    assert_same(dense_pow, sparse_pow)
+    assert sparse_pow.storage == 'sparse'
+    assert dense_pow.storage == 'dense'
+    assert sparse_pow.dlnz == approx(0.001*n)
+    assert np.all(sparse_pow.N_underflow == 0.)
+
+def test_matrix_power_not_square():
+
+    dense, _ = make_tfs()
+    non_square = TransFuncAtRedshift(
+        np.ones((3, 20)), eng=dense.eng, in_eng=dense.in_eng[:3],
+        rs=np.full(3, 100.), storage='sparse'
+    )
+    with pytest.raises(TypeError):
+        non_square.matrix_power(2)